@@ -4,8 +4,17 @@ All reads and writes to Airtable: Projects, Clients, Traffic table
 """
 
 import os
+import re
+import time
 import httpx
 from datetime import datetime
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+
+import metrics
+import tracing
+import breaker
+import logs
 
 # ===================
 # CONFIG
@@ -13,27 +22,75 @@ from datetime import datetime
 
 AIRTABLE_API_KEY = os.environ.get('AIRTABLE_API_KEY')
 AIRTABLE_BASE_ID = os.environ.get('AIRTABLE_BASE_ID', 'app8CI7NAZqhQ4G1Y')
+AIRTABLE_API_URL = os.environ.get('AIRTABLE_API_URL', 'https://api.airtable.com/v0')  # bench/ points this at the emulator
 
 PROJECTS_TABLE = 'Projects'
 CLIENTS_TABLE = 'Clients'
 TRAFFIC_TABLE = 'Traffic'
 UPDATES_TABLE = 'Updates'
 MEETINGS_TABLE = 'Meetings'
+PEOPLE_TABLE = 'People'
 
 TIMEOUT = 10.0
 
+# Batch lookups: values per OR() formula (keeps URLs well under Airtable's limit)
+# and records per create call (Airtable max is 10)
+OR_CHUNK_SIZE = 40
+CREATE_CHUNK_SIZE = 10
+
+logger = logs.get('airtable')
+
+
+class _MeteredTransport(httpx.HTTPTransport):
+    """
+    HTTP transport that counts (and traces) every Airtable request for /metrics,
+    behind the Airtable circuit breaker (refused at once while it's open)
+    """
+    
+    def handle_request(self, request):
+        if not breaker.airtable.allow():
+            raise breaker.BreakerOpen('airtable', breaker.airtable.retry_in())
+        table = metrics.airtable_table(request.url)
+        with tracing.span(f"airtable {request.method} {table}", table=table, method=request.method) as span:
+            start = time.perf_counter()
+            try:
+                response = super().handle_request(request)
+            except Exception:
+                metrics.record_airtable(table, request.method, 'error', time.perf_counter() - start)
+                breaker.airtable.record(False, time.perf_counter() - start)
+                raise
+            seconds = time.perf_counter() - start
+            metrics.record_airtable(table, request.method, response.status_code, seconds)
+            breaker.airtable.record(response.status_code < 500 and response.status_code != 429, seconds)
+            span.set(status=response.status_code)
+            return response
+
+
+# Pooled client for every Airtable call (also used by traffic.py tools)
+client = httpx.Client(timeout=TIMEOUT, transport=_MeteredTransport())
+
+
+_DATE_PATTERN = re.compile(r'(\d{1,2})/(\d{1,2})/(\d{4})')
+
 
 def _parse_date_to_iso(date_str):
     """
     Parse Airtable date field (D/M/YYYY format) into ISO format (YYYY-MM-DD).
     Handles formats like "2/3/2026" or "15/12/2025".
     """
-    if not date_str or str(date_str).upper() == 'TBC':
+    if not date_str:
+        return None
+    return _date_to_iso(str(date_str))
+
+
+@lru_cache(maxsize=4096)
+def _date_to_iso(date_str):
+    """Memoized - a base only has a few hundred distinct due dates"""
+    if date_str.upper() == 'TBC':
         return None
     
-    import re
     # Handle D/M/YYYY format
-    match = re.search(r'(\d{1,2})/(\d{1,2})/(\d{4})', str(date_str))
+    match = _DATE_PATTERN.search(date_str)
     if match:
         day, month, year = int(match.group(1)), int(match.group(2)), int(match.group(3))
         try:
@@ -42,11 +99,8 @@ def _parse_date_to_iso(date_str):
             return None
     
     # Also handle ISO format if Airtable sends it that way
-    if 'T' in str(date_str):
-        try:
-            return str(date_str).split('T')[0]
-        except:
-            pass
+    if 'T' in date_str:
+        return date_str.split('T')[0]
     
     return None
 
@@ -61,7 +115,39 @@ def _headers():
 
 def _url(table):
     """Build Airtable URL for a table"""
-    return f'https://api.airtable.com/v0/{AIRTABLE_BASE_ID}/{table}'
+    return f'{AIRTABLE_API_URL}/{AIRTABLE_BASE_ID}/{table}'
+
+
+def _or_formula(field, values):
+    """OR() formula matching any of values, e.g. OR({Job Number}='LAB 055', ...)"""
+    return "OR(" + ", ".join(f"{{{field}}}='{value}'" for value in values) + ")"
+
+
+def _chunks(items, size):
+    """Split a list into lists of at most size items"""
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def _get_all_records(table, params):
+    """GET every page of a filtered table (follows Airtable's offset)"""
+    params = dict(params)
+    records = []
+    
+    while True:
+        response = client.get(
+            _url(table),
+            headers=_headers(),
+            params=params,
+            timeout=TIMEOUT
+        )
+        response.raise_for_status()
+        data = response.json()
+        records.extend(data.get('records', []))
+        
+        offset = data.get('offset')
+        if not offset:
+            return records
+        params['offset'] = offset
 
 
 # ===================
@@ -81,7 +167,7 @@ def check_duplicate(internet_message_id):
             'filterByFormula': f"{{internetMessageId}}='{internet_message_id}'"
         }
         
-        response = httpx.get(
+        response = client.get(
             _url(TRAFFIC_TABLE), 
             headers=_headers(), 
             params=params, 
@@ -93,7 +179,7 @@ def check_duplicate(internet_message_id):
         return records[0] if records else None
         
     except Exception as e:
-        print(f"[airtable] Error checking duplicate: {e}")
+        logger.error('Error checking duplicate', error=str(e))
         return None
 
 
@@ -109,7 +195,7 @@ def check_pending_clarify(conversation_id):
         filter_formula = f"AND({{conversationId}}='{conversation_id}', {{Status}}='pending')"
         params = {'filterByFormula': filter_formula}
         
-        response = httpx.get(
+        response = client.get(
             _url(TRAFFIC_TABLE), 
             headers=_headers(), 
             params=params, 
@@ -121,10 +207,83 @@ def check_pending_clarify(conversation_id):
         return records[0] if records else None
         
     except Exception as e:
-        print(f"[airtable] Error checking pending clarify: {e}")
+        logger.error('Error checking pending clarify', error=str(e))
         return None
 
 
+def _traffic_fields(internet_message_id, conversation_id, route, status, job_number, client_code, sender_email, subject, email_body=None):
+    """Build the fields for a Traffic table record"""
+    # Truncate email body if too long for Airtable
+    truncated_body = None
+    if email_body:
+        if len(email_body) > 99000:
+            truncated_body = email_body[:99000] + "\n\n[TRUNCATED - email too long]"
+        else:
+            truncated_body = email_body
+    
+    return {
+        'internetMessageId': internet_message_id or '',
+        'conversationId': conversation_id or '',
+        'Route': route,
+        'Status': status,
+        'JobNumber': job_number or '',
+        'clientCode': client_code or '',
+        'SenderEmail': sender_email or '',
+        'Subject': subject or '',
+        'EmailBody': truncated_body or ''
+    }
+
+
+def check_duplicates(internet_message_ids):
+    """
+    Batch version of check_duplicate - one OR() query per chunk of ids.
+    Returns dict of internetMessageId -> existing record (only ids already seen).
+    """
+    ids = sorted({mid for mid in internet_message_ids if mid})
+    if not AIRTABLE_API_KEY or not ids:
+        return {}
+    
+    found = {}
+    try:
+        for chunk in _chunks(ids, OR_CHUNK_SIZE):
+            params = {'filterByFormula': _or_formula('internetMessageId', chunk)}
+            for record in _get_all_records(TRAFFIC_TABLE, params):
+                mid = record['fields'].get('internetMessageId')
+                if mid and mid not in found:
+                    found[mid] = record
+        
+        return found
+        
+    except Exception as e:
+        logger.error('Error checking duplicates', error=str(e))
+        return found
+
+
+def check_pending_clarifies(conversation_ids):
+    """
+    Batch version of check_pending_clarify.
+    Returns dict of conversationId -> pending record.
+    """
+    ids = sorted({cid for cid in conversation_ids if cid})
+    if not AIRTABLE_API_KEY or not ids:
+        return {}
+    
+    found = {}
+    try:
+        for chunk in _chunks(ids, OR_CHUNK_SIZE):
+            params = {'filterByFormula': f"AND({_or_formula('conversationId', chunk)}, {{Status}}='pending')"}
+            for record in _get_all_records(TRAFFIC_TABLE, params):
+                cid = record['fields'].get('conversationId')
+                if cid and cid not in found:
+                    found[cid] = record
+        
+        return found
+        
+    except Exception as e:
+        logger.error('Error checking pending clarifies', error=str(e))
+        return found
+
+
 def log_traffic(internet_message_id, conversation_id, route, status, job_number, client_code, sender_email, subject, email_body=None):
     """
     Log email to Traffic table.
@@ -136,29 +295,14 @@ def log_traffic(internet_message_id, conversation_id, route, status, job_number,
         return None
     
     try:
-        # Truncate email body if too long for Airtable
-        truncated_body = None
-        if email_body:
-            if len(email_body) > 99000:
-                truncated_body = email_body[:99000] + "\n\n[TRUNCATED - email too long]"
-            else:
-                truncated_body = email_body
-        
         record_data = {
-            'fields': {
-                'internetMessageId': internet_message_id or '',
-                'conversationId': conversation_id or '',
-                'Route': route,
-                'Status': status,
-                'JobNumber': job_number or '',
-                'clientCode': client_code or '',
-                'SenderEmail': sender_email or '',
-                'Subject': subject or '',
-                'EmailBody': truncated_body or ''
-            }
+            'fields': _traffic_fields(
+                internet_message_id, conversation_id, route, status,
+                job_number, client_code, sender_email, subject, email_body
+            )
         }
         
-        response = httpx.post(
+        response = client.post(
             _url(TRAFFIC_TABLE), 
             headers=_headers(), 
             json=record_data, 
@@ -166,16 +310,49 @@ def log_traffic(internet_message_id, conversation_id, route, status, job_number,
         )
         
         if response.status_code != 200:
-            print(f"[airtable] Traffic log rejected: {response.status_code} - {response.text}")
+            logger.error('Traffic log rejected', status=response.status_code, response=response.text)
             return None
         
         return response.json().get('id')
         
     except Exception as e:
-        print(f"[airtable] Error logging to Traffic: {e}")
+        logger.error('Error logging to Traffic', error=str(e))
         return None
 
 
+def log_traffic_batch(entries):
+    """
+    Log many emails to the Traffic table, 10 records per request.
+    entries: list of log_traffic argument tuples.
+    Returns list of created record IDs (None for any chunk that was rejected).
+    """
+    if not AIRTABLE_API_KEY or not entries:
+        return []
+    
+    record_ids = []
+    for chunk in _chunks(list(entries), CREATE_CHUNK_SIZE):
+        try:
+            response = client.post(
+                _url(TRAFFIC_TABLE),
+                headers=_headers(),
+                json={'records': [{'fields': _traffic_fields(*entry)} for entry in chunk]},
+                timeout=TIMEOUT
+            )
+            
+            if response.status_code != 200:
+                logger.error('Traffic batch log rejected', status=response.status_code, response=response.text)
+                record_ids.extend([None] * len(chunk))
+                continue
+            
+            record_ids.extend(r.get('id') for r in response.json().get('records', []))
+            
+        except Exception as e:
+            logger.error('Error batch logging to Traffic', error=str(e))
+            record_ids.extend([None] * len(chunk))
+    
+    return record_ids
+
+
 def get_email_body(internet_message_id):
     """
     Retrieve email body from Traffic table by internetMessageId.
@@ -192,7 +369,7 @@ def get_email_body(internet_message_id):
             'maxRecords': 1
         }
         
-        response = httpx.get(
+        response = client.get(
             _url(TRAFFIC_TABLE), 
             headers=_headers(), 
             params=params, 
@@ -202,13 +379,13 @@ def get_email_body(internet_message_id):
         
         records = response.json().get('records', [])
         if not records:
-            print(f"[airtable] No traffic record found for {internet_message_id}")
+            logger.warning('No traffic record found', internetMessageId=internet_message_id)
             return None
         
         return records[0]['fields'].get('EmailBody', None)
         
     except Exception as e:
-        print(f"[airtable] Error getting email body: {e}")
+        logger.error('Error getting email body', error=str(e))
         return None
 
 
@@ -221,7 +398,7 @@ def update_traffic_record(record_id, updates):
         return False
     
     try:
-        response = httpx.patch(
+        response = client.patch(
             f"{_url(TRAFFIC_TABLE)}/{record_id}",
             headers=_headers(),
             json={'fields': updates},
@@ -231,7 +408,7 @@ def update_traffic_record(record_id, updates):
         return True
         
     except Exception as e:
-        print(f"[airtable] Error updating Traffic record: {e}")
+        logger.error('Error updating Traffic record', error=str(e))
         return False
 
 
@@ -252,7 +429,7 @@ def get_project(job_number):
             'filterByFormula': f"{{Job Number}}='{job_number}'"
         }
         
-        response = httpx.get(
+        response = client.get(
             _url(PROJECTS_TABLE), 
             headers=_headers(), 
             params=params, 
@@ -264,38 +441,218 @@ def get_project(job_number):
         if not records:
             return None
         
-        record = records[0]
-        fields = record['fields']
+        # Extract client code from job number
+        client_code = job_number.split()[0] if job_number else None
+        
+        # Get Team ID from Clients table
+        team_id = get_team_id(client_code) if client_code else None
+        
+        return _project_from_record(records[0], job_number, team_id)
+        
+    except Exception as e:
+        job = last_known_job(job_number)
+        if job is not None:
+            logger.warning('Serving cached project', jobNumber=job_number, error=str(e).splitlines()[0])
+            return job.to_project(get_team_id(job_number.split()[0]), job_number)
+        logger.error('Error looking up project', jobNumber=job_number, error=str(e))
+        return None
+
+
+def get_projects(job_numbers):
+    """
+    Batch version of get_project - one OR() query for the projects and one
+    for their clients' Team IDs.
+    Returns dict of job number -> project dict (only jobs that exist).
+    """
+    job_numbers = sorted({j for j in job_numbers if j})
+    if not AIRTABLE_API_KEY or not job_numbers:
+        return {}
+    
+    try:
+        records = []
+        for chunk in _chunks(job_numbers, OR_CHUNK_SIZE):
+            records.extend(_get_all_records(PROJECTS_TABLE, {'filterByFormula': _or_formula('Job Number', chunk)}))
+        
+        team_ids = get_team_ids({j.split()[0] for j in job_numbers})
+        
+        projects = {}
+        for record in records:
+            job_number = record['fields'].get('Job Number', '')
+            if job_number in projects or job_number not in job_numbers:
+                continue
+            projects[job_number] = _project_from_record(record, job_number, team_ids.get(job_number.split()[0]))
+        
+        return projects
+        
+    except Exception as e:
+        logger.error('Error looking up projects', error=str(e))
+        return {}
+
+
+# ===================
+# JOB RECORDS
+# ===================
+
+class Job:
+    """
+    One Projects record, decoded once. Every Projects reader goes through here;
+    to_dict() gives the job card (SCHEMA.md §3), to_project() the enrichment dict.
+    """
+    
+    __slots__ = (
+        'record_id', 'job_number', 'job_name', 'client_name', 'description', 'the_story',
+        'project_owner', 'stage', 'status', 'round', 'with_client', 'update_due', 'live_date',
+        'update', 'last_updated', 'update_history', 'channel_url', 'days_since_update',
+        'teams_channel_id', 'files_url',
+    )
+    
+    def __init__(self, record):
+        fields = record.get('fields', {})
+        get = fields.get
+        
+        self.record_id = record.get('id')
+        self.job_number = get('Job Number', '')
+        self.job_name = get('Project Name', '')
         
         # Client name might be a linked field (list)
-        client_name = fields.get('Client', '')
+        client_name = get('Client', '')
         if isinstance(client_name, list):
             client_name = client_name[0] if client_name else ''
+        self.client_name = client_name
         
-        # Extract client code from job number
-        client_code = job_number.split()[0] if job_number else None
+        self.description = get('Description', '')
+        self.the_story = get('The Story', '')
+        self.project_owner = get('Project Owner', '')
+        self.stage = get('Stage', '')
+        self.status = get('Status', '')
+        self.round = get('Round', 0) or 0
+        self.with_client = get('With Client?', False)
         
-        # Get Team ID from Clients table
-        team_id = get_team_id(client_code) if client_code else None
+        # Update Due is D/M/YYYY, converted to ISO for JS
+        self.update_due = _parse_date_to_iso(get('Update Due', ''))
+        self.live_date = get('Live', '')  # Month dropdown: "Jan", "Feb", "Tbc"
+        
+        # Get update from rollup first (source of truth), fallback to text field
+        self.update = get('Update History', '') or get('Update', '')
+        
+        # Parse update history (field name is 'Update History')
+        update_history_raw = get('Update History', []) or get('Update history', [])
+        update_history = []
+        last_updated = None
+        
+        if update_history_raw:
+            if isinstance(update_history_raw, list):
+                update_history = update_history_raw[:5]  # Keep last 5 for history
+            elif isinstance(update_history_raw, str):
+                update_history = [u.strip() for u in update_history_raw.split('\n') if u.strip()][:5]
+            
+            # Extract date from first history entry if present
+            if update_history:
+                date_part, separator, _ = update_history[0].partition(' | ')
+                if separator:
+                    last_updated = date_part
         
+        self.update_history = update_history
+        self.last_updated = last_updated
+        self.channel_url = get('Channel Url', '')
+        self.days_since_update = get('Days Since Update', '-')
+        self.teams_channel_id = get('Teams Channel ID', None)
+        self.files_url = get('Files Url', '')
+    
+    @property
+    def client_code(self):
+        return self.job_number.split()[0] if self.job_number else ''
+    
+    def to_dict(self):
+        """Job card (SCHEMA.md §3)"""
         return {
-            'recordId': record['id'],
-            'jobNumber': fields.get('Job Number', job_number),
-            'jobName': fields.get('Project Name', ''),
-            'clientName': client_name,
-            'clientCode': client_code,
-            'stage': fields.get('Stage', ''),
-            'status': fields.get('Status', ''),
-            'round': fields.get('Round', 0) or 0,
-            'withClient': fields.get('With Client?', False),
-            'teamsChannelId': fields.get('Teams Channel ID', None),
+            'jobNumber': self.job_number,
+            'jobName': self.job_name,
+            'description': self.description,
+            'theStory': self.the_story,
+            'projectOwner': self.project_owner,
+            'stage': self.stage,
+            'status': self.status,
+            'updateDue': self.update_due,
+            'liveDate': self.live_date,
+            'withClient': self.with_client,
+            'clientCode': self.client_code,
+            'update': self.update,
+            'lastUpdated': self.last_updated,
+            'updateHistory': self.update_history,
+            'channelUrl': self.channel_url,
+            'daysSinceUpdate': self.days_since_update,
+        }
+    
+    def to_project(self, team_id, job_number=None):
+        """The project dict used for enrichment (job_number: the one we searched for)"""
+        job_number = job_number or self.job_number
+        return {
+            'recordId': self.record_id,
+            'jobNumber': self.job_number or job_number,
+            'jobName': self.job_name,
+            'clientName': self.client_name,
+            'clientCode': job_number.split()[0] if job_number else None,
+            'stage': self.stage,
+            'status': self.status,
+            'round': self.round,
+            'withClient': self.with_client,
+            'teamsChannelId': self.teams_channel_id,
             'teamId': team_id,
-            'filesUrl': fields.get('Files Url', ''),
+            'filesUrl': self.files_url,
         }
-        
+
+
+def decode_jobs(records):
+    """Projects records -> [Job]"""
+    return [Job(record) for record in records]
+
+
+def _project_from_record(record, job_number, team_id):
+    """Map a Projects record to the project dict used for enrichment"""
+    return Job(record).to_project(team_id, job_number)
+    
+    
+# Last good job list per formula - served while Airtable is failing or its breaker is open
+_last_jobs = {}
+STALE_JOBS_MAX_AGE = int(os.environ.get('STALE_JOBS_MAX_AGE', '3600'))
+
+
+def last_known_job(job_number):
+    """
+    A job from the newest good job list that has it (within STALE_JOBS_MAX_AGE),
+    or None - get_project's answer while Airtable is failing (shared with airtable_async)
+    """
+    now = time.time()
+    for fetched_at, jobs in sorted(_last_jobs.values(), key=lambda entry: entry[0], reverse=True):
+        if now - fetched_at > STALE_JOBS_MAX_AGE:
+            break
+        for job in jobs:
+            if job.job_number == job_number:
+                return job
+    return None
+
+
+def _get_jobs(filter_formula):
+    """Projects records matching a formula, decoded (the last good list if Airtable is down)"""
+    try:
+        response = client.get(
+            _url(PROJECTS_TABLE),
+            headers=_headers(),
+            params={'filterByFormula': filter_formula},
+            timeout=TIMEOUT
+        )
+        response.raise_for_status()
+        jobs = decode_jobs(response.json().get('records', []))
     except Exception as e:
-        print(f"[airtable] Error looking up project: {e}")
-        return None
+        fetched_at, jobs = _last_jobs.get(filter_formula, (None, None))
+        if jobs is None or time.time() - fetched_at > STALE_JOBS_MAX_AGE:
+            raise
+        logger.warning('Serving cached jobs', ageSeconds=round(time.time() - fetched_at), error=str(e).splitlines()[0])
+        return jobs
+    
+    _last_jobs[filter_formula] = (time.time(), jobs)
+    return jobs
 
 
 def get_active_jobs(client_code):
@@ -309,78 +666,52 @@ def get_active_jobs(client_code):
     try:
         # Get all jobs that are NOT completed
         filter_formula = f"AND(FIND('{client_code}', {{Job Number}})=1, {{Status}}!='Completed')"
-        params = {'filterByFormula': filter_formula}
         
-        print(f"[airtable] Fetching active jobs for {client_code}")
+        logger.debug('Fetching active jobs', clientCode=client_code)
         
-        response = httpx.get(
-            _url(PROJECTS_TABLE), 
-            headers=_headers(), 
-            params=params, 
-            timeout=TIMEOUT
-        )
-        response.raise_for_status()
+        jobs = _get_jobs(filter_formula)
         
-        records = response.json().get('records', [])
+        logger.info('Active jobs', clientCode=client_code, jobs=len(jobs))
         
-        print(f"[airtable] Found {len(records)} active jobs for {client_code}")
+        return [job.to_dict() for job in jobs]
         
-        jobs = []
-        for record in records:
-            fields = record.get('fields', {})
-            job_number = fields.get('Job Number', '')
-            
-            # Get update from rollup first (source of truth), fallback to text field
-            latest_update = fields.get('Update History', '') or fields.get('Update', '')
-            
-            # Parse update history (field name is 'Update History')
-            update_history_raw = fields.get('Update History', []) or fields.get('Update history', [])
-            update_history = []
-            last_updated = None
-            
-            if update_history_raw:
-                if isinstance(update_history_raw, list):
-                    update_history = update_history_raw[:5]  # Keep last 5 for history
-                elif isinstance(update_history_raw, str):
-                    update_history = [u.strip() for u in update_history_raw.split('\n') if u.strip()][:5]
-                
-                # Extract date from first history entry if present
-                if update_history:
-                    first_update = update_history[0]
-                    if ' | ' in first_update:
-                        date_part, _ = first_update.split(' | ', 1)
-                        last_updated = date_part
-            
-            # Parse Update Due - now D/M/YYYY format, convert to ISO for JS
-            update_due_raw = fields.get('Update Due', '')
-            update_due = _parse_date_to_iso(update_due_raw)
-            
-            jobs.append({
-                'jobNumber': job_number,
-                'jobName': fields.get('Project Name', ''),
-                'description': fields.get('Description', ''),
-                'theStory': fields.get('The Story', ''),
-                'projectOwner': fields.get('Project Owner', ''),
-                'stage': fields.get('Stage', ''),
-                'status': fields.get('Status', ''),
-                'updateDue': update_due,
-                'liveDate': fields.get('Live', ''),  # Month dropdown: "Jan", "Feb", "Tbc"
-                'withClient': fields.get('With Client?', False),
-                'clientCode': job_number.split()[0] if job_number else '',
-                'update': latest_update,
-                'lastUpdated': last_updated,
-                'updateHistory': update_history,
-                'channelUrl': fields.get('Channel Url', ''),
-                'daysSinceUpdate': fields.get('Days Since Update', '-'),
-            })
+    except Exception as e:
+        logger.error('Error getting active jobs', error=str(e))
+        return []
+
+
+def get_active_jobs_for_clients(client_codes):
+    """
+    Batch version of get_active_jobs - one OR() query for several clients.
+    Returns list of job dicts.
+    """
+    codes = sorted({c.upper() for c in client_codes if c})
+    if not AIRTABLE_API_KEY or not codes:
+        return []
+    
+    try:
+        starts = ", ".join(f"FIND('{code}', {{Job Number}})=1" for code in codes)
+        filter_formula = f"AND(OR({starts}), {{Status}}!='Completed')"
         
-        return jobs
+        logger.debug('Fetching active jobs', clientCodes=codes)
+        
+        jobs = _get_jobs(filter_formula)
+        
+        logger.info('Active jobs', clients=len(codes), jobs=len(jobs))
+        
+        return [job.to_dict() for job in jobs]
         
     except Exception as e:
-        print(f"[airtable] Error getting active jobs: {e}")
+        logger.error('Error getting active jobs', error=str(e))
         return []
 
 
+def load_active_jobs():
+    """All active jobs across all clients, decoded. Raises on Airtable errors (warm-up uses this)."""
+    # Get all jobs that are NOT completed
+    return _get_jobs("{Status}!='Completed'")
+
+
 def get_all_active_jobs():
     """
     Get ALL active jobs across ALL clients.
@@ -391,77 +722,16 @@ def get_all_active_jobs():
         return []
     
     try:
-        # Get all jobs that are NOT completed
-        filter_formula = "{Status}!='Completed'"
-        params = {'filterByFormula': filter_formula}
-        
-        print(f"[airtable] Fetching all active jobs across all clients")
-        
-        response = httpx.get(
-            _url(PROJECTS_TABLE), 
-            headers=_headers(), 
-            params=params, 
-            timeout=TIMEOUT
-        )
-        response.raise_for_status()
-        
-        records = response.json().get('records', [])
+        logger.debug('Fetching all active jobs')
         
-        print(f"[airtable] Found {len(records)} total active jobs")
+        jobs = load_active_jobs()
         
-        jobs = []
-        for record in records:
-            fields = record.get('fields', {})
-            job_number = fields.get('Job Number', '')
-            
-            # Get update from rollup first (source of truth), fallback to text field
-            latest_update = fields.get('Update History', '') or fields.get('Update', '')
-            
-            # Parse update history (field name is 'Update History')
-            update_history_raw = fields.get('Update History', []) or fields.get('Update history', [])
-            update_history = []
-            last_updated = None
-            
-            if update_history_raw:
-                if isinstance(update_history_raw, list):
-                    update_history = update_history_raw[:5]  # Keep last 5 for history
-                elif isinstance(update_history_raw, str):
-                    update_history = [u.strip() for u in update_history_raw.split('\n') if u.strip()][:5]
-                
-                # Extract date from first history entry if present
-                if update_history:
-                    first_update = update_history[0]
-                    if ' | ' in first_update:
-                        date_part, _ = first_update.split(' | ', 1)
-                        last_updated = date_part
-            
-            # Parse Update Due - now D/M/YYYY format, convert to ISO for JS
-            update_due_raw = fields.get('Update Due', '')
-            update_due = _parse_date_to_iso(update_due_raw)
-            
-            jobs.append({
-                'jobNumber': job_number,
-                'jobName': fields.get('Project Name', ''),
-                'description': fields.get('Description', ''),
-                'theStory': fields.get('The Story', ''),
-                'projectOwner': fields.get('Project Owner', ''),
-                'stage': fields.get('Stage', ''),
-                'status': fields.get('Status', ''),
-                'updateDue': update_due,
-                'liveDate': fields.get('Live', ''),  # Month dropdown: "Jan", "Feb", "Tbc"
-                'withClient': fields.get('With Client?', False),
-                'clientCode': job_number.split()[0] if job_number else '',
-                'update': latest_update,
-                'lastUpdated': last_updated,
-                'updateHistory': update_history,
-                'channelUrl': fields.get('Channel Url', ''),
-                'daysSinceUpdate': fields.get('Days Since Update', '-'),
-            })
+        logger.info('All active jobs', jobs=len(jobs))
         
-        return jobs
+        return [job.to_dict() for job in jobs]
         
     except Exception as e:
-        print(f"[airtable] Error getting all active jobs: {e}")
+        logger.error('Error getting all active jobs', error=str(e))
         return []
 
 
@@ -483,9 +753,9 @@ def get_job_by_number(job_number):
             'maxRecords': 1
         }
         
-        print(f"[airtable] Fetching job: {job_number}")
+        logger.debug('Fetching job', jobNumber=job_number)
         
-        response = httpx.get(
+        response = client.get(
             _url(PROJECTS_TABLE), 
             headers=_headers(), 
             params=params, 
@@ -496,65 +766,63 @@ def get_job_by_number(job_number):
         records = response.json().get('records', [])
         
         if not records:
-            print(f"[airtable] Job {job_number} not found")
+            logger.info('Job not found', jobNumber=job_number)
             return None
         
-        fields = records[0].get('fields', {})
+        # Get client code and team ID
+        client_code = job_number.split()[0] if job_number else ''
+        team_id = get_team_id(client_code) if client_code else None
         
-        # Get update from rollup first (source of truth), fallback to text field
-        latest_update = fields.get('Update History', '') or fields.get('Update', '')
+        return _job_detail(Job(records[0]), client_code, team_id)
         
-        # Parse update history (field name is 'Update History')
-        update_history_raw = fields.get('Update History', []) or fields.get('Update history', [])
-        update_history = []
-        last_updated = None
+    except Exception as e:
+        logger.error('Error getting job by number', jobNumber=job_number, error=str(e))
+        return None
+
+
+def _job_detail(job, client_code, team_id):
+    """A job dict with its links, as get_job_by_number returns it"""
+    return {
+        **job.to_dict(),
+        'clientCode': client_code,
+        'teamsChannelId': job.teams_channel_id or '',
+        'teamId': team_id,
+        'filesUrl': job.files_url,
+    }
+
+
+def get_jobs_by_numbers(job_numbers):
+    """
+    Batch version of get_job_by_number - one OR() query for the jobs and one
+    for their clients' Team IDs.
+    Returns dict of job number -> job dict (only jobs that exist).
+    """
+    job_numbers = sorted({j.replace('_', ' ').upper() for j in job_numbers if j})
+    if not AIRTABLE_API_KEY or not job_numbers:
+        return {}
+    
+    try:
+        logger.debug('Fetching jobs', jobNumbers=job_numbers)
         
-        if update_history_raw:
-            if isinstance(update_history_raw, list):
-                update_history = update_history_raw[:5]  # Keep last 5 for history
-            elif isinstance(update_history_raw, str):
-                update_history = [u.strip() for u in update_history_raw.split('\n') if u.strip()][:5]
-            
-            # Extract date from first history entry if present
-            if update_history:
-                first_update = update_history[0]
-                if ' | ' in first_update:
-                    date_part, _ = first_update.split(' | ', 1)
-                    last_updated = date_part
+        records = []
+        for chunk in _chunks(job_numbers, OR_CHUNK_SIZE):
+            records.extend(_get_all_records(PROJECTS_TABLE, {'filterByFormula': _or_formula('Job Number', chunk)}))
         
-        # Parse Update Due - now D/M/YYYY format, convert to ISO for JS
-        update_due_raw = fields.get('Update Due', '')
-        update_due = _parse_date_to_iso(update_due_raw)
+        team_ids = get_team_ids({j.split()[0] for j in job_numbers})
         
-        # Get client code and team ID
-        client_code = job_number.split()[0] if job_number else ''
-        team_id = get_team_id(client_code) if client_code else None
+        jobs = {}
+        for record in records:
+            job_number = record['fields'].get('Job Number', '')
+            if job_number in jobs or job_number not in job_numbers:
+                continue
+            client_code = job_number.split()[0]
+            jobs[job_number] = _job_detail(Job(record), client_code, team_ids.get(client_code))
         
-        return {
-            'jobNumber': fields.get('Job Number', ''),
-            'jobName': fields.get('Project Name', ''),
-            'description': fields.get('Description', ''),
-            'theStory': fields.get('The Story', ''),
-            'projectOwner': fields.get('Project Owner', ''),
-            'stage': fields.get('Stage', ''),
-            'status': fields.get('Status', ''),
-            'updateDue': update_due,
-            'liveDate': fields.get('Live', ''),  # Month dropdown: "Jan", "Feb", "Tbc"
-            'withClient': fields.get('With Client?', False),
-            'clientCode': client_code,
-            'update': latest_update,
-            'lastUpdated': last_updated,
-            'updateHistory': update_history,
-            'channelUrl': fields.get('Channel Url', ''),
-            'daysSinceUpdate': fields.get('Days Since Update', '-'),
-            'teamsChannelId': fields.get('Teams Channel ID', ''),
-            'teamId': team_id,
-            'filesUrl': fields.get('Files Url', ''),
-        }
+        return jobs
         
     except Exception as e:
-        print(f"[airtable] Error getting job by number: {e}")
-        return None
+        logger.error('Error getting jobs by number', error=str(e))
+        return {}
 
 
 def update_project_record(job_number, updates):
@@ -589,7 +857,7 @@ def update_project_record(job_number, updates):
             'maxRecords': 1
         }
         
-        response = httpx.get(
+        response = client.get(
             _url(PROJECTS_TABLE),
             headers=_headers(),
             params=params,
@@ -604,7 +872,7 @@ def update_project_record(job_number, updates):
         record_id = records[0]['id']
         
         # Update the record
-        response = httpx.patch(
+        response = client.patch(
             f"{_url(PROJECTS_TABLE)}/{record_id}",
             headers=_headers(),
             json={'fields': updates},
@@ -612,11 +880,11 @@ def update_project_record(job_number, updates):
         )
         response.raise_for_status()
         
-        print(f"[airtable] Updated project {job_number}: {list(updates.keys())}")
+        logger.info('Updated project', jobNumber=job_number, fields=list(updates.keys()))
         return {'success': True, 'updated': list(updates.keys())}
         
     except Exception as e:
-        print(f"[airtable] Error updating project record: {e}")
+        logger.error('Error updating project record', jobNumber=job_number, error=str(e))
         return {'success': False, 'error': str(e)}
 
 
@@ -642,7 +910,7 @@ def create_update_record(job_number, update_text, update_due=None):
             'maxRecords': 1
         }
         
-        response = httpx.get(
+        response = client.get(
             _url(PROJECTS_TABLE),
             headers=_headers(),
             params=params,
@@ -666,7 +934,7 @@ def create_update_record(job_number, update_text, update_due=None):
             update_fields['Update due'] = update_due
         
         # Create the record
-        response = httpx.post(
+        response = client.post(
             _url(UPDATES_TABLE),
             headers=_headers(),
             json={'fields': update_fields},
@@ -675,12 +943,12 @@ def create_update_record(job_number, update_text, update_due=None):
         response.raise_for_status()
         
         new_record = response.json()
-        print(f"[airtable] Created update record for {job_number}: {new_record.get('id')}")
+        logger.info('Created update record', jobNumber=job_number, recordId=new_record.get('id'))
         
         return {'success': True, 'record_id': new_record.get('id')}
         
     except Exception as e:
-        print(f"[airtable] Error creating update record: {e}")
+        logger.error('Error creating update record', jobNumber=job_number, error=str(e))
         return {'success': False, 'error': str(e)}
 
 
@@ -688,6 +956,30 @@ def create_update_record(job_number, update_text, update_due=None):
 # CLIENTS TABLE
 # ===================
 
+# The full Clients table as last read (spend.py re-reads it every SPEND_REFRESH
+# seconds) - Team ID and client name lookups answer from it while it's fresh
+CLIENTS_CACHE_SECONDS = int(os.environ.get('CLIENTS_CACHE_SECONDS', '900'))
+_clients_cache = (0.0, {})  # (fetched_at, client code -> fields)
+
+
+def cached_client(client_code):
+    """A client's fields from a recent full read, else None (shared with airtable_async)"""
+    fetched_at, clients = _clients_cache
+    if time.time() - fetched_at > CLIENTS_CACHE_SECONDS:
+        return None
+    return clients.get(client_code)
+
+
+def store_clients(records):
+    global _clients_cache
+    clients = {}
+    for record in records:
+        fields = record.get('fields', {})
+        if fields.get('Client code'):
+            clients.setdefault(fields['Client code'], fields)
+    _clients_cache = (time.time(), clients)
+
+
 def get_team_id(client_code):
     """
     Look up Team ID from Clients table by client code.
@@ -696,12 +988,16 @@ def get_team_id(client_code):
     if not AIRTABLE_API_KEY or not client_code:
         return None
     
+    cached = cached_client(client_code)
+    if cached is not None:
+        return cached.get('Teams ID', None)
+    
     try:
         params = {
             'filterByFormula': f"{{Client code}}='{client_code}'"
         }
         
-        response = httpx.get(
+        response = client.get(
             _url(CLIENTS_TABLE), 
             headers=_headers(), 
             params=params, 
@@ -716,10 +1012,34 @@ def get_team_id(client_code):
         return records[0]['fields'].get('Teams ID', None)
         
     except Exception as e:
-        print(f"[airtable] Error looking up Team ID: {e}")
+        logger.error('Error looking up Team ID', clientCode=client_code, error=str(e))
         return None
 
 
+def get_team_ids(client_codes):
+    """
+    Batch version of get_team_id.
+    Returns dict of client code -> Team ID.
+    """
+    codes = sorted({c for c in client_codes if c})
+    if not AIRTABLE_API_KEY or not codes:
+        return {}
+    
+    try:
+        team_ids = {}
+        for chunk in _chunks(codes, OR_CHUNK_SIZE):
+            for record in _get_all_records(CLIENTS_TABLE, {'filterByFormula': _or_formula('Client code', chunk)}):
+                fields = record['fields']
+                if fields.get('Client code'):
+                    team_ids.setdefault(fields['Client code'], fields.get('Teams ID', None))
+        
+        return team_ids
+        
+    except Exception as e:
+        logger.error('Error looking up Team IDs', error=str(e))
+        return {}
+
+
 def get_client_name(client_code):
     """
     Look up client name from Clients table by client code.
@@ -728,12 +1048,16 @@ def get_client_name(client_code):
     if not AIRTABLE_API_KEY or not client_code:
         return None
     
+    cached = cached_client(client_code)
+    if cached is not None:
+        return cached.get('Clients', None)
+    
     try:
         params = {
             'filterByFormula': f"{{Client code}}='{client_code}'"
         }
         
-        response = httpx.get(
+        response = client.get(
             _url(CLIENTS_TABLE), 
             headers=_headers(), 
             params=params, 
@@ -748,14 +1072,104 @@ def get_client_name(client_code):
         return records[0]['fields'].get('Clients', None)
         
     except Exception as e:
-        print(f"[airtable] Error looking up client name: {e}")
+        logger.error('Error looking up client name', clientCode=client_code, error=str(e))
+        return None
+
+
+def get_clients(client_codes):
+    """
+    Clients records for several codes in one OR() query.
+    Returns dict of client code -> fields. Raises on Airtable errors.
+    """
+    codes = sorted({c for c in client_codes if c})
+    clients = {}
+    for chunk in _chunks(codes, OR_CHUNK_SIZE):
+        for record in _get_all_records(CLIENTS_TABLE, {'filterByFormula': _or_formula('Client code', chunk)}):
+            fields = record.get('fields', {})
+            if fields.get('Client code'):
+                clients.setdefault(fields['Client code'], fields)
+    return clients
+
+
+def get_all_clients():
+    """Every Clients record, all pages (for spend.py's view, and the client lookups). Raises on Airtable errors."""
+    records = _get_all_records(CLIENTS_TABLE, {})
+    store_clients(records)
+    return records
+
+
+def get_job_counter(client_code):
+    """
+    A client's job number counter ('Next Job #') for reservations.py.
+    Returns {'recordId', 'clientName', 'next'} ('next' as stored - a string),
+    or None if the client doesn't exist. Raises on Airtable errors.
+    """
+    response = client.get(
+        _url(CLIENTS_TABLE),
+        headers=_headers(),
+        params={'filterByFormula': f"{{Client code}} = '{client_code}'", 'maxRecords': 1},
+        timeout=TIMEOUT
+    )
+    response.raise_for_status()
+    
+    records = response.json().get('records', [])
+    if not records:
         return None
+    
+    fields = records[0].get('fields', {})
+    return {
+        'recordId': records[0].get('id'),
+        'clientName': fields.get('Clients', client_code),
+        'next': fields.get('Next Job #', ''),
+    }
+
+
+def set_job_counter(record_id, next_number):
+    """Write a client's 'Next Job #' (3 digits, like the rest of the table). Raises on Airtable errors."""
+    response = client.patch(
+        f"{_url(CLIENTS_TABLE)}/{record_id}",
+        headers=_headers(),
+        json={'fields': {'Next Job #': f"{next_number:03d}"}},
+        timeout=TIMEOUT
+    )
+    response.raise_for_status()
+
+
+# ===================
+# PEOPLE TABLE
+# ===================
+
+def get_active_people():
+    """
+    Every active contact in the People table, for people.py's directory.
+    Returns list of {'name', 'email', 'phone', 'clientCode'}. Raises on Airtable errors.
+    """
+    records = _get_all_records(PEOPLE_TABLE, {'filterByFormula': '{Active} = TRUE()'})
+    
+    people = []
+    for record in records:
+        fields = record.get('fields', {})
+        name = fields.get('Name', fields.get('Full name', ''))
+        if not name:
+            continue
+        people.append({
+            'name': name,
+            'email': fields.get('Email Address', ''),
+            'phone': fields.get('Phone Number', ''),
+            'clientCode': fields.get('Client Link', '')
+        })
+    return people
 
 
 # ===================
 # MEETINGS TABLE
 # ===================
 
+_MEETING_DATETIME_PATTERN = re.compile(r'(\d{4})-(\d{2})-(\d{2})T(\d{2}):(\d{2})')
+_UTC = ZoneInfo('UTC')
+_NZ_TZ = ZoneInfo('Pacific/Auckland')
+
+
 def _parse_meeting_datetime(dt_str):
     """Parse meeting datetime from Airtable API (UTC) and convert to NZ time.
     Returns: (date, time_str) or (None, '')
@@ -763,17 +1177,13 @@ def _parse_meeting_datetime(dt_str):
     if not dt_str:
         return None, ''
     
-    import re
-    from zoneinfo import ZoneInfo
-    nz_tz = ZoneInfo('Pacific/Auckland')
-    
     # ISO format from API: "2026-02-02T00:00:00.000Z"
-    iso_match = re.match(r'(\d{4})-(\d{2})-(\d{2})T(\d{2}):(\d{2})', dt_str)
+    iso_match = _MEETING_DATETIME_PATTERN.match(dt_str)
     if iso_match:
         y, mo, d = int(iso_match.group(1)), int(iso_match.group(2)), int(iso_match.group(3))
         h, mi = int(iso_match.group(4)), int(iso_match.group(5))
-        utc_dt = datetime(y, mo, d, h, mi, tzinfo=ZoneInfo('UTC'))
-        nz_dt = utc_dt.astimezone(nz_tz)
+        utc_dt = datetime(y, mo, d, h, mi, tzinfo=_UTC)
+        nz_dt = utc_dt.astimezone(_NZ_TZ)
         period = 'am' if nz_dt.hour < 12 else 'pm'
         display_h = nz_dt.hour % 12 or 12
         return nz_dt.date(), f"{display_h}:{nz_dt.minute:02d}{period}"
@@ -781,54 +1191,87 @@ def _parse_meeting_datetime(dt_str):
     return None, ''
 
 
+def _meeting_from_record(record):
+    """Map a Meetings record to a meeting dict (None if it has no usable start)"""
+    fields = record.get('fields', {})
+    
+    start_str = fields.get('Start', '')
+    end_str = fields.get('End', '')
+    meeting_date, start_time = _parse_meeting_datetime(start_str)
+    _, end_time = _parse_meeting_datetime(end_str)
+    
+    if not meeting_date:
+        return None
+    
+    return {
+        'title': fields.get('Title', ''),
+        'day': fields.get('Day', ''),  # "Today", "Tomorrow", "Thursday", etc.
+        'date': meeting_date.isoformat(),
+        'startTime': start_time,
+        'endTime': end_time,
+        'location': fields.get('Location', ''),
+        'whose': fields.get('Whose meeting', ''),
+        'attendees': fields.get("Who's going", ''),
+    }
+
+
+# Meetings change a few times a day - Hub requests within this many seconds share one fetch
+MEETINGS_CACHE_SECONDS = int(os.environ.get('MEETINGS_CACHE_SECONDS', '60'))
+_meetings_cache = (0.0, None)
+
+
+def cached_meetings():
+    """The last meetings list if it's fresh enough, else None (shared with airtable_async)"""
+    fetched_at, meetings = _meetings_cache
+    if meetings is None or time.time() - fetched_at > MEETINGS_CACHE_SECONDS:
+        return None
+    return list(meetings)
+
+
+def store_meetings(meetings):
+    global _meetings_cache
+    _meetings_cache = (time.time(), list(meetings))
+
+
+def load_meetings():
+    """Fetch the meetings and refill the cache. Raises on Airtable errors (warm-up uses this)."""
+    response = client.get(
+        _url(MEETINGS_TABLE),
+        headers=_headers(),
+        timeout=TIMEOUT
+    )
+    response.raise_for_status()
+    
+    meetings = []
+    
+    for record in response.json().get('records', []):
+        meeting = _meeting_from_record(record)
+        if meeting:
+            meetings.append(meeting)
+    
+    # Sort by date then time
+    meetings.sort(key=lambda x: (x.get('date', ''), x.get('startTime', '')))
+    
+    store_meetings(meetings)
+    return meetings
+
+
 def get_meetings():
     """
     Get all meetings from table.
     Meetingbot keeps the table curated to ~1 week ahead, so we pull everything.
-    Returns list of meetings sorted by date/time.
+    Returns list of meetings sorted by date/time (cached for MEETINGS_CACHE_SECONDS).
     """
     if not AIRTABLE_API_KEY:
         return []
     
+    cached = cached_meetings()
+    if cached is not None:
+        return cached
+    
     try:
-        response = httpx.get(
-            _url(MEETINGS_TABLE),
-            headers=_headers(),
-            timeout=TIMEOUT
-        )
-        response.raise_for_status()
-        
-        meetings = []
-        
-        for record in response.json().get('records', []):
-            fields = record.get('fields', {})
-            
-            start_str = fields.get('Start', '')
-            end_str = fields.get('End', '')
-            meeting_date, start_time = _parse_meeting_datetime(start_str)
-            _, end_time = _parse_meeting_datetime(end_str)
-            
-            if not meeting_date:
-                continue
-            
-            meeting = {
-                'title': fields.get('Title', ''),
-                'day': fields.get('Day', ''),  # "Today", "Tomorrow", "Thursday", etc.
-                'date': meeting_date.isoformat(),
-                'startTime': start_time,
-                'endTime': end_time,
-                'location': fields.get('Location', ''),
-                'whose': fields.get('Whose meeting', ''),
-                'attendees': fields.get("Who's going", ''),
-            }
-            
-            meetings.append(meeting)
-        
-        # Sort by date then time
-        meetings.sort(key=lambda x: (x.get('date', ''), x.get('startTime', '')))
-        
-        return meetings
+        return load_meetings()
     
     except Exception as e:
-        print(f"[airtable] Error fetching meetings: {e}")
+        logger.error('Error fetching meetings', error=str(e))
         return []
@@ -0,0 +1,292 @@
+"""
+Dot Traffic 2.0 - Airtable Operations (async)
+Async twins of the airtable.py helpers on the request path, for the ASGI app.
+
+Same tables, same formulas, same return shapes - just awaited on one shared
+httpx.AsyncClient so a single event loop can hold many requests in flight.
+Record mapping is shared with airtable.py.
+"""
+
+import time
+import httpx
+
+import metrics
+import tracing
+import breaker
+import logs
+from airtable import (
+    AIRTABLE_API_KEY,
+    TIMEOUT,
+    PROJECTS_TABLE,
+    CLIENTS_TABLE,
+    TRAFFIC_TABLE,
+    MEETINGS_TABLE,
+    _headers,
+    _url,
+    _traffic_fields,
+    _project_from_record,
+    _meeting_from_record,
+    cached_meetings,
+    store_meetings,
+    last_known_job,
+    cached_client,
+)
+
+logger = logs.get('airtable')
+
+# ===================
+# CLIENT
+# ===================
+
+class _MeteredAsyncTransport(httpx.AsyncHTTPTransport):
+    """Async HTTP transport that counts (and traces) every Airtable request, behind the Airtable breaker"""
+    
+    async def handle_async_request(self, request):
+        if not breaker.airtable.allow():
+            raise breaker.BreakerOpen('airtable', breaker.airtable.retry_in())
+        table = metrics.airtable_table(request.url)
+        with tracing.span(f"airtable {request.method} {table}", table=table, method=request.method) as span:
+            start = time.perf_counter()
+            try:
+                response = await super().handle_async_request(request)
+            except Exception:
+                metrics.record_airtable(table, request.method, 'error', time.perf_counter() - start)
+                breaker.airtable.record(False, time.perf_counter() - start)
+                raise
+            seconds = time.perf_counter() - start
+            metrics.record_airtable(table, request.method, response.status_code, seconds)
+            breaker.airtable.record(response.status_code < 500 and response.status_code != 429, seconds)
+            span.set(status=response.status_code)
+            return response
+
+
+# One pooled client per process (the ASGI app runs one event loop per process)
+client = httpx.AsyncClient(timeout=TIMEOUT, transport=_MeteredAsyncTransport())
+
+
+async def close():
+    """Close the pooled client (called when the ASGI app shuts down)"""
+    await client.aclose()
+
+
+async def _get_records(table, params=None):
+    """GET a table with params and return its records"""
+    response = await client.get(_url(table), headers=_headers(), params=params)
+    response.raise_for_status()
+    return response.json().get('records', [])
+
+
+# ===================
+# TRAFFIC TABLE (Deduplication & Logging)
+# ===================
+
+async def check_duplicate(internet_message_id):
+    """
+    Check if we've already processed this email.
+    Returns the existing record if found, None otherwise.
+    """
+    if not AIRTABLE_API_KEY or not internet_message_id:
+        return None
+    
+    try:
+        records = await _get_records(TRAFFIC_TABLE, {
+            'filterByFormula': f"{{internetMessageId}}='{internet_message_id}'"
+        })
+        return records[0] if records else None
+        
+    except Exception as e:
+        logger.error('Error checking duplicate', error=str(e))
+        return None
+
+
+async def check_pending_clarify(conversation_id):
+    """
+    Check if this conversation has a pending clarify request.
+    Returns the pending record if found, None otherwise.
+    """
+    if not AIRTABLE_API_KEY or not conversation_id:
+        return None
+    
+    try:
+        records = await _get_records(TRAFFIC_TABLE, {
+            'filterByFormula': f"AND({{conversationId}}='{conversation_id}', {{Status}}='pending')"
+        })
+        return records[0] if records else None
+        
+    except Exception as e:
+        logger.error('Error checking pending clarify', error=str(e))
+        return None
+
+
+async def log_traffic(internet_message_id, conversation_id, route, status, job_number, client_code, sender_email, subject, email_body=None):
+    """
+    Log email to Traffic table.
+    Returns the created record ID or None.
+    """
+    if not AIRTABLE_API_KEY:
+        return None
+    
+    try:
+        record_data = {
+            'fields': _traffic_fields(
+                internet_message_id, conversation_id, route, status,
+                job_number, client_code, sender_email, subject, email_body
+            )
+        }
+        
+        response = await client.post(_url(TRAFFIC_TABLE), headers=_headers(), json=record_data)
+        
+        if response.status_code != 200:
+            logger.error('Traffic log rejected', status=response.status_code, response=response.text)
+            return None
+        
+        return response.json().get('id')
+        
+    except Exception as e:
+        logger.error('Error logging to Traffic', error=str(e))
+        return None
+
+
+async def update_traffic_record(record_id, updates):
+    """
+    Update an existing Traffic table record.
+    updates: dict of field names to values
+    """
+    if not AIRTABLE_API_KEY or not record_id:
+        return False
+    
+    try:
+        response = await client.patch(
+            f"{_url(TRAFFIC_TABLE)}/{record_id}",
+            headers=_headers(),
+            json={'fields': updates}
+        )
+        response.raise_for_status()
+        return True
+        
+    except Exception as e:
+        logger.error('Error updating Traffic record', error=str(e))
+        return False
+
+
+# ===================
+# PROJECTS TABLE
+# ===================
+
+async def get_project(job_number):
+    """
+    Look up project by job number.
+    Returns dict with project info or None.
+    """
+    if not AIRTABLE_API_KEY or not job_number:
+        return None
+    
+    try:
+        records = await _get_records(PROJECTS_TABLE, {
+            'filterByFormula': f"{{Job Number}}='{job_number}'"
+        })
+        if not records:
+            return None
+        
+        client_code = job_number.split()[0] if job_number else None
+        team_id = await get_team_id(client_code) if client_code else None
+        
+        return _project_from_record(records[0], job_number, team_id)
+        
+    except Exception as e:
+        job = last_known_job(job_number)
+        if job is not None:
+            logger.warning('Serving cached project', jobNumber=job_number, error=str(e).splitlines()[0])
+            return job.to_project(await get_team_id(job_number.split()[0]), job_number)
+        logger.error('Error looking up project', jobNumber=job_number, error=str(e))
+        return None
+
+
+# ===================
+# CLIENTS TABLE
+# ===================
+
+async def get_team_id(client_code):
+    """
+    Look up Team ID from Clients table by client code.
+    Returns Team ID string or None.
+    """
+    if not AIRTABLE_API_KEY or not client_code:
+        return None
+    
+    cached = cached_client(client_code)
+    if cached is not None:
+        return cached.get('Teams ID', None)
+    
+    try:
+        records = await _get_records(CLIENTS_TABLE, {
+            'filterByFormula': f"{{Client code}}='{client_code}'"
+        })
+        if not records:
+            return None
+        
+        return records[0]['fields'].get('Teams ID', None)
+        
+    except Exception as e:
+        logger.error('Error looking up Team ID', clientCode=client_code, error=str(e))
+        return None
+
+
+async def get_client_name(client_code):
+    """
+    Look up client name from Clients table by client code.
+    Returns client name string or None.
+    """
+    if not AIRTABLE_API_KEY or not client_code:
+        return None
+    
+    cached = cached_client(client_code)
+    if cached is not None:
+        return cached.get('Clients', None)
+    
+    try:
+        records = await _get_records(CLIENTS_TABLE, {
+            'filterByFormula': f"{{Client code}}='{client_code}'"
+        })
+        if not records:
+            return None
+        
+        return records[0]['fields'].get('Clients', None)
+        
+    except Exception as e:
+        logger.error('Error looking up client name', clientCode=client_code, error=str(e))
+        return None
+
+
+# ===================
+# MEETINGS TABLE
+# ===================
+
+async def get_meetings():
+    """
+    Get all meetings from table.
+    Returns list of meetings sorted by date/time.
+    """
+    if not AIRTABLE_API_KEY:
+        return []
+    
+    cached = cached_meetings()
+    if cached is not None:
+        return cached
+    
+    try:
+        meetings = []
+        for record in await _get_records(MEETINGS_TABLE):
+            meeting = _meeting_from_record(record)
+            if meeting:
+                meetings.append(meeting)
+        
+        # Sort by date then time
+        meetings.sort(key=lambda x: (x.get('date', ''), x.get('startTime', '')))
+        
+        store_meetings(meetings)
+        return meetings
+        
+    except Exception as e:
+        logger.error('Error fetching meetings', error=str(e))
+        return []
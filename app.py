@@ -11,7 +11,7 @@ ARCHITECTURE:
 
 FLOW:
 1. Gates (ignore self, check sender domain, deduplication)
-2. Check for pending clarify reply
+2. Check for pending clarify reply (runs concurrently with dedup + project prefetch)
 3. Call Claude (Claude uses tools to fetch jobs, make decisions)
 4. Log to Traffic table
 5. Route based on type:
@@ -19,108 +19,321 @@ FLOW:
    - action → call worker, worker handles everything (file, Teams, confirmation)
 """
 
+import os
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 import httpx
 import airtable
 import traffic
+import hub
 import connect
+import metrics
+import tracing
+import profiling
+import decision_cache
+import breaker
+import people
+import spend
+import warmup
+import logs
+import outbox
 
 app = Flask(__name__)
 CORS(app)
 
+logger = logs.get('app')
+
 # ===================
 # WORKER URLS
 # ===================
 
+WORKER_BASE_URL = os.environ.get('WORKER_BASE_URL', 'https://dot-workers.up.railway.app')
+
 WORKER_URLS = {
-    'update': 'https://dot-workers.up.railway.app/update',
-    'setup': 'https://dot-workers.up.railway.app/setup',
-    'triage': 'https://dot-workers.up.railway.app/setup',  # triage routes to setup
-    'new-job': 'https://dot-workers.up.railway.app/setup',  # new-job routes to setup
-    'file': 'https://dot-workers.up.railway.app/file',
+    'update': f'{WORKER_BASE_URL}/update',
+    'setup': f'{WORKER_BASE_URL}/setup',
+    'triage': f'{WORKER_BASE_URL}/setup',  # triage routes to setup
+    'new-job': f'{WORKER_BASE_URL}/setup',  # new-job routes to setup
+    'file': f'{WORKER_BASE_URL}/file',
     # Future workers:
-    # 'feedback': 'https://dot-workers.up.railway.app/feedback',
+    # 'feedback': f'{WORKER_BASE_URL}/feedback',
 }
 
 WORKER_TIMEOUT = 90.0  # Setup does more, give it time
 
+# Gate lookups (dedup, pending clarify, project prefetch) are independent
+# Airtable reads, so they run side by side instead of one after the other
+GATE_POOL = ThreadPoolExecutor(max_workers=6, thread_name_prefix='gate')
+
+# /traffic/batch: how many emails go through the brain at once
+BATCH_PARALLELISM = int(os.environ.get('BATCH_PARALLELISM', 4))
+BATCH_MAX_PARALLELISM = int(os.environ.get('BATCH_MAX_PARALLELISM', 16))
 
-def call_worker(route, payload):
+
+@metrics.timed('call_worker')
+def call_worker(route, payload, queue=True):
     """
     Call a worker service.
     Workers handle everything: file attachments, Airtable updates, Teams, confirmation emails.
+    While the workers breaker is open the call is queued for a background retry
+    (queue=False returns a retryable failure instead).
     
     Returns dict with success status and worker response.
     """
     url = WORKER_URLS.get(route)
     
     if not url:
-        print(f"[app] No worker URL configured for route: {route}")
-        return {
-            'success': False,
-            'error': f'No worker configured for route: {route}',
-            'route': route
-        }
+        return no_worker(route)
+    
+    if not breaker.workers.allow():
+        return worker_unavailable(route, payload, queue)
     
-    print(f"[app] Calling worker: {route} -> {url}")
+    logger.info('Calling worker', route=route, url=url)
     
+    start = time.perf_counter()
     try:
         response = httpx.post(
             url,
             json=payload,
             timeout=WORKER_TIMEOUT,
-            headers={'Content-Type': 'application/json'}
+            headers={'Content-Type': 'application/json', **tracing.headers()}
         )
-        
-        success = response.status_code == 200
-        
-        try:
-            response_data = response.json()
-        except:
-            response_data = response.text
-        
-        print(f"[app] Worker response: {response.status_code}, success={success}")
-        
-        return {
-            'success': success,
-            'status_code': response.status_code,
-            'response': response_data
-        }
-        
-    except httpx.TimeoutException:
-        print(f"[app] Worker timeout: {route}")
-        return {
-            'success': False,
-            'error': f'Worker timeout after {WORKER_TIMEOUT}s',
-            'route': route
-        }
     except Exception as e:
-        print(f"[app] Worker error: {route} - {e}")
-        return {
-            'success': False,
-            'error': str(e),
-            'route': route
-        }
+        breaker.workers.record(False, time.perf_counter() - start)
+        return worker_error(route, e)
+    
+    breaker.workers.record(response.status_code < 500, time.perf_counter() - start)
+    return worker_result(route, response)
+
+
+# call_worker's results - shared with asgi.call_worker so both return the same shape
+
+def no_worker(route):
+    logger.error('No worker URL configured', route=route)
+    return {
+        'success': False,
+        'error': f'No worker configured for route: {route}',
+        'route': route
+    }
+
+
+def worker_unavailable(route, payload, queue=True):
+    """Workers breaker open: queue the call for a background retry, or (queue=False) a retryable failure"""
+    if queue:
+        return queue_worker_call(route, payload)
+    return {
+        'success': False,
+        'error': f'Workers unavailable (retry in {breaker.workers.retry_in():.0f}s)',
+        'route': route,
+        'retryable': True
+    }
+
+
+def worker_result(route, response):
+    """A worker's HTTP response (5xx is worth retrying)"""
+    success = response.status_code == 200
+    
+    try:
+        response_data = response.json()
+    except ValueError:
+        response_data = response.text
+    
+    logger.info('Worker response', route=route, status=response.status_code, success=success)
+    
+    return {
+        'success': success,
+        'status_code': response.status_code,
+        'response': response_data,
+        'retryable': response.status_code >= 500
+    }
+
+
+def worker_error(route, error):
+    """A worker call that timed out or couldn't connect (worth retrying)"""
+    if isinstance(error, httpx.TimeoutException):
+        logger.warning('Worker timeout', route=route)
+        message = f'Worker timeout after {WORKER_TIMEOUT}s'
+    else:
+        logger.warning('Worker error', route=route, error=str(error))
+        message = str(error)
+    return {
+        'success': False,
+        'error': message,
+        'route': route,
+        'retryable': True
+    }
+
+
+# ===================
+# WORKER QUEUE
+# ===================
+# Worker calls refused by an open breaker wait here, and a background thread
+# retries them once the breaker lets calls through again. In memory, per
+# process - a restart loses whatever is still queued.
+
+WORKER_QUEUE_MAX = int(os.environ.get('WORKER_QUEUE_MAX', 200))
+WORKER_QUEUE_MAX_AGE = int(os.environ.get('WORKER_QUEUE_MAX_AGE', 30 * 60))
+WORKER_RETRY_SECONDS = float(os.environ.get('WORKER_RETRY_SECONDS', 10))
+
+worker_queue = deque()  # (queued at, route, payload)
+_worker_queue_lock = threading.Lock()
+_worker_drainer = None
+
+
+def queue_worker_call(route, payload):
+    """Hold a worker call for retry. Returns call_worker's shape ('status': 'queued')."""
+    global _worker_drainer
+    with _worker_queue_lock:
+        if len(worker_queue) >= WORKER_QUEUE_MAX:
+            logger.warning('Worker queue full, not queueing', route=route)
+            return {
+                'success': False,
+                'error': 'Workers unavailable and the retry queue is full',
+                'route': route
+            }
+        worker_queue.append((time.time(), route, payload))
+        waiting = len(worker_queue)
+        if _worker_drainer is None or not _worker_drainer.is_alive():
+            _worker_drainer = threading.Thread(target=_drain_worker_queue, name='worker-queue', daemon=True)
+            _worker_drainer.start()
+    
+    logger.warning('Workers unavailable - queued', route=route, waiting=waiting)
+    return {'success': True, 'status': 'queued', 'route': route, 'queued': waiting}
+
+
+def _give_up(route, payload, error):
+    """A queued call that can't be delivered - tell the sender, like a failed worker call"""
+    logger.error('Dropping queued worker call', route=route, error=str(error))
+    connect.send_failure(
+        to_email=payload.get('senderEmail'),
+        route=route,
+        error_message=error,
+        sender_name=payload.get('senderName'),
+        subject_line=payload.get('subjectLine'),
+        job_number=payload.get('jobNumber'),
+        job_name=payload.get('jobName'),
+        client_name=payload.get('clientName'),
+        original_email=payload.get('originalEmail')
+    )
+
+
+def _drain_worker_queue():
+    """Background thread: send queued worker calls, oldest first, until the queue is empty"""
+    global _worker_drainer
+    while True:
+        time.sleep(WORKER_RETRY_SECONDS)
+        while worker_queue:
+            queued_at, route, payload = worker_queue[0]
+            if time.time() - queued_at > WORKER_QUEUE_MAX_AGE:
+                worker_queue.popleft()
+                _give_up(route, payload, f'Workers unavailable for over {WORKER_QUEUE_MAX_AGE // 60} minutes')
+                continue
+            
+            result = call_worker(route, payload, queue=False)
+            if not result.get('success') and result.get('retryable'):
+                break  # still down - wait and try again
+            worker_queue.popleft()
+            if result.get('success'):
+                logger.info('Queued worker call delivered', route=route, seconds=round(time.time() - queued_at))
+            else:
+                _give_up(route, payload, result.get('error', 'Unknown error'))
+        
+        with _worker_queue_lock:
+            if not worker_queue:
+                _worker_drainer = None
+                return
+
+
+def health_status():
+    """Breaker state for /health - 'degraded' while any dependency's breaker isn't closed"""
+    return {
+        'status': 'healthy' if breaker.healthy() else 'degraded',
+        'dependencies': breaker.status(),
+        'workerQueue': len(worker_queue),
+        'decisionCache': decision_cache.stats(),
+        'peopleDirectory': people.stats(),
+        'spendView': spend.stats(),
+        'logging': logs.stats(),
+        'outbox': outbox.stats(),
+    }
 
 
 # ===================
 # HEALTH CHECK
 # ===================
 
+@app.route('/ready', methods=['GET'])
+def ready():
+    """Readiness: 503 until this worker has warmed up (warmup.py), unlike /health"""
+    return jsonify(warmup.status()), 200 if warmup.ready() else 503
+
+
 @app.route('/', methods=['GET'])
 @app.route('/health', methods=['GET'])
 def health():
     """Health check endpoint"""
     return jsonify({
-        'status': 'healthy',
         'service': 'Dot Brain',
         'version': '3.2',
         'architecture': 'brain-thinks-workers-work',
-        'workers': list(WORKER_URLS.keys())
+        'workers': list(WORKER_URLS.keys()),
+        **health_status()
     })
 
 
+# ===================
+# METRICS (Prometheus)
+# ===================
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Prometheus scrape endpoint - stage latencies, Airtable calls, Claude tokens"""
+    body, content_type = metrics.render()
+    return body, 200, {'Content-Type': content_type}
+
+
+# ===================
+# PROFILES (admin)
+# ===================
+
+def profiles_response(header, profile_id=None):
+    """
+    (body, status, headers) for the profile admin endpoints - shared with asgi.py.
+    No id: the stored profiles. '<id>': its summary. '<id>.prof': the raw cProfile file.
+    """
+    if not profiling.authorized(header):
+        return {'error': f'Profiling needs PROFILE_TOKEN in the {profiling.PROFILE_HEADER} header'}, 403, {}
+    if profile_id is None:
+        return {'profiles': profiling.list_profiles()}, 200, {}
+    
+    if profile_id.endswith('.prof'):
+        path = profiling.profile_path(profile_id[:-len('.prof')])
+        if not path:
+            return {'error': 'Profile not found'}, 404, {}
+        with open(path, 'rb') as f:
+            return f.read(), 200, {
+                'Content-Type': 'application/octet-stream',
+                'Content-Disposition': f'attachment; filename="{profile_id}"',
+            }
+    
+    summary = profiling.get_profile(profile_id)
+    if not summary:
+        return {'error': 'Profile not found'}, 404, {}
+    return summary, 200, {}
+
+
+@app.route('/admin/profiles', methods=['GET'])
+@app.route('/admin/profiles/<profile_id>', methods=['GET'])
+def admin_profiles(profile_id=None):
+    """Stored request profiles (profiling.py)"""
+    body, status, headers = profiles_response(request.headers.get(profiling.PROFILE_HEADER), profile_id)
+    return (jsonify(body) if isinstance(body, dict) else body), status, headers
+
+
 # ===================
 # SESSION CLEAR (Hub)
 # ===================
@@ -143,6 +356,8 @@ def clear_session():
 # ===================
 
 @app.route('/hub', methods=['POST'])
+@tracing.trace('POST /hub', traceparent=lambda: request.headers.get('traceparent'))
+@profiling.profile('POST /hub', header=lambda: request.headers.get(profiling.PROFILE_HEADER))
 def handle_hub():
     """
     Fast path for Hub requests.
@@ -150,7 +365,6 @@ def handle_hub():
     ~2-3 seconds vs ~8 seconds for full traffic.
     """
     try:
-        import hub
         data = request.get_json()
         
         # Validate
@@ -159,14 +373,13 @@ def handle_hub():
             return jsonify({'error': 'No content provided'}), 400
         
         # Simple Claude handles it
-        result = hub.handle_hub_request(data)
+        with metrics.timed('hub'):
+            result = hub.handle_hub_request(data)
         
         return jsonify(result)
         
     except Exception as e:
-        print(f"[app] Hub error: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.error('Hub error', exc_info=True, error=str(e))
         return jsonify({
             'type': 'answer',
             'message': "Sorry, I got in a muddle over that one.",
@@ -179,6 +392,8 @@ def handle_hub():
 # ===================
 
 @app.route('/traffic', methods=['POST'])
+@tracing.trace('POST /traffic', traceparent=lambda: request.headers.get('traceparent'))
+@profiling.profile('POST /traffic', header=lambda: request.headers.get(profiling.PROFILE_HEADER))
 def handle_traffic():
     """
     Main routing endpoint. Receives requests from PA Listener (email) or Hub.
@@ -186,241 +401,521 @@ def handle_traffic():
     """
     try:
         data = request.get_json()
+        result, status_code = process_traffic(data)
+        return jsonify(result), status_code
         
-        # ===================
-        # VALIDATE INPUT
-        # ===================
-        content = data.get('content') or data.get('body') or data.get('emailContent', '')
-        subject = data.get('subject') or data.get('subjectLine', '')
-        
-        if not content and subject:
-            content = f"Subject: {subject}"
-        
-        if not content:
-            return jsonify({'error': 'No email body or subject provided'}), 400
-        
-        sender_email = data.get('from') or data.get('senderEmail', '')
-        sender_name = data.get('senderName', '')
-        has_attachments = data.get('hasAttachments', False)
-        source = data.get('source', 'email')
-        internet_message_id = data.get('internetMessageId', '')
-        conversation_id = data.get('conversationId', '')
-        received_datetime = data.get('receivedDateTime', '')
-        
-        # ===================
-        # STEP 1: IGNORE DOT'S OWN EMAILS
-        # ===================
-        if sender_email.lower() == 'dot@hunch.co.nz':
-            return jsonify({
-                'route': 'ignored',
-                'status': 'self',
-                'reason': 'Ignoring email from Dot to prevent loops'
-            })
-        
-        # ===================
-        # STEP 2: CHECK SENDER DOMAIN
-        # ===================
-        if not sender_email.lower().endswith('@hunch.co.nz'):
-            airtable.log_traffic(
-                internet_message_id, conversation_id, 'external', 'ignored',
-                None, None, sender_email, subject
-            )
-            return jsonify({
-                'route': 'external',
-                'status': 'ignored',
-                'reason': 'External sender - only @hunch.co.nz emails are processed',
-                'senderEmail': sender_email
-            })
-        
-        # ===================
-        # STEP 3: DEDUPLICATION
-        # ===================
-        if internet_message_id:
-            existing = airtable.check_duplicate(internet_message_id)
-            if existing:
-                return jsonify({
-                    'route': 'duplicate',
-                    'status': 'already_processed',
-                    'reason': 'Email already processed',
-                    'originalRoute': existing['fields'].get('Route', ''),
-                    'originalRecordId': existing['id']
-                })
-        
-        # ===================
-        # STEP 4: CHECK PENDING CLARIFY
-        # ===================
-        if conversation_id:
-            pending_clarify = airtable.check_pending_clarify(conversation_id)
-            if pending_clarify:
-                result = handle_clarify_reply(data, pending_clarify)
-                if result:
-                    return jsonify(result)
-        
-        # ===================
-        # STEP 5: CALL CLAUDE
-        # ===================
-        print(f"[app] === ROUTING ===")
-        print(f"[app] Source: {source}")
-        print(f"[app] Subject: {subject}")
-        print(f"[app] Sender: {sender_email}")
-        
+    except Exception as e:
+        logger.error('Error in /traffic', exc_info=True, error=str(e))
+        return jsonify({
+            'error': 'Internal server error',
+            'details': str(e)
+        }), 500
+
+
+@metrics.timed('traffic')
+def process_traffic(data, gates=None, log=None):
+    """
+    Run one email/Hub message through gates, Claude, logging and routing.
+    Shared by /traffic and /traffic/batch; asgi.handle_traffic runs the same
+    steps (see HELPER: TRAFFIC STEPS) with awaited I/O.
+    
+    Args:
+        data: request dict (see SCHEMA.md §1)
+        gates: precomputed gate results (batch) - run_gates() is called if None
+        log: Traffic logger, defaults to airtable.log_traffic (batch defers logging)
+    
+    Returns (response dict, HTTP status code).
+    """
+    log = log or airtable.log_traffic
+    
+    # ===================
+    # VALIDATE INPUT
+    # ===================
+    email = read_traffic_request(data)
+    if email is None:
+        return {'error': 'No email body or subject provided'}, 400
+    
+    tracing.annotate(internetMessageId=email['internet_message_id'], source=email['source'], sender=email['sender_email'])
+    
+    # ===================
+    # STEP 1 + 2: IGNORE DOT'S OWN EMAILS, CHECK SENDER DOMAIN
+    # ===================
+    stopped = sender_gate(email)
+    if stopped:
+        response, log_args = stopped
+        if log_args:
+            log(*log_args)
+        return response, 200
+    
+    # ===================
+    # STEP 3 + 4: DEDUPLICATION & PENDING CLARIFY (concurrent)
+    # ===================
+    if gates is None:
+        with metrics.timed('gates'):
+            gates = run_gates(email['internet_message_id'], email['conversation_id'], email['subject'], email['content'])
+    
+    if gates['duplicate']:
+        return duplicate_response(gates['duplicate']), 200
+    
+    if gates['pending_clarify']:
+        with metrics.timed('clarify'):
+            result = handle_clarify_reply(data, gates['pending_clarify'], log)
+        if result:
+            return result, 200
+    
+    # ===================
+    # STEP 5: CALL CLAUDE
+    # ===================
+    logger.info('Routing', source=email['source'], subject=email['subject'], sender=email['sender_email'])
+    
+    with metrics.timed('route_request'):
         routing = traffic.route_request(data)
+    
+    log_routed(routing)
+    
+    if routing.get('type') == 'error':
+        return routing, 500
+    
+    # ===================
+    # STEP 5b: ENRICH WITH PROJECT DATA (if job exists)
+    # ===================
+    if routing.get('jobNumber'):
+        with metrics.timed('enrichment'):
+            project = get_prefetched_project(gates, routing.get('jobNumber'))
+        if project:
+            routing = enrich_with_project(routing, project)
+            logger.info('Enriched', teamId=routing.get('teamId'), channelId=routing.get('teamsChannelId'))
+    
+    # ===================
+    # STEP 6: LOG TO TRAFFIC TABLE
+    # ===================
+    with metrics.timed('log_traffic'):
+        log(*traffic_log_args(email, routing))
+    
+    # ===================
+    # STEP 7 + 8: BUILD PAYLOAD, ROUTE BASED ON TYPE
+    # ===================
+    call, arguments = plan_reply(email, routing, build_worker_payload(data, routing))
+    
+    if call is None:
+        worker_result = arguments
+    elif call == 'call_worker':
+        # ACTION: the worker handles EVERYTHING (files, Airtable, Teams, confirmation email)
+        worker_result = call_worker(**arguments)
+        if not worker_result.get('success'):
+            connect.send_failure(**failure_email(email, routing, worker_result))
+    else:
+        # ANSWER / REDIRECT / CLARIFY: Brain sends the email directly via connect.py
+        worker_result = getattr(connect, call)(**arguments)
+    
+    # ===================
+    # RETURN RESPONSE
+    # ===================
+    return traffic_response(routing, worker_result), 200
+
+
+# ===================
+# BATCH TRAFFIC ENDPOINT (email bursts)
+# ===================
+
+class TrafficLogBuffer:
+    """
+    Collects log_traffic calls during a batch so they can be written in bulk.
+    Called from several threads at once.
+    """
+    
+    def __init__(self):
+        self.entries = []
+        self._lock = threading.Lock()
+    
+    def __call__(self, *args):
+        with self._lock:
+            self.entries.append(args)
+        return None
+    
+    def flush(self):
+        """Write everything collected so far with airtable.log_traffic_batch"""
+        with self._lock:
+            entries, self.entries = self.entries, []
+        return airtable.log_traffic_batch(entries)
+
+
+@app.route('/traffic/batch', methods=['POST'])
+@tracing.trace('POST /traffic/batch', traceparent=lambda: request.headers.get('traceparent'))
+def handle_traffic_batch():
+    """
+    Process a burst of emails in one request.
+    
+    Does the shared work once for the whole batch - dedup (one OR() query),
+    pending-clarify check, project/client prefetch and Traffic logging
+    (bulk create) - then routes the emails through the brain concurrently.
+    
+    Body: {"emails": [<traffic request>, ...], "parallelism": 4}
+    Returns per-email results in the order received.
+    """
+    try:
+        data = request.get_json()
+        emails = data.get('emails') or []
+        if not isinstance(emails, list) or not emails:
+            return jsonify({'error': 'No emails provided'}), 400
         
-        print(f"[app] Type: {routing.get('type')}")
-        print(f"[app] Route: {routing.get('route')}")
-        print(f"[app] Client: {routing.get('clientCode')}")
-        print(f"[app] Job: {routing.get('jobNumber')}")
-        
-        if routing.get('type') == 'error':
-            return jsonify(routing), 500
-        
-        # ===================
-        # STEP 5b: ENRICH WITH PROJECT DATA (if job exists)
-        # ===================
-        if routing.get('jobNumber'):
-            project = airtable.get_project(routing.get('jobNumber'))
-            if project:
-                routing = enrich_with_project(routing, project)
-                print(f"[app] Enriched: teamId={routing.get('teamId')}, channelId={routing.get('teamsChannelId')}")
-        
-        # ===================
-        # STEP 6: LOG TO TRAFFIC TABLE
-        # ===================
-        response_type = routing.get('type', 'action')
-        route = routing.get('route', 'unknown')
-        
-        log_route = response_type if response_type in ['clarify', 'confirm', 'answer', 'redirect'] else route
-        status = 'pending' if response_type in ['clarify', 'confirm'] else 'processed'
+        parallelism = int(data.get('parallelism') or BATCH_PARALLELISM)
+        parallelism = max(1, min(parallelism, BATCH_MAX_PARALLELISM, len(emails)))
         
-        airtable.log_traffic(
-            internet_message_id, conversation_id, log_route, status,
-            routing.get('jobNumber'), routing.get('clientCode'),
-            sender_email, subject, content  # Pass email body for storage
-        )
+        logger.info('Batch', emails=len(emails), parallelism=parallelism)
         
-        # ===================
-        # STEP 7: BUILD PAYLOAD
-        # ===================
-        payload = build_worker_payload(data, routing)
+        gates_list = run_batch_gates(emails)
+        log = TrafficLogBuffer()
         
-        # ===================
-        # STEP 8: ROUTE BASED ON TYPE
-        # ===================
-        worker_result = None
+        def process_one(index):
+            try:
+                result, status_code = process_traffic(emails[index], gates=gates_list[index], log=log)
+            except Exception as e:
+                logger.error('Batch email failed', exc_info=True, index=index, error=str(e))
+                result, status_code = {'error': 'Internal server error', 'details': str(e)}, 500
+            return {
+                'index': index,
+                'internetMessageId': emails[index].get('internetMessageId', ''),
+                'status': status_code,
+                'result': result
+            }
         
-        # Build original email for trail (used by connect.py)
-        original_email = {
-            'senderName': sender_name,
-            'senderEmail': sender_email,
-            'subject': subject,
-            'receivedDateTime': received_datetime,
-            'content': content
-        }
+        with ThreadPoolExecutor(max_workers=parallelism, thread_name_prefix='batch') as pool:
+            futures = [tracing.submit(pool, process_one, index) for index in range(len(emails))]
+            results = [future.result() for future in futures]
         
-        if response_type == 'answer':
-            # ANSWER: Brain sends email directly via connect.py
-            if source == 'email':
-                worker_result = connect.send_answer(
-                    to_email=sender_email,
-                    message=routing.get('message', ''),
-                    sender_name=sender_name,
-                    subject_line=subject,
-                    original_email=original_email
-                )
-            else:
-                worker_result = {'success': True, 'status': 'answered'}
-                
-        elif response_type == 'redirect':
-            # REDIRECT: Brain sends email directly via connect.py
-            if source == 'email':
-                worker_result = connect.send_redirect(
-                    to_email=sender_email,
-                    sender_name=sender_name,
-                    subject_line=subject,
-                    client_code=routing.get('clientCode'),
-                    client_name=routing.get('clientName'),
-                    redirect_to=routing.get('redirectTo', 'wip'),
-                    message=routing.get('message'),
-                    original_email=original_email
-                )
-            else:
-                worker_result = {'success': True, 'status': 'redirected'}
-                
-        elif response_type in ['clarify', 'confirm']:
-            # CLARIFY/CONFIRM: Brain sends email directly via connect.py
-            if source == 'email':
-                clarify_type = routing.get('clarifyType', 'no_idea')
-                if response_type == 'confirm':
-                    clarify_type = 'confirm'
-                
-                worker_result = connect.send_clarify(
-                    to_email=sender_email,
-                    clarify_type=clarify_type,
-                    sender_name=sender_name,
-                    subject_line=subject,
-                    job_number=routing.get('jobNumber'),
-                    possible_jobs=routing.get('jobs') or routing.get('possibleJobs'),
-                    original_email=original_email
-                )
-            else:
-                worker_result = {'success': True, 'status': 'pending_user_input'}
-                
-        elif response_type == 'action':
-            # ACTION: Call worker - worker handles EVERYTHING
-            # (file attachments, Airtable updates, Teams post, confirmation email)
-            if source == 'email':
-                worker_result = call_worker(route, payload)
-                    
-                # If worker failed, send failure email from Brain
-                # (because worker might not have been able to send it)
-                if not worker_result.get('success'):
-                    connect.send_failure(
-                        to_email=sender_email,
-                        route=route,
-                        error_message=worker_result.get('error', 'Unknown error'),
-                        sender_name=sender_name,
-                        subject_line=subject,
-                        job_number=routing.get('jobNumber'),
-                        job_name=routing.get('jobName'),
-                        client_name=routing.get('clientName'),
-                        original_email=original_email
-                    )
-            else:
-                # Hub - return for user to act on
-                worker_result = {'success': True, 'status': 'user_action_required'}
-        else:
-            # Unknown type
-            worker_result = {'success': False, 'error': f'Unknown type: {response_type}'}
+        logged = log.flush()
+        logger.info('Batch done', emails=len(results), trafficRecords=len(logged))
         
-        # ===================
-        # RETURN RESPONSE
-        # ===================
         return jsonify({
-            'type': response_type,
-            'route': route,
-            'confidence': routing.get('confidence', 'unknown'),
-            'reason': routing.get('reason', ''),
-            'message': routing.get('message', ''),
-            'jobNumber': routing.get('jobNumber'),
-            'clientCode': routing.get('clientCode'),
-            'clientName': routing.get('clientName'),
-            'intent': routing.get('intent'),
-            'jobs': routing.get('jobs') or routing.get('possibleJobs'),
-            'clarifyType': routing.get('clarifyType'),
-            'redirectTo': routing.get('redirectTo'),
-            'worker': worker_result
+            'count': len(results),
+            'logged': len([r for r in logged if r]),
+            'results': results
         })
         
     except Exception as e:
-        print(f"[app] Error in /traffic: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.error('Error in /traffic/batch', exc_info=True, error=str(e))
         return jsonify({
             'error': 'Internal server error',
             'details': str(e)
         }), 500
 
 
+def run_batch_gates(emails):
+    """
+    Gate lookups for a whole batch: one dedup query, one pending-clarify
+    query and one project prefetch, shared out as per-email gate dicts
+    (same shape as run_gates).
+    
+    An internetMessageId repeated inside the batch counts as a duplicate
+    of its first occurrence.
+    """
+    message_ids = [e.get('internetMessageId', '') for e in emails]
+    conversation_ids = [e.get('conversationId', '') for e in emails]
+    job_numbers = set()
+    for email in emails:
+        subject = email.get('subject') or email.get('subjectLine', '')
+        content = email.get('content') or email.get('body') or email.get('emailContent', '')
+        job_number = traffic.extract_job_number(subject) or traffic.extract_job_number(content)
+        if job_number:
+            job_numbers.add(job_number)
+    
+    duplicates = tracing.submit(GATE_POOL, airtable.check_duplicates, message_ids)
+    pendings = tracing.submit(GATE_POOL, airtable.check_pending_clarifies, conversation_ids)
+    projects = tracing.submit(GATE_POOL, airtable.get_projects, job_numbers)
+    duplicates, pendings, projects = duplicates.result(), pendings.result(), projects.result()
+    
+    # Remember misses too, so a job that doesn't exist isn't looked up again per email
+    projects = {j: projects.get(j) for j in job_numbers}
+    
+    gates_list = []
+    first_seen = {}
+    for index, (mid, cid) in enumerate(zip(message_ids, conversation_ids)):
+        duplicate = duplicates.get(mid) if mid else None
+        if mid and not duplicate:
+            if mid in first_seen:
+                duplicate = {
+                    'id': f'batch:{first_seen[mid]}',
+                    'fields': {'Route': 'batch duplicate'}
+                }
+            else:
+                first_seen[mid] = index
+        
+        gates_list.append({
+            'duplicate': duplicate,
+            'pending_clarify': pendings.get(cid) if cid else None,
+            'prefetch_job': None,
+            'prefetch': None,
+            'projects': projects,
+        })
+    
+    return gates_list
+
+
+# ===================
+# HELPER: ROUTING RESULT
+# ===================
+
+def classify_routing(routing):
+    """
+    Work out how a routing decision is logged.
+    Returns (response_type, route, log_route, status).
+    """
+    response_type = routing.get('type', 'action')
+    route = routing.get('route', 'unknown')
+    
+    log_route = response_type if response_type in ['clarify', 'confirm', 'answer', 'redirect'] else route
+    status = 'pending' if response_type in ['clarify', 'confirm'] else 'processed'
+    
+    return response_type, route, log_route, status
+
+
+def traffic_response(routing, worker_result):
+    """Build the /traffic JSON response from Claude's decision and the worker result"""
+    return {
+        'type': routing.get('type', 'action'),
+        'route': routing.get('route', 'unknown'),
+        'confidence': routing.get('confidence', 'unknown'),
+        'reason': routing.get('reason', ''),
+        'message': routing.get('message', ''),
+        'jobNumber': routing.get('jobNumber'),
+        'clientCode': routing.get('clientCode'),
+        'clientName': routing.get('clientName'),
+        'intent': routing.get('intent'),
+        'jobs': routing.get('jobs') or routing.get('possibleJobs'),
+        'clarifyType': routing.get('clarifyType'),
+        'redirectTo': routing.get('redirectTo'),
+        'worker': worker_result
+    }
+
+
+# ===================
+# HELPER: TRAFFIC STEPS
+# ===================
+# The decisions /traffic makes, without the I/O - process_traffic and
+# asgi.handle_traffic both run these and only make the calls themselves.
+
+def read_traffic_request(data):
+    """
+    The fields /traffic works from (PA Listener's older names accepted), or
+    None when there's neither a body nor a subject.
+    """
+    content = data.get('content') or data.get('body') or data.get('emailContent', '')
+    subject = data.get('subject') or data.get('subjectLine', '')
+    
+    if not content and subject:
+        content = f"Subject: {subject}"
+    
+    if not content:
+        return None
+    
+    email = {
+        'content': content,
+        'subject': subject,
+        'sender_email': data.get('from') or data.get('senderEmail', ''),
+        'sender_name': data.get('senderName', ''),
+        'source': data.get('source', 'email'),
+        'internet_message_id': data.get('internetMessageId', ''),
+        'conversation_id': data.get('conversationId', ''),
+        'received_datetime': data.get('receivedDateTime', ''),
+    }
+    
+    # Original email for the trail (used by connect.py)
+    email['original_email'] = {
+        'senderName': email['sender_name'],
+        'senderEmail': email['sender_email'],
+        'subject': subject,
+        'receivedDateTime': email['received_datetime'],
+        'content': content,
+        'internetMessageId': email['internet_message_id']
+    }
+    return email
+
+
+def sender_gate(email):
+    """
+    Steps 1-2: Dot's own emails and external senders stop here.
+    Returns (response, log_traffic args or None), or None to carry on.
+    """
+    sender_email = email['sender_email']
+    
+    if sender_email.lower() == 'dot@hunch.co.nz':
+        return {
+            'route': 'ignored',
+            'status': 'self',
+            'reason': 'Ignoring email from Dot to prevent loops'
+        }, None
+    
+    if not sender_email.lower().endswith('@hunch.co.nz'):
+        log_args = (email['internet_message_id'], email['conversation_id'], 'external', 'ignored',
+                    None, None, sender_email, email['subject'])
+        return {
+            'route': 'external',
+            'status': 'ignored',
+            'reason': 'External sender - only @hunch.co.nz emails are processed',
+            'senderEmail': sender_email
+        }, log_args
+    
+    return None
+
+
+def duplicate_response(existing):
+    """Step 3: the response for an email already in the Traffic table"""
+    return {
+        'route': 'duplicate',
+        'status': 'already_processed',
+        'reason': 'Email already processed',
+        'originalRoute': existing['fields'].get('Route', ''),
+        'originalRecordId': existing['id']
+    }
+
+
+def log_routed(routing):
+    """Step 5: log Claude's decision"""
+    logger.info('Routed', type=routing.get('type'), route=routing.get('route'),
+                clientCode=routing.get('clientCode'), jobNumber=routing.get('jobNumber'))
+
+
+def traffic_log_args(email, routing):
+    """Step 6: log_traffic arguments for a routed request"""
+    _, _, log_route, status = classify_routing(routing)
+    return (
+        email['internet_message_id'], email['conversation_id'], log_route, status,
+        routing.get('jobNumber'), routing.get('clientCode'),
+        email['sender_email'], email['subject'], email['content']  # Pass email body for storage
+    )
+
+
+def plan_reply(email, routing, payload):
+    """
+    Step 8 without the I/O: what this decision sends.
+    Returns (call, kwargs) - call is 'call_worker' or a send_* name that
+    connect and connect_async both have - or (None, worker_result) when
+    nothing is sent (Hub requests get the decision in the response).
+    """
+    response_type, route, _, _ = classify_routing(routing)
+    from_email = email['source'] == 'email'
+    reply = {
+        'to_email': email['sender_email'],
+        'sender_name': email['sender_name'],
+        'subject_line': email['subject'],
+        'original_email': email['original_email'],
+    }
+    
+    if response_type == 'answer':
+        if not from_email:
+            return None, {'success': True, 'status': 'answered'}
+        return 'send_answer', {**reply, 'message': routing.get('message', '')}
+    
+    if response_type == 'redirect':
+        if not from_email:
+            return None, {'success': True, 'status': 'redirected'}
+        return 'send_redirect', {
+            **reply,
+            'client_code': routing.get('clientCode'),
+            'client_name': routing.get('clientName'),
+            'redirect_to': routing.get('redirectTo', 'wip'),
+            'message': routing.get('message'),
+        }
+    
+    if response_type in ['clarify', 'confirm']:
+        if not from_email:
+            return None, {'success': True, 'status': 'pending_user_input'}
+        return 'send_clarify', {
+            **reply,
+            'clarify_type': 'confirm' if response_type == 'confirm' else routing.get('clarifyType', 'no_idea'),
+            'job_number': routing.get('jobNumber'),
+            'possible_jobs': routing.get('jobs') or routing.get('possibleJobs'),
+        }
+    
+    if response_type == 'action':
+        if not from_email:
+            # Hub - return for user to act on
+            return None, {'success': True, 'status': 'user_action_required'}
+        return 'call_worker', {'route': route, 'payload': payload}
+    
+    return None, {'success': False, 'error': f'Unknown type: {response_type}'}
+
+
+def failure_email(email, routing, worker_result):
+    """send_failure arguments for a failed worker call (the worker might not have been able to send one)"""
+    return {
+        'to_email': email['sender_email'],
+        'route': routing.get('route', 'unknown'),
+        'error_message': worker_result.get('error', 'Unknown error'),
+        'sender_name': email['sender_name'],
+        'subject_line': email['subject'],
+        'job_number': routing.get('jobNumber'),
+        'job_name': routing.get('jobName'),
+        'client_name': routing.get('clientName'),
+        'original_email': email['original_email']
+    }
+
+
+# ===================
+# HELPER: GATE CHECKS
+# ===================
+
+def run_gates(internet_message_id, conversation_id, subject, content):
+    """
+    Run the gate lookups concurrently.
+    
+    Dedup and pending-clarify are independent Traffic-table reads, and if the
+    email already names a job we start fetching its project at the same time
+    (Claude usually lands on the same job). Returns as soon as a duplicate is
+    confirmed - the other lookups are abandoned.
+    
+    Returns dict with:
+        duplicate: existing Traffic record or None
+        pending_clarify: pending Traffic record or None
+        prefetch_job: job number being prefetched (or None)
+        prefetch: Future for airtable.get_project(prefetch_job) (or None)
+    """
+    gates = {
+        'duplicate': None,
+        'pending_clarify': None,
+        'prefetch_job': None,
+        'prefetch': None,
+    }
+    
+    # Speculative project prefetch - only when the subject/body names a job
+    prefetch_job = traffic.extract_job_number(subject) or traffic.extract_job_number(content)
+    if prefetch_job:
+        gates['prefetch_job'] = prefetch_job
+        gates['prefetch'] = tracing.submit(GATE_POOL, airtable.get_project, prefetch_job)
+    
+    duplicate_future = tracing.submit(GATE_POOL, airtable.check_duplicate, internet_message_id) if internet_message_id else None
+    pending_future = tracing.submit(GATE_POOL, airtable.check_pending_clarify, conversation_id) if conversation_id else None
+    
+    pending = {f for f in (duplicate_future, pending_future) if f}
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        if duplicate_future in done and duplicate_future.result():
+            gates['duplicate'] = duplicate_future.result()
+            for future in pending:
+                future.cancel()
+            if gates['prefetch']:
+                gates['prefetch'].cancel()
+            return gates
+    
+    if pending_future:
+        gates['pending_clarify'] = pending_future.result()
+    
+    return gates
+
+
+def get_prefetched_project(gates, job_number):
+    """Use the speculative prefetch if it was for this job, otherwise look it up"""
+    if job_number in gates.get('projects', {}):
+        return gates['projects'][job_number]
+    if gates.get('prefetch') and gates.get('prefetch_job') == job_number:
+        try:
+            return gates['prefetch'].result()
+        except Exception as e:
+            logger.warning('Project prefetch failed, retrying', error=str(e))
+    return airtable.get_project(job_number)
+
+
 # ===================
 # HELPER: ENRICH WITH PROJECT DATA
 # ===================
@@ -443,11 +938,13 @@ def enrich_with_project(routing, project):
 # CLARIFY REPLY HANDLER
 # ===================
 
-def handle_clarify_reply(data, pending_clarify):
+def handle_clarify_reply(data, pending_clarify, log=None):
     """
     Handle a reply to a previous clarify request.
     Returns routing dict if handled, None to continue normal processing.
     """
+    log = log or airtable.log_traffic
+    
     content = (data.get('body') or data.get('emailContent', '')).strip()
     subject = data.get('subject') or data.get('subjectLine', '')
     sender_email = data.get('from') or data.get('senderEmail', '')
@@ -465,7 +962,8 @@ def handle_clarify_reply(data, pending_clarify):
         'senderEmail': sender_email,
         'subject': subject,
         'receivedDateTime': received_datetime,
-        'content': content
+        'content': content,
+        'internetMessageId': internet_message_id
     }
     
     # Check for job number in reply
@@ -488,7 +986,7 @@ def handle_clarify_reply(data, pending_clarify):
     
     if is_triage:
         # User wants to triage as new job - call setup worker
-        airtable.log_traffic(
+        log(
             internet_message_id, conversation_id, 'setup', 'processed',
             None, pending_fields.get('clientCode'), sender_email, subject, content
         )
@@ -530,7 +1028,7 @@ def handle_clarify_reply(data, pending_clarify):
         project = airtable.get_project(reply_job_number)
         
         if project:
-            airtable.log_traffic(
+            log(
                 internet_message_id, conversation_id, 'update', 'processed',
                 reply_job_number, reply_job_number.split()[0], sender_email, subject
             )
@@ -599,7 +1097,7 @@ def handle_clarify_reply(data, pending_clarify):
             project = airtable.get_project(suggested_job)
             
             if project:
-                airtable.log_traffic(
+                log(
                     internet_message_id, conversation_id, 'update', 'processed',
                     suggested_job, suggested_job.split()[0], sender_email, subject
                 )
@@ -690,7 +1188,8 @@ def build_worker_payload(email_data, routing):
             'senderEmail': email_data.get('from') or email_data.get('senderEmail', ''),
             'subject': email_data.get('subject') or email_data.get('subjectLine', ''),
             'receivedDateTime': email_data.get('receivedDateTime', ''),
-            'content': email_data.get('body') or email_data.get('content') or email_data.get('emailContent', '')
+            'content': email_data.get('body') or email_data.get('content') or email_data.get('emailContent', ''),
+            'internetMessageId': email_data.get('internetMessageId', '')
         },
         
         # Attachments (worker handles filing)
@@ -704,6 +1203,7 @@ def build_worker_payload(email_data, routing):
         'receivedDateTime': email_data.get('receivedDateTime', ''),
         'allRecipients': email_data.get('allRecipients', []),
         'source': email_data.get('source', 'email'),
+        'traceId': tracing.current_trace_id(),
     }
 
 
@@ -714,4 +1214,5 @@ def build_worker_payload(email_data, routing):
 if __name__ == '__main__':
     import os
     port = int(os.environ.get('PORT', 8080))
+    warmup.warm_up()
     app.run(host='0.0.0.0', port=port)
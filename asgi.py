@@ -0,0 +1,362 @@
+"""
+Dot Traffic 2.0 (Brain) - Async serving mode
+Same endpoints as app.py, served from one event loop per process.
+
+Almost all of a request's time is spent waiting on Anthropic, Airtable,
+PA Postman and the workers. Under gunicorn sync workers each of those waits
+holds a whole worker; here they are awaited, so one process can hold
+hundreds of in-flight Claude conversations.
+
+RUN:
+    hypercorn asgi:app --bind 0.0.0.0:$PORT
+
+The sync Flask app (app.py) stays the default in Procfile. Routing logic,
+payloads and responses are shared with app.py - only the I/O is async.
+"""
+
+import time
+import asyncio
+import httpx
+from quart import Quart, request, jsonify
+from quart_cors import cors
+
+import app as sync_app
+import traffic
+import airtable_async
+import connect_async
+import traffic_async
+import hub_async
+import metrics
+import tracing
+import profiling
+import breaker
+import reservations
+import warmup
+import logs
+from app import (
+    WORKER_URLS,
+    WORKER_TIMEOUT,
+    build_worker_payload,
+    enrich_with_project,
+    traffic_response,
+    read_traffic_request,
+    sender_gate,
+    duplicate_response,
+    log_routed,
+    traffic_log_args,
+    plan_reply,
+    failure_email,
+)
+
+app = cors(Quart(__name__))
+
+logger = logs.get('app')
+
+# Pooled client for worker calls
+worker_client = httpx.AsyncClient(timeout=WORKER_TIMEOUT)
+
+
+@app.before_serving
+async def warm_up():
+    """Warm up before taking requests (warmup.py) - sync steps, off the event loop"""
+    await asyncio.to_thread(warmup.warm_up)
+
+
+@app.after_serving
+async def close_clients():
+    """Close every pooled async client when the server shuts down"""
+    await asyncio.to_thread(reservations.release_unused)
+    await worker_client.aclose()
+    await airtable_async.close()
+    await connect_async.close()
+    await traffic_async.close()
+    await hub_async.close()
+
+
+# ===================
+# WORKERS
+# ===================
+
+@metrics.timed('call_worker')
+async def call_worker(route, payload, queue=True):
+    """
+    Call a worker service (async twin of app.call_worker - same results:
+    queued while the breaker is open, 'retryable' on timeouts and 5xx).
+    """
+    url = WORKER_URLS.get(route)
+    
+    if not url:
+        return sync_app.no_worker(route)
+    
+    # Breaker open - queue it; the sync app's background thread retries it
+    if not breaker.workers.allow():
+        return sync_app.worker_unavailable(route, payload, queue)
+    
+    logger.info('Calling worker', route=route, url=url)
+    
+    start = time.perf_counter()
+    try:
+        response = await worker_client.post(
+            url,
+            json=payload,
+            headers={'Content-Type': 'application/json', **tracing.headers()}
+        )
+    except Exception as e:
+        breaker.workers.record(False, time.perf_counter() - start)
+        return sync_app.worker_error(route, e)
+    
+    breaker.workers.record(response.status_code < 500, time.perf_counter() - start)
+    return sync_app.worker_result(route, response)
+
+
+# ===================
+# HEALTH CHECK
+# ===================
+
+@app.route('/ready', methods=['GET'])
+async def ready():
+    """Readiness: 503 until warm-up has finished, unlike /health"""
+    return jsonify(warmup.status()), 200 if warmup.ready() else 503
+
+
+@app.route('/', methods=['GET'])
+@app.route('/health', methods=['GET'])
+async def health():
+    """Health check endpoint"""
+    return jsonify({
+        'service': 'Dot Brain',
+        'version': '3.2',
+        'architecture': 'brain-thinks-workers-work',
+        'serving': 'asgi',
+        'workers': list(WORKER_URLS.keys()),
+        **sync_app.health_status()
+    })
+
+
+# ===================
+# METRICS (Prometheus)
+# ===================
+
+@app.route('/metrics', methods=['GET'])
+async def prometheus_metrics():
+    """Prometheus scrape endpoint (same registry as app.prometheus_metrics)"""
+    body, content_type = metrics.render()
+    return body, 200, {'Content-Type': content_type}
+
+
+# ===================
+# PROFILES (admin)
+# ===================
+
+@app.route('/admin/profiles', methods=['GET'])
+@app.route('/admin/profiles/<profile_id>', methods=['GET'])
+async def admin_profiles(profile_id=None):
+    """Stored request profiles (same store as app.admin_profiles)"""
+    header = request.headers.get(profiling.PROFILE_HEADER)
+    body, status, headers = await asyncio.to_thread(sync_app.profiles_response, header, profile_id)
+    return (jsonify(body) if isinstance(body, dict) else body), status, headers
+
+
+# ===================
+# SESSION CLEAR (Hub)
+# ===================
+
+@app.route('/traffic/clear', methods=['POST'])
+async def clear_session():
+    """Clear conversation memory for a Hub session"""
+    try:
+        data = await request.get_json()
+        session_id = data.get('sessionId')
+        if session_id:
+            traffic.clear_conversation(session_id)
+        return jsonify({'success': True})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+# ===================
+# HUB ENDPOINT
+# ===================
+
+@app.route('/hub', methods=['POST'])
+@tracing.trace('POST /hub', traceparent=lambda: request.headers.get('traceparent'))
+@profiling.profile('POST /hub', header=lambda: request.headers.get(profiling.PROFILE_HEADER))
+async def handle_hub():
+    """Fast path for Hub requests (async twin of app.handle_hub)"""
+    try:
+        data = await request.get_json()
+        
+        content = data.get('content', '')
+        if not content:
+            return jsonify({'error': 'No content provided'}), 400
+        
+        with metrics.timed('hub'):
+            result = await hub_async.handle_hub_request(data)
+        
+        return jsonify(result)
+        
+    except Exception as e:
+        logger.error('Hub error', exc_info=True, error=str(e))
+        return jsonify({
+            'type': 'answer',
+            'message': "Sorry, I got in a muddle over that one.",
+            'jobs': None
+        }), 500
+
+
+# ===================
+# GATE CHECKS
+# ===================
+
+async def run_gates(internet_message_id, conversation_id, subject, content):
+    """
+    Run the gate lookups concurrently (async twin of app.run_gates).
+    Returns as soon as a duplicate is confirmed.
+    """
+    gates = {
+        'duplicate': None,
+        'pending_clarify': None,
+        'prefetch_job': None,
+        'prefetch': None,
+    }
+    
+    prefetch_job = traffic.extract_job_number(subject) or traffic.extract_job_number(content)
+    if prefetch_job:
+        gates['prefetch_job'] = prefetch_job
+        gates['prefetch'] = asyncio.create_task(airtable_async.get_project(prefetch_job))
+    
+    duplicate_task = asyncio.create_task(airtable_async.check_duplicate(internet_message_id)) if internet_message_id else None
+    pending_task = asyncio.create_task(airtable_async.check_pending_clarify(conversation_id)) if conversation_id else None
+    
+    pending = {t for t in (duplicate_task, pending_task) if t}
+    while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        if duplicate_task in done and duplicate_task.result():
+            gates['duplicate'] = duplicate_task.result()
+            for task in pending:
+                task.cancel()
+            if gates['prefetch']:
+                gates['prefetch'].cancel()
+            return gates
+    
+    if pending_task:
+        gates['pending_clarify'] = pending_task.result()
+    
+    return gates
+
+
+async def get_prefetched_project(gates, job_number):
+    """Use the speculative prefetch if it was for this job, otherwise look it up"""
+    if gates.get('prefetch') and gates.get('prefetch_job') == job_number:
+        try:
+            return await gates['prefetch']
+        except Exception as e:
+            logger.warning('Project prefetch failed, retrying', error=str(e))
+    return await airtable_async.get_project(job_number)
+
+
+# ===================
+# MAIN TRAFFIC ENDPOINT
+# ===================
+
+@app.route('/traffic', methods=['POST'])
+@tracing.trace('POST /traffic', traceparent=lambda: request.headers.get('traceparent'))
+@profiling.profile('POST /traffic', header=lambda: request.headers.get(profiling.PROFILE_HEADER))
+@metrics.timed('traffic')
+async def handle_traffic():
+    """
+    Main routing endpoint (async twin of app.process_traffic).
+    The same steps (app.py HELPER: TRAFFIC STEPS) - only the I/O is awaited here.
+    """
+    try:
+        data = await request.get_json()
+        
+        # ===================
+        # VALIDATE INPUT
+        # ===================
+        email = read_traffic_request(data)
+        if email is None:
+            return jsonify({'error': 'No email body or subject provided'}), 400
+        
+        tracing.annotate(internetMessageId=email['internet_message_id'], source=email['source'], sender=email['sender_email'])
+        
+        # ===================
+        # STEP 1 + 2: IGNORE DOT'S OWN EMAILS, CHECK SENDER DOMAIN
+        # ===================
+        stopped = sender_gate(email)
+        if stopped:
+            response, log_args = stopped
+            if log_args:
+                await airtable_async.log_traffic(*log_args)
+            return jsonify(response)
+        
+        # ===================
+        # STEP 3 + 4: DEDUPLICATION & PENDING CLARIFY (concurrent)
+        # ===================
+        with metrics.timed('gates'):
+            gates = await run_gates(email['internet_message_id'], email['conversation_id'], email['subject'], email['content'])
+        
+        if gates['duplicate']:
+            return jsonify(duplicate_response(gates['duplicate']))
+        
+        if gates['pending_clarify']:
+            # Clarify replies are rare - reuse the sync handler off the loop
+            with metrics.timed('clarify'):
+                result = await asyncio.to_thread(sync_app.handle_clarify_reply, data, gates['pending_clarify'])
+            if result:
+                return jsonify(result)
+        
+        # ===================
+        # STEP 5: CALL CLAUDE
+        # ===================
+        logger.info('Routing', source=email['source'], subject=email['subject'], sender=email['sender_email'])
+        
+        with metrics.timed('route_request'):
+            routing = await traffic_async.route_request(data)
+        
+        log_routed(routing)
+        
+        if routing.get('type') == 'error':
+            return jsonify(routing), 500
+        
+        # ===================
+        # STEP 5b: ENRICH WITH PROJECT DATA (if job exists)
+        # ===================
+        if routing.get('jobNumber'):
+            with metrics.timed('enrichment'):
+                project = await get_prefetched_project(gates, routing.get('jobNumber'))
+            if project:
+                routing = enrich_with_project(routing, project)
+                logger.info('Enriched', teamId=routing.get('teamId'), channelId=routing.get('teamsChannelId'))
+        
+        # ===================
+        # STEP 6: LOG TO TRAFFIC TABLE
+        # ===================
+        with metrics.timed('log_traffic'):
+            await airtable_async.log_traffic(*traffic_log_args(email, routing))
+        
+        # ===================
+        # STEP 7 + 8: BUILD PAYLOAD, ROUTE BASED ON TYPE
+        # ===================
+        call, arguments = plan_reply(email, routing, build_worker_payload(data, routing))
+        
+        if call is None:
+            worker_result = arguments
+        elif call == 'call_worker':
+            worker_result = await call_worker(**arguments)
+            if not worker_result.get('success'):
+                await connect_async.send_failure(**failure_email(email, routing, worker_result))
+        else:
+            worker_result = await getattr(connect_async, call)(**arguments)
+        
+        # ===================
+        # RETURN RESPONSE
+        # ===================
+        return jsonify(traffic_response(routing, worker_result))
+        
+    except Exception as e:
+        logger.error('Error in /traffic', exc_info=True, error=str(e))
+        return jsonify({
+            'error': 'Internal server error',
+            'details': str(e)
+        }), 500
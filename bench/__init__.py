@@ -0,0 +1,10 @@
+"""
+Dot Traffic 2.0 - Bench
+Offline benchmarks for the brain. Nothing here is imported by the app.
+
+- fixtures.py: synthetic Airtable base + /traffic and /hub requests
+- standins.py: local Airtable, Anthropic, PA and worker stand-ins
+- load.py: end-to-end load test against the stand-ins (p50/p95/p99, throughput)
+- micro.py: micro-benchmarks for the per-request CPU paths, with baselines
+- corpus.py: record/replay routing cassettes (latency, rounds, tokens per email)
+"""
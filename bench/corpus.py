@@ -0,0 +1,232 @@
+"""
+Bench - Corpus (record/replay)
+A repeatable routing benchmark: record cassettes of traffic.route_request once,
+then replay them after every change and compare latency, rounds and tokens.
+
+    # Record - real emails (JSONL of /traffic bodies) against the real services
+    python -m bench.corpus record --corpus emails.jsonl --out cassettes/
+
+    # Record - synthetic emails against the stand-ins (no keys needed)
+    python -m bench.corpus record --standins --count 50 --out cassettes/
+
+    # Replay - recorded timing (--speed 0 for pure CPU), optional baseline compare
+    python -m bench.corpus replay cassettes/ --json after.json --compare before.json
+
+Replay runs our real code (prompt building, tool loop, JSON parsing) with the
+Anthropic calls and tool results served from the cassette (cassettes.py), so the
+only variable left is the change under test. An email whose replayed decision
+differs from the recorded one (type / route / jobNumber) is flagged - the
+change altered routing, not just speed. Tokens are the recorded usage; inputChars
+is measured on the replayed prompts, so it moves when prompt building changes.
+
+Cassettes contain real email content and Airtable data: keep them out of git
+(/cassettes/ is ignored).
+"""
+
+import io
+import os
+import json
+import glob
+import time
+import logging
+import argparse
+import contextlib
+
+from bench import fixtures, standins as standins_module
+from bench.load import percentile
+
+DECISION_FIELDS = ('type', 'route', 'jobNumber')
+
+
+# ===================
+# RECORD
+# ===================
+
+def load_corpus(path):
+    """One /traffic request body per line"""
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def record(args):
+    standins = None
+    if args.standins:
+        base, standins = standins_module.from_arguments(args)
+        standins.start()
+        os.environ.update(standins.env())
+    else:
+        base = fixtures.make_base(jobs=args.jobs)
+    
+    requests = load_corpus(args.corpus) if args.corpus else fixtures.make_emails(base, args.count, body_bytes=args.body_bytes)
+    
+    # Read at import time - every email goes to Claude, none served from the decision cache
+    os.environ['CASSETTE_DIR'] = os.path.abspath(args.out)
+    os.environ.setdefault('DECISION_CACHE', 'off')
+    import traffic
+    
+    try:
+        for i, request_data in enumerate(requests, 1):
+            with _quiet(args.verbose):
+                routing = traffic.route_request(request_data)
+            print(f"[bench] {i}/{len(requests)} {request_data.get('subject', '')[:50]!r} -> "
+                  f"{routing.get('type')} {routing.get('jobNumber') or ''}")
+    finally:
+        if standins:
+            standins.stop()
+    
+    print(f"[bench] Cassettes in {args.out}")
+
+
+# ===================
+# REPLAY
+# ===================
+
+def decision(routing):
+    return {field: (routing or {}).get(field) for field in DECISION_FIELDS}
+
+
+def tokens(interactions):
+    usage = [(i['response'].get('usage') or {}) for i in interactions if i['kind'] == 'claude']
+    return {
+        'input': sum(u.get('input_tokens') or 0 for u in usage),
+        'output': sum(u.get('output_tokens') or 0 for u in usage),
+    }
+
+
+def replay_one(traffic, cassettes, path, speed, live_tools, verbose):
+    cassette = cassettes.load(path)
+    start = time.perf_counter()
+    with cassettes.replaying(cassette, speed=speed, live_tools=live_tools) as replay:
+        with _quiet(verbose):
+            routing = traffic.route_request(cassette['request'], cassette.get('activeJobs'))
+    seconds = time.perf_counter() - start
+    
+    claude_calls = [i for i in replay.used if i['kind'] == 'claude']
+    expected, actual = decision(cassette['routing']), decision(routing)
+    return {
+        'cassette': os.path.basename(path),
+        'seconds': seconds,
+        'recordedSeconds': cassette.get('seconds'),
+        'claudeCalls': len(claude_calls),
+        'toolRounds': max(0, len(claude_calls) - 1),
+        'toolCalls': len(replay.used) - len(claude_calls),
+        'tokens': tokens(replay.used),
+        'inputChars': replay.input_chars,
+        'decision': actual,
+        'matches': expected == actual and not replay.mismatches,
+        'mismatches': replay.mismatches,
+    }
+
+
+def aggregate(results):
+    latencies = sorted(r['seconds'] for r in results)
+    count = len(results) or 1
+    return {
+        'emails': len(results),
+        'p50': percentile(latencies, 0.50),
+        'p95': percentile(latencies, 0.95),
+        'mean': sum(latencies) / count,
+        'claudeCalls': sum(r['claudeCalls'] for r in results) / count,
+        'toolRounds': sum(r['toolRounds'] for r in results) / count,
+        'inputTokens': sum(r['tokens']['input'] for r in results) / count,
+        'outputTokens': sum(r['tokens']['output'] for r in results) / count,
+        'inputChars': sum(r['inputChars'] for r in results) / count,
+        'changedDecisions': sum(1 for r in results if not r['matches']),
+    }
+
+
+def print_report(results, summary, baseline=None):
+    print()
+    print(f"{'cassette':<32} {'ms':>8} {'calls':>5} {'tools':>5} {'in tok':>7} {'chars':>8}  decision")
+    for r in results:
+        flag = '' if r['matches'] else '  CHANGED ' + ', '.join(r['mismatches'])
+        print(f"{r['cassette'][:32]:<32} {r['seconds'] * 1000:8.0f} {r['claudeCalls']:>5} {r['toolCalls']:>5} "
+              f"{r['tokens']['input']:>7} {r['inputChars']:>8}  "
+              f"{r['decision']['type']} {r['decision']['jobNumber'] or ''}{flag}")
+    
+    print()
+    for key in ('p50', 'p95', 'mean', 'claudeCalls', 'toolRounds', 'inputTokens', 'outputTokens', 'inputChars', 'changedDecisions'):
+        line = f"{key:<18} {summary[key]:12.3f}"
+        if baseline and baseline.get(key) is not None:
+            before = baseline[key]
+            delta = (summary[key] - before) / before * 100 if before else 0.0
+            line += f"   (was {before:.3f}, {delta:+.1f}%)"
+        print(line)
+
+
+def replay(args):
+    os.environ.setdefault('ANTHROPIC_API_KEY', 'replay')
+    os.environ.pop('CASSETTE_DIR', None)
+    os.environ.setdefault('DECISION_CACHE', 'off')
+    import traffic
+    import cassettes
+    
+    paths = sorted(glob.glob(os.path.join(args.cassettes, '*.json')))
+    if not paths:
+        print(f"[bench] No cassettes in {args.cassettes}")
+        return None
+    
+    results = [replay_one(traffic, cassettes, path, args.speed, args.live_tools, args.verbose) for path in paths]
+    summary = aggregate(results)
+    
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['summary']
+    print_report(results, summary, baseline)
+    
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'args': vars(args), 'summary': summary, 'results': results}, f, indent=2)
+    return summary
+
+
+# ===================
+# CLI
+# ===================
+
+@contextlib.contextmanager
+def _quiet(verbose):
+    """route_request logs a lot - keep the report readable"""
+    if verbose:
+        yield
+        return
+    root = logging.getLogger('dot')
+    level = root.level
+    root.setLevel(logging.WARNING)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            yield
+    finally:
+        root.setLevel(level)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Record and replay routing cassettes')
+    commands = parser.add_subparsers(dest='command', required=True)
+    
+    rec = commands.add_parser('record', help='run route_request over a corpus, writing cassettes')
+    rec.add_argument('--out', default='cassettes')
+    rec.add_argument('--corpus', help='JSONL of /traffic request bodies (default: synthetic emails)')
+    rec.add_argument('--count', type=int, default=50, help='synthetic emails to generate')
+    rec.add_argument('--body-bytes', type=int, help='pad synthetic bodies to this size')
+    rec.add_argument('--standins', action='store_true', help='record against the local stand-ins')
+    rec.add_argument('--verbose', action='store_true')
+    standins_module.add_arguments(rec)
+    
+    rep = commands.add_parser('replay', help='replay cassettes and report latency, rounds and tokens')
+    rep.add_argument('cassettes', help='directory of cassettes')
+    rep.add_argument('--speed', type=float, default=1.0, help='scale recorded latencies (0 = no waiting)')
+    rep.add_argument('--live-tools', action='store_true', help='run tools for real instead of from the cassette')
+    rep.add_argument('--json', help='write results here (use as a later --compare baseline)')
+    rep.add_argument('--compare', help='results JSON from an earlier replay')
+    rep.add_argument('--verbose', action='store_true')
+    
+    args = parser.parse_args(argv)
+    if args.command == 'record':
+        return record(args)
+    return replay(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,269 @@
+"""
+Bench - Fixtures
+Synthetic Airtable data and requests, shaped like the real base.
+
+Field names match what airtable.py and the traffic.py tools read, so the
+emulator can serve them and the micro-benchmarks can parse them. Everything is
+seeded - the same arguments always produce the same base.
+
+    base = make_base(jobs=1000)           # {table: [records]}
+    emails = make_emails(base, 200)       # /traffic request bodies
+    asks = make_hub_requests(base, 200)   # /hub request bodies
+
+A real base exported with `dump_base` can be served instead (recorded mode).
+"""
+
+import json
+import random
+from datetime import datetime, timedelta
+
+# ===================
+# VOCABULARY
+# ===================
+
+CLIENTS = [
+    ('TOW', 'Tower'), ('LAB', 'Labour'), ('SKY', 'Sky'), ('ONE', 'One NZ'),
+    ('ONB', 'One NZ Business'), ('ONS', 'One NZ Simplification'), ('FIS', 'Fisher Funds'),
+    ('HUN', 'Hunch'), ('WKA', 'Waikato'), ('NZP', 'NZ Post'), ('AKL', 'Auckland Council'),
+    ('MER', 'Mercury'),
+]
+
+STAGES = ['Clarify', 'Simplify', 'Craft', 'Refine', 'Deliver']
+STATUSES = ['In Progress', 'In Progress', 'In Progress', 'On Hold', 'Incoming', 'Completed']
+LIVE = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Tbc']
+OWNERS = ['Michael', 'Emma', 'Sarah', 'Josh', 'Ruby']
+WORDS = (
+    'brand campaign launch refresh digital social video print radio outdoor '
+    'brief concept script storyboard edit round feedback approval budget '
+    'timeline pricing retail member product website banner email newsletter'
+).split()
+
+
+def _record_id(rng):
+    return 'rec' + ''.join(rng.choice('ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789') for _ in range(14))
+
+
+def _words(rng, n):
+    return ' '.join(rng.choice(WORDS) for _ in range(n))
+
+
+def _date(day):
+    """D/M/YYYY, the format Airtable's Update Due field uses"""
+    return f"{day.day}/{day.month}/{day.year}"
+
+
+# ===================
+# TABLES
+# ===================
+
+def make_clients(rng):
+    records = []
+    for i, (code, name) in enumerate(CLIENTS):
+        records.append({
+            'id': _record_id(rng),
+            'fields': {
+                'Client code': code,
+                'Clients': name,
+                'Teams ID': f"team-{code.lower()}",
+                'Monthly Committed': f"${rng.randint(5, 40) * 1000:,}",
+                'Quarterly Committed': f"${rng.randint(15, 120) * 1000:,}",
+                'This month': f"${rng.randint(0, 40) * 1000:,}",
+                'This Quarter': f"${rng.randint(0, 120) * 1000:,}",
+                'Rollover Credit': rng.choice([0, 0, 2500, 5000]),
+                'Rollover use': rng.choice(['', 'JAN-MAR']),
+                'Year end': rng.choice(['March', 'June', 'December']),
+                'Current Quarter': 'OCT-DEC',
+                'JAN-MAR': rng.randint(0, 90000),
+                'APR-JUN': rng.randint(0, 90000),
+                'JUL-SEP': rng.randint(0, 90000),
+                'OCT-DEC': rng.randint(0, 90000),
+                'Next Job #': 100 + i,
+            }
+        })
+    return records
+
+
+def make_projects(rng, jobs, today):
+    records = []
+    for i in range(jobs):
+        code, name = CLIENTS[i % len(CLIENTS)]
+        job_number = f"{code} {i // len(CLIENTS) + 1:03d}"
+        history = [
+            f"{_date(today - timedelta(days=7 * h + rng.randint(0, 6)))} | {_words(rng, 12).capitalize()}"
+            for h in range(rng.randint(0, 6))
+        ]
+        records.append({
+            'id': _record_id(rng),
+            'fields': {
+                'Job Number': job_number,
+                'Project Name': _words(rng, 3).title(),
+                'Client': [name],
+                'Description': _words(rng, 20).capitalize(),
+                'The Story': _words(rng, 40).capitalize(),
+                'Project Owner': rng.choice(OWNERS),
+                'Stage': rng.choice(STAGES),
+                'Status': rng.choice(STATUSES),
+                'Round': rng.randint(0, 4),
+                'With Client?': rng.random() < 0.3,
+                'Update Due': _date(today + timedelta(days=rng.randint(-5, 14))),
+                'Live': rng.choice(LIVE),
+                'Update': history[0].split(' | ', 1)[1] if history else '',
+                'Update History': history,
+                'Days Since Update': rng.randint(0, 30),
+                'Teams Channel ID': f"19:{job_number.replace(' ', '').lower()}@thread.tacv2",
+                'Channel Url': f"https://teams.microsoft.com/l/channel/{job_number.replace(' ', '')}",
+                'Files Url': f"https://hunch.sharepoint.com/sites/{code}/{job_number.replace(' ', '')}",
+            }
+        })
+    return records
+
+
+def make_people(rng, per_client=4):
+    records = []
+    for code, name in CLIENTS:
+        for p in range(per_client):
+            first = rng.choice(['Anna', 'Ben', 'Chloe', 'Dan', 'Ella', 'Finn', 'Grace', 'Hamish'])
+            records.append({
+                'id': _record_id(rng),
+                'fields': {
+                    'Full name': f"{first} {code.title()}{p}",
+                    'Email Address': f"{first.lower()}.{code.lower()}{p}@example.co.nz",
+                    'Phone Number': f"021 {rng.randint(100, 999)} {rng.randint(1000, 9999)}",
+                    'Client Link': code,
+                    'Active': rng.random() < 0.9,
+                }
+            })
+    return records
+
+
+def make_meetings(rng, today, count=25):
+    records = []
+    for m in range(count):
+        start = datetime(today.year, today.month, today.day, 20) + timedelta(days=m // 4, hours=rng.randint(0, 8))
+        records.append({
+            'id': _record_id(rng),
+            'fields': {
+                'Title': f"{rng.choice(CLIENTS)[1]} - {_words(rng, 2)}",
+                'Day': 'Today' if m < 4 else start.strftime('%A'),
+                'Start': start.strftime('%Y-%m-%dT%H:%M:00.000Z'),
+                'End': (start + timedelta(minutes=rng.choice([30, 60]))).strftime('%Y-%m-%dT%H:%M:00.000Z'),
+                'Location': rng.choice(['Studio', 'Teams', 'Client office']),
+                'Whose meeting': rng.choice(OWNERS),
+                "Who's going": ', '.join(rng.sample(OWNERS, 2)),
+            }
+        })
+    return records
+
+
+def make_base(jobs=200, seed=1, today=None):
+    """A whole synthetic base: {table name: [records]}"""
+    rng = random.Random(seed)
+    today = today or datetime.now()
+    return {
+        'Clients': make_clients(rng),
+        'Projects': make_projects(rng, jobs, today),
+        'People': make_people(rng),
+        'Meetings': make_meetings(rng, today),
+        'Traffic': [],
+        'Updates': [],
+    }
+
+
+def dump_base(base, path):
+    with open(path, 'w') as f:
+        json.dump(base, f)
+
+
+def load_base(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+# ===================
+# REQUESTS
+# ===================
+
+def _job_numbers(base):
+    return [r['fields']['Job Number'] for r in base['Projects']]
+
+
+def make_emails(base, count, seed=2, body_bytes=None):
+    """
+    /traffic request bodies (SCHEMA.md §1). Most name a real job; some only a
+    client, some nothing. body_bytes pads the body to a size (e.g. 100_000).
+    """
+    rng = random.Random(seed)
+    jobs = _job_numbers(base)
+    emails = []
+    for i in range(count):
+        roll = rng.random()
+        if roll < 0.7 and jobs:
+            job = rng.choice(jobs)
+            subject = f"{job} - {rng.choice(['update', 'feedback', 'round 2', 'files'])}"
+            body = f"Hi Dot, {job} {_words(rng, 25)}. Client is happy with the {rng.choice(WORDS)}."
+        elif roll < 0.9:
+            code, name = rng.choice(CLIENTS)
+            subject = f"{name} {rng.choice(WORDS)} question"
+            body = f"Hey Dot, what's happening with {name}? {_words(rng, 15)}"
+        else:
+            subject = _words(rng, 3).capitalize()
+            body = _words(rng, 30).capitalize()
+        if body_bytes and len(body) < body_bytes:
+            filler = ('\n> ' + _words(rng, 12)) * (body_bytes // 60 + 1)
+            body = (body + filler)[:body_bytes]
+        has_attachments = rng.random() < 0.2
+        emails.append({
+            'source': 'email',
+            'content': body,
+            'subject': subject,
+            'senderEmail': f"{rng.choice(OWNERS).lower()}@hunch.co.nz",
+            'senderName': rng.choice(OWNERS),
+            'hasAttachments': has_attachments,
+            'attachmentNames': [f"{subject.split(' - ')[0]} - draft v{rng.randint(1, 4)}.pdf"] if has_attachments else [],
+            'internetMessageId': f"<bench-{seed}-{i}-{rng.getrandbits(32):08x}@hunch.co.nz>",
+            'conversationId': f"conv-{seed}-{i}",
+            'receivedDateTime': datetime.now().strftime('%Y-%m-%dT%H:%M:%SZ'),
+        })
+    return emails
+
+
+def job_card(record):
+    """A Projects record in the job-card shape the Hub sends back as `jobs`"""
+    fields = record['fields']
+    day, month, year = (int(x) for x in fields['Update Due'].split('/'))
+    return {
+        'jobNumber': fields['Job Number'],
+        'jobName': fields['Project Name'],
+        'clientCode': fields['Job Number'].split()[0],
+        'stage': fields['Stage'],
+        'status': fields['Status'],
+        'withClient': fields['With Client?'],
+        'updateDue': f"{year:04d}-{month:02d}-{day:02d}",
+        'liveDate': fields['Live'],
+        'daysSinceUpdate': fields['Days Since Update'],
+        'update': fields['Update'],
+    }
+
+
+def make_hub_requests(base, count, seed=3, jobs_in_context=50):
+    """/hub request bodies with a slice of active jobs in context"""
+    rng = random.Random(seed)
+    active = [job_card(r) for r in base['Projects'] if r['fields']['Status'] != 'Completed']
+    asks = []
+    for i in range(count):
+        jobs = rng.sample(active, min(jobs_in_context, len(active)))
+        if rng.random() < 0.1:
+            content = f"What's my horoscope? I'm a {rng.choice(['leo', 'virgo', 'aries'])}"
+        elif jobs:
+            content = f"What's the latest on {rng.choice(jobs)['jobNumber']}?"
+        else:
+            content = "What's due this week?"
+        asks.append({
+            'content': content,
+            'jobs': jobs,
+            'senderName': rng.choice(OWNERS),
+            'sessionId': f"bench-{seed}-{i % 20}",
+            'accessLevel': rng.choice(['Full', 'Client WIP']),
+            'history': [],
+        })
+    return asks
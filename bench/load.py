@@ -0,0 +1,212 @@
+"""
+Bench - Load test
+Drives /traffic and /hub at a fixed concurrency against the stand-ins and
+reports latency percentiles and throughput per endpoint.
+
+    python -m bench.load --server gunicorn --workers 4 --concurrency 16 --requests 200
+    python -m bench.load --server hypercorn --endpoints traffic --claude-latency 2
+    python -m bench.load --brain-url http://localhost:8080   # brain already running
+                                                             # (with the stand-in env)
+
+The brain runs as a real server process (gunicorn, hypercorn or the Flask dev
+server) with its Airtable / Anthropic / PA / worker URLs pointed at the
+stand-ins. Stand-in call counts (including Airtable 429s) are reported too.
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import argparse
+import tempfile
+import subprocess
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import httpx
+
+from bench import fixtures, standins as standins_module
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ENDPOINTS = {
+    'traffic': '/traffic',
+    'hub': '/hub',
+}
+
+# ===================
+# BRAIN PROCESS
+# ===================
+
+def server_command(server, port, workers):
+    """Command line for the brain under test"""
+    bind = f"127.0.0.1:{port}"
+    if server == 'gunicorn':
+        return [sys.executable, '-m', 'gunicorn', 'app:app', '--bind', bind,
+                '--workers', str(workers), '--timeout', '120', '--config', 'gunicorn.conf.py']
+    if server == 'hypercorn':
+        return [sys.executable, '-m', 'hypercorn', 'asgi:app', '--bind', bind, '--workers', str(workers)]
+    if server == 'dev':
+        return [sys.executable, 'app.py']
+    raise ValueError(f"Unknown server {server}")
+
+
+def free_port():
+    import socket
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_brain(server, workers, env, log_path):
+    """Start the brain and wait for /health. Returns (process, base_url)."""
+    port = free_port()
+    log = open(log_path, 'w')
+    process = subprocess.Popen(
+        server_command(server, port, workers),
+        cwd=REPO_ROOT,
+        env=dict(os.environ, **env, PORT=str(port)),
+        stdout=log,
+        stderr=subprocess.STDOUT,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Brain exited with {process.returncode} - see {log_path}")
+        try:
+            if httpx.get(f"{base_url}/health", timeout=1.0).status_code == 200:
+                return process, base_url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.25)
+    
+    process.terminate()
+    raise RuntimeError(f"Brain did not become healthy - see {log_path}")
+
+
+# ===================
+# DRIVER
+# ===================
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile (q in 0..1)"""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, math.ceil(q * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(endpoint, results, wall_seconds):
+    latencies = sorted(seconds for seconds, _ in results)
+    statuses = Counter(status for _, status in results)
+    ok = sum(n for status, n in statuses.items() if isinstance(status, int) and status < 500)
+    return {
+        'endpoint': endpoint,
+        'requests': len(results),
+        'ok': ok,
+        'errors': len(results) - ok,
+        'statuses': {str(status): n for status, n in statuses.items()},
+        'p50': percentile(latencies, 0.50),
+        'p95': percentile(latencies, 0.95),
+        'p99': percentile(latencies, 0.99),
+        'mean': sum(latencies) / len(latencies) if latencies else None,
+        'throughput': len(results) / wall_seconds if wall_seconds else None,
+    }
+
+
+def drive(base_url, endpoint, bodies, concurrency):
+    """POST every body to the endpoint, `concurrency` at a time"""
+    path = ENDPOINTS[endpoint]
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    
+    with httpx.Client(base_url=base_url, timeout=300.0, limits=limits) as client:
+        def one(body):
+            start = time.perf_counter()
+            try:
+                status = client.post(path, json=body).status_code
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            return time.perf_counter() - start, status
+        
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(one, bodies))
+        wall = time.perf_counter() - start
+    
+    return summarize(endpoint, results, wall)
+
+
+def bodies_for(endpoint, base, count, body_bytes=None, seed=0):
+    if endpoint == 'traffic':
+        return fixtures.make_emails(base, count, seed=seed + 2, body_bytes=body_bytes)
+    return fixtures.make_hub_requests(base, count, seed=seed + 3)
+
+
+def print_report(summaries, counts):
+    def ms(value):
+        return f"{value * 1000:8.0f}" if value is not None else '       -'
+    
+    print()
+    print(f"{'endpoint':<10} {'reqs':>6} {'errors':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>8}")
+    for s in summaries:
+        print(f"{s['endpoint']:<10} {s['requests']:>6} {s['errors']:>6} "
+              f"{ms(s['p50'])} {ms(s['p95'])} {ms(s['p99'])} {s['throughput']:8.2f}")
+    print()
+    for name, calls in counts.items():
+        if calls:
+            print(f"{name:<10} " + ', '.join(f"{k}={v}" for k, v in sorted(calls.items())))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Load-test the brain against local stand-ins')
+    parser.add_argument('--server', choices=['gunicorn', 'hypercorn', 'dev'], default='gunicorn')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--brain-url', help='test an already running brain instead of starting one')
+    parser.add_argument('--endpoints', default='traffic,hub')
+    parser.add_argument('--requests', type=int, default=100, help='requests per endpoint')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--warmup', type=int, default=2, help='unmeasured requests per endpoint first')
+    parser.add_argument('--body-bytes', type=int, help='pad email bodies to this size')
+    parser.add_argument('--json', help='also write the results here')
+    standins_module.add_arguments(parser)
+    args = parser.parse_args(argv)
+    
+    base, standins = standins_module.from_arguments(args)
+    standins.start()
+    
+    process = None
+    try:
+        if args.brain_url:
+            base_url = args.brain_url.rstrip('/')
+        else:
+            log_path = os.path.join(tempfile.gettempdir(), 'dot-bench-brain.log')
+            process, base_url = start_brain(args.server, args.workers, standins.env(), log_path)
+            print(f"[bench] Brain up ({args.server} x{args.workers}) at {base_url}, log: {log_path}")
+        
+        summaries = []
+        for endpoint in [e.strip() for e in args.endpoints.split(',') if e.strip()]:
+            if args.warmup:
+                drive(base_url, endpoint, bodies_for(endpoint, base, args.warmup, seed=100), 1)
+            bodies = bodies_for(endpoint, base, args.requests, args.body_bytes)
+            print(f"[bench] {endpoint}: {len(bodies)} requests at concurrency {args.concurrency}")
+            summaries.append(drive(base_url, endpoint, bodies, args.concurrency))
+        
+        counts = standins.counts()
+        print_report(summaries, counts)
+        
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump({'args': vars(args), 'results': summaries, 'standins': counts}, f, indent=2)
+        return summaries
+        
+    finally:
+        if process:
+            process.terminate()
+            process.wait(timeout=30)
+        standins.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,364 @@
+"""
+Bench - Micro-benchmarks
+Times the pure-Python paths every request runs, over synthetic data at
+10 / 100 / 1,000 / 10,000 jobs and email bodies up to 100 KB.
+
+    python -m bench.micro                                  # everything
+    python -m bench.micro --filter hub --sizes 100,1000    # a subset
+    python -m bench.micro --save baseline.json             # record a baseline
+    python -m bench.micro --compare baseline.json          # exit 1 on regression
+
+Each case reports the best per-call time over several repeats (timeit's
+autorange picks the loop count). --compare flags any case slower than the
+baseline by more than --threshold (default 15%) and exits non-zero, so it can
+gate a change. Baselines are per machine - record and compare on the same box.
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import timeit
+import logging
+import argparse
+import contextlib
+import random
+import tempfile
+import platform
+from datetime import datetime
+
+from bench import fixtures
+
+# Modules read their keys at import time
+os.environ.setdefault('ANTHROPIC_API_KEY', 'bench')
+os.environ.setdefault('AIRTABLE_API_KEY', 'bench')
+
+import httpx
+
+import airtable
+import connect
+import decision_cache
+import hub
+import people
+import preprocess
+import reservations
+import traffic
+
+JOB_SIZES = [10, 100, 1000, 10000]
+BODY_SIZES = [1000, 10000, 100000]
+CARD_SIZES = [5]
+BATCH_SIZES = [100, 1000]
+
+# ===================
+# DATA
+# ===================
+
+_bases = {}
+
+
+def base(jobs):
+    """Synthetic base, cached per size (10k jobs takes a moment to build)"""
+    if jobs not in _bases:
+        _bases[jobs] = fixtures.make_base(jobs=jobs)
+    return _bases[jobs]
+
+
+def email(body_bytes, job=False):
+    """
+    One /traffic body of body_bytes. Without a job number by default - the
+    worst case, where every field gets scanned.
+    """
+    data = fixtures.make_emails(base(100), 1, seed=7)[0]
+    filler = "Hi Dot, can you check where we got to with the brief for next week? "
+    data['content'] = (filler * (body_bytes // len(filler) + 1))[:body_bytes]
+    if job:
+        data['content'] = 'TOW 001 ' + data['content']
+    else:
+        data['subject'] = 'Quick question'
+        data['attachmentNames'] = ['brief.pdf', 'notes.docx']
+    return data
+
+
+def hub_jobs(jobs):
+    return [fixtures.job_card(r) for r in base(jobs)['Projects']]
+
+
+def meetings(count):
+    records = fixtures.make_meetings(random.Random(5), datetime.now(), count=count)
+    return [m for m in (airtable._meeting_from_record(r) for r in records) if m]
+
+
+# ===================
+# CASES
+# ===================
+# Each case: setup(size) -> zero-argument callable to time
+
+def case_extract_job_number(size):
+    data = email(size)
+    def run():
+        job = traffic.extract_job_number(data['subject'])
+        if not job:
+            job = traffic.extract_job_number(data['content'])
+        if not job:
+            for filename in data['attachmentNames']:
+                job = traffic.extract_job_number(filename)
+                if job:
+                    break
+        return job
+    return run
+
+
+def case_preprocess(size):
+    data = email(size)
+    data['content'] += "\n\nKind regards,\nSarah\n\nFrom: Client <c@example.com>\nSent: Monday\n\n" + data['content']
+    return lambda: preprocess.clean_email(data['content'], data['subject'])
+
+
+def case_decision_key(size):
+    data = email(size)
+    text = decision_cache.text_for(data['subject'], data['content'], data['attachmentNames'])
+    return lambda: decision_cache.key('email', data['senderEmail'], text)
+
+
+def case_format_jobs(size):
+    jobs = hub_jobs(size)
+    return lambda: hub._format_jobs_for_context(jobs)
+
+
+def case_format_meetings(size):
+    items = meetings(size)
+    return lambda: hub._format_meetings_for_context(items)
+
+
+def case_parse_jobs(size):
+    """get_all_active_jobs end to end minus the network: JSON decode + record loop"""
+    body = json.dumps({'records': base(size)['Projects']}).encode()
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, content=body))
+    bench_client = httpx.Client(transport=transport)
+    
+    def run():
+        real_client, airtable.client = airtable.client, bench_client
+        try:
+            return airtable.get_all_active_jobs()
+        finally:
+            airtable.client = real_client
+    return run
+
+
+def case_tool_result(size):
+    """A get_all_active_jobs result as it goes back to Claude"""
+    jobs = [job.to_dict() for job in airtable.decode_jobs(base(size)['Projects'])]
+    result = {'jobs': jobs, 'count': len(jobs)}
+    return lambda: traffic.tool_result_block('toolu_bench', result, 'get_all_active_jobs', {})
+
+
+def case_search_people(size):
+    """A typo'd name across the directory (size = people per client)"""
+    records = fixtures.make_people(random.Random(size), per_client=size)
+    index = people._Index([{
+        'name': r['fields']['Full name'],
+        'email': r['fields']['Email Address'],
+        'clientCode': r['fields']['Client Link'],
+    } for r in records])
+    return lambda: index.search(None, 'hamsih')
+
+
+def case_reserve(size):
+    """A job number from a block already claimed (the Airtable round trips are per block, not timed)"""
+    counter = {'next': 1}
+    
+    def handler(request):
+        if request.method == 'PATCH':
+            counter['next'] = int(json.loads(request.content)['fields']['Next Job #'])
+        record = {'id': 'recBench', 'fields': {'Clients': 'Bench', 'Next Job #': f"{counter['next']:03d}"}}
+        return httpx.Response(200, json={'records': [record], **record})
+    
+    reservations.RESERVATIONS_DB = os.path.join(tempfile.mkdtemp(prefix='dot-bench-'), 'reservations.sqlite3')
+    reservations.RESERVATION_BLOCK = 10 ** 9
+    real_client, airtable.client = airtable.client, httpx.Client(transport=httpx.MockTransport(handler))
+    try:
+        reservations.reserve('BEN')
+    finally:
+        airtable.client = real_client
+    return lambda: reservations.reserve('BEN')
+
+
+def case_parse_dates(size):
+    dates = [r['fields']['Update Due'] for r in base(size)['Projects']]
+    return lambda: [airtable._parse_date_to_iso(d) for d in dates]
+
+
+def case_job_cards(size):
+    jobs = hub_jobs(100)[:size]
+    return lambda: connect._format_job_cards(jobs)
+
+
+def email_args(email_type, jobs):
+    """compose_<email_type> arguments for a typical email of that type"""
+    common = {'sender_name': 'Sarah Lee', 'subject_line': 'Brief for next week'}
+    if email_type == 'answer':
+        return {**common, 'message': "TOW 001 is with the client - update due Friday."}
+    if email_type == 'redirect':
+        return {**common, 'client_code': 'TOW', 'client_name': 'Tower', 'redirect_to': 'tracker'}
+    if email_type == 'clarify':
+        return {**common, 'clarify_type': 'confirm', 'possible_jobs': jobs}
+    if email_type == 'confirmation':
+        return {**common, 'route': 'update', 'job_number': 'TOW 001', 'job_name': 'Brand refresh',
+                'files_url': 'https://files.example.com/TOW001'}
+    if email_type == 'failure':
+        return {**common, 'route': 'file', 'error_message': 'Could not reach Dropbox (timeout)',
+                'job_number': 'TOW 001', 'job_name': 'Brand refresh'}
+    return {**common, 'route': 'triage'}
+
+
+def case_compose(email_type):
+    """One email of a type, job cards warm in the cache (the steady state)"""
+    def setup(size):
+        args = email_args(email_type, hub_jobs(100)[:5])
+        compose = connect.COMPOSERS[email_type]
+        return lambda: compose(**args)
+    return setup
+
+
+def case_render_batch(size):
+    """A run of clarify emails, 5 of 100 jobs each, from a cold card cache"""
+    jobs = hub_jobs(100)
+    rng = random.Random(size)
+    items = [email_args('clarify', rng.sample(jobs, 5)) for _ in range(size)]
+    
+    def run():
+        connect._job_card.cache_clear()
+        return connect.render_batch('clarify', items)
+    return run
+
+
+def case_worker_payload(size):
+    import app
+    data = email(size, job=True)
+    routing = {'route': 'update', 'type': 'action', 'jobNumber': 'TOW 001', 'clientCode': 'TOW'}
+    return lambda: json.dumps(app.build_worker_payload(data, routing))
+
+
+CASES = [
+    ('traffic.extract_job_number', BODY_SIZES, case_extract_job_number),
+    ('preprocess.clean_email', BODY_SIZES, case_preprocess),
+    ('decision_cache.key', BODY_SIZES, case_decision_key),
+    ('hub._format_jobs_for_context', JOB_SIZES, case_format_jobs),
+    ('hub._format_meetings_for_context', [10, 100, 1000], case_format_meetings),
+    ('airtable.get_all_active_jobs', JOB_SIZES, case_parse_jobs),
+    ('traffic.tool_result_block', JOB_SIZES, case_tool_result),
+    ('people.search', [4, 40, 400], case_search_people),
+    ('reservations.reserve', [1], case_reserve),
+    ('airtable._parse_date_to_iso', JOB_SIZES, case_parse_dates),
+    ('connect._format_job_cards', CARD_SIZES, case_job_cards),
+    *((f'connect.compose_{email_type}', [1], case_compose(email_type)) for email_type in connect.COMPOSERS),
+    ('connect.render_batch', BATCH_SIZES, case_render_batch),
+    ('app.build_worker_payload', BODY_SIZES, case_worker_payload),
+]
+
+
+# ===================
+# RUNNER
+# ===================
+
+def measure(fn, repeat=5):
+    """Best seconds per call over `repeat` runs of an autoranged loop"""
+    timer = timeit.Timer(fn)
+    loops, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=loops)) / loops
+
+
+def run(filter_text=None, sizes=None, repeat=5, quiet=False):
+    """{"case[size]": seconds per call}"""
+    results = {}
+    for name, case_sizes, setup in CASES:
+        if filter_text and filter_text not in name:
+            continue
+        for size in case_sizes:
+            if sizes and size not in sizes and len(case_sizes) > 1:
+                continue
+            key = f"{name}[{size}]"
+            # print from setup is noise (the parse loop logs per call)
+            with _quiet():
+                fn = setup(size)
+                seconds = measure(fn, repeat=repeat)
+            results[key] = seconds
+            if not quiet:
+                print(f"{key:<45} {_format(seconds):>12}")
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Cases slower than baseline by more than threshold: [(key, before, after, ratio)]"""
+    regressions = []
+    print()
+    print(f"{'case':<45} {'baseline':>12} {'now':>12} {'change':>8}")
+    for key, seconds in results.items():
+        before = baseline.get(key)
+        if before is None:
+            print(f"{key:<45} {'-':>12} {_format(seconds):>12}")
+            continue
+        ratio = seconds / before if before else 1.0
+        flag = '  REGRESSION' if ratio > 1 + threshold else ''
+        print(f"{key:<45} {_format(before):>12} {_format(seconds):>12} {(ratio - 1) * 100:+7.1f}%{flag}")
+        if flag:
+            regressions.append((key, before, seconds, ratio))
+    return regressions
+
+
+def _format(seconds):
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:.1f} us"
+    return f"{seconds * 1e3:.2f} ms"
+
+
+@contextlib.contextmanager
+def _quiet():
+    """Silence the app's logging (warnings and errors still show) and stdout while timing"""
+    root = logging.getLogger('dot')
+    level = root.level
+    root.setLevel(logging.WARNING)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            yield
+    finally:
+        root.setLevel(level)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Micro-benchmarks for the per-request CPU paths')
+    parser.add_argument('--filter', help='only cases whose name contains this')
+    parser.add_argument('--sizes', help='comma-separated sizes to run (jobs or body bytes)')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--save', help='write results as a baseline')
+    parser.add_argument('--compare', help='baseline to compare against')
+    parser.add_argument('--threshold', type=float, default=0.15, help='allowed slowdown before failing (0.15 = 15%%)')
+    args = parser.parse_args(argv)
+    
+    sizes = {int(s) for s in args.sizes.split(',')} if args.sizes else None
+    results = run(args.filter, sizes, args.repeat, quiet=bool(args.compare))
+    
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({
+                'recordedAt': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'python': platform.python_version(),
+                'machine': platform.node(),
+                'results': results,
+            }, f, indent=2)
+        print(f"[bench] Baseline saved to {args.save}")
+    
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n[bench] {len(regressions)} case(s) regressed more than {args.threshold:.0%}")
+            return 1
+        print(f"\n[bench] No regressions beyond {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,672 @@
+"""
+Bench - Stand-ins
+Local HTTP servers for everything the brain talks to, so it can be load-tested
+without paid APIs or real mailboxes:
+
+- AirtableEmulator: REST API over fixture tables (filterByFormula, paging,
+  create, update) with Airtable's 5 requests/second/base limit
+- FakeAnthropic: Messages API returning scripted tool_use + decision
+  sequences, or recorded responses replayed from a JSONL file
+- FakePA: PA Postman and Teamsbot endpoints
+- FakeWorkers: dot-workers (/update, /setup, /file) and the horoscope service
+
+Every stand-in takes latency/jitter (seconds) to inject network + service time.
+`env()` gives the variables that point the brain at them.
+
+Run standalone (then start the brain with the printed env):
+    python -m bench.standins --jobs 500
+"""
+
+import re
+import json
+import time
+import random
+import secrets
+import argparse
+import itertools
+import threading
+from collections import Counter
+from functools import lru_cache
+from datetime import datetime, timezone
+from urllib.parse import urlparse, parse_qs, unquote
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from bench import fixtures
+
+# ===================
+# SERVER PLUMBING
+# ===================
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+
+class StandIn:
+    """
+    One stand-in server on a background thread.
+    Subclasses implement handle(method, path, query, body) -> (status, payload).
+    """
+    
+    name = 'stand-in'
+    
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, jitter=0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.calls = Counter()
+        self._lock = threading.Lock()
+        self.server = _Server((host, port), self._handler_class())
+        self.thread = threading.Thread(target=self.server.serve_forever, name=self.name, daemon=True)
+    
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+    
+    def start(self):
+        self.thread.start()
+        return self
+    
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+    
+    def count(self, key, n=1):
+        with self._lock:
+            self.calls[key] += n
+    
+    def delay(self, extra=0.0):
+        seconds = self.latency + extra
+        if self.jitter:
+            seconds += random.uniform(-self.jitter, self.jitter)
+        if seconds > 0:
+            time.sleep(seconds)
+    
+    def handle(self, method, path, query, body):
+        raise NotImplementedError
+    
+    def _handler_class(self):
+        standin = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            
+            def log_message(self, *args):
+                pass
+            
+            def _dispatch(self):
+                parsed = urlparse(self.path)
+                length = int(self.headers.get('Content-Length') or 0)
+                raw = self.rfile.read(length) if length else b''
+                try:
+                    body = json.loads(raw) if raw else None
+                except ValueError:
+                    body = None
+                
+                try:
+                    status, payload = standin.handle(self.command, parsed.path, parse_qs(parsed.query), body)
+                except Exception as e:
+                    status, payload = 500, {'error': str(e)}
+                
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+            
+            do_GET = do_POST = do_PATCH = do_DELETE = _dispatch
+        
+        return Handler
+
+
+# ===================
+# AIRTABLE FORMULAS
+# ===================
+
+_FORMULA_TOKEN = re.compile(
+    r"\s*(?:(\{[^}]*\})|('(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\")|(\d+(?:\.\d+)?)|([A-Za-z_]\w*)|(!=|<=|>=|=|<|>|&|\(|\)|,))"
+)
+
+
+def _text(value):
+    """Airtable's string view of a cell (linked records / lookups join with ', ')"""
+    if value is None:
+        return ''
+    if isinstance(value, list):
+        return ', '.join(_text(v) for v in value)
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    return str(value)
+
+
+def _truthy(value):
+    if isinstance(value, str):
+        return value != ''
+    if isinstance(value, list):
+        return len(value) > 0
+    return bool(value)
+
+
+def _compare(op, a, b):
+    if isinstance(a, bool) or isinstance(b, bool):
+        a, b = _truthy(a), _truthy(b)
+    elif isinstance(a, (int, float)) or isinstance(b, (int, float)):
+        try:
+            a, b = float(a or 0), float(b or 0)
+        except (TypeError, ValueError):
+            a, b = _text(a), _text(b)
+    else:
+        a, b = _text(a), _text(b)
+    return {
+        '=': a == b, '!=': a != b,
+        '<': a < b, '>': a > b, '<=': a <= b, '>=': a >= b,
+    }[op]
+
+
+_FUNCTIONS = {
+    'AND': lambda *args: all(_truthy(a) for a in args),
+    'OR': lambda *args: any(_truthy(a) for a in args),
+    'NOT': lambda a: not _truthy(a),
+    'TRUE': lambda: True,
+    'FALSE': lambda: False,
+    'BLANK': lambda: None,
+    'FIND': lambda needle, haystack, start=1: _text(haystack).find(_text(needle), max(int(start) - 1, 0)) + 1,
+    'LOWER': lambda a: _text(a).lower(),
+    'UPPER': lambda a: _text(a).upper(),
+    'LEN': lambda a: len(_text(a)),
+}
+
+
+@lru_cache(maxsize=1024)
+def compile_formula(formula):
+    """
+    Compile the filterByFormula subset the brain uses ({Field}, 'text', numbers,
+    = != < > <= >=, &, AND/OR/NOT/FIND/TRUE/FALSE...) into fn(fields) -> value.
+    """
+    tokens = []
+    pos, formula = 0, formula.strip()
+    while pos < len(formula):
+        match = _FORMULA_TOKEN.match(formula, pos)
+        if not match or match.end() == pos:
+            raise ValueError(f"Invalid formula at {pos}: {formula!r}")
+        field, string, number, name, op = match.groups()
+        if field is not None:
+            tokens.append(('field', field[1:-1]))
+        elif string is not None:
+            tokens.append(('value', re.sub(r'\\(.)', r'\1', string[1:-1])))
+        elif number is not None:
+            tokens.append(('value', float(number) if '.' in number else int(number)))
+        elif name is not None:
+            tokens.append(('name', name.upper()))
+        else:
+            tokens.append(('op', op))
+        pos = match.end()
+    
+    position = [0]
+    
+    def peek():
+        return tokens[position[0]] if position[0] < len(tokens) else (None, None)
+    
+    def take(expected=None):
+        token = peek()
+        if token[0] is None or (expected and token != ('op', expected)):
+            raise ValueError(f"Invalid formula, expected {expected or 'more'}: {formula!r}")
+        position[0] += 1
+        return token
+    
+    def expression():
+        left = concat()
+        kind, value = peek()
+        if kind == 'op' and value in ('=', '!=', '<', '>', '<=', '>='):
+            take()
+            right = concat()
+            return lambda fields, l=left, r=right, op=value: _compare(op, l(fields), r(fields))
+        return left
+    
+    def concat():
+        parts = [primary()]
+        while peek() == ('op', '&'):
+            take()
+            parts.append(primary())
+        if len(parts) == 1:
+            return parts[0]
+        return lambda fields: ''.join(_text(p(fields)) for p in parts)
+    
+    def primary():
+        kind, value = take()
+        if kind == 'field':
+            return lambda fields: fields.get(value)
+        if kind == 'value':
+            return lambda fields: value
+        if (kind, value) == ('op', '('):
+            inner = expression()
+            take(')')
+            return inner
+        if kind == 'name':
+            if value not in _FUNCTIONS:
+                raise ValueError(f"Unsupported formula function {value}")
+            take('(')
+            args = []
+            if peek() != ('op', ')'):
+                args.append(expression())
+                while peek() == ('op', ','):
+                    take()
+                    args.append(expression())
+            take(')')
+            fn = _FUNCTIONS[value]
+            return lambda fields: fn(*[a(fields) for a in args])
+        raise ValueError(f"Invalid formula token {value!r}: {formula!r}")
+    
+    compiled = expression()
+    if position[0] != len(tokens):
+        raise ValueError(f"Invalid formula, trailing tokens: {formula!r}")
+    return compiled
+
+
+# ===================
+# AIRTABLE
+# ===================
+
+class _TokenBucket:
+    """Airtable allows 5 requests per second per base"""
+    
+    def __init__(self, rate):
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def take(self):
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+class AirtableEmulator(StandIn):
+    """Airtable REST API over fixture tables: /v0/<base>/<table>[/<record>]"""
+    
+    name = 'airtable'
+    PAGE_SIZE = 100
+    
+    def __init__(self, base, rate_limit=5.0, **kwargs):
+        super().__init__(**kwargs)
+        created = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.000Z')
+        self.tables = {
+            table: [dict(record, createdTime=record.get('createdTime', created)) for record in records]
+            for table, records in base.items()
+        }
+        self.bucket = _TokenBucket(rate_limit) if rate_limit else None
+    
+    def handle(self, method, path, query, body):
+        parts = [unquote(p) for p in path.split('/') if p]
+        if len(parts) < 3 or parts[0] != 'v0':
+            return 404, {'error': 'NOT_FOUND'}
+        table = parts[2]
+        record_id = parts[3] if len(parts) > 3 else None
+        
+        self.delay()
+        if self.bucket and not self.bucket.take():
+            self.count('429')
+            return 429, {'errors': [{'error': 'RATE_LIMIT_REACHED',
+                                     'message': 'Rate limit exceeded. Please try again later'}]}
+        self.count(f"{method} {table}")
+        
+        if table not in self.tables:
+            return 404, {'error': {'type': 'TABLE_NOT_FOUND', 'message': f"Could not find table {table}"}}
+        if method == 'GET':
+            return self._list(table, query)
+        if method == 'POST':
+            return self._create(table, body or {})
+        if method == 'PATCH' and record_id:
+            return self._update(table, record_id, body or {})
+        return 405, {'error': 'METHOD_NOT_ALLOWED'}
+    
+    def _list(self, table, query):
+        formula = (query.get('filterByFormula') or [None])[0]
+        try:
+            match = compile_formula(formula) if formula else None
+        except ValueError as e:
+            return 422, {'error': {'type': 'INVALID_FILTER_BY_FORMULA', 'message': str(e)}}
+        
+        with self._lock:
+            records = list(self.tables[table])
+        if match:
+            records = [r for r in records if _truthy(match(r['fields']))]
+        
+        max_records = int((query.get('maxRecords') or [0])[0])
+        if max_records:
+            records = records[:max_records]
+        
+        page_size = min(int((query.get('pageSize') or [self.PAGE_SIZE])[0]), self.PAGE_SIZE)
+        offset = int((query.get('offset') or [0])[0])
+        page = records[offset:offset + page_size]
+        
+        result = {'records': page}
+        if offset + page_size < len(records):
+            result['offset'] = str(offset + page_size)
+        return 200, result
+    
+    def _new_record(self, fields):
+        return {
+            'id': 'rec' + secrets.token_hex(7),
+            'createdTime': datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+            'fields': dict(fields),
+        }
+    
+    def _create(self, table, body):
+        if 'records' in body:
+            records = [self._new_record(r.get('fields', {})) for r in body['records'][:10]]
+            with self._lock:
+                self.tables[table].extend(records)
+            return 200, {'records': records}
+        
+        record = self._new_record(body.get('fields', {}))
+        with self._lock:
+            self.tables[table].append(record)
+        return 200, record
+    
+    def _update(self, table, record_id, body):
+        with self._lock:
+            for record in self.tables[table]:
+                if record['id'] == record_id:
+                    record['fields'].update(body.get('fields', {}))
+                    return 200, record
+        return 404, {'error': 'NOT_FOUND'}
+
+
+# ===================
+# ANTHROPIC
+# ===================
+
+JOB_PATTERN = re.compile(r'\b([A-Z]{3}) ?(\d{3})\b')
+
+
+def _message_text(message):
+    content = message.get('content', '')
+    if isinstance(content, str):
+        return content
+    return '\n'.join(block.get('text', '') for block in content if isinstance(block, dict))
+
+
+def _has_tool_result(message):
+    content = message.get('content')
+    return isinstance(content, list) and any(
+        isinstance(block, dict) and block.get('type') == 'tool_result' for block in content
+    )
+
+
+def _line_after(text, label):
+    for line in text.split('\n'):
+        if line.startswith(label):
+            return line[len(label):].strip()
+    return ''
+
+
+class FakeAnthropic(StandIn):
+    """
+    Anthropic Messages API (POST /v1/messages).
+
+    Scripted (default) - behaves like Claude does on the bench fixtures:
+      traffic: job named -> get_job_by_number, client named -> get_active_jobs,
+               then an action / answer / clarify decision
+      hub:     horoscope questions -> get_horoscope, everything else an answer
+    Recorded - replays Anthropic responses from a JSONL file, in order, cycling.
+
+    per_token adds generation time per output token on top of latency.
+    """
+    
+    name = 'anthropic'
+    
+    def __init__(self, recorded=None, per_token=0.0, clients=None, **kwargs):
+        super().__init__(**kwargs)
+        self.per_token = per_token
+        self.clients = clients or fixtures.CLIENTS
+        self._replay = None
+        if recorded:
+            with open(recorded) as f:
+                responses = [json.loads(line) for line in f if line.strip()]
+            self._replay = itertools.cycle(responses)
+            self._replay_lock = threading.Lock()
+    
+    def handle(self, method, path, query, body):
+        if method != 'POST' or not path.endswith('/v1/messages'):
+            return 404, {'type': 'error', 'error': {'type': 'not_found_error', 'message': path}}
+        body = body or {}
+        
+        if self._replay:
+            with self._replay_lock:
+                message = dict(next(self._replay))
+            message['id'] = 'msg_' + secrets.token_hex(12)
+        else:
+            content, stop_reason = self.script(body)
+            message = {
+                'id': 'msg_' + secrets.token_hex(12),
+                'type': 'message',
+                'role': 'assistant',
+                'model': body.get('model', 'claude-bench'),
+                'content': content,
+                'stop_reason': stop_reason,
+                'stop_sequence': None,
+                'usage': {
+                    'input_tokens': len(json.dumps(body)) // 4,
+                    'output_tokens': max(1, len(json.dumps(content)) // 4),
+                },
+            }
+        
+        self.count(f"{message['stop_reason']}")
+        self.delay(self.per_token * message.get('usage', {}).get('output_tokens', 0))
+        return 200, message
+    
+    def script(self, body):
+        tools = {t.get('name') for t in body.get('tools') or []}
+        messages = body.get('messages') or []
+        last = messages[-1] if messages else {}
+        after_tool = _has_tool_result(last)
+        
+        if 'get_horoscope' in tools:
+            return self._script_hub(messages, after_tool)
+        return self._script_traffic(messages, after_tool, tools)
+    
+    def _tool_use(self, name, tool_input):
+        block = {'type': 'tool_use', 'id': 'toolu_' + secrets.token_hex(12), 'name': name, 'input': tool_input}
+        return [block], 'tool_use'
+    
+    def _answer(self, decision):
+        return [{'type': 'text', 'text': json.dumps(decision)}], 'end_turn'
+    
+    def _script_hub(self, messages, after_tool):
+        question = ''
+        for message in reversed(messages):
+            text = _message_text(message)
+            if 'Question:' in text:
+                question = _line_after(text, 'Question:')
+                break
+        
+        if not after_tool and 'horoscope' in question.lower():
+            sign = question.rstrip('?!. ').split()[-1].lower()
+            return self._tool_use('get_horoscope', {'sign': sign})
+        
+        job = JOB_PATTERN.search(question)
+        job_number = f"{job.group(1)} {job.group(2)}" if job else None
+        return self._answer({
+            'type': 'answer',
+            'message': f"Here's the latest on {job_number}." if job_number else "Here's what I found.",
+            'jobs': [job_number] if job_number else None,
+            'nextPrompt': None,
+        })
+    
+    def _script_traffic(self, messages, after_tool, tools):
+        request_text = ''
+        for message in reversed(messages):
+            text = _message_text(message)
+            if text.startswith('Source:'):
+                request_text = text
+                break
+        
+        job_number = _line_after(request_text, 'Job number found in text:')
+        job_number = None if job_number in ('', 'None') else job_number
+        client_code = job_number.split()[0] if job_number else None
+        if not client_code:
+            lowered = request_text.lower()
+            for code, name in self.clients:
+                if name.lower() in lowered:
+                    client_code = code
+                    break
+        
+        if tools and not after_tool:
+            if job_number:
+                return self._tool_use('get_job_by_number', {'job_number': job_number})
+            if client_code:
+                return self._tool_use('get_active_jobs', {'client_code': client_code})
+        
+        if job_number:
+            route = 'file' if 'Has Attachments: True' in request_text else 'update'
+            return self._answer({
+                'type': 'action', 'route': route, 'confidence': 'high',
+                'jobNumber': job_number, 'clientCode': client_code,
+                'message': f"On it - {route} for {job_number}.",
+                'reason': 'Job number in email',
+            })
+        if client_code:
+            return self._answer({
+                'type': 'answer', 'route': 'wip', 'confidence': 'medium',
+                'clientCode': client_code, 'jobNumber': None,
+                'message': f"Here are the active {client_code} jobs.",
+                'reason': 'Client named, no job',
+            })
+        return self._answer({
+            'type': 'clarify', 'clarifyType': 'no_idea', 'confidence': 'low',
+            'clientCode': None, 'jobNumber': None,
+            'message': "Which job is this about?",
+            'reason': 'No client or job',
+        })
+
+
+# ===================
+# POWER AUTOMATE + WORKERS
+# ===================
+
+class FakePA(StandIn):
+    """PA Postman (/postman) and PA Teamsbot (/teamsbot)"""
+    
+    name = 'pa'
+    
+    def handle(self, method, path, query, body):
+        if method != 'POST' or path not in ('/postman', '/teamsbot'):
+            return 404, {'error': 'NOT_FOUND'}
+        self.count(path.strip('/'))
+        self.delay()
+        return 202, {}
+
+
+class FakeWorkers(StandIn):
+    """dot-workers routes plus the horoscope service"""
+    
+    name = 'workers'
+    
+    def handle(self, method, path, query, body):
+        route = path.strip('/')
+        if method != 'POST':
+            return 404, {'error': 'NOT_FOUND'}
+        self.count(route)
+        self.delay()
+        if route == 'horoscope':
+            return 200, {'message': 'The stars say ship it.'}
+        if route in ('update', 'setup', 'file', 'feedback'):
+            return 200, {'success': True, 'route': route, 'jobNumber': (body or {}).get('jobNumber')}
+        return 404, {'error': f"No worker {route}"}
+
+
+# ===================
+# ALL TOGETHER
+# ===================
+
+class StandIns:
+    """The full set, started together"""
+    
+    def __init__(self, base, airtable_rps=5.0, airtable_latency=0.15, claude_latency=1.0,
+                 claude_per_token=0.0, pa_latency=0.3, worker_latency=0.5, jitter=0.0, recorded=None):
+        self.airtable = AirtableEmulator(base, rate_limit=airtable_rps, latency=airtable_latency, jitter=jitter)
+        self.anthropic = FakeAnthropic(recorded=recorded, per_token=claude_per_token,
+                                       latency=claude_latency, jitter=jitter)
+        self.pa = FakePA(latency=pa_latency, jitter=jitter)
+        self.workers = FakeWorkers(latency=worker_latency, jitter=jitter)
+    
+    def all(self):
+        return [self.airtable, self.anthropic, self.pa, self.workers]
+    
+    def start(self):
+        for standin in self.all():
+            standin.start()
+        return self
+    
+    def stop(self):
+        for standin in self.all():
+            standin.stop()
+    
+    def env(self):
+        """Environment that points the brain at the stand-ins"""
+        return {
+            'AIRTABLE_API_URL': f"{self.airtable.url}/v0",
+            'AIRTABLE_API_KEY': 'bench',
+            'AIRTABLE_BASE_ID': 'appBench',
+            'ANTHROPIC_BASE_URL': self.anthropic.url,
+            'ANTHROPIC_API_KEY': 'bench',
+            'PA_POSTMAN_URL': f"{self.pa.url}/postman",
+            'PA_TEAMSBOT_URL': f"{self.pa.url}/teamsbot",
+            'WORKER_BASE_URL': self.workers.url,
+            'HOROSCOPE_SERVICE_URL': self.workers.url,
+        }
+    
+    def counts(self):
+        return {standin.name: dict(standin.calls) for standin in self.all()}
+
+
+def add_arguments(parser):
+    """Stand-in options shared by the bench CLIs"""
+    parser.add_argument('--jobs', type=int, default=200, help='synthetic Projects records')
+    parser.add_argument('--fixtures', help='serve a base dumped with fixtures.dump_base instead')
+    parser.add_argument('--airtable-rps', type=float, default=5.0, help='Airtable rate limit (0 = off)')
+    parser.add_argument('--airtable-latency', type=float, default=0.15)
+    parser.add_argument('--claude-latency', type=float, default=1.0)
+    parser.add_argument('--claude-per-token', type=float, default=0.0)
+    parser.add_argument('--recorded-claude', help='JSONL of Anthropic responses to replay')
+    parser.add_argument('--pa-latency', type=float, default=0.3)
+    parser.add_argument('--worker-latency', type=float, default=0.5)
+    parser.add_argument('--jitter', type=float, default=0.0)
+
+
+def from_arguments(args):
+    base = fixtures.load_base(args.fixtures) if args.fixtures else fixtures.make_base(jobs=args.jobs)
+    standins = StandIns(
+        base,
+        airtable_rps=args.airtable_rps,
+        airtable_latency=args.airtable_latency,
+        claude_latency=args.claude_latency,
+        claude_per_token=args.claude_per_token,
+        pa_latency=args.pa_latency,
+        worker_latency=args.worker_latency,
+        jitter=args.jitter,
+        recorded=args.recorded_claude,
+    )
+    return base, standins
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run the bench stand-ins')
+    add_arguments(parser)
+    base, standins = from_arguments(parser.parse_args())
+    standins.start()
+    for key, value in standins.env().items():
+        print(f"export {key}={value}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        standins.stop()
@@ -0,0 +1,197 @@
+"""
+Dot Traffic 2.0 - Circuit Breakers
+One breaker per dependency (Anthropic, Airtable, workers), so a slow or
+failing service is noticed after a handful of calls and then skipped straight
+to a fallback, instead of every request waiting out its full timeout while
+gunicorn workers pile up.
+
+HOW A BREAKER DECIDES:
+- Every call is recorded in a rolling window (BREAKER_WINDOW seconds).
+  A call fails if it raises, returns a server error / 429, or takes longer
+  than the dependency's slow threshold. Workers have none: setup is allowed
+  its full WORKER_TIMEOUT, so only errors and timeouts count against them.
+- closed:    calls go through. Once the window holds BREAKER_MIN_CALLS calls and
+             at least BREAKER_FAILURE_RATIO of them failed, the breaker opens.
+- open:      calls are refused at once (BreakerOpen) for BREAKER_COOLDOWN seconds.
+- half_open: after the cooldown, one trial call goes through. Success closes
+             the breaker; failure opens it for another cooldown.
+
+FALLBACKS (where the breakers are used):
+- anthropic: traffic.fallback_routing - a rule-based route for emails naming
+             one job that open with a file/update instruction, otherwise a
+             fast error
+- airtable:  airtable._get_jobs serves the last good job list
+- workers:   app.call_worker queues the call and retries it in the background
+
+State is per process (each gunicorn worker learns on its own) and shows on /health.
+"""
+
+import os
+import time
+import threading
+import contextlib
+from collections import deque
+
+import metrics
+import logs
+
+# ===================
+# CONFIG
+# ===================
+
+BREAKER_WINDOW = float(os.environ.get('BREAKER_WINDOW', '60'))
+BREAKER_MIN_CALLS = int(os.environ.get('BREAKER_MIN_CALLS', '5'))
+BREAKER_FAILURE_RATIO = float(os.environ.get('BREAKER_FAILURE_RATIO', '0.5'))
+BREAKER_COOLDOWN = float(os.environ.get('BREAKER_COOLDOWN', '30'))
+
+# A call slower than this counts as a failure (seconds)
+ANTHROPIC_SLOW_SECONDS = float(os.environ.get('ANTHROPIC_SLOW_SECONDS', '30'))
+AIRTABLE_SLOW_SECONDS = float(os.environ.get('AIRTABLE_SLOW_SECONDS', '5'))
+
+
+class BreakerOpen(Exception):
+    """A call refused because its dependency's breaker is open"""
+    
+    def __init__(self, name, retry_in=None):
+        self.name = name
+        self.retry_in = retry_in
+        message = f"{name} circuit open"
+        if retry_in is not None:
+            message += f" (retry in {retry_in:.0f}s)"
+        super().__init__(message)
+
+
+def server_fault(error):
+    """Whether an exception means the dependency is unwell (not a bad request of ours)"""
+    status = getattr(error, 'status_code', None)
+    return status is None or status >= 500 or status == 429
+
+
+logger = logs.get('breaker')
+
+# ===================
+# BREAKER
+# ===================
+
+class Breaker:
+    """Rolling-window circuit breaker for one dependency"""
+    
+    def __init__(self, name, slow_seconds=None, window=None, min_calls=None, failure_ratio=None, cooldown=None):
+        self.name = name
+        self.slow_seconds = slow_seconds
+        self.window = BREAKER_WINDOW if window is None else window
+        self.min_calls = BREAKER_MIN_CALLS if min_calls is None else min_calls
+        self.failure_ratio = BREAKER_FAILURE_RATIO if failure_ratio is None else failure_ratio
+        self.cooldown = BREAKER_COOLDOWN if cooldown is None else cooldown
+        
+        self.state = 'closed'
+        self.opened_at = None
+        self.calls = deque()        # (time, seconds, failed)
+        self.probing = False
+        self._lock = threading.Lock()
+    
+    def _prune(self, now):
+        while self.calls and now - self.calls[0][0] > self.window:
+            self.calls.popleft()
+    
+    def _move(self, state, now):
+        self.state = state
+        self.opened_at = now if state == 'open' else self.opened_at
+        if state == 'closed':
+            self.calls.clear()
+            self.opened_at = None
+        metrics.record_breaker(self.name, state)
+        logger.warning('State changed', breaker=self.name, state=state)
+    
+    def allow(self):
+        """Whether a call may go ahead now (a True in half_open is the trial call)"""
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            now = time.monotonic()
+            if self.state == 'open' and now - self.opened_at >= self.cooldown:
+                self._move('half_open', now)
+            if self.state == 'half_open' and not self.probing:
+                self.probing = True
+                return True
+        metrics.record_breaker(self.name, 'rejected')
+        return False
+    
+    def retry_in(self):
+        """Seconds until an open breaker lets a trial call through"""
+        with self._lock:
+            if self.state != 'open':
+                return 0.0
+            return max(0.0, self.cooldown - (time.monotonic() - self.opened_at))
+    
+    def record(self, ok, seconds=0.0):
+        """Record one finished call (ok=False for errors; slow calls fail regardless)"""
+        failed = not ok or (self.slow_seconds is not None and seconds > self.slow_seconds)
+        now = time.monotonic()
+        with self._lock:
+            if self.state == 'half_open':
+                self.probing = False
+                self._move('open' if failed else 'closed', now)
+                return
+            if self.state == 'open':
+                return
+            
+            self.calls.append((now, seconds, failed))
+            self._prune(now)
+            failures = sum(1 for call in self.calls if call[2])
+            if len(self.calls) >= self.min_calls and failures / len(self.calls) >= self.failure_ratio:
+                self._move('open', now)
+    
+    @contextlib.contextmanager
+    def guard(self):
+        """
+        Run the block as one call: refused with BreakerOpen if the breaker is
+        open, recorded as a failure if it raises a server-side error.
+        """
+        if not self.allow():
+            raise BreakerOpen(self.name, self.retry_in())
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException as e:
+            self.record(not server_fault(e), time.perf_counter() - start)
+            raise
+        self.record(True, time.perf_counter() - start)
+    
+    def snapshot(self):
+        """State and rolling window figures, for /health"""
+        with self._lock:
+            self._prune(time.monotonic())
+            seconds = sorted(call[1] for call in self.calls)
+            failures = sum(1 for call in self.calls if call[2])
+            state = self.state
+        snapshot = {
+            'state': state,
+            'calls': len(seconds),
+            'failures': failures,
+            'p95Seconds': round(seconds[int(0.95 * (len(seconds) - 1))], 3) if seconds else None,
+        }
+        if state == 'open':
+            snapshot['retryIn'] = round(self.retry_in(), 1)
+        return snapshot
+
+
+# ===================
+# DEPENDENCIES
+# ===================
+
+anthropic = Breaker('anthropic', slow_seconds=ANTHROPIC_SLOW_SECONDS)
+airtable = Breaker('airtable', slow_seconds=AIRTABLE_SLOW_SECONDS)
+workers = Breaker('workers')  # errors and timeouts only - a slow setup is a normal one
+
+BREAKERS = {b.name: b for b in (anthropic, airtable, workers)}
+
+
+def status():
+    """{dependency: snapshot} for /health"""
+    return {name: b.snapshot() for name, b in BREAKERS.items()}
+
+
+def healthy():
+    """True when every breaker is closed"""
+    return all(b.state == 'closed' for b in BREAKERS.values())
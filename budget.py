@@ -0,0 +1,227 @@
+"""
+Dot Traffic 2.0 - Prompt Budget
+Keeps Claude's input to a predictable size, however long the session or job list.
+
+Every prompt is split into parts with a token allowance each:
+- system:  the system prompt + tool definitions (fixed, measured once)
+- message: the current question / email (email bodies are already capped by preprocess.py)
+- context: the jobs (and meetings) listed for Claude
+- history: earlier turns of the conversation
+- tools:   each tool result, and earlier rounds' results as the loop grows
+
+Whatever doesn't fit is dropped lowest-value first: the oldest history turns,
+the jobs least related to the question (with a one-line summary of what was
+left out), list items in oversized tool results, then earlier tool results.
+
+Tokens are estimated from characters (~CHARS_PER_TOKEN each). That's close
+enough for budgeting and costs nothing per request, unlike the count_tokens API.
+"""
+
+import os
+import json
+
+import metrics
+import logs
+
+# ===================
+# CONFIG
+# ===================
+
+PROMPT_TOKEN_BUDGET = int(os.environ.get('PROMPT_TOKEN_BUDGET', '24000'))
+TOOL_RESULT_TOKENS = int(os.environ.get('TOOL_RESULT_TOKENS', '4000'))
+
+# What's left after system + message: this share for context, the rest for history
+CONTEXT_SHARE = 0.7
+
+CHARS_PER_TOKEN = 4
+
+# Stands in for a tool result dropped from an earlier round
+TOOL_RESULT_DROPPED = json.dumps({'note': 'Earlier tool result removed to save space - call the tool again if you need it'})
+
+logger = logs.get('budget')
+
+# ===================
+# MEASURING
+# ===================
+
+def estimate_tokens(value):
+    """Approximate tokens in a string, or in anything JSON-serializable"""
+    if value is None:
+        return 0
+    if not isinstance(value, str):
+        value = json.dumps(value, default=str)
+    return (len(value) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _message_tokens(message):
+    return estimate_tokens(message.get('content')) + 4
+
+
+def plan(system_tokens, message_tokens, budget=None):
+    """
+    Split the budget left after the fixed parts.
+    Returns {'context': tokens, 'history': tokens}.
+    """
+    budget = PROMPT_TOKEN_BUDGET if budget is None else budget
+    free = max(0, budget - system_tokens - message_tokens)
+    context = int(free * CONTEXT_SHARE)
+    return {'context': context, 'history': free - context}
+
+
+# ===================
+# JOBS
+# ===================
+
+_STATUS_ORDER = {'In Progress': 0, 'Incoming': 1, 'On Hold': 2, 'Completed': 3, 'Archived': 4}
+
+
+def rank_jobs(jobs, job_numbers=(), text=''):
+    """
+    Indexes of jobs, most relevant first: jobs named (in job_numbers or the
+    text), then jobs for a client named, then by status and due date.
+    """
+    text = (text or '').upper()
+    job_numbers = set(job_numbers) | {job.get('jobNumber') for job in jobs if job.get('jobNumber') and job.get('jobNumber') in text}
+    words = set(text.replace(',', ' ').replace('?', ' ').split())
+    codes = {j.split()[0] for j in job_numbers if j} | (words & {job.get('clientCode') for job in jobs})
+    
+    def score(index):
+        job = jobs[index]
+        return (
+            job.get('jobNumber') not in job_numbers,
+            job.get('clientCode') not in codes,
+            _STATUS_ORDER.get(job.get('status'), 1),
+            job.get('updateDue') or '9999',
+        )
+    return sorted(range(len(jobs)), key=score)
+
+
+def jobs_summary(jobs, dropped):
+    """One line for the jobs left out of the prompt, counted by client"""
+    counts = {}
+    for index in dropped:
+        code = jobs[index].get('clientCode') or '?'
+        counts[code] = counts.get(code, 0) + 1
+    by_client = ', '.join(f"{code} x{n}" for code, n in sorted(counts.items(), key=lambda item: -item[1]))
+    return f"(+{len(dropped)} more jobs not shown: {by_client} - use the job tools for these)"
+
+
+# ===================
+# FITTING
+# ===================
+
+def fit_history(messages, max_tokens, module='traffic'):
+    """
+    Most recent history messages that fit in max_tokens (oldest dropped first).
+    Never starts on an assistant turn.
+    """
+    kept = []
+    used = 0
+    for message in reversed(messages):
+        tokens = _message_tokens(message)
+        if used + tokens > max_tokens:
+            break
+        kept.append(message)
+        used += tokens
+    kept.reverse()
+    
+    while kept and kept[0].get('role') != 'user':
+        kept.pop(0)
+    
+    if len(kept) < len(messages):
+        logger.info('History trimmed', kept=len(kept), messages=len(messages), tokens=used)
+        metrics.record_trim(module, 'history')
+    return kept
+
+
+def fit_lines(lines, max_tokens, rank=None, summarize=None, module='traffic', part='context'):
+    """
+    Join lines within max_tokens. If they don't all fit, lines are taken in
+    rank order (best first - a list of indexes) and kept in their original
+    order; summarize(dropped_indexes) gives a closing line for what's left out.
+    """
+    total = sum(estimate_tokens(line) + 1 for line in lines)
+    if total <= max_tokens:
+        return "\n".join(lines)
+    
+    order = rank if rank is not None else range(len(lines))
+    reserve = 30 if summarize else 0
+    keep = set()
+    used = 0
+    for index in order:
+        tokens = estimate_tokens(lines[index]) + 1
+        if used + tokens > max_tokens - reserve:
+            continue
+        keep.add(index)
+        used += tokens
+    
+    dropped = [i for i in range(len(lines)) if i not in keep]
+    kept_lines = [line for i, line in enumerate(lines) if i in keep]
+    if summarize and dropped:
+        kept_lines.append(summarize(dropped))
+    
+    logger.info(f"{part.capitalize()} trimmed", kept=len(keep), lines=len(lines), tokens=used, totalTokens=total)
+    metrics.record_trim(module, part)
+    return "\n".join(kept_lines)
+
+
+def fit_tool_result(result, max_tokens=None, module='traffic'):
+    """
+    A tool result cut down to max_tokens: the longest lists (jobs, people, ...)
+    are shortened first and the cut is recorded under 'truncated'.
+    """
+    max_tokens = TOOL_RESULT_TOKENS if max_tokens is None else max_tokens
+    if not max_tokens or estimate_tokens(result) <= max_tokens:
+        return result
+    if not isinstance(result, dict):
+        text = json.dumps(result, default=str)
+        metrics.record_trim(module, 'tools')
+        return {'truncatedResult': text[:max_tokens * CHARS_PER_TOKEN]}
+    
+    result = dict(result)
+    truncated = {}
+    lists = sorted((k for k, v in result.items() if isinstance(v, list) and v),
+                   key=lambda k: estimate_tokens(result[k]), reverse=True)
+    for key in lists:
+        items = result[key]
+        keep = len(items)
+        while keep > 1 and estimate_tokens(result) > max_tokens:
+            keep = keep // 2
+            result[key] = items[:keep]
+        if keep < len(items):
+            truncated[key] = {'shown': keep, 'total': len(items)}
+        if estimate_tokens(result) <= max_tokens:
+            break
+    
+    if truncated:
+        result['truncated'] = truncated
+    if estimate_tokens(result) > max_tokens:
+        text = json.dumps(result, default=str)
+        result = {'truncatedResult': text[:max_tokens * CHARS_PER_TOKEN]}
+    
+    logger.info('Tool result trimmed', tokens=estimate_tokens(result), truncated=truncated or 'text cut')
+    metrics.record_trim(module, 'tools')
+    return result
+
+
+def fit_tool_rounds(messages, max_tokens, module='traffic'):
+    """
+    Keep a growing tool loop within max_tokens by replacing the oldest tool
+    results (never the latest round's) with a short note. Changes messages in place.
+    """
+    used = sum(_message_tokens(m) for m in messages)
+    if used <= max_tokens:
+        return messages
+    
+    # Tool results before the latest round, oldest first
+    rounds = [m for m in messages[:-1] if isinstance(m.get('content'), list)]
+    for message in rounds:
+        for block in message['content']:
+            if used <= max_tokens:
+                break
+            if block.get('type') != 'tool_result' or block.get('content') == TOOL_RESULT_DROPPED:
+                continue
+            used -= estimate_tokens(block['content']) - estimate_tokens(TOOL_RESULT_DROPPED)
+            block['content'] = TOOL_RESULT_DROPPED
+            metrics.record_trim(module, 'tools')
+    return messages
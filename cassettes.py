@@ -0,0 +1,274 @@
+"""
+Dot Traffic 2.0 - Cassettes
+Record/replay of the Claude tool loop, so routing can be benchmarked
+deterministically (bench/corpus.py).
+
+RECORD: with CASSETTE_DIR set, every traffic.route_request writes one JSON
+cassette - the request, each Anthropic call (messages sent, response, seconds),
+each execute_tool result (seconds), and the final decision.
+Cassettes contain real email content: keep them out of git.
+
+REPLAY: inside `replaying(cassette)`, traffic.call_claude returns the recorded
+responses in order and execute_tool returns recorded results by (name, input),
+each after its recorded duration times `speed` - so timing stays realistic
+while everything around the calls (prompt building, parsing, our own code)
+runs for real.
+"""
+
+import os
+import json
+import time
+import asyncio
+import hashlib
+import inspect
+import functools
+import threading
+import contextlib
+import contextvars
+from datetime import datetime
+
+import logs
+
+# ===================
+# CONFIG
+# ===================
+
+CASSETTE_DIR = os.environ.get('CASSETTE_DIR', '')
+
+# The recording or replay for the current route_request
+_active = contextvars.ContextVar('dot_cassette', default=None)
+
+
+class CassetteMismatch(Exception):
+    """Replay asked for a Claude call or tool result the cassette doesn't have"""
+
+
+def _snapshot(value):
+    """JSON-safe deep copy (messages keep growing after the call)"""
+    return json.loads(json.dumps(value, default=str))
+
+
+def _tool_key(name, tool_input):
+    return f"{name}:{json.dumps(tool_input, sort_keys=True, default=str)}"
+
+
+logger = logs.get('cassettes')
+
+# ===================
+# RECORD
+# ===================
+
+class _Recording:
+    """Collects one route_request's Claude and tool interactions"""
+    
+    def __init__(self, request_data, active_jobs, directory):
+        self.directory = directory
+        self.started = time.perf_counter()
+        self.data = {
+            'recordedAt': datetime.now().isoformat(timespec='seconds'),
+            'request': _snapshot(request_data),
+            'activeJobs': _snapshot(active_jobs),
+            'interactions': [],
+            'routing': None,
+            'seconds': None,
+        }
+        self._lock = threading.Lock()
+    
+    def add(self, interaction):
+        with self._lock:
+            self.data['interactions'].append(interaction)
+    
+    def save(self, routing):
+        self.data['routing'] = _snapshot(routing)
+        self.data['seconds'] = round(time.perf_counter() - self.started, 4)
+        
+        request = self.data['request']
+        key = request.get('internetMessageId') or json.dumps(request, sort_keys=True)
+        name = f"{datetime.now():%Y%m%d-%H%M%S}-{hashlib.sha1(key.encode()).hexdigest()[:8]}.json"
+        path = os.path.join(self.directory, name)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(path, 'w') as f:
+                json.dump(self.data, f, indent=1, default=str)
+            logger.info('Recorded', path=path)
+        except Exception as e:
+            logger.error('Error saving cassette', error=str(e))
+
+
+def recorded(fn):
+    """
+    Decorator for route_request(request_data, ...): record a cassette per call
+    when CASSETTE_DIR is set (sync or async).
+    """
+    def start(args, kwargs):
+        if not CASSETTE_DIR or _active.get() is not None:
+            return None
+        request_data = args[0] if args else kwargs.get('request_data', {})
+        active_jobs = args[1] if len(args) > 1 else kwargs.get('active_jobs')
+        return _Recording(request_data, active_jobs, CASSETTE_DIR)
+    
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(*args, **kwargs):
+            recording = start(args, kwargs)
+            if recording is None:
+                return await fn(*args, **kwargs)
+            token = _active.set(recording)
+            try:
+                result = await fn(*args, **kwargs)
+            finally:
+                _active.reset(token)
+            recording.save(result)
+            return result
+        return async_wrapper
+    
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        recording = start(args, kwargs)
+        if recording is None:
+            return fn(*args, **kwargs)
+        token = _active.set(recording)
+        try:
+            result = fn(*args, **kwargs)
+        finally:
+            _active.reset(token)
+        recording.save(result)
+        return result
+    return wrapper
+
+
+# ===================
+# REPLAY
+# ===================
+
+class _Replay:
+    """Hands out a cassette's recorded interactions"""
+    
+    def __init__(self, cassette, speed=1.0, live_tools=False):
+        self.cassette = cassette
+        self.speed = speed
+        self.live_tools = live_tools
+        self.claude = [i for i in cassette['interactions'] if i['kind'] == 'claude']
+        self.tools = {}
+        for interaction in cassette['interactions']:
+            if interaction['kind'] == 'tool':
+                self.tools.setdefault(_tool_key(interaction['name'], interaction['input']), []).append(interaction)
+        self.used = []
+        self.mismatches = []
+        self.input_chars = 0
+        self._lock = threading.Lock()
+    
+    def next_claude(self, params):
+        with self._lock:
+            index = len([i for i in self.used if i['kind'] == 'claude'])
+            if index >= len(self.claude):
+                self.mismatches.append(f"claude call {index + 1}")
+                raise CassetteMismatch(f"Cassette has only {len(self.claude)} Claude calls")
+            interaction = self.claude[index]
+            self.used.append(interaction)
+            self.input_chars += len(json.dumps(params, default=str))
+        return interaction
+    
+    def next_tool(self, name, tool_input):
+        with self._lock:
+            recorded_calls = self.tools.get(_tool_key(name, tool_input))
+            if not recorded_calls:
+                self.mismatches.append(f"tool {name}")
+                raise CassetteMismatch(f"No recorded result for {name} {tool_input}")
+            interaction = recorded_calls.pop(0)
+            self.used.append(interaction)
+        return interaction
+    
+    def seconds(self, interaction):
+        return interaction['seconds'] * self.speed
+
+
+@contextlib.contextmanager
+def replaying(cassette, speed=1.0, live_tools=False):
+    """
+    Replay a cassette for the route_request calls inside the block.
+    speed scales recorded durations (0 = no waiting); live_tools runs the real tools.
+    """
+    replay = _Replay(cassette, speed, live_tools)
+    token = _active.set(replay)
+    try:
+        yield replay
+    finally:
+        _active.reset(token)
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def _message(data):
+    """Recorded response back into an anthropic Message"""
+    from anthropic.types import Message
+    return Message.model_validate(data)
+
+
+# ===================
+# HOOKS (traffic.py / traffic_async.py)
+# ===================
+
+def _claude_interaction(call, params, response, seconds):
+    return {
+        'kind': 'claude',
+        'call': call,
+        'model': params.get('model'),
+        'messages': _snapshot(params.get('messages')),
+        'response': response.model_dump(),
+        'seconds': round(seconds, 4),
+    }
+
+
+def claude(call, params, create):
+    """Run one messages.create(**params) - recorded, replayed or passed through"""
+    active = _active.get()
+    if isinstance(active, _Replay):
+        interaction = active.next_claude(params)
+        time.sleep(active.seconds(interaction))
+        return _message(interaction['response'])
+    
+    start = time.perf_counter()
+    response = create(**params)
+    if isinstance(active, _Recording):
+        active.add(_claude_interaction(call, params, response, time.perf_counter() - start))
+    return response
+
+
+async def claude_async(call, params, create):
+    """Async twin of claude() for traffic_async"""
+    active = _active.get()
+    if isinstance(active, _Replay):
+        interaction = active.next_claude(params)
+        await asyncio.sleep(active.seconds(interaction))
+        return _message(interaction['response'])
+    
+    start = time.perf_counter()
+    response = await create(**params)
+    if isinstance(active, _Recording):
+        active.add(_claude_interaction(call, params, response, time.perf_counter() - start))
+    return response
+
+
+def tool(name, tool_input, run):
+    """Run one tool via run(name, tool_input) - recorded, replayed or passed through"""
+    active = _active.get()
+    if isinstance(active, _Replay) and not active.live_tools:
+        interaction = active.next_tool(name, tool_input)
+        time.sleep(active.seconds(interaction))
+        return interaction['result']
+    
+    start = time.perf_counter()
+    result = run(name, tool_input)
+    if isinstance(active, _Recording):
+        active.add({
+            'kind': 'tool',
+            'name': name,
+            'input': _snapshot(tool_input),
+            'result': _snapshot(result),
+            'seconds': round(time.perf_counter() - start, 4),
+        })
+    return result
@@ -10,10 +10,30 @@ CONNECT COMMUNICATES (this file)
 This module handles:
 - Sending emails via PA Postman (answers, clarifications, confirmations, failures)
 - Posting to Teams channels via PA Teamsbot
+
+Both go through the outbox (outbox.py): a send returns once the message is
+queued, and background senders deliver it with retries. Emails are keyed by
+(internetMessageId, email type), so each is sent at most once.
+
+Teams posts to the same channel within TEAMS_COALESCE_WINDOW seconds of each
+other go out as one digest (teams_digest), in the order they were posted -
+held at most TEAMS_COALESCE_MAX_DELAY seconds, TEAMS_DIGEST_MAX posts per
+digest. A burst of updates on one job is one flow run and one notification.
+TEAMS_COALESCE_WINDOW=0 posts each one on its own.
+
+Each email's HTML is one f-string, inside a wrapper made once at import (see
+TEMPLATES). Job cards are cached per job version, so the same jobs in a run
+of clarify emails are rendered once. render_batch renders many emails of one
+type.
 """
 
 import os
-import httpx
+import functools
+
+import metrics
+import tracing
+import outbox
+import logs
 
 # ===================
 # CONFIG
@@ -22,7 +42,10 @@ import httpx
 PA_POSTMAN_URL = os.environ.get('PA_POSTMAN_URL', '')
 PA_TEAMSBOT_URL = os.environ.get('PA_TEAMSBOT_URL', '')
 
-TIMEOUT = 30.0
+# Teams coalescing (seconds): hold a channel's posts this long after the latest, never longer than the max
+TEAMS_COALESCE_WINDOW = float(os.environ.get('TEAMS_COALESCE_WINDOW', '5'))
+TEAMS_COALESCE_MAX_DELAY = float(os.environ.get('TEAMS_COALESCE_MAX_DELAY', '30'))
+TEAMS_DIGEST_MAX = int(os.environ.get('TEAMS_DIGEST_MAX', '20'))
 
 # Logo for email footer (300x150 original, display at 56x28 to maintain 2:1 ratio)
 LOGO_URL = "https://raw.githubusercontent.com/MGhunch/dot-hub/main/images/ai2-logo.png"
@@ -30,6 +53,11 @@ LOGO_URL = "https://raw.githubusercontent.com/MGhunch/dot-hub/main/images/ai2-lo
 # Hub base URL
 HUB_URL = "https://dot.hunch.co.nz"
 
+# Rendered job cards kept (one per job version - see _job_card)
+JOB_CARD_CACHE = int(os.environ.get('JOB_CARD_CACHE', '1024'))
+
+logger = logs.get('connect')
+
 
 # ===================
 # HELPER FUNCTIONS
@@ -43,10 +71,216 @@ def _get_first_name(sender_name):
     return first if first else "there"
 
 
-def _email_wrapper(content):
-    """Wrap email content with consistent styling and footer"""
-    return f"""<div style="font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif; font-size: 15px; line-height: 1.6; color: #333;">
-{content}
+def postman_payload(to_email, subject, body_html, original_email=None):
+    """
+    Build the PA Postman payload.
+    
+    original_email: Optional dict with original email for trail:
+        {
+            'senderName': 'Michael',
+            'senderEmail': 'michael@hunch.co.nz',
+            'subject': 'Original subject',
+            'receivedDateTime': '2026-01-24T08:00:00Z',
+            'content': 'Original email body text'
+        }
+    """
+    payload = {
+        'to': to_email,
+        'subject': subject,
+        'body': body_html
+    }
+    
+    # Include original email for trail if provided (formatted for PA Postman)
+    if original_email:
+        payload['replyTo'] = {
+            'from': original_email.get('senderName', ''),
+            'fromEmail': original_email.get('senderEmail', ''),
+            'sent': original_email.get('receivedDateTime', ''),
+            'subject': original_email.get('subject', ''),
+            'body': original_email.get('content', '')
+        }
+    
+    # Lets PA Postman's run history be joined to our trace
+    trace_id = tracing.current_trace_id()
+    if trace_id:
+        payload['traceId'] = trace_id
+    
+    return payload
+
+
+def email_key(original_email, email_type):
+    """Idempotency key for an email: (internetMessageId, email type), or None without a message id"""
+    message_id = (original_email or {}).get('internetMessageId')
+    return f"{message_id}:{email_type}" if message_id and email_type else None
+
+
+def _send_email(to_email, subject, body_html, original_email=None, email_type=None):
+    """
+    Queue an email for PA Postman (outbox.py) - returns once it's queued.
+    
+    Args:
+        to_email: Recipient email address
+        subject: Email subject line
+        body_html: HTML body content
+        original_email: Optional dict with original email for trail (see postman_payload);
+            its internetMessageId and email_type make the idempotency key
+        email_type: 'answer', 'redirect', 'clarify', 'confirmation', 'failure', 'not_built'
+    
+    Returns dict with success status ('queued', or 'duplicate' if this email was already sent).
+    """
+    payload = postman_payload(to_email, subject, body_html, original_email)
+    
+    if not PA_POSTMAN_URL:
+        logger.error('PA_POSTMAN_URL not configured')
+        return {
+            'success': False,
+            'error': 'PA_POSTMAN_URL not configured',
+            'would_send': payload
+        }
+    
+    try:
+        return outbox.enqueue('email', PA_POSTMAN_URL, payload, tracing.headers(), email_key(original_email, email_type))
+    except Exception as e:
+        logger.error('Error queueing email', error=str(e))
+        return {
+            'success': False,
+            'error': str(e),
+            'would_send': payload
+        }
+
+
+# ===================
+# TEAMS POSTING
+# ===================
+
+def teams_payload(team_id, channel_id, message, subject=None, job_number=None, context=None):
+    """Build the PA Teamsbot payload (context is appended as a quote)"""
+    if not subject and job_number:
+        subject = f"Update: {job_number}"
+    
+    # Build full message with context if provided
+    full_message = message
+    if context:
+        # Truncate context if very long
+        context_text = context[:500] + '...' if len(context) > 500 else context
+        full_message = f"{message}\n\n---\n**Context:**\n>{context_text}"
+    
+    payload = {
+        'teamId': team_id,
+        'channelId': channel_id,
+        'subject': subject or '',
+        'message': full_message,
+        'jobNumber': job_number or ''
+    }
+    
+    trace_id = tracing.current_trace_id()
+    if trace_id:
+        payload['traceId'] = trace_id
+    
+    return payload
+
+
+def teams_digest(payloads):
+    """One Teams post for several queued to the same channel, in the order they were posted"""
+    first = payloads[0]
+    subjects = list(dict.fromkeys(p['subject'] for p in payloads if p.get('subject')))
+    job_numbers = list(dict.fromkeys(p['jobNumber'] for p in payloads if p.get('jobNumber')))
+    
+    # Same subject throughout (one job's updates): just the messages. Mixed: each under its subject.
+    if len(subjects) > 1:
+        sections = [f"**{p['subject']}**\n\n{p['message']}" if p.get('subject') else p['message'] for p in payloads]
+    else:
+        sections = [p['message'] for p in payloads]
+    
+    digest = {
+        'teamId': first['teamId'],
+        'channelId': first['channelId'],
+        'subject': subjects[0] if len(subjects) == 1 else f"{len(payloads)} updates",
+        'message': '\n\n---\n\n'.join(sections),
+        'jobNumber': ', '.join(job_numbers)
+    }
+    if first.get('traceId'):
+        digest['traceId'] = first['traceId']
+    return digest
+
+
+outbox.register_digest('teams', teams_digest, TEAMS_DIGEST_MAX)
+
+
+def queue_teams(payload):
+    """Queue a Teams post, coalescing with others to the same channel (TEAMS_COALESCE_WINDOW)"""
+    return outbox.enqueue(
+        'teams', PA_TEAMSBOT_URL, payload, tracing.headers(),
+        batch=f"{payload['teamId']}:{payload['channelId']}" if TEAMS_COALESCE_WINDOW > 0 else None,
+        window=TEAMS_COALESCE_WINDOW,
+        max_delay=TEAMS_COALESCE_MAX_DELAY
+    )
+
+
+def teams_skipped(team_id, channel_id):
+    """Result for a Teams post with missing IDs"""
+    logger.warning('Teams post skipped - missing IDs', teamId=team_id, channelId=channel_id)
+    return {
+        'success': False,
+        'error': 'Missing teamId or channelId',
+        'skipped': True
+    }
+
+
+@metrics.timed('post_to_teams')
+def post_to_teams(team_id, channel_id, message, subject=None, job_number=None, context=None):
+    """
+    Post a message to a Teams channel via PA Teamsbot (queued in the outbox,
+    coalesced with other posts to the channel - see teams_digest).
+    
+    Args:
+        team_id: The Teams team ID (from Clients table)
+        channel_id: The Teams channel ID (from Projects table)
+        message: The message to post (summary of what happened)
+        subject: Optional subject line
+        job_number: Optional job number for logging
+        context: Optional context from original email (Teams doesn't have the email trail)
+    
+    Returns:
+        dict with success status
+    """
+    if not team_id or not channel_id:
+        return teams_skipped(team_id, channel_id)
+    
+    payload = teams_payload(team_id, channel_id, message, subject, job_number, context)
+    
+    logger.info('Posting to Teams', jobNumber=job_number)
+    
+    if not PA_TEAMSBOT_URL:
+        logger.error('PA_TEAMSBOT_URL not configured')
+        return {
+            'success': False,
+            'error': 'PA_TEAMSBOT_URL not configured',
+            'would_send': payload
+        }
+    
+    try:
+        return queue_teams(payload)
+    except Exception as e:
+        logger.error('Error queueing Teams post', error=str(e))
+        return {
+            'success': False,
+            'error': str(e),
+            'would_send': payload
+        }
+
+
+# ===================
+# TEMPLATES
+# ===================
+# Each email is one f-string function. The wrapper every email sits in (with
+# the logo) is two strings made once, at import, that each email's f-string
+# starts and ends with - the body isn't built and then wrapped.
+
+_WRAPPER_TOP = """<div style="font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif; font-size: 15px; line-height: 1.6; color: #333;">
+"""
+
+_WRAPPER_BOTTOM = f"""
 
 <table cellpadding="0" cellspacing="0" border="0" width="100%" style="margin-top: 32px; border-top: 1px solid #eee; padding-top: 16px;">
   <tr>
@@ -107,30 +341,17 @@ def _failure_box(title, subtitle):
 </table>"""
 
 
-def _format_job_cards(possible_jobs):
-    """Format list of possible jobs as HTML cards with Hub links"""
-    if not possible_jobs:
-        return "<p><em>No active jobs found</em></p>"
-    
-    cards = []
-    for job in possible_jobs[:5]:  # Max 5 jobs
-        job_number = job.get('jobNumber', '')
-        job_name = job.get('jobName', '')
-        stage = job.get('stage', '')
-        update_due = job.get('updateDue', 'TBC')
-        with_client = job.get('withClient', False)
-        
-        # Build Hub link
-        hub_link = f"{HUB_URL}/?job={job_number.replace(' ', '')}&action=edit"
-        
-        # Status badge
-        status_text = "With client" if with_client else stage
-        
-        card = f"""
+@functools.lru_cache(maxsize=JOB_CARD_CACHE)
+def _job_card(job_number, job_name, status_text, update_due):
+    """
+    One job card. Keyed on the fields it shows - a job's version, as far as
+    the card goes - so a job is rendered once until one of them changes.
+    """
+    return f"""
 <table cellpadding="0" cellspacing="0" border="0" width="100%" style="margin-bottom:12px;">
   <tr>
     <td style="background:#f5f5f5; border-radius:8px; padding:16px; border-left:4px solid #ED1C24;">
-      <a href="{hub_link}" style="text-decoration:none; color:inherit; display:block;">
+      <a href="{HUB_URL}/?job={job_number.replace(' ', '')}&action=edit" style="text-decoration:none; color:inherit; display:block;">
         <table cellpadding="0" cellspacing="0" border="0" width="100%">
           <tr>
             <td style="font-size:16px; font-weight:600; color:#1a1a1a; padding-bottom:4px;">
@@ -148,191 +369,72 @@ def _format_job_cards(possible_jobs):
   </tr>
 </table>
 """
-        cards.append(card)
-    
-    return "\n".join(cards)
 
 
-def _send_email(to_email, subject, body_html, original_email=None):
-    """
-    Send an email via PA Postman.
-    
-    Args:
-        to_email: Recipient email address
-        subject: Email subject line
-        body_html: HTML body content
-        original_email: Optional dict with original email for trail:
-            {
-                'senderName': 'Michael',
-                'senderEmail': 'michael@hunch.co.nz',
-                'subject': 'Original subject',
-                'receivedDateTime': '2026-01-24T08:00:00Z',
-                'content': 'Original email body text'
-            }
-    
-    Returns dict with success status.
-    """
-    postman_payload = {
-        'to': to_email,
-        'subject': subject,
-        'body': body_html
-    }
-    
-    # Include original email for trail if provided (formatted for PA Postman)
-    if original_email:
-        postman_payload['replyTo'] = {
-            'from': original_email.get('senderName', ''),
-            'fromEmail': original_email.get('senderEmail', ''),
-            'sent': original_email.get('receivedDateTime', ''),
-            'subject': original_email.get('subject', ''),
-            'body': original_email.get('content', '')
-        }
+def _format_job_cards(possible_jobs):
+    """Format list of possible jobs as HTML cards with Hub links"""
+    if not possible_jobs:
+        return "<p><em>No active jobs found</em></p>"
     
-    if not PA_POSTMAN_URL:
-        print(f"[connect] PA_POSTMAN_URL not configured")
-        return {
-            'success': False,
-            'error': 'PA_POSTMAN_URL not configured',
-            'would_send': postman_payload
-        }
+    cards = []
+    for job in possible_jobs[:5]:  # Max 5 jobs
+        # Status badge
+        status_text = "With client" if job.get('withClient', False) else job.get('stage', '')
+        # As text here so the cache key is hashable whatever the job dict holds
+        cards.append(_job_card(job.get('jobNumber', ''), str(job.get('jobName', '')),
+                               str(status_text), str(job.get('updateDue', 'TBC'))))
     
-    try:
-        response = httpx.post(
-            PA_POSTMAN_URL,
-            json=postman_payload,
-            timeout=TIMEOUT,
-            headers={'Content-Type': 'application/json'}
-        )
-        
-        success = response.status_code in [200, 202]
-        print(f"[connect] Email sent: {success} (status {response.status_code})")
-        
-        return {
-            'success': success,
-            'response_code': response.status_code
-        }
-        
-    except Exception as e:
-        print(f"[connect] Error sending email: {e}")
-        return {
-            'success': False,
-            'error': str(e),
-            'would_send': postman_payload
-        }
+    return "\n".join(cards)
 
 
 # ===================
-# TEAMS POSTING
+# EMAIL: ANSWERS (from Traffic directly)
 # ===================
 
-def post_to_teams(team_id, channel_id, message, subject=None, job_number=None, context=None):
-    """
-    Post a message to a Teams channel via PA Teamsbot.
-    
-    Args:
-        team_id: The Teams team ID (from Clients table)
-        channel_id: The Teams channel ID (from Projects table)
-        message: The message to post (summary of what happened)
-        subject: Optional subject line
-        job_number: Optional job number for logging
-        context: Optional context from original email (Teams doesn't have the email trail)
-    
-    Returns:
-        dict with success status
-    """
-    if not team_id or not channel_id:
-        print(f"[connect] Teams post skipped - missing IDs (team: {team_id}, channel: {channel_id})")
-        return {
-            'success': False,
-            'error': 'Missing teamId or channelId',
-            'skipped': True
-        }
-    
-    if not subject and job_number:
-        subject = f"Update: {job_number}"
-    
-    # Build full message with context if provided
-    full_message = message
-    if context:
-        # Truncate context if very long
-        context_text = context[:500] + '...' if len(context) > 500 else context
-        full_message = f"{message}\n\n---\n**Context:**\n>{context_text}"
-    
-    teams_payload = {
-        'teamId': team_id,
-        'channelId': channel_id,
-        'subject': subject or '',
-        'message': full_message,
-        'jobNumber': job_number or ''
-    }
-    
-    print(f"[connect] Posting to Teams: {job_number or 'update'}")
+def _answer_html(first_name, message):
+    """Answer email HTML"""
+    return f"""{_WRAPPER_TOP}<p style="margin: 0 0 20px 0;">Hey {first_name},</p>
+<p style="margin: 0 0 20px 0;">{message}</p>
+<p style="margin: 0;">Dot</p>{_WRAPPER_BOTTOM}"""
+
+
+def compose_answer(message, sender_name=None, subject_line=None):
+    """Build (subject, body_html) for an answer email"""
+    first_name = _get_first_name(sender_name)
     
-    if not PA_TEAMSBOT_URL:
-        print(f"[connect] PA_TEAMSBOT_URL not configured")
-        return {
-            'success': False,
-            'error': 'PA_TEAMSBOT_URL not configured',
-            'would_send': teams_payload
-        }
+    body_html = _answer_html(first_name=first_name, message=message)
+    subject = f"Re: {subject_line}" if subject_line else "Dot"
     
-    try:
-        response = httpx.post(
-            PA_TEAMSBOT_URL,
-            json=teams_payload,
-            timeout=TIMEOUT,
-            headers={'Content-Type': 'application/json'}
-        )
-        
-        success = response.status_code in [200, 202]
-        print(f"[connect] Teams post: {success} (status {response.status_code})")
-        
-        return {
-            'success': success,
-            'response_code': response.status_code
-        }
-        
-    except Exception as e:
-        print(f"[connect] Error posting to Teams: {e}")
-        return {
-            'success': False,
-            'error': str(e),
-            'would_send': teams_payload
-        }
+    return subject, body_html
 
 
-# ===================
-# EMAIL: ANSWERS (from Traffic directly)
-# ===================
-
+@metrics.timed('send_answer')
 def send_answer(to_email, message, sender_name=None, subject_line=None, original_email=None):
     """
     Send an answer email - Dot's response to a question.
     Called directly by Traffic for simple Q&A.
     """
-    first_name = _get_first_name(sender_name)
-    
-    content = f"""<p style="margin: 0 0 20px 0;">Hey {first_name},</p>
-<p style="margin: 0 0 20px 0;">{message}</p>
-<p style="margin: 0;">Dot</p>"""
-    
-    body_html = _email_wrapper(content)
-    subject = f"Re: {subject_line}" if subject_line else "Dot"
+    subject, body_html = compose_answer(message, sender_name, subject_line)
     
-    print(f"[connect] Sending answer -> {to_email}")
-    return _send_email(to_email, subject, body_html, original_email)
+    logger.info('Sending answer', to=to_email)
+    return _send_email(to_email, subject, body_html, original_email, 'answer')
 
 
 # ===================
 # EMAIL: REDIRECTS (from Traffic directly)
 # ===================
 
-def send_redirect(to_email, sender_name=None, subject_line=None, client_code=None, 
-                  client_name=None, redirect_to='wip', message=None, original_email=None):
-    """
-    Send a redirect email - pointing user to WIP or Tracker.
-    Called directly by Traffic.
-    """
+def _redirect_html(first_name, display_message, hub_link, link_text):
+    """Redirect email HTML"""
+    return f"""{_WRAPPER_TOP}<p style="margin: 0 0 20px 0;">Hey {first_name},</p>
+<p style="margin: 0 0 20px 0;">{display_message}</p>
+<p style="margin: 0 0 24px 0;"><a href="{hub_link}" style="color: #ED1C24; text-decoration: none; font-weight: 500;">{link_text}</a></p>
+<p style="margin: 0;">Dot</p>{_WRAPPER_BOTTOM}"""
+
+
+def compose_redirect(sender_name=None, subject_line=None, client_code=None, 
+                     client_name=None, redirect_to='wip', message=None):
+    """Build (subject, body_html) for a redirect email"""
     first_name = _get_first_name(sender_name)
     redirect_to_lower = (redirect_to or 'wip').lower()
     
@@ -352,22 +454,72 @@ def send_redirect(to_email, sender_name=None, subject_line=None, client_code=Non
     
     display_message = message if message else default_message
     
-    content = f"""<p style="margin: 0 0 20px 0;">Hey {first_name},</p>
-<p style="margin: 0 0 20px 0;">{display_message}</p>
-<p style="margin: 0 0 24px 0;"><a href="{hub_link}" style="color: #ED1C24; text-decoration: none; font-weight: 500;">{link_text}</a></p>
-<p style="margin: 0;">Dot</p>"""
-    
-    body_html = _email_wrapper(content)
+    body_html = _redirect_html(first_name, display_message, hub_link, link_text)
     subject = f"Re: {subject_line}" if subject_line else "Dot"
     
-    print(f"[connect] Sending redirect ({redirect_to_lower}) -> {to_email}")
-    return _send_email(to_email, subject, body_html, original_email)
+    return subject, body_html
+
+
+@metrics.timed('send_redirect')
+def send_redirect(to_email, sender_name=None, subject_line=None, client_code=None, 
+                  client_name=None, redirect_to='wip', message=None, original_email=None):
+    """
+    Send a redirect email - pointing user to WIP or Tracker.
+    Called directly by Traffic.
+    """
+    subject, body_html = compose_redirect(sender_name, subject_line, client_code,
+                                          client_name, redirect_to, message)
+    
+    logger.info('Sending redirect', to=to_email, redirectTo=(redirect_to or 'wip').lower())
+    return _send_email(to_email, subject, body_html, original_email, 'redirect')
 
 
 # ===================
 # EMAIL: CLARIFY (from Traffic directly)
 # ===================
 
+def _clarify_confirm_html(first_name, job_cards):
+    """Clarify email HTML: which of these jobs?"""
+    return f"""{_WRAPPER_TOP}<p style="margin: 0 0 20px 0;">Hey {first_name},</p>
+<p style="margin: 0 0 20px 0;">I'm not totally sure which job you mean. Do any of these look right?</p>
+{job_cards}
+<p style="margin: 0 0 24px 0;">Just reply with a job number and I'll get on with it.</p>
+<p style="margin: 0;">Dot</p>{_WRAPPER_BOTTOM}"""
+
+
+def _clarify_job_not_found_html(first_name, job_number):
+    """Clarify email HTML: that job number doesn't exist"""
+    return f"""{_WRAPPER_TOP}<p style="margin: 0 0 20px 0;">Hey {first_name},</p>
+<p style="margin: 0 0 20px 0;">Sorry, I can't find job <strong>{job_number}</strong> right now.</p>
+<p style="margin: 0 0 24px 0;">Please check the job number and try again, or reply "Incoming" if it's a new job.</p>
+<p style="margin: 0;">Dot</p>{_WRAPPER_BOTTOM}"""
+
+
+def _clarify_no_idea_html(first_name):
+    """Clarify email HTML: no idea what the email is after"""
+    return f"""{_WRAPPER_TOP}<p style="margin: 0 0 20px 0;">Hey {first_name},</p>
+<p style="margin: 0 0 20px 0;">Throw me a bone, I have no idea what you're after.</p>
+<p style="margin: 0 0 24px 0;">Let me know which client or project... bonus points for a job number.</p>
+<p style="margin: 0;">Dot</p>{_WRAPPER_BOTTOM}"""
+
+
+def compose_clarify(clarify_type, sender_name=None, subject_line=None,
+                    job_number=None, possible_jobs=None):
+    """Build (subject, body_html) for a clarify email"""
+    first_name = _get_first_name(sender_name)
+    
+    if clarify_type == 'confirm':
+        body_html = _clarify_confirm_html(first_name, _format_job_cards(possible_jobs or []))
+    elif clarify_type == 'job_not_found':
+        body_html = _clarify_job_not_found_html(first_name, job_number)
+    else:
+        body_html = _clarify_no_idea_html(first_name)
+    subject = f"Re: {subject_line}" if subject_line else "Dot"
+    
+    return subject, body_html
+
+
+@metrics.timed('send_clarify')
 def send_clarify(to_email, clarify_type, sender_name=None, subject_line=None,
                  job_number=None, possible_jobs=None, original_email=None):
     """
@@ -379,58 +531,51 @@ def send_clarify(to_email, clarify_type, sender_name=None, subject_line=None,
     - 'no_idea' - couldn't understand at all
     - 'job_not_found' - job number doesn't exist
     """
-    first_name = _get_first_name(sender_name)
+    subject, body_html = compose_clarify(clarify_type, sender_name, subject_line,
+                                         job_number, possible_jobs)
     
-    if clarify_type == 'confirm':
-        job_cards = _format_job_cards(possible_jobs or [])
-        content = f"""<p style="margin: 0 0 20px 0;">Hey {first_name},</p>
-<p style="margin: 0 0 20px 0;">I'm not totally sure which job you mean. Do any of these look right?</p>
-{job_cards}
-<p style="margin: 0 0 24px 0;">Just reply with a job number and I'll get on with it.</p>
-<p style="margin: 0;">Dot</p>"""
-    
-    elif clarify_type == 'job_not_found':
-        content = f"""<p style="margin: 0 0 20px 0;">Hey {first_name},</p>
-<p style="margin: 0 0 20px 0;">Sorry, I can't find job <strong>{job_number}</strong> right now.</p>
-<p style="margin: 0 0 24px 0;">Please check the job number and try again, or reply "Incoming" if it's a new job.</p>
-<p style="margin: 0;">Dot</p>"""
-    
-    else:  # no_idea
-        content = f"""<p style="margin: 0 0 20px 0;">Hey {first_name},</p>
-<p style="margin: 0 0 20px 0;">Throw me a bone, I have no idea what you're after.</p>
-<p style="margin: 0 0 24px 0;">Let me know which client or project... bonus points for a job number.</p>
-<p style="margin: 0;">Dot</p>"""
-    
-    body_html = _email_wrapper(content)
-    subject = f"Re: {subject_line}" if subject_line else "Dot"
-    
-    print(f"[connect] Sending clarify ({clarify_type}) -> {to_email}")
-    return _send_email(to_email, subject, body_html, original_email)
+    logger.info('Sending clarify', to=to_email, clarifyType=clarify_type)
+    return _send_email(to_email, subject, body_html, original_email, 'clarify')
 
 
 # ===================
 # EMAIL: CONFIRMATION (from Workers after success)
 # ===================
 
-def send_confirmation(to_email, route, sender_name=None, subject_line=None,
-                      job_number=None, job_name=None, client_name=None, files_url=None,
-                      original_email=None):
-    """
-    Send a confirmation email after successful worker action.
-    Called by Workers after completing their task.
-    """
+CONFIRMATION_TEXT = {
+    'file': 'Files filed',
+    'update': 'Job updated',
+    'triage': 'Job triaged',
+    'new-job': 'New job logged',
+    'feedback': 'Feedback logged',
+    'work-to-client': 'Work sent to client logged',
+}
+
+CONFIRMATION_SUBTITLES = {
+    'file': 'Filed to job folder',
+    'update': 'Status updated',
+    'triage': 'New job created',
+    'new-job': 'Added to pipeline',
+    'feedback': 'Feedback recorded',
+    'work-to-client': 'Delivery logged',
+}
+
+def _confirmation_html(first_name, friendly_text, title, subtitle, files_link):
+    """Confirmation email HTML, with the success box"""
+    return f"""{_WRAPPER_TOP}<p style="margin: 0 0 20px 0;">Hey {first_name},</p>
+<p style="margin: 0 0 20px 0;">All sorted. {friendly_text}.</p>
+
+{_success_box(title, subtitle)}
+
+{files_link}
+<p style="margin: 0;">Dot</p>{_WRAPPER_BOTTOM}"""
+
+
+def compose_confirmation(route, sender_name=None, subject_line=None,
+                         job_number=None, job_name=None, client_name=None, files_url=None):
+    """Build (subject, body_html) for a confirmation email"""
     first_name = _get_first_name(sender_name)
     
-    # Friendly text based on route
-    friendly_text = {
-        'file': 'Files filed',
-        'update': 'Job updated',
-        'triage': 'Job triaged',
-        'new-job': 'New job logged',
-        'feedback': 'Feedback logged',
-        'work-to-client': 'Work sent to client logged',
-    }.get(route, 'Request completed')
-    
     # Build title line
     if job_number and job_name:
         box_title = f"{job_number} | {job_name}"
@@ -441,46 +586,67 @@ def send_confirmation(to_email, route, sender_name=None, subject_line=None,
     else:
         box_title = "Done"
     
-    # Build subtitle
-    subtitle = {
-        'file': 'Filed to job folder',
-        'update': 'Status updated',
-        'triage': 'New job created',
-        'new-job': 'Added to pipeline',
-        'feedback': 'Feedback recorded',
-        'work-to-client': 'Delivery logged',
-    }.get(route, 'Completed')
-    
     # Files link if available
     files_link = ''
     if files_url:
         files_link = f'<p style="margin: 0 0 24px 0;"><a href="{files_url}" style="color: #ED1C24; text-decoration: none; font-weight: 500;">See the files →</a></p>'
     
-    content = f"""<p style="margin: 0 0 20px 0;">Hey {first_name},</p>
-<p style="margin: 0 0 20px 0;">All sorted. {friendly_text}.</p>
+    body_html = _confirmation_html(
+        first_name=first_name,
+        friendly_text=CONFIRMATION_TEXT.get(route, 'Request completed'),
+        title=box_title,
+        subtitle=CONFIRMATION_SUBTITLES.get(route, 'Completed'),
+        files_link=files_link,
+    )
+    subject = f"Re: {subject_line}" if subject_line else "Dot - Done"
+    
+    return subject, body_html
 
-{_success_box(box_title, subtitle)}
 
-{files_link}
-<p style="margin: 0;">Dot</p>"""
-    
-    body_html = _email_wrapper(content)
-    subject = f"Re: {subject_line}" if subject_line else "Dot - Done"
+@metrics.timed('send_confirmation')
+def send_confirmation(to_email, route, sender_name=None, subject_line=None,
+                      job_number=None, job_name=None, client_name=None, files_url=None,
+                      original_email=None):
+    """
+    Send a confirmation email after successful worker action.
+    Called by Workers after completing their task.
+    """
+    subject, body_html = compose_confirmation(route, sender_name, subject_line,
+                                              job_number, job_name, client_name, files_url)
     
-    print(f"[connect] Sending confirmation: {friendly_text} -> {to_email}")
-    return _send_email(to_email, subject, body_html, original_email)
+    logger.info('Sending confirmation', to=to_email, route=route)
+    return _send_email(to_email, subject, body_html, original_email, 'confirmation')
 
 
 # ===================
 # EMAIL: FAILURE (from Workers or app.py on error)
 # ===================
 
-def send_failure(to_email, route, error_message, sender_name=None, subject_line=None,
-                 job_number=None, job_name=None, client_name=None, original_email=None):
-    """
-    Send a failure notification email when something goes wrong.
-    Called by Workers or app.py when an error occurs.
-    """
+FAILURE_SUBTITLES = {
+    'file': "Couldn't file attachments",
+    'update': "Couldn't update job",
+    'triage': "Couldn't create job",
+    'new-job': "Couldn't log new job",
+    'feedback': "Couldn't log feedback",
+    'work-to-client': "Couldn't log delivery",
+}
+
+def _failure_html(first_name, title, subtitle, error_message):
+    """Failure email HTML, with the failure box"""
+    return f"""{_WRAPPER_TOP}<p style="margin: 0 0 20px 0;">Hey {first_name},</p>
+<p style="margin: 0 0 20px 0;">Sorry, I got in a muddle over that one.</p>
+
+{_failure_box(title, subtitle)}
+
+<p style="margin: 0 0 8px 0; font-size: 13px; color: #666;">Here's what I told myself in Dot Language:</p>
+<pre style="background: #f5f5f5; padding: 12px; border-radius: 6px; font-size: 12px; overflow-x: auto; color: #666; margin: 0 0 24px 0; font-family: 'SF Mono', Monaco, 'Courier New', monospace;">{error_message}</pre>
+
+<p style="margin: 0;">Dot</p>{_WRAPPER_BOTTOM}"""
+
+
+def compose_failure(route, error_message, sender_name=None, subject_line=None,
+                    job_number=None, job_name=None, client_name=None):
+    """Build (subject, body_html) for a failure email"""
     first_name = _get_first_name(sender_name)
     
     # Build title line
@@ -493,57 +659,93 @@ def send_failure(to_email, route, error_message, sender_name=None, subject_line=
     else:
         box_title = "Error"
     
-    # Build subtitle based on route
-    box_subtitle = {
-        'file': "Couldn't file attachments",
-        'update': "Couldn't update job",
-        'triage': "Couldn't create job",
-        'new-job': "Couldn't log new job",
-        'feedback': "Couldn't log feedback",
-        'work-to-client': "Couldn't log delivery",
-    }.get(route, "Something went wrong")
-    
-    content = f"""<p style="margin: 0 0 20px 0;">Hey {first_name},</p>
-<p style="margin: 0 0 20px 0;">Sorry, I got in a muddle over that one.</p>
-
-{_failure_box(box_title, box_subtitle)}
+    body_html = _failure_html(
+        first_name=first_name,
+        title=box_title,
+        subtitle=FAILURE_SUBTITLES.get(route, "Something went wrong"),
+        error_message=error_message,
+    )
+    subject = f"Did not compute: {subject_line}" if subject_line else "Did not compute"
+    
+    return subject, body_html
 
-<p style="margin: 0 0 8px 0; font-size: 13px; color: #666;">Here's what I told myself in Dot Language:</p>
-<pre style="background: #f5f5f5; padding: 12px; border-radius: 6px; font-size: 12px; overflow-x: auto; color: #666; margin: 0 0 24px 0; font-family: 'SF Mono', Monaco, 'Courier New', monospace;">{error_message}</pre>
 
-<p style="margin: 0;">Dot</p>"""
-    
-    body_html = _email_wrapper(content)
-    subject = f"Did not compute: {subject_line}" if subject_line else "Did not compute"
+@metrics.timed('send_failure')
+def send_failure(to_email, route, error_message, sender_name=None, subject_line=None,
+                 job_number=None, job_name=None, client_name=None, original_email=None):
+    """
+    Send a failure notification email when something goes wrong.
+    Called by Workers or app.py when an error occurs.
+    """
+    subject, body_html = compose_failure(route, error_message, sender_name, subject_line,
+                                         job_number, job_name, client_name)
     
-    print(f"[connect] Sending failure notification: {route} failed -> {to_email}")
-    return _send_email(to_email, subject, body_html, original_email)
+    logger.info('Sending failure notification', to=to_email, route=route)
+    return _send_email(to_email, subject, body_html, original_email, 'failure')
 
 
 # ===================
 # EMAIL: NOT BUILT (route not implemented yet)
 # ===================
 
-def send_not_built(to_email, route, sender_name=None, subject_line=None, original_email=None):
-    """
-    Send a "not built yet" email when user tries an action that isn't ready.
-    """
+NOT_BUILT_MESSAGES = {
+    'triage': "Triage isn't ready yet. Watch this space.",
+    'todo': f"To-do lists coming soon. Check the WIP in the Hub for now. <a href=\"{HUB_URL}/?view=wip\" style=\"color: #ED1C24;\">Open WIP →</a>",
+    'new-job': "Not set up for new jobs yet. Better to email a human.",
+}
+
+def _not_built_html(first_name, message):
+    """Not built email HTML"""
+    return f"""{_WRAPPER_TOP}<p style="margin: 0 0 20px 0;">Hey {first_name},</p>
+<p style="margin: 0 0 20px 0;">{message}</p>
+<p style="margin: 0;">Dot</p>{_WRAPPER_BOTTOM}"""
+
+
+def compose_not_built(route, sender_name=None, subject_line=None):
+    """Build (subject, body_html) for a not built email"""
     first_name = _get_first_name(sender_name)
     
-    route_messages = {
-        'triage': "Triage isn't ready yet. Watch this space.",
-        'todo': f"To-do lists coming soon. Check the WIP in the Hub for now. <a href=\"{HUB_URL}/?view=wip\" style=\"color: #ED1C24;\">Open WIP →</a>",
-        'new-job': "Not set up for new jobs yet. Better to email a human.",
-    }
-    
-    message = route_messages.get(route, f"Sorry, we're still working on <strong>{route}</strong>. Hoping to have it up and running soon.")
-    
-    content = f"""<p style="margin: 0 0 20px 0;">Hey {first_name},</p>
-<p style="margin: 0 0 20px 0;">{message}</p>
-<p style="margin: 0;">Dot</p>"""
+    message = NOT_BUILT_MESSAGES.get(route, f"Sorry, we're still working on <strong>{route}</strong>. Hoping to have it up and running soon.")
     
-    body_html = _email_wrapper(content)
+    body_html = _not_built_html(first_name, message)
     subject = f"Re: {subject_line}" if subject_line else "Dot - Coming Soon"
     
-    print(f"[connect] Sending not_built notification: {route} -> {to_email}")
-    return _send_email(to_email, subject, body_html, original_email)
+    return subject, body_html
+
+
+@metrics.timed('send_not_built')
+def send_not_built(to_email, route, sender_name=None, subject_line=None, original_email=None):
+    """
+    Send a "not built yet" email when user tries an action that isn't ready.
+    """
+    subject, body_html = compose_not_built(route, sender_name, subject_line)
+    
+    logger.info('Sending not_built notification', to=to_email, route=route)
+    return _send_email(to_email, subject, body_html, original_email, 'not_built')
+
+
+# ===================
+# BATCH RENDERING
+# ===================
+
+COMPOSERS = {
+    'answer': compose_answer,
+    'redirect': compose_redirect,
+    'clarify': compose_clarify,
+    'confirmation': compose_confirmation,
+    'failure': compose_failure,
+    'not_built': compose_not_built,
+}
+
+
+def render_batch(email_type, items):
+    """
+    Render many emails of one type: [(subject, body_html)], in order.
+
+    email_type: a COMPOSERS key (the email types of _send_email)
+    items: compose_<email_type> keyword arguments, one dict per email
+    """
+    compose = COMPOSERS.get(email_type)
+    if compose is None:
+        raise ValueError(f"Unknown email type: {email_type}")
+    return [compose(**item) for item in items]
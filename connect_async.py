@@ -0,0 +1,135 @@
+"""
+Dot Traffic 2.0 - Connect (async)
+Async twins of the connect.py senders, for the ASGI app.
+
+Emails are composed by connect.py (same HTML, same subjects) and queued in
+the same outbox (outbox.py) - its background senders deliver them to
+PA Postman / PA Teamsbot. The SQLite write runs off the event loop.
+"""
+
+import asyncio
+
+import metrics
+import outbox
+
+import connect
+from connect import logger
+
+# ===================
+# OUTBOX
+# ===================
+
+async def close():
+    """Give queued messages a moment to go out (called when the ASGI app shuts down)"""
+    await asyncio.to_thread(outbox.drain)
+
+
+async def _send_email(to_email, subject, body_html, original_email=None, email_type=None):
+    """
+    Queue an email for PA Postman (connect._send_email).
+    Returns dict with success status.
+    """
+    return await asyncio.to_thread(connect._send_email, to_email, subject, body_html, original_email, email_type)
+
+
+# ===================
+# TEAMS POSTING
+# ===================
+
+@metrics.timed('post_to_teams')
+async def post_to_teams(team_id, channel_id, message, subject=None, job_number=None, context=None):
+    """
+    Post a message to a Teams channel via PA Teamsbot (queued in the outbox).
+    Returns dict with success status.
+    """
+    if not team_id or not channel_id:
+        return connect.teams_skipped(team_id, channel_id)
+    
+    payload = connect.teams_payload(team_id, channel_id, message, subject, job_number, context)
+    
+    logger.info('Posting to Teams', jobNumber=job_number)
+    
+    if not connect.PA_TEAMSBOT_URL:
+        logger.error('PA_TEAMSBOT_URL not configured')
+        return {
+            'success': False,
+            'error': 'PA_TEAMSBOT_URL not configured',
+            'would_send': payload
+        }
+    
+    try:
+        return await asyncio.to_thread(connect.queue_teams, payload)
+    except Exception as e:
+        logger.error('Error queueing Teams post', error=str(e))
+        return {
+            'success': False,
+            'error': str(e),
+            'would_send': payload
+        }
+
+
+# ===================
+# EMAILS
+# ===================
+
+@metrics.timed('send_answer')
+async def send_answer(to_email, message, sender_name=None, subject_line=None, original_email=None):
+    """Send an answer email - Dot's response to a question"""
+    subject, body_html = connect.compose_answer(message, sender_name, subject_line)
+    
+    logger.info('Sending answer', to=to_email)
+    return await _send_email(to_email, subject, body_html, original_email, 'answer')
+
+
+@metrics.timed('send_redirect')
+async def send_redirect(to_email, sender_name=None, subject_line=None, client_code=None,
+                        client_name=None, redirect_to='wip', message=None, original_email=None):
+    """Send a redirect email - pointing user to WIP or Tracker"""
+    subject, body_html = connect.compose_redirect(sender_name, subject_line, client_code,
+                                                  client_name, redirect_to, message)
+    
+    logger.info('Sending redirect', to=to_email, redirectTo=(redirect_to or 'wip').lower())
+    return await _send_email(to_email, subject, body_html, original_email, 'redirect')
+
+
+@metrics.timed('send_clarify')
+async def send_clarify(to_email, clarify_type, sender_name=None, subject_line=None,
+                       job_number=None, possible_jobs=None, original_email=None):
+    """Send a clarification email - asking for more info"""
+    subject, body_html = connect.compose_clarify(clarify_type, sender_name, subject_line,
+                                                 job_number, possible_jobs)
+    
+    logger.info('Sending clarify', to=to_email, clarifyType=clarify_type)
+    return await _send_email(to_email, subject, body_html, original_email, 'clarify')
+
+
+@metrics.timed('send_confirmation')
+async def send_confirmation(to_email, route, sender_name=None, subject_line=None,
+                            job_number=None, job_name=None, client_name=None, files_url=None,
+                            original_email=None):
+    """Send a confirmation email after successful worker action"""
+    subject, body_html = connect.compose_confirmation(route, sender_name, subject_line,
+                                                      job_number, job_name, client_name, files_url)
+    
+    logger.info('Sending confirmation', to=to_email, route=route)
+    return await _send_email(to_email, subject, body_html, original_email, 'confirmation')
+
+
+@metrics.timed('send_failure')
+async def send_failure(to_email, route, error_message, sender_name=None, subject_line=None,
+                       job_number=None, job_name=None, client_name=None, original_email=None):
+    """Send a failure notification email when something goes wrong"""
+    subject, body_html = connect.compose_failure(route, error_message, sender_name, subject_line,
+                                                 job_number, job_name, client_name)
+    
+    logger.info('Sending failure notification', to=to_email, route=route)
+    return await _send_email(to_email, subject, body_html, original_email, 'failure')
+
+
+@metrics.timed('send_not_built')
+async def send_not_built(to_email, route, sender_name=None, subject_line=None, original_email=None):
+    """Send a "not built yet" email when user tries an action that isn't ready"""
+    subject, body_html = connect.compose_not_built(route, sender_name, subject_line)
+    
+    logger.info('Sending not_built notification', to=to_email, route=route)
+    return await _send_email(to_email, subject, body_html, original_email, 'not_built')
@@ -0,0 +1,290 @@
+"""
+Dot Traffic 2.0 - Decision Cache
+Reuses Claude's routing decision when the same content comes round again:
+CC'd colleagues forwarding one brief, automated notifications, the Hub's
+"what's due today?" asked five times a morning.
+
+KEY (key()):
+- exact: source, sender (domain for email; the person for the Hub, where
+         "my jobs" depends on who asks), the job numbers mentioned, and the
+         jobs version
+- fuzzy: a 64-bit SimHash over word triples of the text Claude sees (subject
+         without RE:/FW:, preprocessed body, attachment names), matched within
+         DECISION_CACHE_DISTANCE bits. Entries are indexed by 4 bands of 16 bits -
+         anything within 3 bits shares a band, so a lookup only compares a few
+         candidates instead of every entry.
+
+JOBS VERSION: every job list we see (the Hub's active jobs, job tool results)
+is fingerprinted per job. A job whose fields changed, or a new job for a client
+already seen, bumps the version - as does routing an action that changes jobs
+(update, triage, new-job). Entries keyed on an older version never hit again.
+DECISION_CACHE_TTL bounds how stale a hit can be for changes we never see.
+
+WHAT'S REUSED:
+- answer, redirect: served from the cache, no Claude call
+- action:           only with DECISION_CACHE_ACTIONS=validate, and only once the
+                    caller has re-checked it (traffic.validate_cached_action)
+- clarify, confirm, errors: never cached - they depend on the conversation
+
+Hub follow-ups (a session with history) skip the cache. Per process, like
+conversation memory: each gunicorn worker has its own.
+"""
+
+import os
+import re
+import copy
+import time
+import hashlib
+import itertools
+import threading
+from collections import OrderedDict
+
+import metrics
+import logs
+
+# ===================
+# CONFIG
+# ===================
+
+DECISION_CACHE = os.environ.get('DECISION_CACHE', 'on')  # 'off' disables
+DECISION_CACHE_TTL = int(os.environ.get('DECISION_CACHE_TTL', '300'))
+DECISION_CACHE_SIZE = int(os.environ.get('DECISION_CACHE_SIZE', '1000'))
+DECISION_CACHE_DISTANCE = int(os.environ.get('DECISION_CACHE_DISTANCE', '3'))
+
+# 'validate' reuses actions after a fresh check; 'off' always asks Claude
+DECISION_CACHE_ACTIONS = os.environ.get('DECISION_CACHE_ACTIONS', 'off')
+
+CACHED_TYPES = ('answer', 'redirect')
+
+# Action routes that write to Airtable - routing one moves the jobs version on
+JOB_CHANGING_ROUTES = ('update', 'triage', 'new-job')
+
+BITS = 64
+BANDS = 4
+BAND_BITS = BITS // BANDS
+_BAND_MASK = (1 << BAND_BITS) - 1
+
+_WORD = re.compile(r"[a-z0-9']+")
+_REPLY_PREFIX = re.compile(r'^\s*(?:(?:re|fw|fwd)\s*:\s*)+', re.IGNORECASE)
+
+# Fields that change what Claude would say about a job
+_JOB_FIELDS = ('jobName', 'stage', 'status', 'withClient', 'updateDue', 'liveDate')
+
+logger = logs.get('decision_cache')
+
+# ===================
+# STATE
+# ===================
+
+_lock = threading.Lock()
+_ids = itertools.count()
+_entries = OrderedDict()    # id -> entry, oldest first
+_bands = {}                 # (exact, band, value) -> {ids}
+
+_job_versions = {}          # jobNumber -> fingerprint
+_clients_seen = set()
+_jobs_version = 0
+
+
+# ===================
+# FINGERPRINTS
+# ===================
+
+def text_for(subject, content, attachment_names=()):
+    """The text a request is fingerprinted on"""
+    if isinstance(attachment_names, str):
+        attachment_names = [attachment_names]
+    subject = _REPLY_PREFIX.sub('', subject or '')
+    return f"{subject}\n{content or ''}\n{' '.join(attachment_names or [])}"
+
+
+def _features(text):
+    """Word triples (single words for very short texts)"""
+    words = _WORD.findall(text.lower())
+    if len(words) < 3:
+        return words
+    return [f"{a} {b} {c}" for a, b, c in zip(words, words[1:], words[2:])]
+
+
+def simhash(text):
+    """64-bit SimHash: near-identical texts differ in only a few bits"""
+    features = _features(text)
+    if not features:
+        return 0
+    # One 64-char bit string per feature; zip(*) walks the columns in C
+    rows = [format(int.from_bytes(hashlib.blake2b(f.encode(), digest_size=8).digest(), 'big'), '064b') for f in features]
+    half = len(rows) / 2
+    value = 0
+    for column in zip(*rows):
+        value = (value << 1) | (column.count('1') > half)
+    return value
+
+
+def _job_fingerprint(job):
+    update = job.get('updateHistory') or [(job.get('update') or '').strip().split('\n')[0]]
+    text = '\x1f'.join(str(job.get(field)) for field in _JOB_FIELDS) + '\x1f' + str(update[0])
+    return hashlib.blake2b(text.encode(), digest_size=8).digest()
+
+
+# ===================
+# JOBS VERSION
+# ===================
+
+def observe_jobs(jobs):
+    """Note job records we've been shown; any change moves the jobs version on. Returns the version."""
+    global _jobs_version
+    changed = []
+    with _lock:
+        known_clients = set(_clients_seen)
+        for job in jobs or []:
+            number = job.get('jobNumber') if isinstance(job, dict) else None
+            if not number:
+                continue
+            fingerprint = _job_fingerprint(job)
+            before = _job_versions.get(number)
+            if before == fingerprint:
+                continue
+            if before is not None or number.split()[0] in known_clients:
+                changed.append(number)
+            _job_versions[number] = fingerprint
+            _clients_seen.add(number.split()[0])
+        if changed:
+            _jobs_version += 1
+    if changed:
+        logger.info('Jobs changed', jobs=changed[:5], changed=len(changed), version=_jobs_version)
+    return _jobs_version
+
+
+def jobs_changed(reason):
+    """Move the jobs version on - cached decisions from before no longer hit"""
+    global _jobs_version
+    with _lock:
+        _jobs_version += 1
+    logger.info('Jobs version moved on', version=_jobs_version, reason=reason)
+
+
+# ===================
+# CACHE
+# ===================
+
+def key(source, sender, text, job_numbers=()):
+    """Cache key for a request, or None when the cache is off"""
+    if DECISION_CACHE == 'off':
+        return None
+    sender = (sender or '').lower()
+    who = sender if source == 'hub' else sender.rpartition('@')[2]
+    return {
+        'exact': (source, who, tuple(sorted(set(job_numbers or ()))), _jobs_version),
+        'hash': simhash(text),
+    }
+
+
+def _band_keys(exact, value):
+    return [(exact, band, (value >> (band * BAND_BITS)) & _BAND_MASK) for band in range(BANDS)]
+
+
+def _drop(entry_id):
+    entry = _entries.pop(entry_id, None)
+    if entry is None:
+        return
+    for band_key in _band_keys(entry['exact'], entry['hash']):
+        ids = _bands.get(band_key)
+        if ids:
+            ids.discard(entry_id)
+            if not ids:
+                del _bands[band_key]
+
+
+def _matches(cache_key, now):
+    """(distance, id, entry) for live entries within DECISION_CACHE_DISTANCE, closest first (call with _lock held)"""
+    candidates = set()
+    for band_key in _band_keys(cache_key['exact'], cache_key['hash']):
+        candidates |= _bands.get(band_key, set())
+    
+    matches = []
+    for entry_id in candidates:
+        entry = _entries[entry_id]
+        if entry['expires'] <= now:
+            _drop(entry_id)
+            continue
+        distance = (entry['hash'] ^ cache_key['hash']).bit_count()
+        if distance <= DECISION_CACHE_DISTANCE:
+            matches.append((distance, entry_id, entry))
+    return sorted(matches, key=lambda match: match[:2])
+
+
+def cacheable(routing):
+    """Whether a decision can be reused for another request"""
+    kind = routing.get('type')
+    if routing.get('error'):
+        return False
+    return kind in CACHED_TYPES or (kind == 'action' and DECISION_CACHE_ACTIONS == 'validate')
+
+
+def lookup(cache_key):
+    """A copy of the cached decision for a key, or None"""
+    if cache_key is None:
+        return None
+    now = time.time()
+    with _lock:
+        matches = _matches(cache_key, now)
+        if matches:
+            distance, entry_id, entry = matches[0]
+            entry['hits'] += 1
+            routing = copy.deepcopy(entry['routing'])
+    
+    if not matches:
+        metrics.record_decision_cache('miss')
+        return None
+    logger.info('Hit', type=routing.get('type'), route=routing.get('route'), distance=distance,
+                ageSeconds=round(now - entry['stored']), hits=entry['hits'])
+    metrics.record_decision_cache('hit')
+    return routing
+
+
+def store(cache_key, routing):
+    """Cache a fresh decision if it's reusable. Returns True if stored."""
+    if cache_key is None or not cacheable(routing):
+        return False
+    now = time.time()
+    entry = {
+        # Filed under the current jobs version - jobs seen while deciding are what it's based on
+        'exact': cache_key['exact'][:-1] + (_jobs_version,),
+        'hash': cache_key['hash'],
+        'routing': copy.deepcopy(routing),
+        'stored': now,
+        'expires': now + DECISION_CACHE_TTL,
+        'hits': 0,
+    }
+    with _lock:
+        entry_id = next(_ids)
+        _entries[entry_id] = entry
+        for band_key in _band_keys(entry['exact'], entry['hash']):
+            _bands.setdefault(band_key, set()).add(entry_id)
+        while len(_entries) > DECISION_CACHE_SIZE:
+            _drop(next(iter(_entries)))
+    metrics.record_decision_cache('stored')
+    return True
+
+
+def forget(cache_key):
+    """Drop the entries a key matches (a cached action that failed validation)"""
+    if cache_key is None:
+        return
+    with _lock:
+        for _, entry_id, _ in _matches(cache_key, time.time()):
+            _drop(entry_id)
+    metrics.record_decision_cache('rejected')
+
+
+def clear():
+    """Empty the cache (tests, benchmarks)"""
+    with _lock:
+        _entries.clear()
+        _bands.clear()
+
+
+def stats():
+    """Entry count and jobs version, for /health"""
+    with _lock:
+        return {'entries': len(_entries), 'jobsVersion': _jobs_version, 'enabled': DECISION_CACHE != 'off'}
@@ -0,0 +1,55 @@
+"""
+Dot Traffic 2.0 - Gunicorn config
+
+Prometheus multiprocess mode: every worker writes its metric samples to
+PROMETHEUS_MULTIPROC_DIR so /metrics reports the whole server, not just the
+worker that happened to answer the scrape.
+
+Each worker warms up (warmup.py) before it accepts connections and gives
+its queued emails a moment to go out when it exits (outbox.py). Unused
+pre-claimed job numbers are handed back on shutdown (reservations.py), and
+any a crashed run left behind when the next one warms up.
+"""
+
+import os
+import uuid
+import shutil
+import tempfile
+
+# Must be set before any worker imports prometheus_client (metrics.py)
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'dot-metrics'))
+
+# One id for this server run, shared by every worker (reservations.py tells its
+# own job number blocks from ones an earlier run left behind)
+os.environ.setdefault('DOT_BOOT_ID', uuid.uuid4().hex)
+
+
+def on_starting(server):
+    """Start every deploy with an empty metrics directory"""
+    metrics_dir = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+
+def post_worker_init(worker):
+    """Warm each worker up before it accepts connections (warmup.py; /ready turns 200 after)"""
+    import warmup
+    warmup.warm_up()
+
+
+def worker_exit(server, worker):
+    """Let this worker's queued emails and Teams posts go out (the rest stay queued on disk)"""
+    import outbox
+    outbox.drain()
+
+
+def on_exit(server):
+    """Hand unused pre-claimed job numbers back to Airtable (workers share one block file)"""
+    import reservations
+    reservations.release_unused()
+
+
+def child_exit(server, worker):
+    """Drop a dead worker's live gauges (its counters and histograms are kept)"""
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -19,6 +19,11 @@ import json
 import httpx
 from anthropic import Anthropic
 
+import budget
+import metrics
+import breaker
+import logs
+
 # ===================
 # CONFIG
 # ===================
@@ -26,6 +31,8 @@ from anthropic import Anthropic
 ANTHROPIC_API_KEY = os.environ.get('ANTHROPIC_API_KEY')
 ANTHROPIC_MODEL = 'claude-sonnet-4-20250514'
 
+logger = logs.get('hub')
+
 # Horoscope service URL (internal call within Brain)
 HOROSCOPE_SERVICE_URL = os.environ.get('HOROSCOPE_SERVICE_URL', 'https://dot-workers.up.railway.app')
 
@@ -80,7 +87,7 @@ def call_horoscope_service(sign: str) -> dict:
         else:
             return {"error": f"Service returned {response.status_code}"}
     except Exception as e:
-        print(f"[hub] Horoscope service error: {e}")
+        logger.warning('Horoscope service error', error=str(e))
         return {"error": str(e)}
 
 
@@ -100,6 +107,11 @@ def handle_tool_call(tool_name: str, tool_input: dict) -> str:
     return json.dumps({"error": f"Unknown tool: {tool_name}"})
 
 
+# Fixed part of every prompt, and the headers around the question (budget.py)
+SYSTEM_TOKENS = budget.estimate_tokens(HUB_PROMPT) + budget.estimate_tokens(HOROSCOPE_TOOL)
+MESSAGE_OVERHEAD_TOKENS = 100
+
+
 # ===================
 # HELPERS
 # ===================
@@ -125,10 +137,12 @@ def _strip_markdown_json(content):
     return content.strip()
 
 
-def _format_jobs_for_context(jobs):
+def _format_jobs_for_context(jobs, max_tokens=None, question=''):
     """
     Format jobs list for Claude's context.
     Compact format to minimize tokens while giving Claude what it needs.
+    With max_tokens, the jobs most relevant to the question are kept and the
+    rest summarized in one line.
     """
     if not jobs:
         return "No active jobs."
@@ -173,13 +187,22 @@ def _format_jobs_for_context(jobs):
         
         lines.append(' | '.join(parts))
     
-    return f"{len(jobs)} active jobs:\n" + "\n".join(lines)
+    if max_tokens is None:
+        return f"{len(jobs)} active jobs:\n" + "\n".join(lines)
+    
+    return f"{len(jobs)} active jobs:\n" + budget.fit_lines(
+        lines,
+        max_tokens,
+        rank=budget.rank_jobs(jobs, text=question),
+        summarize=lambda dropped: budget.jobs_summary(jobs, dropped),
+        module='hub',
+    )
 
 
-def _format_meetings_for_context(meetings):
+def _format_meetings_for_context(meetings, max_tokens=None):
     """
     Format meetings for Claude's context.
-    Compact format matching jobs style.
+    Compact format matching jobs style (soonest first if over max_tokens).
     """
     if not meetings:
         return "No upcoming meetings."
@@ -199,24 +222,33 @@ def _format_meetings_for_context(meetings):
             parts.append(f"Attendees:{m.get('attendees')}")
         lines.append(f"{day_label}: {' | '.join(p for p in parts if p)}")
     
-    return f"{len(meetings)} meeting(s):\n" + "\n".join(lines)
+    if max_tokens is None:
+        return f"{len(meetings)} meeting(s):\n" + "\n".join(lines)
+    return f"{len(meetings)} meeting(s):\n" + budget.fit_lines(
+        lines,
+        max_tokens,
+        summarize=lambda dropped: f"(+{len(dropped)} later meetings not shown)",
+        module='hub',
+        part='meetings',
+    )
 
 
 # ===================
 # MAIN HANDLER
 # ===================
 
-def handle_hub_request(data):
+MUDDLE_RESPONSE = {
+    'type': 'answer',
+    'message': "Sorry, I got in a muddle over that one.",
+    'jobs': None,
+    'nextPrompt': "Try asking another way?"
+}
+
+
+def build_messages(data, meetings):
     """
-    Handle a Hub chat request with Simple Claude + Horoscope tool.
-    Jobs in context (summary format), one tool for horoscopes.
-    Maintains conversation history for multi-turn context.
-    
-    Args:
-        data: dict with content, jobs, senderName, sessionId, history
-    
-    Returns:
-        dict with type, message, jobs (as job numbers), redirectTo, etc.
+    Build the Claude messages array for a Hub request.
+    Shared by the sync handler and hub_async.
     """
     content = data.get('content', '')
     jobs = data.get('jobs', [])
@@ -224,22 +256,16 @@ def handle_hub_request(data):
     history = data.get('history', [])  # Conversation history from frontend
     access_level = data.get('accessLevel', 'Client WIP')  # Default to most restricted
     
-    # Fetch meetings only for Full access users
-    if access_level == 'Full':
-        from airtable import get_meetings
-        meetings = get_meetings()
-    else:
-        meetings = []
+    logger.info('Simple Claude + tools', question=content, jobs=len(jobs), meetings=len(meetings),
+                history=len(history))
     
-    print(f"[hub] === SIMPLE CLAUDE + TOOLS ===")
-    print(f"[hub] Question: {content}")
-    print(f"[hub] Jobs in context: {len(jobs)}")
-    print(f"[hub] Meetings in context: {len(meetings)}")
-    print(f"[hub] History messages: {len(history)}")
+    # Token allowances (budget.py): meetings get up to a quarter of the context
+    allowance = budget.plan(SYSTEM_TOKENS, budget.estimate_tokens(content) + MESSAGE_OVERHEAD_TOKENS)
+    meetings_tokens = allowance['context'] // 4 if meetings else 0
     
     # Build context with jobs and meetings (summary only - NOT full JSON)
-    jobs_context = _format_jobs_for_context(jobs)
-    meetings_context = _format_meetings_for_context(meetings)
+    jobs_context = _format_jobs_for_context(jobs, allowance['context'] - meetings_tokens, content)
+    meetings_context = _format_meetings_for_context(meetings, meetings_tokens)
     
     # Current message with fresh job data
     current_message = f"""User: {sender_name}
@@ -256,112 +282,151 @@ Question: {content}
     # Build messages array: history + current message
     messages = []
     
-    # Add conversation history (without job context - keeps tokens down)
+    # Add conversation history (without job context - keeps tokens down),
+    # newest turns first within the budget
+    turns = []
     for msg in history:
         role = msg.get('role', 'user')
         msg_content = msg.get('content', '')
         if role in ['user', 'assistant'] and msg_content:
-            messages.append({'role': role, 'content': msg_content})
+            turns.append({'role': role, 'content': msg_content})
+    messages.extend(budget.fit_history(turns, allowance['history'], module='hub'))
     
     # Add current message with fresh job context
     messages.append({'role': 'user', 'content': current_message})
     
+    return messages
+
+
+def claude_request(messages):
+    """Keyword arguments for anthropic messages.create"""
+    return {
+        'model': ANTHROPIC_MODEL,
+        'max_tokens': 1500,
+        'temperature': 0.1,
+        'system': HUB_PROMPT,
+        'messages': messages,
+        'tools': [HOROSCOPE_TOOL],
+    }
+
+
+def call_claude(messages, call):
+    """One Anthropic call - timed, with token usage counted (call: initial / tool_round)"""
+    with breaker.anthropic.guard(), metrics.timed_claude('hub', call):
+        response = anthropic_client.messages.create(**claude_request(messages))
+    metrics.record_usage('hub', getattr(response, 'usage', None))
+    return response
+
+
+def find_tool_use(response):
+    """Return the first tool_use block if Claude wants a tool, else None"""
+    if response.stop_reason != "tool_use":
+        return None
+    for block in response.content:
+        if block.type == "tool_use":
+            return block
+    return None
+
+
+def add_tool_exchange(messages, response, tool_use_block, tool_result):
+    """Add assistant's tool request and tool result to messages"""
+    messages.append({
+        "role": "assistant",
+        "content": response.content
+    })
+    messages.append({
+        "role": "user",
+        "content": [{
+            "type": "tool_result",
+            "tool_use_id": tool_use_block.id,
+            "content": tool_result
+        }]
+    })
+
+
+def response_text(response):
+    """Extract the text response, stripped down to the JSON object"""
+    result_text = ""
+    for block in response.content:
+        if hasattr(block, 'text'):
+            result_text = block.text
+            break
+    return _strip_markdown_json(result_text)
+
+
+def parse_result(result_text):
+    """Parse Claude's JSON answer (raises JSONDecodeError)"""
+    result = json.loads(result_text)
+    
+    logger.info('Answer', type=result.get('type'), message=(result.get('message') or '')[:50],
+                jobs=result.get('jobs') or None)
+    
+    return result
+
+
+def invalid_json_result(result_text, error):
+    """If Claude returned plain text, treat it as an answer"""
+    logger.warning('JSON error', error=str(error), response=(result_text or '')[:200])
+    if result_text and result_text.strip():
+        return {
+            'type': 'answer',
+            'message': result_text.strip(),
+            'jobs': None,
+            'nextPrompt': None
+        }
+    return dict(MUDDLE_RESPONSE)
+
+
+def handle_hub_request(data):
+    """
+    Handle a Hub chat request with Simple Claude + Horoscope tool.
+    Jobs in context (summary format), one tool for horoscopes.
+    Maintains conversation history for multi-turn context.
+    
+    Args:
+        data: dict with content, jobs, senderName, sessionId, history
+    
+    Returns:
+        dict with type, message, jobs (as job numbers), redirectTo, etc.
+    """
+    access_level = data.get('accessLevel', 'Client WIP')  # Default to most restricted
+    
+    # Fetch meetings only for Full access users
+    if access_level == 'Full':
+        from airtable import get_meetings
+        meetings = get_meetings()
+    else:
+        meetings = []
+    
+    messages = build_messages(data, meetings)
+    result_text = ""
+    
     try:
         # First API call - may return tool use or direct response
-        response = anthropic_client.messages.create(
-            model=ANTHROPIC_MODEL,
-            max_tokens=1500,
-            temperature=0.1,
-            system=HUB_PROMPT,
-            messages=messages,
-            tools=[HOROSCOPE_TOOL]
-        )
+        response = call_claude(messages, 'initial')
         
         # Check if Claude wants to use a tool
-        if response.stop_reason == "tool_use":
-            # Find the tool use block
-            tool_use_block = None
-            for block in response.content:
-                if block.type == "tool_use":
-                    tool_use_block = block
-                    break
+        tool_use_block = find_tool_use(response)
+        if tool_use_block:
+            logger.info('Tool call', tool=tool_use_block.name, input=tool_use_block.input)
             
-            if tool_use_block:
-                print(f"[hub] Tool call: {tool_use_block.name}")
-                print(f"[hub] Tool input: {tool_use_block.input}")
-                
-                # Execute the tool
+            # Execute the tool
+            with metrics.timed_tool(tool_use_block.name):
                 tool_result = handle_tool_call(
                     tool_use_block.name, 
                     tool_use_block.input
                 )
-                
-                # Add assistant's tool request and tool result to messages
-                messages.append({
-                    "role": "assistant",
-                    "content": response.content
-                })
-                messages.append({
-                    "role": "user",
-                    "content": [{
-                        "type": "tool_result",
-                        "tool_use_id": tool_use_block.id,
-                        "content": tool_result
-                    }]
-                })
-                
-                # Second API call to get final response
-                response = anthropic_client.messages.create(
-                    model=ANTHROPIC_MODEL,
-                    max_tokens=1500,
-                    temperature=0.1,
-                    system=HUB_PROMPT,
-                    messages=messages,
-                    tools=[HOROSCOPE_TOOL]
-                )
-        
-        # Extract text response
-        result_text = ""
-        for block in response.content:
-            if hasattr(block, 'text'):
-                result_text = block.text
-                break
-        
-        result_text = _strip_markdown_json(result_text)
-        result = json.loads(result_text)
-        
-        print(f"[hub] Type: {result.get('type')}")
-        print(f"[hub] Message: {result.get('message', '')[:50]}...")
-        if result.get('jobs'):
-            print(f"[hub] Jobs returned: {result.get('jobs')}")
+            add_tool_exchange(messages, response, tool_use_block, tool_result)
+            
+            # Second API call to get final response
+            response = call_claude(messages, 'tool_round')
         
-        return result
+        result_text = response_text(response)
+        return parse_result(result_text)
         
     except json.JSONDecodeError as e:
-        print(f"[hub] JSON error: {e}")
-        print(f"[hub] Raw response: {result_text[:200] if result_text else 'empty'}")
-        # If Claude returned plain text, treat it as an answer
-        if result_text and result_text.strip():
-            return {
-                'type': 'answer',
-                'message': result_text.strip(),
-                'jobs': None,
-                'nextPrompt': None
-            }
-        return {
-            'type': 'answer',
-            'message': "Sorry, I got in a muddle over that one.",
-            'jobs': None,
-            'nextPrompt': "Try asking another way?"
-        }
+        return invalid_json_result(result_text, e)
         
     except Exception as e:
-        print(f"[hub] Error: {e}")
-        import traceback
-        traceback.print_exc()
-        return {
-            'type': 'answer', 
-            'message': "Sorry, I got in a muddle over that one.",
-            'jobs': None,
-            'nextPrompt': "Try asking another way?"
-        }
+        logger.error('Error', exc_info=True, error=str(e))
+        return dict(MUDDLE_RESPONSE)
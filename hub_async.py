@@ -0,0 +1,133 @@
+"""
+Dot Hub Brain (async)
+Async twin of hub.handle_hub_request, for the ASGI app.
+
+Context formatting, the horoscope tool definition and response parsing come
+from hub.py; the Claude calls, horoscope service and meetings lookup are awaited.
+"""
+
+import json
+import httpx
+from anthropic import AsyncAnthropic
+
+import hub
+import metrics
+import breaker
+import airtable_async
+import logs
+from hub import ANTHROPIC_API_KEY, HOROSCOPE_SERVICE_URL
+
+# ===================
+# CONFIG
+# ===================
+
+logger = logs.get('hub')
+
+anthropic_client = AsyncAnthropic(
+    api_key=ANTHROPIC_API_KEY,
+    http_client=httpx.AsyncClient(timeout=30.0, follow_redirects=True)
+)
+
+# HTTP client for internal calls
+http_client = httpx.AsyncClient(timeout=10.0)
+
+
+async def close():
+    """Close the pooled clients (called when the ASGI app shuts down)"""
+    await anthropic_client.close()
+    await http_client.aclose()
+
+
+async def call_claude(messages, call):
+    """One Anthropic call - timed, with token usage counted (see hub.call_claude)"""
+    with breaker.anthropic.guard(), metrics.timed_claude('hub', call):
+        response = await anthropic_client.messages.create(**hub.claude_request(messages))
+    metrics.record_usage('hub', getattr(response, 'usage', None))
+    return response
+
+
+# ===================
+# TOOLS
+# ===================
+
+async def call_horoscope_service(sign: str) -> dict:
+    """
+    Call the horoscope service to get a reading.
+    """
+    try:
+        response = await http_client.post(
+            f"{HOROSCOPE_SERVICE_URL}/horoscope",
+            json={"sign": sign.lower()}
+        )
+        if response.status_code == 200:
+            return response.json()
+        else:
+            return {"error": f"Service returned {response.status_code}"}
+    except Exception as e:
+        logger.warning('Horoscope service error', error=str(e))
+        return {"error": str(e)}
+
+
+async def handle_tool_call(tool_name: str, tool_input: dict) -> str:
+    """
+    Handle a tool call from Claude.
+    """
+    if tool_name == "get_horoscope":
+        sign = tool_input.get("sign", "").lower()
+        result = await call_horoscope_service(sign)
+        if "error" in result:
+            return json.dumps({"error": result["error"]})
+        return json.dumps({
+            "message": result.get("message", "The stars are silent today.")
+        })
+    
+    return json.dumps({"error": f"Unknown tool: {tool_name}"})
+
+
+# ===================
+# MAIN HANDLER
+# ===================
+
+async def handle_hub_request(data):
+    """
+    Handle a Hub chat request with Simple Claude + Horoscope tool.
+    Same contract as hub.handle_hub_request.
+    """
+    access_level = data.get('accessLevel', 'Client WIP')  # Default to most restricted
+    
+    # Fetch meetings only for Full access users
+    if access_level == 'Full':
+        meetings = await airtable_async.get_meetings()
+    else:
+        meetings = []
+    
+    messages = hub.build_messages(data, meetings)
+    result_text = ""
+    
+    try:
+        # First API call - may return tool use or direct response
+        response = await call_claude(messages, 'initial')
+        
+        tool_use_block = hub.find_tool_use(response)
+        if tool_use_block:
+            logger.info('Tool call', tool=tool_use_block.name, input=tool_use_block.input)
+            
+            with metrics.timed_tool(tool_use_block.name):
+                tool_result = await handle_tool_call(
+                    tool_use_block.name,
+                    tool_use_block.input
+                )
+            hub.add_tool_exchange(messages, response, tool_use_block, tool_result)
+            
+            # Second API call to get final response
+            response = await call_claude(messages, 'tool_round')
+        
+        result_text = hub.response_text(response)
+        return hub.parse_result(result_text)
+        
+    except json.JSONDecodeError as e:
+        return hub.invalid_json_result(result_text, e)
+        
+    except Exception as e:
+        logger.error('Error', exc_info=True, error=str(e))
+        return dict(hub.MUDDLE_RESPONSE)
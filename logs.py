@@ -0,0 +1,227 @@
+"""
+Dot Traffic 2.0 - Logging
+Structured logs that don't slow requests down. Every module logs through
+here rather than print() - the request path (app.py, asgi.py, traffic.py,
+hub.py and their async twins) and the modules it calls.
+
+    logger = logs.get('traffic')
+    logger.info('Tool round', round=2, tools=['get_job'])
+    logger.debug('Tool result', tool=name, result=result)   # off by default
+
+OUTPUT (LOG_FORMAT): one line per record on stdout
+- json: {"ts", "level", "logger", "msg", "traceId", ...fields} (default)
+- text: [traffic] Tool round round=2 tools=['get_job'] (local dev)
+
+OFF THE REQUEST PATH: a record is checked against LOG_LEVEL, stamped with the
+trace id and put on a bounded queue - nothing is formatted or written on the
+request thread. A background thread formats and writes. If the queue is full
+(stdout stalled) records are dropped and counted rather than blocking.
+
+SIZE AND VOLUME:
+- LOG_MAX_CHARS: every field and message is cut to this many characters
+  (a tool result can be every active job) - 0 for no limit
+- LOG_SAMPLE: share of requests whose debug/info lines are kept, picked by
+  trace id so a request's lines are kept or dropped together. Warnings and
+  errors are always kept.
+"""
+
+import os
+import sys
+import json
+import queue
+import atexit
+import logging
+import threading
+from logging.handlers import QueueHandler, QueueListener
+
+import tracing
+
+# ===================
+# CONFIG
+# ===================
+
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json').lower()
+LOG_MAX_CHARS = int(os.environ.get('LOG_MAX_CHARS', '500'))
+LOG_SAMPLE = float(os.environ.get('LOG_SAMPLE', '1'))
+LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', '10000'))
+
+# ===================
+# STATE
+# ===================
+
+_root = logging.getLogger('dot')
+_root.setLevel(getattr(logging, LOG_LEVEL, logging.INFO))
+_root.propagate = False
+
+_queue = None
+_listener = None
+_listener_pid = None        # the listener thread doesn't survive a fork - restart it in the child
+_start_lock = threading.Lock()
+_dropped = 0
+
+
+# ===================
+# FORMATTING (listener thread)
+# ===================
+
+def _cut(text):
+    if LOG_MAX_CHARS and len(text) > LOG_MAX_CHARS:
+        return f"{text[:LOG_MAX_CHARS]}... [{len(text)} chars]"
+    return text
+
+
+def _field(value, native=False):
+    """
+    A field value as it goes in the line: numbers kept, big values cut to a
+    string. native: small lists/dicts stay as they are (JSON lines).
+    """
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if not isinstance(value, str):
+        try:
+            text = json.dumps(value, default=str)
+        except (TypeError, ValueError):
+            return _cut(str(value))
+        if native and not (LOG_MAX_CHARS and len(text) > LOG_MAX_CHARS):
+            return value
+        value = text
+    return _cut(value)
+
+
+class _JsonFormatter(logging.Formatter):
+    def format(self, record):
+        line = {
+            'ts': round(record.created, 3),
+            'level': record.levelname.lower(),
+            'logger': record.name.split('.', 1)[-1],
+            'msg': _cut(record.getMessage()),
+        }
+        if record.trace_id:
+            line['traceId'] = record.trace_id
+        for key, value in record.fields.items():
+            line[key] = _field(value, native=True)
+        if record.exc_info:
+            line['exception'] = self.formatException(record.exc_info)
+        return json.dumps(line, default=str)
+
+
+class _TextFormatter(logging.Formatter):
+    def format(self, record):
+        text = f"[{record.name.split('.', 1)[-1]}] {_cut(record.getMessage())}"
+        if record.fields:
+            text += ' ' + ' '.join(f"{key}={_field(value)}" for key, value in record.fields.items())
+        if record.levelno >= logging.WARNING:
+            text = f"{record.levelname} {text}"
+        if record.exc_info:
+            text += '\n' + self.formatException(record.exc_info)
+        return text
+
+
+# ===================
+# QUEUE
+# ===================
+
+class _DroppingQueueHandler(QueueHandler):
+    """QueueHandler that never blocks and leaves formatting to the listener"""
+    
+    def prepare(self, record):
+        return record
+    
+    def enqueue(self, record):
+        global _dropped
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _dropped += 1
+
+
+def _start():
+    """Start the queue and its writer thread in this process"""
+    global _queue, _listener, _listener_pid
+    with _start_lock:
+        if _listener_pid == os.getpid():
+            return
+        _queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        output = logging.StreamHandler(sys.stdout)
+        output.setFormatter(_TextFormatter() if LOG_FORMAT == 'text' else _JsonFormatter())
+        _listener = QueueListener(_queue, output)
+        _listener.start()
+        for handler in list(_root.handlers):
+            _root.removeHandler(handler)
+        _root.addHandler(_DroppingQueueHandler(_queue))
+        _listener_pid = os.getpid()
+
+
+def flush():
+    """Write out everything queued (at exit; tests)"""
+    global _listener_pid
+    with _start_lock:
+        if _listener is not None and _listener_pid == os.getpid():
+            _listener.stop()
+            _listener_pid = None
+
+
+atexit.register(flush)
+
+
+# ===================
+# LOGGERS
+# ===================
+
+def _sampled(trace_id):
+    """Whether this request's debug/info lines are kept (LOG_SAMPLE)"""
+    if LOG_SAMPLE >= 1 or not trace_id:
+        return True
+    return int(trace_id[:8], 16) / 0xFFFFFFFF < LOG_SAMPLE
+
+
+class _Logger:
+    """Logger with keyword fields: logger.info('Routed', route='file', job='LAB 055')"""
+    
+    def __init__(self, name):
+        self._logger = logging.getLogger(f'dot.{name}')
+    
+    def _log(self, level, msg, exc_info, fields):
+        if not self._logger.isEnabledFor(level):
+            return
+        trace_id = tracing.current_trace_id()
+        if level < logging.WARNING and not _sampled(trace_id):
+            return
+        if _listener_pid != os.getpid():
+            _start()
+        if exc_info is True:
+            exc_info = sys.exc_info()
+        # makeRecord, not .log(): skips the caller lookup (a stack walk per line)
+        record = self._logger.makeRecord(self._logger.name, level, '', 0, msg, None, exc_info or None,
+                                         extra={'fields': fields, 'trace_id': trace_id})
+        self._logger.handle(record)
+    
+    def enabled(self, level='debug'):
+        """Whether a level is logged - to skip building an expensive field"""
+        return self._logger.isEnabledFor(getattr(logging, level.upper()))
+    
+    def debug(self, msg, **fields):
+        self._log(logging.DEBUG, msg, None, fields)
+    
+    def info(self, msg, **fields):
+        self._log(logging.INFO, msg, None, fields)
+    
+    def warning(self, msg, exc_info=None, **fields):
+        self._log(logging.WARNING, msg, exc_info, fields)
+    
+    def error(self, msg, exc_info=None, **fields):
+        self._log(logging.ERROR, msg, exc_info, fields)
+
+
+def get(name):
+    """Logger for a module - 'traffic' logs as [traffic] / "logger": "traffic" """
+    return _Logger(name)
+
+
+def stats():
+    """Queue depth and records dropped, for /health"""
+    return {
+        'queued': _queue.qsize() if _queue is not None else 0,
+        'dropped': _dropped,
+    }
@@ -0,0 +1,304 @@
+"""
+Dot Traffic 2.0 - Metrics
+Prometheus metrics for the brain, served on /metrics.
+
+WHAT WE MEASURE:
+- dot_stage_seconds{stage}            - each step of handle_traffic (gates, clarify,
+                                        route_request, enrichment, log_traffic,
+                                        call_worker, send_*) plus Claude calls/tool rounds
+- dot_claude_call_seconds{module,call} - every Anthropic messages.create
+- dot_tool_seconds{tool}              - every execute_tool
+- dot_airtable_requests_total{table,method,status}
+- dot_airtable_request_seconds{table,method}
+- dot_anthropic_tokens_total{module,kind} - input / output / cache_read / cache_creation
+- dot_email_chars_total{kind}          - email body chars received / sent to Claude
+- dot_email_prompt_ratio              - prompt chars / original chars per email (preprocess.py)
+- dot_prompt_trimmed_total{module,part} - prompt parts cut to fit the token budget (budget.py)
+- dot_tool_result_tokens_total{tool,kind} - tool result tokens as JSON vs as sent to Claude
+- dot_decision_cache_total{result}    - routing decisions reused (hit) or not (decision_cache.py)
+- dot_breaker_events_total{dependency,event} - circuit breakers opening/closing, calls refused
+- dot_outbox_messages_total{kind,event} - emails / Teams posts queued, duplicate, sent, retried, failed
+- dot_outbox_delivery_messages{kind}  - messages per delivery call (outbox.py): count = calls made,
+                                        sum = messages sent, so sum / count is what coalescing saved
+
+TRACING:
+Every timer here also opens a tracing span (see tracing.py), so stages, Claude
+calls and tools show up in request traces without a second context manager.
+
+GUNICORN:
+Each worker is its own process, so gunicorn.conf.py points PROMETHEUS_MULTIPROC_DIR
+at a shared directory. Every worker writes its samples there and /metrics
+aggregates them, whichever worker answers the scrape.
+"""
+
+import os
+import time
+import functools
+import inspect
+from prometheus_client import (
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    REGISTRY,
+    CONTENT_TYPE_LATEST,
+    generate_latest,
+    multiprocess,
+)
+
+import tracing
+
+# ===================
+# METRICS
+# ===================
+
+# Most stages are network calls: 50ms - 2 minutes
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60, 120)
+
+STAGE_SECONDS = Histogram(
+    'dot_stage_seconds',
+    'Latency of each pipeline stage',
+    ['stage'],
+    buckets=LATENCY_BUCKETS
+)
+
+CLAUDE_CALL_SECONDS = Histogram(
+    'dot_claude_call_seconds',
+    'Latency of each Anthropic messages.create call',
+    ['module', 'call'],
+    buckets=LATENCY_BUCKETS
+)
+
+TOOL_SECONDS = Histogram(
+    'dot_tool_seconds',
+    'Latency of each Claude tool execution',
+    ['tool'],
+    buckets=LATENCY_BUCKETS
+)
+
+AIRTABLE_REQUESTS = Counter(
+    'dot_airtable_requests_total',
+    'Airtable API requests by table, method and status code',
+    ['table', 'method', 'status']
+)
+
+AIRTABLE_SECONDS = Histogram(
+    'dot_airtable_request_seconds',
+    'Latency of Airtable API requests',
+    ['table', 'method'],
+    buckets=LATENCY_BUCKETS
+)
+
+ANTHROPIC_TOKENS = Counter(
+    'dot_anthropic_tokens_total',
+    'Anthropic tokens by module and kind (input, output, cache_read, cache_creation)',
+    ['module', 'kind']
+)
+
+EMAIL_CHARS = Counter(
+    'dot_email_chars_total',
+    'Email body characters received (original) and put in the prompt (prompt)',
+    ['kind']
+)
+
+EMAIL_PROMPT_RATIO = Histogram(
+    'dot_email_prompt_ratio',
+    'Share of each email body left after preprocessing',
+    buckets=(0.01, 0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 0.9, 1.0)
+)
+
+PROMPT_TRIMMED = Counter(
+    'dot_prompt_trimmed_total',
+    'Prompt parts trimmed to fit the token budget (history, context, tools)',
+    ['module', 'part']
+)
+
+TOOL_RESULT_TOKENS = Counter(
+    'dot_tool_result_tokens_total',
+    'Estimated tokens per tool result: as verbatim JSON (json) and as sent to Claude (sent)',
+    ['tool', 'kind']
+)
+
+DECISION_CACHE = Counter(
+    'dot_decision_cache_total',
+    'Routing decision cache lookups and stores (hit, miss, stored, rejected)',
+    ['result']
+)
+
+TOOL_ROUNDS = Histogram(
+    'dot_tool_rounds',
+    'Claude tool rounds per routed request (0 = answered without tools)',
+    ['module'],
+    buckets=(0, 1, 2, 3, 4, 5)
+)
+
+TOOL_CALLS = Histogram(
+    'dot_tool_calls',
+    'Tool calls per routed request, across all its rounds',
+    ['module'],
+    buckets=(0, 1, 2, 3, 5, 8, 13)
+)
+
+BREAKER_EVENTS = Counter(
+    'dot_breaker_events_total',
+    'Circuit breaker transitions (open, half_open, closed) and calls refused (rejected)',
+    ['dependency', 'event']
+)
+
+OUTBOX_MESSAGES = Counter(
+    'dot_outbox_messages_total',
+    'Outbox messages by event (queued, duplicate, sent, retried, failed)',
+    ['kind', 'event']
+)
+
+OUTBOX_DELIVERY_MESSAGES = Histogram(
+    'dot_outbox_delivery_messages',
+    'Messages per successful delivery call - more than 1 is a coalesced digest',
+    ['kind'],
+    buckets=(1, 2, 3, 5, 8, 13, 20)
+)
+
+
+# ===================
+# HELPERS
+# ===================
+
+class _Timer:
+    """
+    Observe elapsed seconds into a histogram, inside a tracing span of the same name.
+    Works as a context manager or as a decorator (sync or async functions).
+    """
+    
+    def __init__(self, histogram, span_name, **labels):
+        self.histogram = histogram
+        self.span_name = span_name
+        self.labels = labels
+    
+    def __enter__(self):
+        self.span = tracing.span(self.span_name, **self.labels)
+        self.span.__enter__()
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc):
+        self.histogram.labels(**self.labels).observe(time.perf_counter() - self.start)
+        self.span.__exit__(*exc)
+        return False
+    
+    def __call__(self, fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with _Timer(self.histogram, self.span_name, **self.labels):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+        
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _Timer(self.histogram, self.span_name, **self.labels):
+                return fn(*args, **kwargs)
+        return wrapper
+
+
+def timed(stage):
+    """Time a pipeline stage, e.g. `with metrics.timed('gates'):`"""
+    return _Timer(STAGE_SECONDS, stage, stage=stage)
+
+
+def timed_tool(tool):
+    """Time one Claude tool execution"""
+    return _Timer(TOOL_SECONDS, f'tool {tool}', tool=tool)
+
+
+def timed_claude(module, call):
+    """Time one Anthropic call (call: initial / tool_round / final)"""
+    return _Timer(CLAUDE_CALL_SECONDS, f'claude {module}.{call}', module=module, call=call)
+
+
+def record_usage(module, usage):
+    """Count Anthropic tokens from a response's usage block"""
+    if usage is None:
+        return
+    for kind, attr in (
+        ('input', 'input_tokens'),
+        ('output', 'output_tokens'),
+        ('cache_read', 'cache_read_input_tokens'),
+        ('cache_creation', 'cache_creation_input_tokens'),
+    ):
+        count = getattr(usage, attr, None)
+        if count:
+            ANTHROPIC_TOKENS.labels(module=module, kind=kind).inc(count)
+
+
+def record_airtable(table, method, status, seconds):
+    """Count one Airtable request (status is the HTTP code, or 'error')"""
+    AIRTABLE_REQUESTS.labels(table=table, method=method, status=str(status)).inc()
+    AIRTABLE_SECONDS.labels(table=table, method=method).observe(seconds)
+
+
+def record_preprocess(original_chars, prompt_chars):
+    """Count one email body before and after preprocessing"""
+    EMAIL_CHARS.labels(kind='original').inc(original_chars)
+    EMAIL_CHARS.labels(kind='prompt').inc(prompt_chars)
+    if original_chars:
+        EMAIL_PROMPT_RATIO.observe(prompt_chars / original_chars)
+
+
+def record_trim(module, part):
+    """Count one prompt part trimmed by budget.py"""
+    PROMPT_TRIMMED.labels(module=module, part=part).inc()
+
+
+def record_tool_result(tool, json_tokens, sent_tokens):
+    """Count a tool result's tokens as JSON and as sent (the difference is what the compact format saved)"""
+    TOOL_RESULT_TOKENS.labels(tool=tool, kind='json').inc(json_tokens)
+    TOOL_RESULT_TOKENS.labels(tool=tool, kind='sent').inc(sent_tokens)
+
+
+def record_tool_rounds(module, rounds, calls):
+    """Observe one request's tool rounds and tool calls (sum / count = the average per request)"""
+    TOOL_ROUNDS.labels(module=module).observe(rounds)
+    TOOL_CALLS.labels(module=module).observe(calls)
+
+
+def record_decision_cache(result):
+    """Count a decision cache outcome (decision_cache.py)"""
+    DECISION_CACHE.labels(result=result).inc()
+
+
+def record_breaker(dependency, event):
+    """Count a circuit breaker transition or refused call (breaker.py)"""
+    BREAKER_EVENTS.labels(dependency=dependency, event=event).inc()
+
+
+def record_outbox(kind, event, messages=1):
+    """Count outbox messages by event (outbox.py)"""
+    OUTBOX_MESSAGES.labels(kind=kind, event=event).inc(messages)
+
+
+def record_outbox_delivery(kind, messages):
+    """One successful delivery call carrying `messages` messages (1, or a coalesced digest)"""
+    OUTBOX_MESSAGES.labels(kind=kind, event='sent').inc(messages)
+    OUTBOX_DELIVERY_MESSAGES.labels(kind=kind).observe(messages)
+
+
+def airtable_table(url):
+    """Table name from an Airtable API URL (/v0/<base>/<table>[/<record>])"""
+    parts = url.path.split('/')
+    return parts[3] if len(parts) > 3 else 'unknown'
+
+
+# ===================
+# EXPOSITION
+# ===================
+
+def render():
+    """
+    Render all metrics in Prometheus text format.
+    Returns (body, content_type).
+    """
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,391 @@
+"""
+Dot Traffic 2.0 - Outbox
+Emails (PA Postman) and Teams posts (PA Teamsbot) leave through here, so a
+request never waits on Power Automate's HTTP triggers.
+
+HOW:
+- enqueue() writes the message to a local SQLite file (OUTBOX_DB, shared by
+  every worker on the box) and returns - a local write, well under a
+  millisecond. connect.send_answer and friends return as soon as it's queued.
+- OUTBOX_SENDERS background threads per process deliver queued messages on
+  one pooled httpx.Client. Each message is leased while it's being sent, so
+  two workers never send the same one; a worker that dies mid-send leaves a
+  lease that runs out and another worker picks the message up.
+- Failures (network errors, timeouts, 429 and 5xx) are retried with
+  exponential backoff (OUTBOX_BACKOFF, doubling, capped at OUTBOX_MAX_BACKOFF)
+  up to OUTBOX_MAX_ATTEMPTS; other 4xx answers aren't retried. A message that
+  runs out of attempts stays in the file as 'failed' and is logged.
+
+IDEMPOTENCY: a message can carry a key - connect uses (internetMessageId,
+email type) - and a key is only ever queued once, so a retried /traffic call
+or a second failure path can't send the sender the same email twice. The key
+also goes to PA Postman as the Idempotency-Key header. Sent messages are kept
+OUTBOX_KEEP seconds so their keys still count.
+
+COALESCING: messages queued with a batch key (connect: one per Teams
+channel) are held for `window` seconds, and each new one in the batch pushes
+that back - but never past `max_delay` after the first. They then go out as
+one message, built by the digest registered for their kind
+(register_digest). A batch goes out in the order it was queued, and nothing
+in it is sent while an earlier message of the batch is in flight or waiting
+to retry.
+
+SHUTDOWN: drain() sends held batches at once and gives queued messages
+OUTBOX_DRAIN_SECONDS to go out (gunicorn worker_exit, Quart after_serving) -
+whatever's left is still in the file for the next process on the box.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import tempfile
+import threading
+
+import httpx
+
+import logs
+import metrics
+
+# ===================
+# CONFIG
+# ===================
+
+OUTBOX_DB = os.environ.get('OUTBOX_DB', os.path.join(tempfile.gettempdir(), 'dot-outbox.sqlite3'))
+OUTBOX_SENDERS = int(os.environ.get('OUTBOX_SENDERS', '4'))
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get('OUTBOX_MAX_ATTEMPTS', '6'))
+OUTBOX_BACKOFF = float(os.environ.get('OUTBOX_BACKOFF', '2'))
+OUTBOX_MAX_BACKOFF = float(os.environ.get('OUTBOX_MAX_BACKOFF', '300'))
+OUTBOX_KEEP = int(os.environ.get('OUTBOX_KEEP', str(24 * 3600)))
+OUTBOX_DRAIN_SECONDS = float(os.environ.get('OUTBOX_DRAIN_SECONDS', '10'))
+
+TIMEOUT = 30.0
+LEASE_SECONDS = TIMEOUT + 30    # longer than any one delivery attempt
+POLL_SECONDS = 1.0              # how often idle senders look for retries and other workers' leftovers
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    key TEXT UNIQUE,
+    kind TEXT NOT NULL,
+    url TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    headers TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL,
+    lease_until REAL NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    sent_at REAL,
+    last_error TEXT,
+    batch TEXT
+);
+CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt);
+"""
+
+# Added after the first release - files created before it get the column on open
+MIGRATIONS = (
+    ('batch', 'ALTER TABLE outbox ADD COLUMN batch TEXT'),
+)
+BATCH_INDEX = 'CREATE INDEX IF NOT EXISTS outbox_batch ON outbox (batch, status)'
+
+logger = logs.get('outbox')
+
+# ===================
+# STATE
+# ===================
+
+_local = threading.local()
+_wake = threading.Condition()
+_senders = []
+_senders_pid = None
+_client = None
+_start_lock = threading.Lock()
+_in_flight = 0
+_digests = {}               # kind -> (combine, max_items)
+
+
+# ===================
+# STORAGE
+# ===================
+
+def _db():
+    """This thread's connection (sqlite3 connections aren't shared across threads)"""
+    conn = getattr(_local, 'conn', None)
+    if conn is None or getattr(_local, 'path', None) != OUTBOX_DB:
+        conn = sqlite3.connect(OUTBOX_DB, timeout=30, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.executescript(SCHEMA)
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(outbox)')}
+        for column, migration in MIGRATIONS:
+            if column not in columns:
+                conn.execute(migration)
+        conn.execute(BATCH_INDEX)
+        _local.conn, _local.path = conn, OUTBOX_DB
+    return conn
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT: the write lock other workers wait on"""
+    
+    def __enter__(self):
+        self.conn = _db()
+        self.conn.execute('BEGIN IMMEDIATE')
+        return self.conn
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute('COMMIT' if exc_type is None else 'ROLLBACK')
+
+
+# ===================
+# ENQUEUE
+# ===================
+
+def register_digest(kind, combine, max_items=20):
+    """How batched messages of a kind become one: combine(payloads) -> payload, at most max_items at a time"""
+    _digests[kind] = (combine, max_items)
+
+
+def enqueue(kind, url, payload, headers=None, key=None, batch=None, window=0, max_delay=0):
+    """
+    Queue a message for delivery and return at once.
+    kind: 'email' / 'teams' (logs, metrics, digests); key: idempotency key - a
+    key already queued or sent isn't queued again.
+    batch, window, max_delay: coalesce with other messages of the same batch
+    key (see COALESCING) - held `window` seconds after the latest, at most
+    `max_delay` after the first.
+    Returns {'success': True, 'status': 'queued' | 'duplicate', 'outboxId'}.
+    """
+    now = time.time()
+    headers = {'Content-Type': 'application/json', **(headers or {})}
+    if key:
+        headers['Idempotency-Key'] = key
+    
+    with _Transaction() as conn:
+        send_at = now
+        if batch and window > 0:
+            # Hold the whole batch until `window` after this message, capped by its first message
+            first = conn.execute(
+                "SELECT MIN(created_at) FROM outbox WHERE batch = ? AND status = 'pending' AND attempts = 0 AND lease_until <= ?",
+                (batch, now)
+            ).fetchone()[0]
+            send_at = min(now + window, (first or now) + max_delay)
+            conn.execute(
+                "UPDATE outbox SET next_attempt = ? WHERE batch = ? AND status = 'pending' AND attempts = 0 AND lease_until <= ?",
+                (send_at, batch, now)
+            )
+        cursor = conn.execute(
+            'INSERT OR IGNORE INTO outbox (key, kind, url, payload, headers, next_attempt, created_at, batch) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            (key, kind, url, json.dumps(payload), json.dumps(headers), send_at, now, batch)
+        )
+        existing = None if cursor.rowcount else conn.execute('SELECT id, status FROM outbox WHERE key = ?', (key,)).fetchone()
+    
+    if existing:
+        metrics.record_outbox(kind, 'duplicate')
+        logger.info('Already queued - not sending again', kind=kind, key=key, status=existing[1])
+        return {'success': True, 'status': 'duplicate', 'outboxId': existing[0]}
+    
+    metrics.record_outbox(kind, 'queued')
+    start()
+    with _wake:
+        _wake.notify()
+    logger.info('Queued', kind=kind, key=key, batch=batch, outboxId=cursor.lastrowid)
+    return {'success': True, 'status': 'queued', 'outboxId': cursor.lastrowid}
+
+
+# ===================
+# SENDERS
+# ===================
+
+def _http():
+    """The pooled client, one per process"""
+    global _client
+    if _client is None:
+        _client = httpx.Client(timeout=TIMEOUT)
+    return _client
+
+
+def _claim():
+    """
+    Lease the next due message - with the rest of its batch, oldest first -
+    or []. A batch is due when its oldest pending message is, and isn't
+    claimable while any of it is leased (per-batch ordering).
+    """
+    now = time.time()
+    with _Transaction() as conn:
+        row = conn.execute(
+            "SELECT id, kind, batch FROM outbox "
+            "WHERE status = 'pending' AND next_attempt <= ? AND lease_until <= ? AND (batch IS NULL OR id = "
+            "(SELECT MIN(id) FROM outbox AS b WHERE b.batch = outbox.batch AND b.status = 'pending')) "
+            "ORDER BY next_attempt LIMIT 1",
+            (now, now)
+        ).fetchone()
+        if row is None:
+            return []
+        
+        message_id, kind, batch = row
+        ids = [message_id]
+        if batch and kind in _digests:
+            ids = [r[0] for r in conn.execute(
+                "SELECT id FROM outbox WHERE batch = ? AND status = 'pending' ORDER BY id LIMIT ?",
+                (batch, _digests[kind][1])
+            )]
+        marks = ','.join('?' * len(ids))
+        conn.execute(f'UPDATE outbox SET lease_until = ? WHERE id IN ({marks})', (now + LEASE_SECONDS, *ids))
+        return conn.execute(
+            f'SELECT id, kind, url, payload, headers, attempts, key FROM outbox WHERE id IN ({marks}) ORDER BY id', ids
+        ).fetchall()
+
+
+def _idle_seconds():
+    """How long an idle sender sleeps: until the next retry is due, at most POLL_SECONDS"""
+    next_attempt = _db().execute("SELECT MIN(next_attempt) FROM outbox WHERE status = 'pending'").fetchone()[0]
+    if next_attempt is None:
+        return POLL_SECONDS
+    return min(POLL_SECONDS, max(0.01, next_attempt - time.time()))
+
+
+def _retryable(status_code):
+    return status_code == 429 or status_code >= 500
+
+
+def _deliver(rows):
+    """One attempt at one message, or one digest of a batch; records the outcome for every message in it"""
+    message_id, kind, url, payload, headers, attempts, key = rows[0]
+    ids = [row[0] for row in rows]
+    marks = ','.join('?' * len(ids))
+    attempts = max(row[5] for row in rows) + 1
+    if len(rows) > 1:
+        combine = _digests[kind][0]
+        payload = json.dumps(combine([json.loads(row[3]) for row in rows]))
+    error = None
+    retry = False
+    try:
+        response = _http().post(url, content=payload, headers=json.loads(headers))
+        if response.status_code not in (200, 202):
+            error = f'HTTP {response.status_code}'
+            retry = _retryable(response.status_code)
+    except Exception as e:
+        error = str(e) or type(e).__name__
+        retry = True
+    
+    conn = _db()
+    if error is None:
+        conn.execute(f"UPDATE outbox SET status = 'sent', attempts = ?, sent_at = ?, lease_until = 0 WHERE id IN ({marks})",
+                     (attempts, time.time(), *ids))
+        metrics.record_outbox_delivery(kind, len(ids))
+        logger.info('Sent', kind=kind, key=key, outboxId=message_id, messages=len(ids), attempts=attempts)
+    elif retry and attempts < OUTBOX_MAX_ATTEMPTS:
+        delay = min(OUTBOX_BACKOFF * 2 ** (attempts - 1), OUTBOX_MAX_BACKOFF)
+        conn.execute(f'UPDATE outbox SET attempts = ?, next_attempt = ?, lease_until = 0, last_error = ? WHERE id IN ({marks})',
+                     (attempts, time.time() + delay, error, *ids))
+        metrics.record_outbox(kind, 'retried', len(ids))
+        logger.warning('Send failed, retrying', kind=kind, key=key, outboxId=message_id, messages=len(ids),
+                       attempts=attempts, retryIn=delay, error=error)
+    else:
+        conn.execute(f"UPDATE outbox SET status = 'failed', attempts = ?, lease_until = 0, last_error = ? WHERE id IN ({marks})",
+                     (attempts, error, *ids))
+        metrics.record_outbox(kind, 'failed', len(ids))
+        logger.error('Send failed, giving up', kind=kind, key=key, outboxId=message_id, messages=len(ids),
+                     attempts=attempts, error=error, payload=payload)
+
+
+def _prune():
+    """Forget sent messages older than OUTBOX_KEEP (their keys with them)"""
+    _db().execute("DELETE FROM outbox WHERE status = 'sent' AND sent_at < ?", (time.time() - OUTBOX_KEEP,))
+
+
+def _sender_loop():
+    """Background thread: deliver due messages, sleeping until woken or the next retry"""
+    global _in_flight
+    last_prune = 0
+    while True:
+        try:
+            rows = _claim()
+            if not rows:
+                if time.time() - last_prune > 3600:
+                    _prune()
+                    last_prune = time.time()
+                idle = _idle_seconds()
+                with _wake:
+                    _wake.wait(idle)
+                continue
+            with _wake:
+                _in_flight += 1
+            try:
+                _deliver(rows)
+            finally:
+                with _wake:
+                    _in_flight -= 1
+                    _wake.notify_all()
+        except Exception as e:
+            logger.error('Sender error', exc_info=True, error=str(e))
+            time.sleep(POLL_SECONDS)
+
+
+def start():
+    """Start this process's senders (idempotent; restarted after a fork)"""
+    global _senders, _senders_pid, _client
+    if _senders_pid == os.getpid():
+        return
+    with _start_lock:
+        if _senders_pid == os.getpid():
+            return
+        # A forked child inherits the parent's client but none of its threads
+        _client = None
+        _senders = [
+            threading.Thread(target=_sender_loop, name=f'outbox-{n}', daemon=True)
+            for n in range(OUTBOX_SENDERS)
+        ]
+        for sender in _senders:
+            sender.start()
+        _senders_pid = os.getpid()
+
+
+def _due():
+    now = time.time()
+    return _db().execute(
+        "SELECT COUNT(*) FROM outbox WHERE status = 'pending' AND next_attempt <= ?", (now,)
+    ).fetchone()[0]
+
+
+def flush_batches():
+    """Make every held batch due now (shutdown)"""
+    _db().execute(
+        "UPDATE outbox SET next_attempt = ? WHERE batch IS NOT NULL AND status = 'pending' AND attempts = 0",
+        (time.time(),)
+    )
+
+
+def drain(timeout=None):
+    """
+    Send held batches now, then wait up to timeout (OUTBOX_DRAIN_SECONDS) for
+    due messages to go out - at shutdown. Returns what's left.
+    """
+    if _senders_pid != os.getpid():
+        return _due()
+    flush_batches()
+    deadline = time.time() + (OUTBOX_DRAIN_SECONDS if timeout is None else timeout)
+    while time.time() < deadline:
+        left = _due()
+        if not left and not _in_flight:
+            return 0
+        with _wake:
+            _wake.notify_all()
+            _wake.wait(min(0.1, max(0, deadline - time.time())))
+    left = _due()
+    if left:
+        logger.warning('Shutting down with messages queued - left for the next process', pending=left)
+    return left
+
+
+def stats():
+    """Queue counts by status, for /health"""
+    counts = dict(_db().execute('SELECT status, COUNT(*) FROM outbox GROUP BY status').fetchall())
+    return {
+        'pending': counts.get('pending', 0),
+        'failed': counts.get('failed', 0),
+        'sent': counts.get('sent', 0),
+    }
@@ -0,0 +1,230 @@
+"""
+Dot Traffic 2.0 - People Directory
+The People table held in memory and indexed, so search_people answers
+"who's our contact at Sky?" without paging through Airtable on every call.
+
+SYNC: loaded on the first search, then refreshed every PEOPLE_REFRESH seconds
+by a background thread. A failed refresh keeps the last good directory.
+Each refresh builds a new index and swaps it in whole - searches never lock.
+
+INDEXES (one per refresh):
+- by client: client code -> people, with One NZ's divisions (ONE/ONB/ONS)
+  grouped like the old Airtable filter
+- prefixes:  every prefix of every word in a name or email, and the client
+  code - "ann", "chlo", "sky" all go straight to their people
+- trigrams:  trigram -> words containing it, to find the few words worth
+  comparing for typos ("Hamsih", "chloee") and fragments ("xample")
+
+SCORING (per query word, best word of the person):
+- 1.0 exact word, 0.9 prefix, 0.8 inside a word,
+  else edit similarity (difflib ratio) if at least PEOPLE_FUZZY
+A person matches when every query word does; best average score first.
+
+Per process, like the decision cache: each gunicorn worker keeps its own copy.
+"""
+
+import os
+import re
+import time
+import threading
+from difflib import SequenceMatcher
+from collections import defaultdict
+
+import airtable
+import logs
+
+# ===================
+# CONFIG
+# ===================
+
+PEOPLE_REFRESH = int(os.environ.get('PEOPLE_REFRESH', '300'))
+
+# Lowest similarity that still counts as a typo match (0-1)
+PEOPLE_FUZZY = float(os.environ.get('PEOPLE_FUZZY', '0.75'))
+
+# Client codes searched together
+CLIENT_GROUPS = {code: ('ONE', 'ONB', 'ONS') for code in ('ONE', 'ONB', 'ONS')}
+
+_WORD = re.compile(r"[a-z0-9']+")
+
+logger = logs.get('people')
+
+# ===================
+# STATE
+# ===================
+
+_index = None               # the current _Index, swapped whole on refresh
+_loaded_at = None
+_load_lock = threading.Lock()
+_refresher = None
+
+
+# ===================
+# INDEX
+# ===================
+
+def _words(text):
+    """Lowercase words of a name, email or query ('anna.sky@example.co.nz' -> anna, sky, example, co, nz)"""
+    return _WORD.findall((text or '').lower())
+
+
+def _trigrams(word):
+    padded = f" {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _client_codes(value):
+    """'Client Link' as a list of codes (a single code or a linked list)"""
+    if isinstance(value, (list, tuple)):
+        return [str(code).upper() for code in value if code]
+    return [value.upper()] if value else []
+
+
+class _Index:
+    """Read-only indexes over one snapshot of the People table"""
+    
+    def __init__(self, people):
+        self.people = people
+        self.by_client = defaultdict(list)      # code -> [person id]
+        self.words = defaultdict(set)           # word -> {person id}
+        self.prefixes = defaultdict(set)        # prefix -> {word}
+        self.grams = defaultdict(set)           # trigram -> {word}
+        
+        for person_id, person in enumerate(people):
+            codes = _client_codes(person.get('clientCode'))
+            for code in codes:
+                self.by_client[code].append(person_id)
+            
+            for word in _words(person.get('name')) + _words(person.get('email')) + [code.lower() for code in codes]:
+                self.words[word].add(person_id)
+        
+        for word in self.words:
+            for end in range(1, len(word) + 1):
+                self.prefixes[word[:end]].add(word)
+            for gram in _trigrams(word):
+                self.grams[gram].add(word)
+    
+    def candidates(self, client_code):
+        """Person ids for a client (with its group), or everyone"""
+        if not client_code:
+            return range(len(self.people))
+        ids = set()
+        for code in CLIENT_GROUPS.get(client_code.upper(), (client_code.upper(),)):
+            ids.update(self.by_client.get(code, ()))
+        return sorted(ids)
+    
+    def word_scores(self, query_word):
+        """{indexed word: score} for one query word"""
+        scores = {word: 0.9 for word in self.prefixes.get(query_word, ())}
+        if query_word in self.words:
+            scores[query_word] = 1.0
+        
+        # Only words sharing a trigram are worth comparing
+        nearby = set()
+        for gram in _trigrams(query_word):
+            nearby.update(self.grams.get(gram, ()))
+        matcher = SequenceMatcher(None, b=query_word)
+        for word in nearby - scores.keys():
+            if len(query_word) >= 3 and query_word in word:
+                scores[word] = 0.8
+                continue
+            matcher.set_seq1(word)
+            if matcher.real_quick_ratio() < PEOPLE_FUZZY or matcher.quick_ratio() < PEOPLE_FUZZY:
+                continue
+            similarity = matcher.ratio()
+            if similarity >= PEOPLE_FUZZY:
+                scores[word] = round(min(similarity, 0.79), 3)
+        return scores
+    
+    def search(self, client_code=None, search_term=None):
+        """[(score, person)] best first"""
+        ids = self.candidates(client_code)
+        query_words = list(dict.fromkeys(_WORD.findall((search_term or '').lower())))
+        if not query_words:
+            return [(1.0, self.people[i]) for i in ids]
+        
+        allowed = set(ids)
+        totals = None
+        for query_word in query_words:
+            best = {}
+            for word, score in self.word_scores(query_word).items():
+                for person_id in self.words[word]:
+                    if person_id in allowed and score > best.get(person_id, 0):
+                        best[person_id] = score
+            if totals is None:
+                totals = best
+            else:
+                totals = {i: totals[i] + score for i, score in best.items() if i in totals}
+            if not totals:
+                return []
+        
+        ranked = sorted(totals.items(), key=lambda item: (-item[1], self.people[item[0]]['name']))
+        return [(round(total / len(query_words), 3), self.people[i]) for i, total in ranked]
+
+
+# ===================
+# SYNC
+# ===================
+
+def refresh():
+    """Reload the directory from Airtable (raises on failure; the old one stays)"""
+    global _index, _loaded_at
+    start = time.perf_counter()
+    people = airtable.get_active_people()
+    index = _Index(people)
+    _index, _loaded_at = index, time.time()
+    logger.info('Loaded', people=len(people), seconds=round(time.perf_counter() - start, 2))
+    return len(people)
+
+
+def _refresh_loop():
+    """Background thread: reload every PEOPLE_REFRESH seconds"""
+    while True:
+        time.sleep(PEOPLE_REFRESH)
+        try:
+            refresh()
+        except Exception as e:
+            logger.warning('Refresh failed, keeping the last directory', error=str(e).splitlines()[0])
+
+
+def _ensure_loaded():
+    """Load on first use and (re)start the refresher - threads don't survive a fork"""
+    global _refresher
+    if _index is not None and (PEOPLE_REFRESH <= 0 or (_refresher is not None and _refresher.is_alive())):
+        return _index
+    with _load_lock:
+        if _index is None:
+            refresh()
+        if PEOPLE_REFRESH > 0 and (_refresher is None or not _refresher.is_alive()):
+            _refresher = threading.Thread(target=_refresh_loop, name='people-refresh', daemon=True)
+            _refresher.start()
+    return _index
+
+
+# ===================
+# SEARCH
+# ===================
+
+def search(client_code=None, search_term=None):
+    """
+    People for a client and/or matching a name or email, typos allowed.
+    Returns list of {'name', 'email', 'phone', 'clientCode'} (with 'match' when
+    a search term was given), best match first. Raises if the directory can't load.
+    """
+    index = _ensure_loaded()
+    results = []
+    for score, person in index.search(client_code, search_term):
+        person = dict(person)
+        if search_term:
+            person['match'] = score
+        results.append(person)
+    return results
+
+
+def stats():
+    """Directory size and age, for /health"""
+    index = _index
+    return {
+        'people': len(index.people) if index else None,
+        'ageSeconds': round(time.time() - _loaded_at) if _loaded_at else None,
+    }
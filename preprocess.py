@@ -0,0 +1,317 @@
+"""
+Dot Traffic 2.0 - Email Preprocessing
+Shrinks an email body before it goes into Claude's prompt.
+
+Routing needs what the sender wrote, not the reply chain under it, their
+signature, the legal disclaimer or leftover HTML. A 40 KB thread usually
+routes on its first few hundred characters.
+
+PIPELINE (EMAIL_PREPROCESS; after html, line by line with each step a
+generator - so the token cap stops reading a 100 KB body once the budget is spent):
+- html:        strip tags/entities if the body is HTML
+- quoted:      drop '>' lines; cut at the first reply header ("On ... wrote:",
+               Outlook's From/Sent block, -----Original Message-----).
+               A forward keeps its first forwarded message, header collapsed
+               to one line; older history below it is cut.
+- signature:   cut at "-- " or a sign-off line ("Kind regards", "Cheers", ...)
+               that comes after what the sender wrote and starts the last
+               block - nothing but short name / title / contact lines after
+               it. A sign-off before any content ("Hi Dot, Thanks! Please
+               ...") is kept, as is anything after it.
+- disclaimers: drop confidentiality / external-sender banners
+- whitespace:  collapse blank runs, strip invisible characters
+- cap:         stop at EMAIL_TOKEN_BUDGET tokens (~CHARS_PER_TOKEN chars each)
+
+Only the prompt sees the result. The original body still goes to log_traffic,
+the worker payload and conversation memory.
+"""
+
+import os
+import re
+import html
+
+import budget
+import metrics
+import logs
+
+# ===================
+# CONFIG
+# ===================
+
+# Steps to run, in order ('' or 'off' disables preprocessing)
+EMAIL_PREPROCESS = os.environ.get('EMAIL_PREPROCESS', 'html,quoted,signature,disclaimers,whitespace,cap')
+
+# Prompt budget for the email body (0 = no cap)
+EMAIL_TOKEN_BUDGET = int(os.environ.get('EMAIL_TOKEN_BUDGET', '2000'))
+CHARS_PER_TOKEN = budget.CHARS_PER_TOKEN
+
+# A sign-off followed by more than this many lines, or by a long line, is not a signature
+SIGNATURE_MAX_LINES = 8
+SIGNATURE_MAX_LINE_CHARS = 80
+# Words in a name or title line (contact lines - phone, email, web - may have more)
+SIGNATURE_MAX_WORDS = 6
+
+TRIMMED_MARKER = '[... trimmed]'
+
+logger = logs.get('preprocess')
+
+# ===================
+# PATTERNS
+# ===================
+
+_HTML_HINT = re.compile(r'<(?:html|body|div|p|br|table|span)\b', re.IGNORECASE)
+_HTML_BREAK = re.compile(r'<\s*(?:br|/p|/div|/tr|/li|/h\d)\s*/?\s*>', re.IGNORECASE)
+_HTML_DROP = re.compile(r'<(style|script|head)\b.*?</\1\s*>', re.IGNORECASE | re.DOTALL)
+_HTML_TAG = re.compile(r'<[^>]+>')
+
+_REPLY_HEADER = re.compile(
+    r'^\s*(?:'
+    r'On .{0,200}wrote:\s*$'
+    r'|-{2,}\s*Original Message\s*-{2,}'
+    r'|_{10,}\s*$'
+    r')',
+    re.IGNORECASE
+)
+_FORWARD_HEADER = re.compile(r'^\s*-{2,}\s*Forwarded message\s*-{2,}', re.IGNORECASE)
+_HEADER_FIELD = re.compile(r'^\s*\*?(From|Sent|Date|To|Cc|Subject)\s*:\*?\s*(.*)$', re.IGNORECASE)
+_FORWARD_SUBJECT = re.compile(r'^\s*(?:FW|FWD)\s*:', re.IGNORECASE)
+
+_SIGN_OFF = re.compile(
+    r'^\s*(?:--|'
+    r'(?:kind |warm |best |many )?(?:regards|thanks|thank you|cheers|best|ngā mihi|nga mihi|talk soon)'
+    r'(?: again)?[,.!]*)\s*$',
+    re.IGNORECASE
+)
+
+_GREETING = re.compile(r'^\s*(?:hi|hey|hello|dear|morning|afternoon|good (?:morning|afternoon)|kia ora)\b[^.!?]{0,30}[,.!]?\s*$',
+                       re.IGNORECASE)
+
+# Lines that can't be part of a signature: a sentence, a request, a job number
+_SENTENCE_END = re.compile(r'[.!?]\s*$')
+_REQUEST_START = re.compile(r'^\s*(?:please|pls|can|could|would|will|and|also|just|let|need|i|we)\b', re.IGNORECASE)
+_JOB_NUMBER = re.compile(r'\b[A-Za-z]{3}(?:\s+|_)\d{3}\b')
+_CONTACT = re.compile(r'@|www\.|https?://|\d[\d ()+-]{5,}')
+
+_DISCLAIMER = re.compile(
+    r'(?:this (?:e-?mail|message)(?: and any attachments?)? (?:is|are|may be|contains?) (?:confidential|privileged|intended)'
+    r'|if you (?:have received|are not the intended)'
+    r'|caution: this email originated from outside'
+    r'|external email:|please consider the environment before printing)',
+    re.IGNORECASE
+)
+
+_INVISIBLE = re.compile('[\u200b\u200c\u200d\u2060\ufeff\u00ad]')
+
+
+# ===================
+# STEPS
+# ===================
+
+def _html_to_text(content):
+    """If the body is HTML, turn it into text (whole body, before the line steps)"""
+    if not _HTML_HINT.search(content):
+        return content
+    text = _HTML_DROP.sub('', content)
+    text = _HTML_BREAK.sub('\n', text)
+    return html.unescape(_HTML_TAG.sub('', text))
+
+
+# Line steps: (lines, subject) -> lines
+
+def _forward_line(header):
+    """One line standing in for a forwarded message's From/Sent/To/Subject block"""
+    line = f"[Forwarded from {header.get('from') or 'unknown'}"
+    if header.get('subject'):
+        line += f": {header['subject']}"
+    return line + ']'
+
+
+def _quoted(lines, subject):
+    """Drop quoted history; a forward keeps its first forwarded message"""
+    forwards_left = 1 if _FORWARD_SUBJECT.match(subject or '') else 0
+    held = None     # a From: line that may start an Outlook header block
+    header = None   # fields of the forwarded header block being read
+    
+    for line in lines:
+        field = _HEADER_FIELD.match(line)
+        
+        if header is not None:
+            if field:
+                header[field.group(1).lower()] = field.group(2).strip()
+                continue
+            if not line.strip() and not header:
+                continue
+            yield _forward_line(header)
+            header = None
+        
+        if held is not None:
+            if field and field.group(1).lower() != 'from':
+                # From: then Sent:/To:/... - a reply or forward header
+                if not forwards_left:
+                    return
+                forwards_left -= 1
+                header = {'from': _HEADER_FIELD.match(held).group(2).strip(), field.group(1).lower(): field.group(2).strip()}
+                held = None
+                continue
+            yield held
+            held = None
+        
+        if line.lstrip().startswith('>'):
+            continue
+        if _REPLY_HEADER.match(line) or _FORWARD_HEADER.match(line):
+            if not forwards_left:
+                return
+            forwards_left -= 1
+            header = {}
+            continue
+        if field and field.group(1).lower() == 'from':
+            held = line
+            continue
+        yield line
+    
+    if header:
+        yield _forward_line(header)
+    if held is not None:
+        yield held
+
+
+def _signature_line(line):
+    """Whether a line after a sign-off could be a name, title or contact line"""
+    text = line.strip()
+    if not text:
+        return True
+    if len(line) > SIGNATURE_MAX_LINE_CHARS or _JOB_NUMBER.search(text) or _REQUEST_START.match(text):
+        return False
+    if _CONTACT.search(text):
+        return True
+    return not _SENTENCE_END.search(text) and len(text.split()) <= SIGNATURE_MAX_WORDS
+
+
+def _signature(lines, subject):
+    """
+    Cut at a sign-off that follows the sender's content and is followed only
+    by a short block of signature lines to the end of the body
+    """
+    held = None
+    content = False     # a line that isn't a greeting or a sign-off has been seen
+    for line in lines:
+        if held is not None:
+            if _signature_line(line) and len(held) <= SIGNATURE_MAX_LINES:
+                held.append(line)
+                continue
+            # Not a signature after all - this line is looked at afresh below
+            yield from held
+            held = None
+        if _SIGN_OFF.match(line):
+            if content:
+                held = [line]
+                continue
+        elif line.strip() and not _GREETING.match(line):
+            content = True
+        yield line
+    
+    if held:
+        # Keep the sign-off itself ("Thanks," carries tone), drop what follows
+        yield held[0]
+
+
+def _disclaimers(lines, subject):
+    """Drop the paragraph a disclaimer starts in"""
+    skipping = False
+    for line in lines:
+        if skipping:
+            if not line.strip():
+                skipping = False
+            continue
+        if _DISCLAIMER.search(line):
+            skipping = True
+            continue
+        yield line
+
+
+def _whitespace(lines, subject):
+    """Strip invisible characters, trailing space and runs of blank lines"""
+    blank = True
+    for line in lines:
+        line = _INVISIBLE.sub('', line).replace('\xa0', ' ').rstrip()
+        if not line:
+            if not blank:
+                yield ''
+            blank = True
+            continue
+        blank = False
+        yield line
+
+
+def _cap(lines, subject):
+    """Stop once the token budget is spent"""
+    if not EMAIL_TOKEN_BUDGET:
+        yield from lines
+        return
+    remaining = EMAIL_TOKEN_BUDGET * CHARS_PER_TOKEN
+    for line in lines:
+        if len(line) + 1 > remaining:
+            if remaining > 0:
+                yield line[:remaining].rsplit(' ', 1)[0]
+            yield TRIMMED_MARKER
+            return
+        remaining -= len(line) + 1
+        yield line
+
+
+STEPS = {
+    'quoted': _quoted,
+    'signature': _signature,
+    'disclaimers': _disclaimers,
+    'whitespace': _whitespace,
+    'cap': _cap,
+}
+
+
+def _configured_steps(setting):
+    """Step names from EMAIL_PREPROCESS ('html' is applied to the whole body first)"""
+    names = [n.strip() for n in setting.split(',') if n.strip()]
+    if names == ['off']:
+        return []
+    unknown = [n for n in names if n != 'html' and n not in STEPS]
+    if unknown:
+        logger.warning('Ignoring unknown steps', steps=unknown)
+    return [n for n in names if n == 'html' or n in STEPS]
+
+
+PIPELINE = _configured_steps(EMAIL_PREPROCESS)
+
+
+# ===================
+# ENTRY POINT
+# ===================
+
+def clean_email(content, subject='', steps=None):
+    """
+    Email body as Claude should see it.
+    steps: step names to run (default: EMAIL_PREPROCESS).
+    Returns (text, stats) - stats: {'originalChars', 'chars', 'ratio'}.
+    """
+    steps = PIPELINE if steps is None else steps
+    content = content or ''
+    if not steps or not content:
+        return content, {'originalChars': len(content), 'chars': len(content), 'ratio': 1.0}
+    
+    text = _html_to_text(content) if 'html' in steps else content
+    lines = iter(text.splitlines())
+    for name in steps:
+        if name in STEPS:
+            lines = STEPS[name](lines, subject)
+    text = '\n'.join(lines).strip()
+    
+    # Never hand Claude nothing when the sender wrote something
+    if not text:
+        text = content[:EMAIL_TOKEN_BUDGET * CHARS_PER_TOKEN] if EMAIL_TOKEN_BUDGET else content
+    
+    stats = {
+        'originalChars': len(content),
+        'chars': len(text),
+        'ratio': round(len(text) / len(content), 4),
+    }
+    metrics.record_preprocess(stats['originalChars'], stats['chars'])
+    return text, stats
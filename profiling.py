@@ -0,0 +1,302 @@
+"""
+Dot Traffic 2.0 - Profiling
+CPU profiles (cProfile) and allocation snapshots (tracemalloc) of real
+/traffic and /hub requests, stored under their trace id - so a slow request
+seen in a trace can be opened as a profile.
+
+WHICH REQUESTS (any of):
+- PROFILE=on              every request
+- PROFILE_SAMPLE_RATE     a random share of requests (e.g. 0.01)
+- X-Dot-Profile header    one request, when the header carries PROFILE_TOKEN
+
+WHAT (PROFILE_MODE, default 'cpu,memory'):
+- cpu:    cProfile of the request thread - the top functions by cumulative
+          time, plus the raw .prof file for snakeviz / pstats
+- memory: tracemalloc snapshots before and after; the lines that allocated
+          most during the request. tracemalloc only runs while a memory
+          profile is open, so unprofiled requests pay nothing.
+
+One CPU profile runs at a time per process (cProfile is process-wide from
+Python 3.12); a request picked while one is running gets memory only.
+
+Under asgi.py the event loop runs other requests in between, so a CPU
+profile there covers whatever the loop did meanwhile - use it for hot spots,
+not per-request attribution. Gate lookups on GATE_POOL threads aren't in the
+request thread's profile.
+
+STORAGE: PROFILE_DIR (shared by every worker on the box), newest
+PROFILE_KEEP kept. Written on a background thread, like trace exports.
+Read them at /admin/profiles (X-Dot-Profile header with PROFILE_TOKEN).
+"""
+
+import os
+import io
+import json
+import time
+import random
+import pstats
+import cProfile
+import inspect
+import tempfile
+import functools
+import threading
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import tracing
+import logs
+
+# ===================
+# CONFIG
+# ===================
+
+PROFILE = os.environ.get('PROFILE', 'off')
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', '0'))
+PROFILE_MODE = os.environ.get('PROFILE_MODE', 'cpu,memory')
+PROFILE_TOKEN = os.environ.get('PROFILE_TOKEN', '')
+PROFILE_DIR = os.environ.get('PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'dot-profiles'))
+PROFILE_KEEP = int(os.environ.get('PROFILE_KEEP', '50'))
+
+PROFILE_HEADER = 'X-Dot-Profile'
+
+# Rows kept in a profile's summary
+TOP_FUNCTIONS = 40
+TOP_ALLOCATIONS = 25
+
+_write_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='profile-write')
+
+# tracemalloc is process-wide: started by the first open memory profile, stopped by the last
+_memory_lock = threading.Lock()
+_memory_open = 0
+
+# One cProfile at a time in the process: from 3.12 a second one on any thread
+# raises ValueError, and asgi runs many requests on one thread
+_cpu_lock = threading.Lock()
+
+logger = logs.get('profiling')
+
+# ===================
+# SELECTION
+# ===================
+
+def authorized(header_value):
+    """Whether a request carries the profiling token"""
+    return bool(PROFILE_TOKEN) and header_value == PROFILE_TOKEN
+
+
+def wanted(header_value=None):
+    """Whether to profile this request"""
+    if PROFILE == 'on' or authorized(header_value):
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+# ===================
+# CAPTURE
+# ===================
+
+def _start_memory():
+    global _memory_open
+    with _memory_lock:
+        if _memory_open == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        _memory_open += 1
+    return tracemalloc.take_snapshot()
+
+
+def _stop_memory(before):
+    global _memory_open
+    after = tracemalloc.take_snapshot()
+    with _memory_lock:
+        _memory_open -= 1
+        if _memory_open == 0:
+            tracemalloc.stop()
+    return before, after
+
+
+def _start_cpu():
+    """A running cProfile, or None while another request holds the profiler"""
+    if not _cpu_lock.acquire(blocking=False):
+        return None
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Another profiling tool (a debugger, py-spy in-process) is already active
+        _cpu_lock.release()
+        return None
+    except BaseException:
+        _cpu_lock.release()
+        raise
+    return profiler
+
+
+class _Capture:
+    """One request's profile: cProfile and/or tracemalloc around the handler"""
+    
+    def __init__(self, name, header):
+        self.name = name
+        self.header = header
+        self.active = False
+    
+    def __enter__(self):
+        header = self.header() if callable(self.header) else self.header
+        if not wanted(header):
+            return self
+        self.active = True
+        self.modes = {m.strip() for m in PROFILE_MODE.split(',')}
+        self.trace_id = tracing.current_trace_id()
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.snapshot = _start_memory() if 'memory' in self.modes else None
+        self.profiler = None
+        try:
+            if 'cpu' in self.modes:
+                self.profiler = _start_cpu()
+        except BaseException:
+            if self.snapshot:
+                _stop_memory(self.snapshot)
+            raise
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        if not self.active:
+            return False
+        if self.profiler:
+            self.profiler.disable()
+        seconds = time.perf_counter() - self.start
+        snapshots = _stop_memory(self.snapshot) if self.snapshot else None
+        if self.profiler:
+            # After the memory snapshot, so the profiler's own allocations aren't in it
+            self.profiler.create_stats()
+            _cpu_lock.release()
+        _write_pool.submit(_store, self.name, self.trace_id, self.started_at, seconds, self.profiler, snapshots)
+        return False
+    
+    def __call__(self, fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with _Capture(self.name, self.header):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+        
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _Capture(self.name, self.header):
+                return fn(*args, **kwargs)
+        return wrapper
+
+
+def profile(name, header=None):
+    """
+    Profile a request handler if this request is picked (see wanted).
+    header: the X-Dot-Profile value, or a function returning it. Put it under
+    tracing.trace so the profile is filed under the request's trace id.
+    """
+    return _Capture(name, header)
+
+
+# ===================
+# STORAGE
+# ===================
+
+def _cpu_summary(profiler):
+    out = io.StringIO()
+    stats = pstats.Stats(profiler, stream=out)
+    stats.sort_stats('cumulative').print_stats(TOP_FUNCTIONS)
+    return out.getvalue()
+
+
+def _memory_summary(snapshots):
+    before, after = snapshots
+    ignore = [tracemalloc.Filter(False, module.__file__) for module in (tracemalloc, cProfile)]
+    before, after = before.filter_traces(ignore), after.filter_traces(ignore)
+    return [
+        {'where': str(stat.traceback[0]), 'sizeKiB': round(stat.size_diff / 1024, 1), 'count': stat.count_diff}
+        for stat in after.compare_to(before, 'lineno')[:TOP_ALLOCATIONS]
+    ]
+
+
+def _store(name, trace_id, started_at, seconds, profiler, snapshots):
+    """Background: write the summary (and .prof) to PROFILE_DIR, then prune"""
+    try:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        profile_id = trace_id or f"untraced-{int(started_at * 1000)}-{os.getpid()}"
+        summary = {
+            'id': profile_id,
+            'traceId': trace_id,
+            'name': name,
+            'pid': os.getpid(),
+            'startedAt': started_at,
+            'seconds': round(seconds, 4),
+        }
+        if profiler:
+            profiler.dump_stats(os.path.join(PROFILE_DIR, f"{profile_id}.prof"))
+            summary['cpu'] = _cpu_summary(profiler)
+        if snapshots:
+            summary['memory'] = _memory_summary(snapshots)
+        with open(os.path.join(PROFILE_DIR, f"{profile_id}.json"), 'w') as f:
+            json.dump(summary, f)
+        logger.info('Profiled', name=name, ms=round(seconds * 1000), profileId=profile_id)
+        _prune()
+    except Exception as e:
+        logger.error('Error storing profile', error=str(e))
+
+
+def _prune():
+    summaries = sorted(
+        (entry for entry in os.scandir(PROFILE_DIR) if entry.name.endswith('.json')),
+        key=lambda entry: entry.stat().st_mtime
+    )
+    for entry in summaries[:max(0, len(summaries) - PROFILE_KEEP)]:
+        base = entry.path[:-len('.json')]
+        for path in (entry.path, base + '.prof'):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+# ===================
+# ADMIN
+# ===================
+
+def _safe_id(profile_id):
+    return bool(profile_id) and all(c.isalnum() or c == '-' for c in profile_id)
+
+
+def list_profiles():
+    """Stored profiles, newest first: [{'id', 'traceId', 'name', 'seconds', 'startedAt'}]"""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    profiles = []
+    for entry in os.scandir(PROFILE_DIR):
+        if not entry.name.endswith('.json'):
+            continue
+        try:
+            with open(entry.path) as f:
+                summary = json.load(f)
+        except (OSError, ValueError):
+            continue
+        profiles.append({key: summary.get(key) for key in ('id', 'traceId', 'name', 'seconds', 'startedAt', 'pid')})
+    return sorted(profiles, key=lambda p: p['startedAt'] or 0, reverse=True)
+
+
+def get_profile(profile_id):
+    """A stored profile's summary (CPU top functions, allocations), or None"""
+    if not _safe_id(profile_id):
+        return None
+    try:
+        with open(os.path.join(PROFILE_DIR, f"{profile_id}.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def profile_path(profile_id):
+    """Path of a stored .prof file, or None"""
+    if not _safe_id(profile_id):
+        return None
+    path = os.path.join(PROFILE_DIR, f"{profile_id}.prof")
+    return path if os.path.exists(path) else None
@@ -0,0 +1,257 @@
+"""
+Dot Traffic 2.0 - Job Number Reservations
+Hands out job numbers without two setups ever getting the same one, and
+without two Airtable round trips per reservation.
+
+HOW:
+- Numbers are claimed from Airtable's 'Next Job #' in blocks of
+  RESERVATION_BLOCK (one read + one write per block, not per number) and kept
+  in a local SQLite file shared by every gunicorn worker on the box.
+- A reservation takes the next number from the client's block inside a
+  process lock (threads) and a short SQLite write transaction (other
+  workers), so allocations per client are strictly serial. Every number
+  handed out is also written to a `reserved` table with a unique key - a
+  repeat is impossible.
+- A block is only claimed when a reservation finds the last one used up.
+  The Airtable read and write happen under a per-client file lock, outside
+  the SQLite write lock, so other clients' reservations (and other workers)
+  don't wait on the round trip. Airtable's counter is at most one block
+  ahead of the numbers handed out; next_number() is what get_client_detail
+  reports.
+- Unused numbers are handed back to Airtable (only if nobody has moved the
+  counter since): at shutdown (release_unused) and, for blocks a crashed or
+  killed server left behind, when the next one warms up (release_leftovers).
+
+DURABILITY: keep RESERVATIONS_DB on a disk that survives restarts, or a
+crash leaves up to RESERVATION_BLOCK - 1 numbers per client unused.
+RESERVATION_BLOCK=1 keeps Airtable's counter exact (a read + write per number).
+
+LIMITS: the SQLite file serializes workers on one machine. Separate machines
+each claim their own blocks - those never overlap, but the block claim itself
+is a read-then-write on Airtable, as the old per-number reservation was.
+"""
+
+import os
+import time
+import uuid
+import fcntl
+import sqlite3
+import threading
+import contextlib
+from collections import defaultdict
+
+import airtable
+import logs
+
+# ===================
+# CONFIG
+# ===================
+
+RESERVATIONS_DB = os.environ.get('RESERVATIONS_DB', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'reservations.sqlite3'))
+RESERVATION_BLOCK = int(os.environ.get('RESERVATION_BLOCK', '5'))
+
+# This server run (gunicorn.conf.py sets it in the master so every worker shares it)
+BOOT_ID = os.environ.setdefault('DOT_BOOT_ID', uuid.uuid4().hex)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blocks (
+    client_code TEXT PRIMARY KEY,
+    client_name TEXT,
+    record_id TEXT,
+    next INTEGER NOT NULL,
+    end INTEGER NOT NULL,
+    claimed_at REAL,
+    boot TEXT
+);
+CREATE TABLE IF NOT EXISTS reserved (
+    job_number TEXT PRIMARY KEY,
+    client_code TEXT NOT NULL,
+    reserved_at REAL NOT NULL
+);
+"""
+
+# Columns added since the first schema: (column, statement)
+MIGRATIONS = (
+    ('boot', 'ALTER TABLE blocks ADD COLUMN boot TEXT'),
+)
+
+
+class ReservationError(Exception):
+    """A job number couldn't be reserved (unknown client, no sequence, Airtable down)"""
+
+
+logger = logs.get('reservations')
+
+# ===================
+# STORAGE
+# ===================
+
+_local = threading.local()
+_locks = defaultdict(threading.Lock)
+_locks_guard = threading.Lock()
+
+
+def _db():
+    """This thread's connection (sqlite3 connections aren't shared across threads)"""
+    conn = getattr(_local, 'conn', None)
+    if conn is None or getattr(_local, 'path', None) != RESERVATIONS_DB:
+        os.makedirs(os.path.dirname(RESERVATIONS_DB) or '.', exist_ok=True)
+        conn = sqlite3.connect(RESERVATIONS_DB, timeout=30, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')  # durable across process crashes; no fsync per reservation
+        conn.executescript(SCHEMA)
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(blocks)')}
+        for column, migration in MIGRATIONS:
+            if column not in columns:
+                conn.execute(migration)
+        _local.conn, _local.path = conn, RESERVATIONS_DB
+    return conn
+
+
+def _client_lock(client_code):
+    with _locks_guard:
+        return _locks[client_code]
+
+
+@contextlib.contextmanager
+def _claim_lock(client_code):
+    """
+    Cross-process lock on one client's block claims, held across the Airtable
+    round trips. A file lock, so a worker that dies holding it lets go.
+    """
+    os.makedirs(os.path.dirname(RESERVATIONS_DB) or '.', exist_ok=True)
+    with open(f"{RESERVATIONS_DB}.{client_code}.lock", 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT: the write lock other workers wait on"""
+    
+    def __enter__(self):
+        self.conn = _db()
+        self.conn.execute('BEGIN IMMEDIATE')
+        return self.conn
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute('COMMIT' if exc_type is None else 'ROLLBACK')
+
+
+# ===================
+# BLOCKS
+# ===================
+
+def _claim_block(client_code):
+    """Move Airtable's counter on by a block and keep the block (under _claim_lock)"""
+    counter = airtable.get_job_counter(client_code)
+    if counter is None:
+        raise ReservationError(f'Client {client_code} not found')
+    if not counter['next']:
+        raise ReservationError(f'No job number sequence configured for {client_code}')
+    try:
+        start = int(counter['next'])
+    except ValueError:
+        raise ReservationError(f"Invalid job number format: {counter['next']}")
+    
+    end = start + RESERVATION_BLOCK
+    airtable.set_job_counter(counter['recordId'], end)
+    with _Transaction() as conn:
+        conn.execute(
+            'INSERT OR REPLACE INTO blocks (client_code, client_name, record_id, next, end, claimed_at, boot) VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (client_code, counter['clientName'], counter['recordId'], start, end, time.time(), BOOT_ID)
+        )
+    logger.info('Claimed block', clientCode=client_code, first=f"{start:03d}", last=f"{end - 1:03d}")
+
+
+def _take(client_code):
+    """The next number from the client's block: (client_name, number, end), or None when it's used up"""
+    with _Transaction() as conn:
+        row = conn.execute('SELECT client_name, next, end FROM blocks WHERE client_code = ?', (client_code,)).fetchone()
+        if row is None:
+            return None
+        client_name, number, end = row
+        
+        # Skip anything already handed out (a block claimed twice by hand-edited counters)
+        while number < end and conn.execute('SELECT 1 FROM reserved WHERE job_number = ?', (f"{client_code} {number:03d}",)).fetchone():
+            number += 1
+        if number >= end:
+            conn.execute('UPDATE blocks SET next = end WHERE client_code = ?', (client_code,))
+            return None
+        
+        conn.execute('INSERT INTO reserved (job_number, client_code, reserved_at) VALUES (?, ?, ?)', (f"{client_code} {number:03d}", client_code, time.time()))
+        conn.execute('UPDATE blocks SET next = ? WHERE client_code = ?', (number + 1, client_code))
+    return client_name, number, end
+
+
+# ===================
+# RESERVE
+# ===================
+
+def reserve(client_code):
+    """
+    Reserve the next job number for a client.
+    Returns {'clientCode', 'clientName', 'reservedJobNumber', 'nextJobNumber'};
+    raises ReservationError.
+    """
+    with _client_lock(client_code):
+        taken = _take(client_code)
+        if taken is None:
+            with _claim_lock(client_code):
+                # Another worker may have claimed one while we waited
+                taken = _take(client_code)
+                while taken is None:
+                    _claim_block(client_code)
+                    taken = _take(client_code)
+        
+    client_name, number, end = taken
+    return {
+        'clientCode': client_code,
+        'clientName': client_name,
+        'reservedJobNumber': f"{client_code} {number:03d}",
+        'nextJobNumber': f"{number + 1:03d}",
+    }
+
+
+def next_number(client_code):
+    """The number the next reservation will get ('056'), or None if no block is held - then Airtable's counter is right"""
+    row = _db().execute('SELECT next FROM blocks WHERE client_code = ? AND next < end', (client_code,)).fetchone()
+    return f"{row[0]:03d}" if row else None
+
+
+def release_unused(leftovers_only=False):
+    """
+    Hand unused block numbers back to Airtable (shutdown hook). A counter that
+    moved since the claim is left alone - someone else has numbers past ours.
+    leftovers_only: just blocks claimed by an earlier server run.
+    """
+    with _Transaction() as conn:
+        query = 'SELECT client_code, record_id, next, end FROM blocks WHERE next < end'
+        params = ()
+        if leftovers_only:
+            query += ' AND (boot IS NULL OR boot != ?)'
+            params = (BOOT_ID,)
+        rows = conn.execute(query, params).fetchall()
+    
+    for client_code, record_id, number, end in rows:
+        with _client_lock(client_code), _claim_lock(client_code):
+            # Drop the block first so nothing is taken from it while its numbers go back
+            with _Transaction() as conn:
+                dropped = conn.execute('DELETE FROM blocks WHERE client_code = ? AND next = ? AND end = ?',
+                                       (client_code, number, end)).rowcount
+            if not dropped:
+                continue
+            try:
+                counter = airtable.get_job_counter(client_code)
+                if counter and counter['next'] and int(counter['next']) == end:
+                    airtable.set_job_counter(record_id, number)
+                    logger.info('Released block', clientCode=client_code, first=f"{number:03d}", last=f"{end - 1:03d}")
+            except Exception as e:
+                logger.error('Error releasing block', clientCode=client_code, error=str(e))
+
+
+def release_leftovers():
+    """Warm-up: hand back blocks a crashed or killed server run left behind"""
+    release_unused(leftovers_only=True)
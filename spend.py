@@ -0,0 +1,232 @@
+"""
+Dot Traffic 2.0 - Spend View
+Every client's spend summary for every period, worked out ahead of time and
+served from memory - get_spend_summary is a dict lookup, and
+get_all_spend_summaries answers "who's over budget this quarter?" in one call.
+
+VIEW (build_view): client code -> period -> summary, for this_month,
+this_quarter, last_quarter and each calendar quarter (JAN-MAR ... OCT-DEC),
+with the quarter mapping, rollover and currency parsing done once.
+
+SYNC: the Clients table (all pages) is loaded on first use, then re-read
+every SPEND_REFRESH seconds by a background thread. The view is only rebuilt
+when the spend fields changed (a hash of them) or the month turned over -
+this_month and this_quarter move with the calendar. A failed refresh keeps
+the last good view.
+
+Per process, like the People directory: each gunicorn worker keeps its own.
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+from datetime import datetime
+
+import airtable
+import logs
+
+# ===================
+# CONFIG
+# ===================
+
+SPEND_REFRESH = int(os.environ.get('SPEND_REFRESH', '300'))
+
+QUARTERS = ('JAN-MAR', 'APR-JUN', 'JUL-SEP', 'OCT-DEC')
+PERIODS = ('this_month', 'this_quarter', 'last_quarter') + QUARTERS
+
+# Clients fields the view is built from - a change to any other field doesn't rebuild it
+SPEND_FIELDS = ('Client code', 'Clients', 'Monthly Committed', 'Rollover Credit', 'Rollover use',
+                'Current Quarter', 'This month') + QUARTERS
+
+logger = logs.get('spend')
+
+# ===================
+# STATE
+# ===================
+
+_view = None                # code -> period -> summary
+_view_month = None          # 'YYYY-MM' the view was built for
+_view_hash = None
+_records = []
+_loaded_at = None
+_load_lock = threading.Lock()
+_refresher = None
+
+
+# ===================
+# VIEW
+# ===================
+
+def _currency(value):
+    """'$12,500', 12500, [12500] -> 12500.0"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        return float(value.replace('$', '').replace(',', '') or 0)
+    if isinstance(value, list):
+        return float(value[0]) if value else 0
+    return 0
+
+
+def _calendar_quarter(month):
+    return QUARTERS[(month - 1) // 3]
+
+
+def _previous_quarter_label(current_quarter):
+    """'Q3' -> 'Q2', 'Q1' -> 'Q4' (the client's financial quarters)"""
+    current = int((current_quarter or '').replace('Q', '') or 1)
+    return f'Q{current - 1 if current > 1 else 4}'
+
+
+def _percent(spent, budget):
+    return round((spent / budget * 100) if budget > 0 else 0)
+
+
+def _client_periods(fields, client_code, now):
+    """{period: summary} for one Clients record"""
+    name = fields.get('Clients', '')
+    monthly = _currency(fields.get('Monthly Committed', 0))
+    rollover = _currency(fields.get('Rollover Credit', 0))
+    rollover_use = fields.get('Rollover use', '')
+    current_quarter = fields.get('Current Quarter', '')
+    this_month = _currency(fields.get('This month', 0))
+    
+    periods = {
+        'this_month': {
+            'client': name,
+            'clientCode': client_code,
+            'period': now.strftime('%B'),
+            'budget': monthly,
+            'spent': this_month,
+            'remaining': monthly - this_month,
+            'percentUsed': _percent(this_month, monthly),
+        }
+    }
+    
+    for quarter in QUARTERS:
+        spent = _currency(fields.get(quarter, 0))
+        rollover_applied = rollover_use == quarter and rollover > 0
+        budget = monthly * 3 + (rollover if rollover_applied else 0)
+        periods[quarter] = {
+            'client': name,
+            'clientCode': client_code,
+            'period': quarter,
+            'budget': budget,
+            'spent': spent,
+            'remaining': budget - spent,
+            'percentUsed': _percent(spent, budget),
+            'rolloverApplied': rollover_applied,
+            'rolloverAmount': rollover if rollover_use == quarter else 0,
+        }
+    
+    this_quarter = _calendar_quarter(now.month)
+    last_quarter = QUARTERS[QUARTERS.index(this_quarter) - 1]
+    periods['this_quarter'] = dict(periods[this_quarter], period=current_quarter)
+    try:
+        periods['last_quarter'] = dict(periods[last_quarter], period=_previous_quarter_label(current_quarter))
+    except ValueError:
+        periods['last_quarter'] = dict(periods[last_quarter])
+    return periods
+
+
+def build_view(records, now=None):
+    """code -> period -> summary for every client (the first record wins for a repeated code)"""
+    now = now or datetime.now()
+    view = {}
+    for record in records:
+        fields = record.get('fields', {})
+        code = fields.get('Client code', '')
+        if code and code not in view:
+            view[code] = _client_periods(fields, code, now)
+    return view
+
+
+def _fingerprint(records):
+    spend = [{field: record.get('fields', {}).get(field) for field in SPEND_FIELDS} for record in records]
+    return hashlib.blake2b(json.dumps(spend, sort_keys=True, default=str).encode(), digest_size=16).digest()
+
+
+# ===================
+# SYNC
+# ===================
+
+def refresh():
+    """Re-read Clients and rebuild the view if spend data changed (raises on failure; the old view stays)"""
+    global _records, _loaded_at
+    records = airtable.get_all_clients()
+    _records, _loaded_at = records, time.time()
+    _rebuild(records)
+    return len(records)
+
+
+def _rebuild(records):
+    """Build the view unless it's already current for these records and this month"""
+    global _view, _view_month, _view_hash
+    now = datetime.now()
+    month = now.strftime('%Y-%m')
+    fingerprint = _fingerprint(records)
+    if _view is not None and fingerprint == _view_hash and month == _view_month:
+        return False
+    start = time.perf_counter()
+    _view = build_view(records, now)
+    _view_month, _view_hash = month, fingerprint
+    logger.info('Built view', clients=len(_view), ms=round((time.perf_counter() - start) * 1000, 1))
+    return True
+
+
+def _refresh_loop():
+    """Background thread: re-read Clients every SPEND_REFRESH seconds"""
+    while True:
+        time.sleep(SPEND_REFRESH)
+        try:
+            refresh()
+        except Exception as e:
+            logger.warning('Refresh failed, keeping the last view', error=str(e).splitlines()[0])
+
+
+def _ensure_loaded():
+    """Load on first use, (re)start the refresher, and roll the view over at month end"""
+    global _refresher
+    if _view is None or (SPEND_REFRESH > 0 and (_refresher is None or not _refresher.is_alive())):
+        with _load_lock:
+            if _view is None:
+                refresh()
+            if SPEND_REFRESH > 0 and (_refresher is None or not _refresher.is_alive()):
+                _refresher = threading.Thread(target=_refresh_loop, name='spend-refresh', daemon=True)
+                _refresher.start()
+    if _view_month != datetime.now().strftime('%Y-%m'):
+        with _load_lock:
+            _rebuild(_records)
+    return _view
+
+
+# ===================
+# LOOKUPS
+# ===================
+
+def _period(period):
+    """Unknown periods fall back to this quarter, as they always have"""
+    return period if period in PERIODS else 'this_quarter'
+
+
+def summary(client_code, period='this_month'):
+    """One client's spend summary for a period, or None if there's no such client"""
+    client = _ensure_loaded().get((client_code or '').upper())
+    return dict(client[_period(period)]) if client else None
+
+
+def all_summaries(period='this_month'):
+    """Every client's spend summary for a period, by client code"""
+    view = _ensure_loaded()
+    period = _period(period)
+    return [dict(view[code][period]) for code in sorted(view)]
+
+
+def stats():
+    """View size and age, for /health"""
+    return {
+        'clients': len(_view) if _view is not None else None,
+        'ageSeconds': round(time.time() - _loaded_at) if _loaded_at else None,
+    }
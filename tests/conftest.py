@@ -0,0 +1,12 @@
+"""
+Tests - shared setup
+The app's modules live at the repo root and read their keys at import time.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault('ANTHROPIC_API_KEY', 'test')
+os.environ.setdefault('AIRTABLE_API_KEY', 'test')
@@ -0,0 +1,114 @@
+"""Breakers: closed -> open -> half_open -> closed/open, slow calls, fault classification"""
+
+import time
+import types
+
+import pytest
+
+import breaker
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+    
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(breaker, 'time', types.SimpleNamespace(monotonic=clock, perf_counter=time.perf_counter))
+    return clock
+
+
+def make(**kwargs):
+    settings = {'window': 60, 'min_calls': 4, 'failure_ratio': 0.5, 'cooldown': 30}
+    return breaker.Breaker('test', **{**settings, **kwargs})
+
+
+class HTTPError(Exception):
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+def test_opens_at_failure_ratio(clock):
+    b = make()
+    for ok in (True, False, True):
+        b.record(ok)
+    assert b.state == 'closed'      # under min_calls
+    b.record(False)
+    assert b.state == 'open'
+    assert not b.allow()
+    with pytest.raises(breaker.BreakerOpen):
+        with b.guard():
+            pass
+
+
+def test_window_forgets_old_failures(clock):
+    b = make()
+    b.record(False)
+    b.record(False)
+    clock.now += 61
+    for _ in range(3):
+        b.record(True)
+    b.record(False)
+    assert b.state == 'closed'
+
+
+def test_half_open_trial_success_closes(clock):
+    b = make()
+    for _ in range(4):
+        b.record(False)
+    clock.now += 29
+    assert not b.allow()
+    assert b.retry_in() == pytest.approx(1)
+    
+    clock.now += 1
+    assert b.allow()                # the one trial call
+    assert b.state == 'half_open'
+    assert not b.allow()            # nobody else while it runs
+    b.record(True)
+    assert b.state == 'closed'
+    assert b.allow()
+    assert b.snapshot()['calls'] == 0
+
+
+def test_half_open_trial_failure_reopens(clock):
+    b = make()
+    for _ in range(4):
+        b.record(False)
+    clock.now += 30
+    with pytest.raises(HTTPError):
+        with b.guard():
+            raise HTTPError(503)
+    assert b.state == 'open'
+    assert b.retry_in() == pytest.approx(30)
+
+
+def test_slow_calls_fail_only_with_a_threshold(clock):
+    slow = make(slow_seconds=5)
+    for _ in range(4):
+        slow.record(True, seconds=6)
+    assert slow.state == 'open'
+    
+    for _ in range(4):
+        breaker.workers.record(True, seconds=80)   # a long setup, inside WORKER_TIMEOUT
+    assert breaker.workers.state == 'closed'
+    assert breaker.workers.slow_seconds is None
+    breaker.workers.calls.clear()
+
+
+def test_client_errors_dont_count(clock):
+    b = make()
+    for _ in range(4):
+        with pytest.raises(HTTPError):
+            with b.guard():
+                raise HTTPError(404)
+    assert b.state == 'closed'
+    for _ in range(4):
+        with pytest.raises(HTTPError):
+            with b.guard():
+                raise HTTPError(429)
+    assert b.state == 'open'
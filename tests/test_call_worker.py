@@ -0,0 +1,61 @@
+"""app.call_worker and asgi.call_worker return the same results"""
+
+import asyncio
+
+import httpx
+import pytest
+
+import app
+import asgi
+import breaker
+
+
+def outcome(kind):
+    """An httpx handler for one worker outcome"""
+    def handler(request):
+        if kind == 'timeout':
+            raise httpx.ReadTimeout('timed out', request=request)
+        if kind == 'refused':
+            raise httpx.ConnectError('connection refused', request=request)
+        if kind == 'error':
+            return httpx.Response(503, text='unavailable')
+        return httpx.Response(200, json={'success': True, 'jobNumber': 'TOW 001'})
+    return handler
+
+
+@pytest.fixture(autouse=True)
+def closed_breaker():
+    breaker.workers._move('closed', 0)
+    yield
+    breaker.workers._move('closed', 0)
+
+
+def sync_call(kind, monkeypatch, **kwargs):
+    client = httpx.Client(transport=httpx.MockTransport(outcome(kind)))
+    monkeypatch.setattr(app.httpx, 'post', client.post)
+    return app.call_worker('update', {'jobNumber': 'TOW 001'}, **kwargs)
+
+
+def async_call(kind, monkeypatch, **kwargs):
+    monkeypatch.setattr(asgi, 'worker_client', httpx.AsyncClient(transport=httpx.MockTransport(outcome(kind))))
+    return asyncio.run(asgi.call_worker('update', {'jobNumber': 'TOW 001'}, **kwargs))
+
+
+@pytest.mark.parametrize('kind', ['ok', 'error', 'timeout', 'refused'])
+def test_same_result(kind, monkeypatch):
+    sync_result = sync_call(kind, monkeypatch)
+    async_result = async_call(kind, monkeypatch)
+    assert sync_result == async_result
+    assert sync_result['retryable'] is (kind != 'ok')
+
+
+def test_unknown_route():
+    assert app.call_worker('nope', {}) == asyncio.run(asgi.call_worker('nope', {}))
+
+
+def test_breaker_open_without_queue(monkeypatch):
+    breaker.workers._move('open', breaker.time.monotonic())
+    sync_result = sync_call('ok', monkeypatch, queue=False)
+    async_result = async_call('ok', monkeypatch, queue=False)
+    assert sync_result['retryable'] and async_result['retryable']
+    assert sync_result['success'] is async_result['success'] is False
@@ -0,0 +1,38 @@
+"""Rule-based routing while Claude is down: only clear instructions reach a worker"""
+
+import pytest
+
+import traffic
+
+
+def context(content, subject=''):
+    return {'source': 'email', 'content': content, 'subject': subject, 'job_numbers': ['TOW 001']}
+
+
+@pytest.mark.parametrize('subject, content, route', [
+    ('Update TOW 001', 'Now with the client, due back Friday.', 'update'),
+    ('TOW 001', 'Please update: now with the client.', 'update'),
+    ('TOW 001', 'Hi Dot,\nUpdate - client approved round 2.', 'update'),
+    ('File this - TOW 001', 'Attached.', 'file'),
+    ('TOW 001 final', 'Hey Dot!\n\nPlease file this in the job bag.', 'file'),
+])
+def test_instructions_route(subject, content, route):
+    assert traffic.fallback_route(context(content, subject)) == route
+
+
+@pytest.mark.parametrize('subject, content', [
+    ('TOW 001', 'No update yet?'),
+    ('Re: Update TOW 001', 'Thanks, looks good.'),
+    ('TOW 001', 'Looks good.\n\nFrom: Sarah\nPlease update the job when you can.'),
+    ('Any update on TOW 001?', 'Chasing this one.'),
+    ('TOW 001', 'Update on the shoot: all fine.'),
+    ('TOW 001', 'Can you update the job for me?'),
+    ('Lunch', 'We should archive these old folders at some point.'),
+])
+def test_anything_else_is_not_routed(subject, content):
+    assert traffic.fallback_route(context(content, subject)) is None
+
+
+def test_unsure_fallback_is_an_error():
+    result = traffic.fallback_routing(context('No update yet?', 'TOW 001'), RuntimeError('anthropic circuit open'))
+    assert result['type'] == 'error'
@@ -0,0 +1,120 @@
+"""Outbox: idempotency keys, claiming with a lease, lease expiry, batch ordering"""
+
+import threading
+import types
+
+import httpx
+import pytest
+
+import outbox
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+    
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch, tmp_path):
+    """A fresh outbox file, no sender threads, and outbox.time under the test's control"""
+    clock = Clock()
+    monkeypatch.setattr(outbox, 'OUTBOX_DB', str(tmp_path / 'outbox.sqlite3'))
+    monkeypatch.setattr(outbox, 'start', lambda: None)
+    monkeypatch.setattr(outbox, 'time', types.SimpleNamespace(time=clock))
+    monkeypatch.setattr(outbox, '_digests', {})
+    return clock
+
+
+def queue(key=None, batch=None, **kwargs):
+    return outbox.enqueue('email', 'http://postman.test/send', {'key': key}, key=key, batch=batch, **kwargs)
+
+
+def claimed_ids():
+    return [row[0] for row in outbox._claim()]
+
+
+def test_duplicate_key_is_not_queued_again(clock):
+    first = queue('msg-1:answer')
+    second = queue('msg-1:answer')
+    assert first['status'] == 'queued'
+    assert second == {'success': True, 'status': 'duplicate', 'outboxId': first['outboxId']}
+    assert outbox.stats()['pending'] == 1
+
+
+def test_key_still_counts_after_sending(clock, monkeypatch):
+    client = httpx.Client(transport=httpx.MockTransport(lambda request: httpx.Response(202)))
+    monkeypatch.setattr(outbox, '_http', lambda: client)
+    queue('msg-1:answer')
+    outbox._deliver(outbox._claim())
+    assert outbox.stats() == {'pending': 0, 'failed': 0, 'sent': 1}
+    assert queue('msg-1:answer')['status'] == 'duplicate'
+
+
+def test_messages_without_a_key_are_all_queued(clock):
+    assert queue()['outboxId'] != queue()['outboxId']
+    assert outbox.stats()['pending'] == 2
+
+
+def test_claim_leases_the_message(clock):
+    message_id = queue('msg-1:answer')['outboxId']
+    assert claimed_ids() == [message_id]
+    assert claimed_ids() == []      # leased - no one else gets it
+
+
+def test_lease_expiry_frees_the_message(clock):
+    message_id = queue('msg-1:answer')['outboxId']
+    assert claimed_ids() == [message_id]
+    
+    clock.now += outbox.LEASE_SECONDS - 1
+    assert claimed_ids() == []
+    clock.now += 2                  # the sender died mid-send
+    assert claimed_ids() == [message_id]
+
+
+def test_retry_waits_for_its_backoff(clock, monkeypatch):
+    client = httpx.Client(transport=httpx.MockTransport(lambda request: httpx.Response(503)))
+    monkeypatch.setattr(outbox, '_http', lambda: client)
+    message_id = queue('msg-1:answer')['outboxId']
+    outbox._deliver(outbox._claim())
+    assert claimed_ids() == []
+    clock.now += outbox.OUTBOX_BACKOFF
+    assert claimed_ids() == [message_id]
+
+
+def test_batch_goes_out_in_order_one_at_a_time(clock):
+    ids = [queue(batch='channel-1')['outboxId'] for _ in range(3)]
+    assert claimed_ids() == [ids[0]]
+    clock.now += 1
+    assert claimed_ids() == []      # the batch waits while its first message is in flight
+
+
+def test_digest_claims_the_whole_batch(clock):
+    outbox.register_digest('email', lambda payloads: {'payloads': payloads}, max_items=2)
+    ids = [queue(batch='channel-1', window=5, max_delay=30)['outboxId'] for _ in range(3)]
+    assert claimed_ids() == []      # held for the window
+    clock.now += 5
+    assert claimed_ids() == ids[:2]
+
+
+def test_concurrent_claims_take_each_message_once(clock):
+    ids = {queue(f'msg-{n}:answer')['outboxId'] for n in range(50)}
+    claimed = []
+    lock = threading.Lock()
+    
+    def claim_all():
+        for _ in range(len(ids)):
+            rows = outbox._claim()
+            if not rows:
+                return
+            with lock:
+                claimed.extend(row[0] for row in rows)
+    
+    threads = [threading.Thread(target=claim_all) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(claimed) == sorted(ids)
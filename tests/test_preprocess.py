@@ -0,0 +1,139 @@
+"""preprocess.clean_email: reply history, forwards, signatures, disclaimers, the token cap"""
+
+import pytest
+
+import preprocess
+
+
+def clean(content, subject=''):
+    return preprocess.clean_email(content, subject)[0]
+
+
+# ===================
+# QUOTED HISTORY
+# ===================
+
+@pytest.mark.parametrize('header', [
+    'On Mon, 3 Mar 2026 at 10:02, Anna Smith <anna@tower.co.nz> wrote:',
+    '-----Original Message-----',
+])
+def test_reply_header_cuts_the_history(header):
+    body = f"Please move TOW 023 to Friday.\n\n{header}\nOld message about TOW 019.\n> quoted"
+    assert clean(body, 'Re: TOW 023') == 'Please move TOW 023 to Friday.'
+
+
+def test_outlook_header_block_cuts_the_history():
+    body = ("Yes, go ahead with SKY 012.\n\n"
+            "From: Anna Smith <anna@tower.co.nz>\nSent: Monday, 3 March 2026 10:02\n"
+            "To: Dot\nSubject: SKY 012\n\nShall we go ahead?")
+    assert clean(body, 'RE: SKY 012') == 'Yes, go ahead with SKY 012.'
+
+
+def test_from_line_without_a_header_block_is_kept():
+    body = "From: the client, new copy for LAB 055.\nPlease update the deck."
+    assert clean(body) == body
+
+
+def test_quoted_lines_are_dropped():
+    assert clean("Agreed.\n> earlier text\n> more\nGo ahead.") == 'Agreed.\nGo ahead.'
+
+
+def test_forward_keeps_the_first_forwarded_message():
+    body = ("FYI - new brief below.\n\n"
+            "---------- Forwarded message ---------\n"
+            "From: Sam Lee <sam@sky.co.nz>\nDate: Mon, 3 Mar 2026\nSubject: Winter brief\nTo: Anna\n\n"
+            "Here's the winter brief for SKY.\n\n"
+            "On Sun, 2 Mar 2026, Jo wrote:\nOlder thread.")
+    assert clean(body, 'FW: Winter brief') == (
+        "FYI - new brief below.\n\n"
+        "[Forwarded from Sam Lee <sam@sky.co.nz>: Winter brief]\n\n"
+        "Here's the winter brief for SKY."
+    )
+
+
+def test_forward_header_in_a_reply_cuts():
+    body = "Thanks, done.\n---------- Forwarded message ---------\nFrom: Sam\nOld."
+    assert clean(body, 'Re: brief') == 'Thanks, done.'
+
+
+# ===================
+# SIGNATURES
+# ===================
+
+def test_signature_after_content_is_cut():
+    body = ("Hi Dot,\nPlease file these for TOW 023.\n\nKind regards,\nAnna Smith\n"
+            "Senior Producer | Tower\nM: +64 21 555 1234\nanna@tower.co.nz")
+    assert clean(body) == 'Hi Dot,\nPlease file these for TOW 023.\n\nKind regards,'
+
+
+def test_dash_dash_separator_is_a_sign_off():
+    assert clean("Move LAB 055 to Monday.\n--\nAnna\nTower") == 'Move LAB 055 to Monday.\n--'
+
+
+def test_instructions_after_an_opening_thanks_are_kept():
+    body = ('Hi Dot,\n\nThanks!\nPlease move SKY 012 live date to Friday.\n'
+            'And add the new banner sizes.\n\nCheers,\nAnna')
+    assert clean(body, 'SKY 012 banners') == (
+        'Hi Dot,\n\nThanks!\nPlease move SKY 012 live date to Friday.\n'
+        'And add the new banner sizes.\n\nCheers,'
+    )
+
+
+def test_sign_off_as_the_first_line_never_cuts():
+    body = 'Thanks\n\nCan you set up a new job for Tower - summer campaign, live 3 March?\n\nAnna Smith\nTower'
+    assert clean(body, 'New job') == body
+
+
+@pytest.mark.parametrize('after', [
+    'Also move LAB 055 live to Monday.',        # a sentence
+    'can you check SKY 012',                    # a request
+    'TOW 023 too',                              # a job number
+    'x' * 90,                                   # a long line
+])
+def test_sign_off_mid_body_is_kept(after):
+    body = f"Please update SKY 012 to craft.\nThanks!\n{after}\n\nCheers\nAnna"
+    assert clean(body) == f"Please update SKY 012 to craft.\nThanks!\n{after}\n\nCheers"
+
+
+def test_long_block_after_a_sign_off_is_kept():
+    body = 'Please update SKY 012.\nCheers\n' + '\n'.join(f'Line {n}' for n in range(12))
+    assert clean(body) == body
+
+
+# ===================
+# DISCLAIMERS, WHITESPACE, CAP
+# ===================
+
+def test_disclaimer_paragraph_is_dropped():
+    body = ("CAUTION: This email originated from outside the organisation.\n\n"
+            "Please update TOW 023.\n\n"
+            "This email and any attachments are confidential and intended only for the addressee.\n"
+            "If you are not the intended recipient, delete it.\n\n"
+            "Tower Ltd")
+    assert clean(body) == 'Please update TOW 023.\n\nTower Ltd'
+
+
+def test_blank_runs_and_invisible_characters_are_collapsed():
+    assert clean("Hi​ Dot\n\n\n\nPlease\xa0update.   ") == 'Hi Dot\n\nPlease update.'
+
+
+def test_token_cap_marks_the_cut(monkeypatch):
+    monkeypatch.setattr(preprocess, 'EMAIL_TOKEN_BUDGET', 10)
+    text = clean('\n'.join(['word ' * 6] * 5))
+    assert text.endswith(preprocess.TRIMMED_MARKER)
+    assert len(text) <= 10 * preprocess.CHARS_PER_TOKEN + len(preprocess.TRIMMED_MARKER) + 1
+
+
+def test_never_returns_empty():
+    body = '> only quoted text\n> nothing new'
+    text, stats = preprocess.clean_email(body)
+    assert text == body
+    assert stats['chars'] == stats['originalChars']
+
+
+def test_html_is_turned_into_text():
+    assert clean('<html><body><p>Please update <b>TOW 023</b></p><style>p{}</style></body></html>') == 'Please update TOW 023'
+
+
+def test_steps_off_returns_the_body():
+    assert preprocess.clean_email('> quoted', steps=[]) == ('> quoted', {'originalChars': 8, 'chars': 8, 'ratio': 1.0})
@@ -0,0 +1,90 @@
+"""Profiling: concurrent profiled requests, the process-wide CPU profiler"""
+
+import threading
+import tracemalloc
+
+import pytest
+
+import profiling
+
+
+@pytest.fixture
+def profiled(monkeypatch):
+    """Profile every request; record what would be stored instead of writing it"""
+    stored = []
+    monkeypatch.setattr(profiling, 'PROFILE', 'on')
+    monkeypatch.setattr(profiling, 'PROFILE_MODE', 'cpu,memory')
+    monkeypatch.setattr(profiling, '_store', lambda *args: stored.append(args))
+    yield stored
+    profiling._write_pool.submit(lambda: None).result()
+
+
+def _run_together(handler, count=2):
+    """Run handler on `count` threads that are all inside it at once"""
+    inside = threading.Barrier(count, timeout=10)
+    errors = []
+    
+    def request():
+        try:
+            handler(inside)
+        except Exception as e:
+            errors.append(e)
+    
+    threads = [threading.Thread(target=request) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=20)
+    return errors
+
+
+def test_two_requests_on_two_threads(profiled):
+    @profiling.profile('POST /traffic')
+    def handler(inside):
+        inside.wait()
+        return sum(range(1000))
+    
+    assert _run_together(handler) == []
+    profiling._write_pool.submit(lambda: None).result()
+    
+    # Both profiled for memory, only one got the CPU profiler
+    assert len(profiled) == 2
+    profilers = [args[4] for args in profiled]
+    assert sum(p is not None for p in profilers) == 1
+    assert all(args[5] is not None for args in profiled)
+    
+    assert profiling._memory_open == 0
+    assert not tracemalloc.is_tracing()
+    assert not profiling._cpu_lock.locked()
+
+
+def test_profiler_already_active_elsewhere(profiled, monkeypatch):
+    """3.12: enable() raises when another profiler is running - the request still runs"""
+    class Busy:
+        def enable(self):
+            raise ValueError('Another profiling tool is already active')
+    monkeypatch.setattr(profiling.cProfile, 'Profile', Busy)
+    
+    @profiling.profile('POST /hub')
+    def handler():
+        return 'ok'
+    
+    assert handler() == 'ok'
+    profiling._write_pool.submit(lambda: None).result()
+    assert profiled[0][4] is None
+    assert not profiling._cpu_lock.locked()
+
+
+def test_failed_start_stops_memory(profiled, monkeypatch):
+    def broken():
+        raise RuntimeError('no profiler')
+    monkeypatch.setattr(profiling, '_start_cpu', broken)
+    
+    @profiling.profile('POST /hub')
+    def handler():
+        return 'ok'
+    
+    with pytest.raises(RuntimeError):
+        handler()
+    assert profiling._memory_open == 0
+    assert not tracemalloc.is_tracing()
@@ -0,0 +1,162 @@
+"""Reservations: unique numbers across threads and processes, lazy block claims"""
+
+import json
+import time
+import threading
+import multiprocessing
+
+import pytest
+
+import airtable
+import reservations
+
+
+class FakeCounter:
+    """
+    Airtable's 'Next Job #' in a file, with Airtable's race: a read and a
+    separate write, so anything not serialized by reservations.py collides.
+    """
+    
+    def __init__(self, path, start=1):
+        self.path = path
+        self.write({'TOW': start, 'LAB': start})
+    
+    def read(self):
+        with open(self.path) as f:
+            return json.load(f)
+    
+    def write(self, counters):
+        with open(self.path, 'w') as f:
+            json.dump(counters, f)
+    
+    def get(self, client_code):
+        counters = self.read()
+        if client_code not in counters:
+            return None
+        time.sleep(0.002)
+        return {'recordId': client_code, 'clientName': client_code.title(), 'next': f"{counters[client_code]:03d}"}
+    
+    def set(self, record_id, next_number):
+        counters = self.read()
+        counters[record_id] = next_number
+        self.write(counters)
+
+
+@pytest.fixture
+def counter(tmp_path, monkeypatch):
+    fake = FakeCounter(str(tmp_path / 'counter.json'))
+    monkeypatch.setattr(reservations, 'RESERVATIONS_DB', str(tmp_path / 'reservations.sqlite3'))
+    monkeypatch.setattr(reservations, 'RESERVATION_BLOCK', 3)
+    monkeypatch.setattr(airtable, 'get_job_counter', fake.get)
+    monkeypatch.setattr(airtable, 'set_job_counter', fake.set)
+    return fake
+
+
+def _reserve_many(client_code, count):
+    return [reservations.reserve(client_code)['reservedJobNumber'] for _ in range(count)]
+
+
+def test_threads_never_collide(counter):
+    results = []
+    lock = threading.Lock()
+    
+    def worker():
+        numbers = _reserve_many('TOW', 25)
+        with lock:
+            results.extend(numbers)
+    
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert len(results) == 200
+    assert sorted(results) == [f"TOW {n:03d}" for n in range(1, 201)]
+
+
+def _process_worker(count, out):
+    out.put(_reserve_many('TOW', count))
+
+
+def test_processes_never_collide(counter):
+    context = multiprocessing.get_context('fork')
+    out = context.Queue()
+    processes = [context.Process(target=_process_worker, args=(20, out)) for _ in range(4)]
+    for process in processes:
+        process.start()
+    results = [number for _ in processes for number in out.get(timeout=60)]
+    for process in processes:
+        process.join(timeout=10)
+    
+    assert len(results) == len(set(results)) == 80
+    # Blocks are only claimed when one runs out, so there are no gaps either
+    assert sorted(results) == [f"TOW {n:03d}" for n in range(1, 81)]
+
+
+def test_blocks_claimed_lazily(counter):
+    assert _reserve_many('TOW', 3) == ['TOW 001', 'TOW 002', 'TOW 003']
+    # The block is used up but the next isn't claimed until it's needed
+    assert counter.read()['TOW'] == 4
+    assert reservations.next_number('TOW') is None
+    
+    assert reservations.reserve('TOW')['reservedJobNumber'] == 'TOW 004'
+    assert counter.read()['TOW'] == 7
+    assert reservations.next_number('TOW') == '005'
+
+
+def test_claim_runs_outside_the_write_lock(counter, monkeypatch):
+    """A slow Airtable claim for one client doesn't hold up another client's reservation"""
+    reservations.reserve('LAB')
+    
+    in_claim, release = threading.Event(), threading.Event()
+    real_get = counter.get
+    
+    def slow_get(client_code):
+        if client_code == 'TOW':
+            in_claim.set()
+            release.wait(10)
+        return real_get(client_code)
+    monkeypatch.setattr(airtable, 'get_job_counter', slow_get)
+    
+    claiming = threading.Thread(target=reservations.reserve, args=('TOW',))
+    claiming.start()
+    assert in_claim.wait(5)
+    try:
+        started = time.perf_counter()
+        assert reservations.reserve('LAB')['reservedJobNumber'] == 'LAB 002'
+        assert time.perf_counter() - started < 1
+    finally:
+        release.set()
+        claiming.join()
+
+
+def test_release_hands_back_unused(counter):
+    _reserve_many('TOW', 1)
+    assert counter.read()['TOW'] == 4
+    reservations.release_unused()
+    assert counter.read()['TOW'] == 2
+    assert reservations.reserve('TOW')['reservedJobNumber'] == 'TOW 002'
+
+
+def test_release_leaves_a_moved_counter(counter):
+    _reserve_many('TOW', 1)
+    counter.set('TOW', 10)      # someone else took numbers past our block
+    reservations.release_unused()
+    assert counter.read()['TOW'] == 10
+    assert reservations.reserve('TOW')['reservedJobNumber'] == 'TOW 010'
+
+
+def test_leftovers_only_from_earlier_runs(counter, monkeypatch):
+    _reserve_many('TOW', 1)
+    reservations.release_leftovers()
+    assert counter.read()['TOW'] == 4       # our own block is kept
+    
+    monkeypatch.setattr(reservations, 'BOOT_ID', 'next-run')
+    reservations.release_leftovers()
+    assert counter.read()['TOW'] == 2
+
+
+def test_unknown_client(counter):
+    with pytest.raises(reservations.ReservationError):
+        reservations.reserve('XYZ')
@@ -0,0 +1,76 @@
+"""warmup.warm_up reports failed preloads, fills the caches requests read and the fallback job list"""
+
+import httpx
+import pytest
+
+import airtable
+import warmup
+
+PROJECT = {'id': 'recP1', 'fields': {'Job Number': 'TOW 001', 'Project Name': 'Launch', 'Status': 'In Progress'}}
+CLIENT = {'id': 'recC1', 'fields': {'Client code': 'TOW', 'Clients': 'Tower', 'Teams ID': 'team-1'}}
+MEETING = {'id': 'recM1', 'fields': {'Title': 'WIP', 'Start': '2026-10-19T09:00:00.000Z'}}
+
+
+class FakeAirtable:
+    """Answers Projects, Clients and Meetings reads, counting them"""
+    
+    def __init__(self, status=200):
+        self.status = status
+        self.requests = []
+    
+    def __call__(self, request):
+        table = request.url.path.rsplit('/', 1)[-1]
+        self.requests.append(table)
+        if self.status != 200:
+            return httpx.Response(self.status, json={'error': 'down'})
+        records = {'Projects': [PROJECT], 'Clients': [CLIENT], 'Meetings': [MEETING]}.get(table, [])
+        return httpx.Response(200, json={'records': records})
+
+
+@pytest.fixture
+def fake_airtable(monkeypatch):
+    def install(status=200):
+        fake = FakeAirtable(status)
+        monkeypatch.setattr(airtable, 'client', httpx.Client(transport=httpx.MockTransport(fake)))
+        return fake
+    
+    monkeypatch.setattr(airtable, '_clients_cache', (0.0, {}))
+    monkeypatch.setattr(airtable, '_meetings_cache', (0.0, None))
+    monkeypatch.setattr(airtable, '_last_jobs', {})
+    monkeypatch.setattr(warmup, '_steps', {})
+    monkeypatch.setattr(warmup, 'WARMUP', 'on')
+    monkeypatch.setattr(warmup, 'STEPS', tuple(step for step in warmup.STEPS if step[0] in ('clients', 'jobs', 'meetings')))
+    return install
+
+
+def test_failed_preload_marks_the_step_failed(fake_airtable):
+    fake_airtable(status=503)
+    steps = warmup.warm_up()
+    assert {name: step['ok'] for name, step in steps.items()} == {'clients': False, 'jobs': False, 'meetings': False}
+    assert all(step['error'] for step in steps.values())
+    assert not any(step['ok'] for step in warmup.status()['steps'].values())
+
+
+def test_preload_serves_client_lookups_and_project_reads_airtable(fake_airtable):
+    fake = fake_airtable()
+    steps = warmup.warm_up()
+    assert all(step['ok'] for step in steps.values())
+    
+    fake.requests.clear()
+    assert airtable.get_client_name('TOW') == 'Tower'
+    assert airtable.get_meetings()
+    assert fake.requests == []
+
+    project = airtable.get_project('TOW 001')
+    assert project['jobName'] == 'Launch' and project['teamId'] == 'team-1'
+    assert fake.requests == ['Projects']        # always the live stage and status
+
+
+def test_project_falls_back_to_the_preloaded_jobs(fake_airtable):
+    fake = fake_airtable()
+    warmup.warm_up()
+    
+    fake.status = 503
+    project = airtable.get_project('TOW 001')
+    assert project['jobName'] == 'Launch' and project['teamId'] == 'team-1'
+    assert airtable.get_project('TOW 999') is None
@@ -0,0 +1,283 @@
+"""
+Dot Traffic 2.0 - Tracing
+Lightweight request tracing: one trace id per request, a span around every
+stage and outbound call, so one slow email can be broken down end to end.
+
+HOW IT FITS:
+- app.py / asgi.py open a trace per request (tracing.trace), continuing the
+  caller's W3C `traceparent` header if PA Listener / Hub sends one
+- every metrics timer (stages, Claude calls, tools, call_worker, send_*) is
+  also a span, and the Airtable transports add one span per HTTP request
+- the trace id goes to workers (build_worker_payload + traceparent header)
+  and to PA Postman / Teamsbot, so their logs can be joined to ours
+- spans outside a trace (scripts, warm-up) are no-ops
+
+EXPORT (TRACE_EXPORT):
+- ''     : off (default) - ids still propagate
+- 'jsonl': one line per trace, appended to TRACE_FILE
+- 'otlp' : OTLP/HTTP JSON to OTEL_EXPORTER_OTLP_ENDPOINT (/v1/traces)
+Exports run on a background thread, never on the request path.
+"""
+
+import os
+import json
+import time
+import secrets
+import inspect
+import functools
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+import httpx
+
+# ===================
+# CONFIG
+# ===================
+
+TRACE_EXPORT = os.environ.get('TRACE_EXPORT', '').lower()
+TRACE_FILE = os.environ.get('TRACE_FILE', 'traces.jsonl')
+OTLP_URL = os.environ.get('OTEL_EXPORTER_OTLP_ENDPOINT', 'http://localhost:4318').rstrip('/') + '/v1/traces'
+OTLP_HEADERS = dict(
+    pair.split('=', 1) for pair in os.environ.get('OTEL_EXPORTER_OTLP_HEADERS', '').split(',') if '=' in pair
+)
+SERVICE_NAME = os.environ.get('OTEL_SERVICE_NAME', 'dot-traffic')
+
+# The span currently open in this thread / task
+_current = contextvars.ContextVar('dot_span', default=None)
+
+_export_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='trace-export')
+_file_lock = threading.Lock()
+
+
+# ===================
+# SPANS
+# ===================
+
+class _Trace:
+    """All finished spans for one request (spans may finish on several threads)"""
+    
+    def __init__(self, trace_id):
+        self.trace_id = trace_id
+        self.spans = []
+        self._lock = threading.Lock()
+    
+    def add(self, record):
+        with self._lock:
+            self.spans.append(record)
+
+
+class _Span:
+    """
+    One timed operation. Works as a context manager or as a decorator
+    (sync or async functions). A root span starts a new trace if none is open.
+    """
+    
+    def __init__(self, name, root=False, traceparent=None, **attributes):
+        self.name = name
+        self.root = root
+        self.traceparent = traceparent
+        self.attributes = attributes
+        self.trace = None
+    
+    def __enter__(self):
+        parent = _current.get()
+        if parent is None:
+            if not self.root:
+                return self
+            traceparent = self.traceparent() if callable(self.traceparent) else self.traceparent
+            trace_id, self.parent_id = _parse_traceparent(traceparent) or (secrets.token_hex(16), None)
+            self.trace = _Trace(trace_id)
+            self.owns_trace = True
+        else:
+            self.trace = parent.trace
+            self.parent_id = parent.span_id
+            self.owns_trace = False
+        
+        self.span_id = secrets.token_hex(8)
+        self.start_ns = time.time_ns()
+        self._token = _current.set(self)
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        if self.trace is None:
+            return False
+        
+        end_ns = time.time_ns()
+        _current.reset(self._token)
+        
+        record = {
+            'traceId': self.trace.trace_id,
+            'spanId': self.span_id,
+            'parentSpanId': self.parent_id,
+            'name': self.name,
+            'startTimeUnixNano': self.start_ns,
+            'endTimeUnixNano': end_ns,
+            'durationMs': round((end_ns - self.start_ns) / 1e6, 2),
+            'attributes': self.attributes,
+            'status': 'error' if exc_type else 'ok',
+        }
+        if exc_type:
+            record['error'] = f"{exc_type.__name__}: {exc}"
+        self.trace.add(record)
+        
+        if self.owns_trace:
+            _export(self.trace, record)
+        return False
+    
+    def set(self, **attributes):
+        """Add attributes to this span"""
+        self.attributes.update(attributes)
+    
+    def __call__(self, fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with _Span(self.name, self.root, self.traceparent, **self.attributes):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+        
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _Span(self.name, self.root, self.traceparent, **self.attributes):
+                return fn(*args, **kwargs)
+        return wrapper
+
+
+def trace(name, traceparent=None, **attributes):
+    """
+    Open a request's root span. Continues the caller's trace if `traceparent`
+    (W3C header value, or a function returning it - for decorating request
+    handlers) is valid; inside an existing trace it is a normal span.
+    """
+    return _Span(name, root=True, traceparent=traceparent, **attributes)
+
+
+def span(name, **attributes):
+    """Open a child span (no-op outside a trace)"""
+    return _Span(name, **attributes)
+
+
+def annotate(**attributes):
+    """Add attributes to the current span, e.g. the email's internetMessageId"""
+    current = _current.get()
+    if current is not None:
+        current.set(**attributes)
+
+
+# ===================
+# PROPAGATION
+# ===================
+
+def current_trace_id():
+    """Trace id of the current request, or None outside a trace"""
+    current = _current.get()
+    return current.trace.trace_id if current is not None else None
+
+
+def headers():
+    """Outbound `traceparent` header for the current span ({} outside a trace)"""
+    current = _current.get()
+    if current is None:
+        return {}
+    return {'traceparent': f"00-{current.trace.trace_id}-{current.span_id}-01"}
+
+
+def submit(pool, fn, *args, **kwargs):
+    """pool.submit that keeps the current span as parent on the worker thread"""
+    return pool.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+def _parse_traceparent(value):
+    """(trace_id, parent_span_id) from a W3C traceparent header, or None"""
+    parts = (value or '').strip().lower().split('-')
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        if int(parts[1], 16) == 0 or int(parts[2], 16) == 0:
+            return None
+    except ValueError:
+        return None
+    return parts[1], parts[2]
+
+
+# ===================
+# EXPORT
+# ===================
+
+def _logger():
+    """The exporter's logger - looked up when needed, since logs imports tracing"""
+    import logs
+    return logs.get('tracing')
+
+
+def _export(trace_obj, root):
+    """Hand a finished trace to the background exporter"""
+    if TRACE_EXPORT == 'jsonl':
+        _export_pool.submit(_write_jsonl, trace_obj, root)
+    elif TRACE_EXPORT == 'otlp':
+        _export_pool.submit(_post_otlp, trace_obj)
+
+
+def _write_jsonl(trace_obj, root):
+    """Append the trace as one JSON line"""
+    line = json.dumps({
+        'traceId': trace_obj.trace_id,
+        'name': root['name'],
+        'durationMs': root['durationMs'],
+        'spans': sorted(trace_obj.spans, key=lambda s: s['startTimeUnixNano']),
+    }, default=str)
+    try:
+        with _file_lock, open(TRACE_FILE, 'a') as f:
+            f.write(line + '\n')
+    except Exception as e:
+        _logger().error('Error writing trace file', path=TRACE_FILE, error=str(e))
+
+
+def _otlp_value(value):
+    """OTLP AnyValue for a Python attribute"""
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+def _otlp_span(record):
+    """One finished span in OTLP JSON form"""
+    otlp = {
+        'traceId': record['traceId'],
+        'spanId': record['spanId'],
+        'name': record['name'],
+        'kind': 1,
+        'startTimeUnixNano': str(record['startTimeUnixNano']),
+        'endTimeUnixNano': str(record['endTimeUnixNano']),
+        'attributes': [
+            {'key': key, 'value': _otlp_value(value)}
+            for key, value in record['attributes'].items() if value is not None
+        ],
+        'status': {'code': 2, 'message': record['error']} if record['status'] == 'error' else {'code': 1},
+    }
+    if record['parentSpanId']:
+        otlp['parentSpanId'] = record['parentSpanId']
+    return otlp
+
+
+def _post_otlp(trace_obj):
+    """POST the trace to an OTLP/HTTP collector"""
+    body = {
+        'resourceSpans': [{
+            'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': SERVICE_NAME}}]},
+            'scopeSpans': [{
+                'scope': {'name': 'dot-traffic'},
+                'spans': [_otlp_span(record) for record in trace_obj.spans],
+            }],
+        }]
+    }
+    try:
+        response = httpx.post(OTLP_URL, json=body, headers=OTLP_HEADERS, timeout=5.0)
+        if response.status_code >= 300:
+            _logger().error('OTLP export failed', status=response.status_code)
+    except Exception as e:
+        _logger().error('OTLP export error', error=str(e))
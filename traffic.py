@@ -13,11 +13,22 @@ import os
 import re
 import json
 import time
-import requests
 import httpx
 from datetime import datetime
 from anthropic import Anthropic
 
+import airtable
+import metrics
+import cassettes
+import preprocess
+import budget
+import decision_cache
+import breaker
+import reservations
+import people
+import spend
+import logs
+
 # ===================
 # CONFIG
 # ===================
@@ -25,9 +36,12 @@ from anthropic import Anthropic
 ANTHROPIC_API_KEY = os.environ.get('ANTHROPIC_API_KEY')
 AIRTABLE_API_KEY = os.environ.get('AIRTABLE_API_KEY')
 AIRTABLE_BASE_ID = os.environ.get('AIRTABLE_BASE_ID', 'app8CI7NAZqhQ4G1Y')
+AIRTABLE_API_URL = os.environ.get('AIRTABLE_API_URL', 'https://api.airtable.com/v0')
 
 ANTHROPIC_MODEL = 'claude-sonnet-4-20250514'
 
+logger = logs.get('traffic')
+
 VALID_CLIENT_CODES = ['ONE', 'ONS', 'ONB', 'SKY', 'TOW', 'FIS', 'FST', 'WKA', 'HUN', 'LAB', 'EON', 'OTH']
 
 # Airtable headers
@@ -37,7 +51,7 @@ AIRTABLE_HEADERS = {
 }
 
 def get_airtable_url(table):
-    return f'https://api.airtable.com/v0/{AIRTABLE_BASE_ID}/{table}'
+    return f'{AIRTABLE_API_URL}/{AIRTABLE_BASE_ID}/{table}'
 
 # Load prompt (unified version)
 PROMPT_PATH = os.path.join(os.path.dirname(__file__), 'prompt_unified.txt')
@@ -101,267 +115,208 @@ def clear_conversation(session_id):
 # ===================
 
 def tool_search_people(client_code=None, search_term=None):
-    """Search People table"""
+    """Search People (the in-memory directory - see people.py)"""
     try:
-        url = get_airtable_url('People')
-        
-        filters = ["{Active} = TRUE()"]
-        if client_code:
-            # Handle One NZ divisions
-            if client_code in ['ONE', 'ONB', 'ONS']:
-                filters.append("OR({Client Link} = 'ONE', {Client Link} = 'ONB', {Client Link} = 'ONS')")
-            else:
-                filters.append(f"{{Client Link}} = '{client_code}'")
-        
-        params = {
-            'filterByFormula': f"AND({', '.join(filters)})" if len(filters) > 1 else filters[0]
-        }
-        
-        all_people = []
-        offset = None
-        
-        while True:
-            if offset:
-                params['offset'] = offset
-            
-            response = requests.get(url, headers=AIRTABLE_HEADERS, params=params)
-            response.raise_for_status()
-            data = response.json()
-            
-            for record in data.get('records', []):
-                fields = record.get('fields', {})
-                name = fields.get('Name', fields.get('Full name', ''))
-                if not name:
-                    continue
-                
-                if search_term:
-                    searchable = f"{name} {fields.get('Email Address', '')}".lower()
-                    if search_term.lower() not in searchable:
-                        continue
-                
-                all_people.append({
-                    'name': name,
-                    'email': fields.get('Email Address', ''),
-                    'phone': fields.get('Phone Number', ''),
-                    'clientCode': fields.get('Client Link', '')
-                })
-            
-            offset = data.get('offset')
-            if not offset:
-                break
-        
-        return {'count': len(all_people), 'people': all_people}
+        found = people.search(client_code, search_term)
+        return {'count': len(found), 'people': found}
     
     except Exception as e:
         return {'error': str(e)}
 
 
-def tool_get_client_detail(client_code):
-    """Get detailed client info"""
+def _client_codes(values):
+    """Client codes from a tool's list input - upper case, each once, in order"""
+    return list(dict.fromkeys(str(v).strip().upper() for v in values or [] if v))
+
+
+def _parse_currency(val):
+    if isinstance(val, list):
+        val = val[0] if val else 0
+    if isinstance(val, (int, float)):
+        return val
+    if isinstance(val, str):
+        return int(val.replace('$', '').replace(',', '') or 0)
+    return 0
+
+
+def _client_detail(fields, client_code):
+    """A Clients record as get_client_detail returns it"""
+    return {
+        'code': client_code,
+        'name': fields.get('Clients', ''),
+        'yearEnd': fields.get('Year end', ''),
+        'currentQuarter': fields.get('Current Quarter', ''),
+        'monthlyCommitted': _parse_currency(fields.get('Monthly Committed', 0)),
+        'quarterlyCommitted': _parse_currency(fields.get('Quarterly Committed', 0)),
+        'thisMonth': _parse_currency(fields.get('This month', 0)),
+        'thisQuarter': _parse_currency(fields.get('This Quarter', 0)),
+        'rolloverCredit': _parse_currency(fields.get('Rollover Credit', 0)),
+        # This box's block is ahead of Airtable's counter - report the number a reservation will get
+        'nextJobNumber': reservations.next_number(client_code) or fields.get('Next Job #', '')
+    }
+
+
+def tool_get_client_detail(client_code=None, client_codes=None):
+    """Get detailed client info (one client, or several in one OR() query)"""
     try:
+        if client_codes:
+            codes = _client_codes(client_codes)
+            found = airtable.get_clients(codes)
+            return {
+                'clients': [_client_detail(found[code], code) for code in codes if code in found],
+                'count': len([code for code in codes if code in found]),
+                'notFound': [code for code in codes if code not in found],
+            }
+        
         url = get_airtable_url('Clients')
         params = {
             'filterByFormula': f"{{Client code}} = '{client_code}'",
             'maxRecords': 1
         }
-        response = requests.get(url, headers=AIRTABLE_HEADERS, params=params)
+        response = airtable.client.get(url, headers=AIRTABLE_HEADERS, params=params)
         response.raise_for_status()
         
         records = response.json().get('records', [])
         if not records:
             return {'error': f'Client {client_code} not found'}
         
-        fields = records[0].get('fields', {})
-        
-        def parse_currency(val):
-            if isinstance(val, (int, float)):
-                return val
-            if isinstance(val, str):
-                return int(val.replace('$', '').replace(',', '') or 0)
-            return 0
-        
-        rollover = fields.get('Rollover Credit', 0)
-        if isinstance(rollover, list):
-            rollover = rollover[0] if rollover else 0
-        rollover = parse_currency(rollover)
-        
-        return {
-            'code': client_code,
-            'name': fields.get('Clients', ''),
-            'yearEnd': fields.get('Year end', ''),
-            'currentQuarter': fields.get('Current Quarter', ''),
-            'monthlyCommitted': parse_currency(fields.get('Monthly Committed', 0)),
-            'quarterlyCommitted': parse_currency(fields.get('Quarterly Committed', 0)),
-            'thisMonth': parse_currency(fields.get('This month', 0)),
-            'thisQuarter': parse_currency(fields.get('This Quarter', 0)),
-            'rolloverCredit': rollover,
-            'nextJobNumber': fields.get('Next Job #', '')
-        }
+        return _client_detail(records[0].get('fields', {}), client_code)
     
     except Exception as e:
         return {'error': str(e)}
 
 
-def tool_get_spend_summary(client_code, period='this_month'):
-    """Get spend summary for a client"""
+def tool_get_spend_summary(client_code=None, period='this_month', client_codes=None):
+    """Get spend summary for a client, or several (from the precomputed view - see spend.py)"""
     try:
-        clients_url = get_airtable_url('Clients')
-        clients_response = requests.get(clients_url, headers=AIRTABLE_HEADERS)
-        clients_response.raise_for_status()
-        
-        client_info = None
-        for record in clients_response.json().get('records', []):
-            fields = record.get('fields', {})
-            if fields.get('Client code', '') == client_code:
-                def parse_currency(val):
-                    if isinstance(val, (int, float)):
-                        return float(val)
-                    if isinstance(val, str):
-                        return float(val.replace('$', '').replace(',', '') or 0)
-                    if isinstance(val, list):
-                        return float(val[0]) if val else 0
-                    return 0
-                
-                monthly = parse_currency(fields.get('Monthly Committed', 0))
-                rollover = parse_currency(fields.get('Rollover Credit', 0))
-                rollover_use = fields.get('Rollover use', '')
-                
-                client_info = {
-                    'name': fields.get('Clients', ''),
-                    'code': client_code,
-                    'monthlyBudget': monthly,
-                    'quarterlyBudget': monthly * 3,
-                    'currentQuarter': fields.get('Current Quarter', ''),
-                    'rollover': rollover,
-                    'rolloverUse': rollover_use,
-                    'JAN-MAR': parse_currency(fields.get('JAN-MAR', 0)),
-                    'APR-JUN': parse_currency(fields.get('APR-JUN', 0)),
-                    'JUL-SEP': parse_currency(fields.get('JUL-SEP', 0)),
-                    'OCT-DEC': parse_currency(fields.get('OCT-DEC', 0)),
-                    'thisMonth': parse_currency(fields.get('This month', 0)),
-                }
-                break
-        
-        if not client_info:
-            return {'error': f'Client {client_code} not found'}
-        
-        now = datetime.now()
-        current_month_num = now.month
-        
-        calendar_quarters = {
-            1: 'JAN-MAR', 2: 'JAN-MAR', 3: 'JAN-MAR',
-            4: 'APR-JUN', 5: 'APR-JUN', 6: 'APR-JUN',
-            7: 'JUL-SEP', 8: 'JUL-SEP', 9: 'JUL-SEP',
-            10: 'OCT-DEC', 11: 'OCT-DEC', 12: 'OCT-DEC'
-        }
-        current_cal_quarter = calendar_quarters[current_month_num]
-        
-        prev_quarters = {
-            'JAN-MAR': 'OCT-DEC',
-            'APR-JUN': 'JAN-MAR',
-            'JUL-SEP': 'APR-JUN',
-            'OCT-DEC': 'JUL-SEP'
-        }
-        last_cal_quarter = prev_quarters[current_cal_quarter]
-        
-        if period == 'this_quarter':
-            quarter_key = current_cal_quarter
-            period_label = client_info['currentQuarter']
-        elif period == 'last_quarter':
-            quarter_key = last_cal_quarter
-            current_q_num = int(client_info['currentQuarter'].replace('Q', '') or 1)
-            last_q_num = current_q_num - 1 if current_q_num > 1 else 4
-            period_label = f'Q{last_q_num}'
-        elif period in ['JAN-MAR', 'APR-JUN', 'JUL-SEP', 'OCT-DEC']:
-            quarter_key = period
-            period_label = period
-        elif period == 'this_month':
+        if client_codes:
+            codes = _client_codes(client_codes)
+            summaries = {code: spend.summary(code, period) for code in codes}
             return {
-                'client': client_info['name'],
-                'clientCode': client_code,
-                'period': now.strftime('%B'),
-                'budget': client_info['monthlyBudget'],
-                'spent': client_info['thisMonth'],
-                'remaining': client_info['monthlyBudget'] - client_info['thisMonth'],
-                'percentUsed': round((client_info['thisMonth'] / client_info['monthlyBudget'] * 100) if client_info['monthlyBudget'] > 0 else 0)
+                'period': period,
+                'clients': [summaries[code] for code in codes if summaries[code]],
+                'count': len([code for code in codes if summaries[code]]),
+                'notFound': [code for code in codes if not summaries[code]],
             }
-        else:
-            quarter_key = current_cal_quarter
-            period_label = client_info['currentQuarter']
         
-        spent = client_info.get(quarter_key, 0)
-        budget = client_info['quarterlyBudget']
-        
-        if client_info['rolloverUse'] == quarter_key and client_info['rollover'] > 0:
-            budget += client_info['rollover']
+        summary = spend.summary(client_code, period)
+        if not summary:
+            return {'error': f'Client {client_code} not found'}
+        return summary
         
-        return {
-            'client': client_info['name'],
-            'clientCode': client_code,
-            'period': period_label,
-            'budget': budget,
-            'spent': spent,
-            'remaining': budget - spent,
-            'percentUsed': round((spent / budget * 100) if budget > 0 else 0),
-            'rolloverApplied': client_info['rolloverUse'] == quarter_key and client_info['rollover'] > 0,
-            'rolloverAmount': client_info['rollover'] if client_info['rolloverUse'] == quarter_key else 0
-        }
+    except Exception as e:
+        return {'error': str(e)}
+                
+                
+def tool_get_all_spend_summaries(period='this_month'):
+    """Get spend summaries for every client at once"""
+    try:
+        summaries = spend.all_summaries(period)
+        return {'period': period, 'clients': summaries, 'count': len(summaries)}
     
     except Exception as e:
         return {'error': str(e)}
 
 
 def tool_reserve_job_number(client_code):
-    """Reserve the next job number for a client"""
+    """Reserve the next job number for a client (from this box's pre-claimed block - see reservations.py)"""
     try:
-        url = get_airtable_url('Clients')
-        params = {
-            'filterByFormula': f"{{Client code}} = '{client_code}'",
-            'maxRecords': 1
-        }
-        response = requests.get(url, headers=AIRTABLE_HEADERS, params=params)
-        response.raise_for_status()
-        
-        records = response.json().get('records', [])
-        if not records:
-            return {'error': f'Client {client_code} not found'}
-        
-        record = records[0]
-        record_id = record.get('id')
-        fields = record.get('fields', {})
-        client_name = fields.get('Clients', client_code)
-        
-        next_num_str = fields.get('Next Job #', '')
-        if not next_num_str:
-            return {'error': f'No job number sequence configured for {client_code}'}
-        
-        try:
-            next_num = int(next_num_str)
-        except ValueError:
-            return {'error': f'Invalid job number format: {next_num_str}'}
-        
-        reserved_job_number = f"{client_code} {next_num:03d}"
-        new_next_num = f"{next_num + 1:03d}"
-        
-        update_response = requests.patch(
-            f"{url}/{record_id}",
-            headers=AIRTABLE_HEADERS,
-            json={'fields': {'Next Job #': new_next_num}}
-        )
-        update_response.raise_for_status()
-        
-        return {
-            'success': True,
-            'clientCode': client_code,
-            'clientName': client_name,
-            'reservedJobNumber': reserved_job_number,
-            'nextJobNumber': new_next_num
-        }
-    
+        return {'success': True, **reservations.reserve(client_code)}
     except Exception as e:
         return {'error': str(e)}
 
 
+# ===================
+# TOOL RESULT FORMAT
+# ===================
+
+# 'compact': job and people lists as a table, the rest as JSON without spaces.
+# 'json': every result as plain json.dumps, as before.
+TOOL_RESULT_FORMAT = os.environ.get('TOOL_RESULT_FORMAT', 'compact')
+
+# A job list row at detail 'summary' - the rest is one get_job_by_number away
+JOB_COLUMNS = ['jobNumber', 'jobName', 'stage', 'status', 'withClient', 'updateDue', 'liveDate', 'daysSinceUpdate', 'update']
+PEOPLE_COLUMNS = ['name', 'email', 'phone', 'clientCode']
+SPEND_COLUMNS = ['clientCode', 'client', 'period', 'budget', 'spent', 'remaining', 'percentUsed', 'rolloverAmount']
+JOB_LIST_TOOLS = ('get_active_jobs', 'get_all_active_jobs')
+SPEND_LIST_TOOLS = ('get_spend_summary', 'get_all_spend_summaries')
+CELL_CHARS = 120
+
+JOB_DETAIL_PROPERTY = {
+    "type": "string",
+    "enum": ["summary", "full"],
+    "description": "'summary' (default): one row per job. 'full': every field of every job - only when you need descriptions or history for many jobs at once"
+}
+
+
+CLIENT_CODES_PROPERTY = {
+    "type": "array",
+    "items": {"type": "string"},
+    "description": "Several client codes at once (e.g., ['SKY', 'TOW']) - one call instead of one per client. Use instead of client_code."
+}
+
+SPEND_PERIOD_PROPERTY = {
+    "type": "string",
+    "enum": ["this_month", "this_quarter", "last_quarter", "JAN-MAR", "APR-JUN", "JUL-SEP", "OCT-DEC"],
+    "description": "Time period: 'this_month' (default), 'this_quarter', 'last_quarter', or a calendar quarter"
+}
+
+
+def _cell(value):
+    """One table cell - pipes and line breaks flattened, long text cut"""
+    if value is None or value == '':
+        return '-'
+    if isinstance(value, bool):
+        return 'yes' if value else 'no'
+    if isinstance(value, list):
+        value = '; '.join(str(v) for v in value)
+    text = ' '.join(str(value).replace('|', '-').split())
+    return text if len(text) <= CELL_CHARS else text[:CELL_CHARS - 3] + '...'
+
+
+def _latest_update(job):
+    """Newest update history entry (the 'update' field can hold the whole history)"""
+    if job.get('updateHistory'):
+        return job['updateHistory'][0]
+    return (job.get('update') or '').strip().split('\n')[0]
+
+
+def format_table(rows, columns, name='rows'):
+    """A header line of column names, then one ' | ' line per row (within the tool result budget)"""
+    lines = [' | '.join(_cell(row.get(column)) for column in columns) for row in rows]
+    body = budget.fit_lines(
+        lines,
+        budget.TOOL_RESULT_TOKENS,
+        summarize=lambda dropped: f"(+{len(dropped)} more {name} not shown)",
+        part='tools',
+    )
+    return ' | '.join(columns) + '\n' + body
+
+
+def format_tool_result(tool_name, tool_input, result):
+    """
+    Tool result as text for Claude.
+    Job lists (unless detail 'full' was asked for), people and all-client spend become tables;
+    everything else, errors included, goes as compact JSON.
+    """
+    tool_input = tool_input or {}
+    if TOOL_RESULT_FORMAT != 'compact' or not isinstance(result, dict) or result.get('error'):
+        return json.dumps(budget.fit_tool_result(result), default=str)
+    
+    if tool_name in JOB_LIST_TOOLS and isinstance(result.get('jobs'), list) and tool_input.get('detail') != 'full':
+        jobs = [dict(job, update=_latest_update(job)) for job in result['jobs']]
+        return (
+            f"{len(jobs)} active jobs - summary rows, call get_job_by_number for a job's description, story and history\n"
+            + format_table(jobs, JOB_COLUMNS, 'jobs')
+        )
+    if tool_name == 'search_people' and isinstance(result.get('people'), list):
+        return f"{len(result['people'])} people\n" + format_table(result['people'], PEOPLE_COLUMNS, 'people')
+    if tool_name in SPEND_LIST_TOOLS and isinstance(result.get('clients'), list):
+        return f"{len(result['clients'])} clients\n" + format_table(result['clients'], SPEND_COLUMNS, 'clients')
+    
+    return json.dumps(budget.fit_tool_result(result), separators=(',', ':'), default=str)
+
+
 # Tool definitions for Claude API
 CLAUDE_TOOLS = [
     {
@@ -376,7 +331,7 @@ CLAUDE_TOOLS = [
                 },
                 "search_term": {
                     "type": "string",
-                    "description": "Search for a specific person by name or email. Optional."
+                    "description": "Search for a specific person by name or email (part of one is fine, spelling mistakes too). Optional."
                 }
             },
             "required": []
@@ -384,21 +339,22 @@ CLAUDE_TOOLS = [
     },
     {
         "name": "get_client_detail",
-        "description": "Get detailed information about a client including their budget, quarter, commercial setup, and next job number.",
+        "description": "Get detailed information about a client including their budget, quarter, commercial setup, and next job number. Pass client_codes to get several clients in one call.",
         "input_schema": {
             "type": "object",
             "properties": {
                 "client_code": {
                     "type": "string",
                     "description": "The client code (e.g., 'SKY', 'TOW', 'ONE')"
-                }
+                },
+                "client_codes": CLIENT_CODES_PROPERTY
             },
-            "required": ["client_code"]
+            "required": []
         }
     },
     {
         "name": "get_spend_summary",
-        "description": "Get spend/budget summary for a client. Use this when asked about how much has been spent, budget remaining, or financial tracking.",
+        "description": "Get spend/budget summary for a client. Use this when asked about how much has been spent, budget remaining, or financial tracking. Pass client_codes for a few named clients in one call.",
         "input_schema": {
             "type": "object",
             "properties": {
@@ -406,12 +362,20 @@ CLAUDE_TOOLS = [
                     "type": "string",
                     "description": "The client code (e.g., 'SKY', 'TOW', 'ONE')"
                 },
-                "period": {
-                    "type": "string",
-                    "description": "Time period: 'this_month', 'this_quarter', or 'last_quarter'"
-                }
+                "client_codes": CLIENT_CODES_PROPERTY,
+                "period": SPEND_PERIOD_PROPERTY
             },
-            "required": ["client_code"]
+            "required": []
+        }
+    },
+    {
+        "name": "get_all_spend_summaries",
+        "description": "Get spend/budget summaries for EVERY client in one call. Use this for cross-client questions like 'who's over budget this quarter?' or 'how are all clients tracking this month?' instead of calling get_spend_summary per client.",
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "period": SPEND_PERIOD_PROPERTY
+            }
         }
     },
     {
@@ -430,73 +394,106 @@ CLAUDE_TOOLS = [
     },
     {
         "name": "get_active_jobs",
-        "description": "Get all active (non-completed) jobs for a specific client. Use this when you know which client and need to see their jobs. Returns job numbers, names, descriptions, stage, status, and due dates.",
+        "description": "Get all active (non-completed) jobs for a specific client, or for a few clients at once with client_codes. Use this when you know which client(s) and need to see their jobs. Returns one summary row per job: job number, name, stage, status, with client, due and live dates, and the latest update. Call get_job_by_number for a job's description, story and update history.",
         "input_schema": {
             "type": "object",
             "properties": {
                 "client_code": {
                     "type": "string",
                     "description": "The client code (e.g., 'SKY', 'TOW', 'LAB')"
-                }
+                },
+                "client_codes": CLIENT_CODES_PROPERTY,
+                "detail": JOB_DETAIL_PROPERTY
             },
-            "required": ["client_code"]
+            "required": []
         }
     },
     {
         "name": "get_all_active_jobs",
-        "description": "Get ALL active jobs across ALL clients in one call. Use this for cross-client queries like 'What's due today?' or 'What's on this week?' - returns ~20 jobs total. More efficient than calling get_active_jobs multiple times.",
+        "description": "Get ALL active jobs across ALL clients in one call. Use this for cross-client queries like 'What's due today?' or 'What's on this week?' - returns ~20 jobs total, one summary row each. More efficient than calling get_active_jobs multiple times.",
         "input_schema": {
             "type": "object",
-            "properties": {},
+            "properties": {
+                "detail": JOB_DETAIL_PROPERTY
+            },
             "required": []
         }
     },
     {
         "name": "get_job_by_number",
-        "description": "Get a specific job by its job number (e.g., 'LAB 055' or 'SKY 042'). Use this when you have an exact job number and need its details.",
+        "description": "Get a specific job by its job number (e.g., 'LAB 055' or 'SKY 042'), or several with job_numbers. Use this when you have exact job numbers and need their details - description, story, update history and links.",
         "input_schema": {
             "type": "object",
             "properties": {
                 "job_number": {
                     "type": "string",
                     "description": "The job number (e.g., 'LAB 055', 'SKY 042')"
+                },
+                "job_numbers": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "Several job numbers at once (e.g., ['LAB 055', 'SKY 042']) - one call instead of one per job. Use instead of job_number."
                 }
             },
-            "required": ["job_number"]
+            "required": []
         }
     }
 ]
 
+# Fixed part of every prompt, and the headers around the message (budget.py)
+SYSTEM_TOKENS = budget.estimate_tokens(TRAFFIC_PROMPT) + budget.estimate_tokens(CLAUDE_TOOLS)
+MESSAGE_OVERHEAD_TOKENS = 200
+
 
 def execute_tool(tool_name, tool_input):
     """Execute a tool and return results"""
-    print(f"[traffic] Executing tool: {tool_name} with input: {tool_input}")
+    logger.info('Executing tool', tool=tool_name, input=tool_input)
+    
+    with metrics.timed_tool(tool_name):
+        result = cassettes.tool(tool_name, tool_input, _run_tool)
     
+    # Can be every active job - debug only, and cut to LOG_MAX_CHARS
+    logger.debug('Tool result', tool=tool_name, result=result)
+    return result
+
+
+def _run_tool(tool_name, tool_input):
+    """Dispatch a tool call to its implementation"""
     if tool_name == "search_people":
         result = tool_search_people(
             client_code=tool_input.get('client_code'),
             search_term=tool_input.get('search_term')
         )
     elif tool_name == "get_client_detail":
-        result = tool_get_client_detail(tool_input.get('client_code'))
+        result = tool_get_client_detail(tool_input.get('client_code'), tool_input.get('client_codes'))
     elif tool_name == "get_spend_summary":
         result = tool_get_spend_summary(
             client_code=tool_input.get('client_code'),
-            period=tool_input.get('period', 'this_month')
+            period=tool_input.get('period', 'this_month'),
+            client_codes=tool_input.get('client_codes')
         )
+    elif tool_name == "get_all_spend_summaries":
+        result = tool_get_all_spend_summaries(tool_input.get('period', 'this_month'))
     elif tool_name == "reserve_job_number":
         result = tool_reserve_job_number(tool_input.get('client_code'))
     elif tool_name == "get_active_jobs":
-        # Import here to avoid circular import
-        import airtable
-        jobs = airtable.get_active_jobs(tool_input.get('client_code'))
+        if tool_input.get('client_codes'):
+            jobs = airtable.get_active_jobs_for_clients(_client_codes(tool_input['client_codes']))
+        else:
+            jobs = airtable.get_active_jobs(tool_input.get('client_code'))
         result = {'jobs': jobs, 'count': len(jobs)}
     elif tool_name == "get_all_active_jobs":
-        import airtable
         jobs = airtable.get_all_active_jobs()
         result = {'jobs': jobs, 'count': len(jobs)}
+    elif tool_name == "get_job_by_number" and tool_input.get('job_numbers'):
+        found = airtable.get_jobs_by_numbers(tool_input['job_numbers'])
+        asked = list(dict.fromkeys(str(j).replace('_', ' ').upper() for j in tool_input['job_numbers'] if j))
+        result = {
+            'jobs': [found[j] for j in asked if j in found],
+            'count': len([j for j in asked if j in found]),
+            'notFound': [j for j in asked if j not in found],
+        }
     elif tool_name == "get_job_by_number":
-        import airtable
         job = airtable.get_job_by_number(tool_input.get('job_number'))
         if job:
             result = {'job': job, 'found': True}
@@ -505,7 +502,6 @@ def execute_tool(tool_name, tool_input):
     else:
         result = {'error': f'Unknown tool: {tool_name}'}
     
-    print(f"[traffic] Tool result: {result}")
     return result
 
 
@@ -513,31 +509,49 @@ def execute_tool(tool_name, tool_input):
 # EXTRACTION HELPERS
 # ===================
 
+# 3 letters + space(s) or underscore + 3 digits: 'TOW 023', 'tow  023', 'ONE_125'
+JOB_NUMBER_PATTERN = re.compile(r'\b([A-Za-z]{3})(?:\s+|_)(\d{3})\b')
+CLIENT_CODES = frozenset(VALID_CLIENT_CODES)
+
+
+def _job_numbers_in(text):
+    """(job number, position) for each valid job number in text, in order"""
+    if not text:
+        return
+    for match in JOB_NUMBER_PATTERN.finditer(text):
+        code = match.group(1).upper()
+        if code in CLIENT_CODES:
+            yield f"{code} {match.group(2)}", match.start()
+
+
 def extract_job_number(text):
     """
     Extract job number from text (e.g., 'TOW 023').
-    Pattern: 3 letters + space + 3 digits
+    Pattern: 3 letters + space + 3 digits (or underscore: ONE_125)
     """
-    if not text:
-        return None
+    for job_number, _ in _job_numbers_in(text):
+        return job_number
+    return None
     
-    # Look for pattern: 3 letters + space + 3 digits
-    match = re.search(r'\b([A-Z]{3})\s+(\d{3})\b', text.upper())
-    if match:
-        code = match.group(1)
-        number = match.group(2)
-        if code in VALID_CLIENT_CODES:
-            return f"{code} {number}"
-    
-    # Also check for underscore variant: ONE_125
-    match = re.search(r'\b([A-Z]{3})_(\d{3})\b', text.upper())
-    if match:
-        code = match.group(1)
-        number = match.group(2)
-        if code in VALID_CLIENT_CODES:
-            return f"{code} {number}"
     
-    return None
+def scan_job_numbers(subject='', content='', attachment_names=()):
+    """
+    Every job number in an email, one pass per field: subject, then content,
+    then each attachment name.
+    Returns [{'jobNumber', 'source', 'position'}] in that order (attachment
+    entries also carry 'attachment' - the file name).
+    """
+    if isinstance(attachment_names, str):
+        attachment_names = [attachment_names]
+    
+    candidates = []
+    for source, text in (('subject', subject), ('content', content)):
+        for job_number, position in _job_numbers_in(text):
+            candidates.append({'jobNumber': job_number, 'source': source, 'position': position})
+    for filename in attachment_names or []:
+        for job_number, position in _job_numbers_in(filename):
+            candidates.append({'jobNumber': job_number, 'source': 'attachment', 'position': position, 'attachment': filename})
+    return candidates
 
 
 def strip_markdown_json(content):
@@ -554,16 +568,19 @@ def strip_markdown_json(content):
 # MAIN ROUTING FUNCTION
 # ===================
 
-def route_request(request_data, active_jobs=None):
+MAX_TOOL_ROUNDS = 5  # Prevent runaway tool loops
+
+FORCE_FINAL_PROMPT = "You've gathered enough information. Please provide your final JSON response now based on what you have."
+
+
+def build_messages(request_data, active_jobs=None):
     """
-    Route a request through Claude - unified for email and hub.
-    
-    Args:
-        request_data: dict with request fields (content, source, sender, etc.)
-        active_jobs: optional list of active jobs
+    Build the Claude messages array for a request.
+    Shared by the sync brain and traffic_async.
     
-    Returns:
-        dict with routing decision from Claude (type, message, route, jobs, etc.)
+    Returns (messages, context) where context carries the bits needed after
+    Claude has decided (source, content, subject, job numbers mentioned, session_id,
+    jobs seen by number, the decision cache key).
     """
     
     # Determine source
@@ -579,31 +596,42 @@ def route_request(request_data, active_jobs=None):
     attachment_names = request_data.get('attachmentNames', [])
     session_id = request_data.get('sessionId', None)
     
-    # Extract job number hint (regex is fine for structured data)
-    job_number = extract_job_number(subject)
-    if not job_number:
-        job_number = extract_job_number(content)
-    if not job_number and attachment_names:
-        for filename in attachment_names:
-            job_number = extract_job_number(filename)
-            if job_number:
-                break
-    
-    # Debug logging
-    print(f"[traffic] === ROUTING DEBUG ===")
-    print(f"[traffic] Source: {source}")
-    print(f"[traffic] Content: {content[:100]}..." if len(content) > 100 else f"[traffic] Content: {content}")
-    print(f"[traffic] Sender: {sender_email}")
-    print(f"[traffic] Job number (regex): {job_number}")
-    
-    # Format active jobs for prompt
+    # Extract job number hints (regex is fine for structured data) - the first
+    # one found is the hint, the rest are listed for Claude too
+    candidates = scan_job_numbers(subject, content, attachment_names)
+    mentioned = list(dict.fromkeys(c['jobNumber'] for c in candidates))
+    job_number = mentioned[0] if mentioned else None
+    
+    logger.info('Routing', source=source, content=content[:100], sender=sender_email,
+                jobNumber=job_number, alsoMentioned=mentioned[1:] or None)
+    
+    # Email body as Claude sees it - quoted history, signatures etc. stripped
+    prompt_content = content
+    if source != 'hub':
+        prompt_content, stats = preprocess.clean_email(content, subject)
+        if stats['chars'] != stats['originalChars']:
+            logger.info('Body preprocessed', originalChars=stats['originalChars'], chars=stats['chars'])
+    
+    # Token allowances for the jobs list and history (budget.py)
+    allowance = budget.plan(SYSTEM_TOKENS, budget.estimate_tokens(prompt_content) + MESSAGE_OVERHEAD_TOKENS)
+    
+    # Format active jobs for prompt - most relevant first if they don't all fit
     active_jobs_text = "No active jobs provided"
     if active_jobs:
-        active_jobs_text = "\n".join([
-            f"- {job['jobNumber']} - {job['jobName']}: {job.get('description', '')} (Stage: {job.get('stage', 'Unknown')}, Status: {job.get('status', 'Unknown')})"
-            for job in active_jobs
-        ])
-        print(f"[traffic] Active jobs provided: {len(active_jobs)}")
+        active_jobs_text = budget.fit_lines(
+            [
+                f"- {job['jobNumber']} - {job['jobName']}: {job.get('description', '')} (Stage: {job.get('stage', 'Unknown')}, Status: {job.get('status', 'Unknown')})"
+                for job in active_jobs
+            ],
+            allowance['context'],
+            rank=budget.rank_jobs(active_jobs, mentioned, f"{subject} {content[:2000]}"),
+            summarize=lambda dropped: budget.jobs_summary(active_jobs, dropped),
+        )
+        logger.info('Active jobs provided', jobs=len(active_jobs))
+    
+    job_numbers_text = job_number if job_number else 'None'
+    if len(mentioned) > 1:
+        job_numbers_text += f"\nOther job numbers mentioned: {', '.join(mentioned[1:])}"
     
     # Build context for Claude
     if source == 'hub':
@@ -614,7 +642,7 @@ User: {sender_name} <{sender_email}>
 Message:
 {content}
 
-Job number found in text: {job_number if job_number else 'None'}
+Job number found in text: {job_numbers_text}
 
 Active jobs for reference:
 {active_jobs_text}"""
@@ -628,176 +656,347 @@ Recipients: {', '.join(recipients) if isinstance(recipients, list) else recipien
 Has Attachments: {has_attachments}
 Attachment Names: {', '.join(attachment_names) if isinstance(attachment_names, list) else attachment_names}
 
-Job number found in text: {job_number if job_number else 'None'}
+Job number found in text: {job_numbers_text}
 
 Active jobs for reference:
 {active_jobs_text}
 
 Email content:
-{content}"""
+{prompt_content}"""
     
     # Build messages array
     messages = []
     
-    # Add conversation history for hub sessions
+    # Add conversation history for hub sessions (last 10, within the budget)
+    follow_up = False
     if source == 'hub' and session_id:
         conv = get_conversation(session_id)
-        for msg in conv['messages'][-10:]:  # Last 10 messages
-            messages.append(msg)
+        messages.extend(budget.fit_history(conv['messages'][-10:], allowance['history']))
+        follow_up = bool(conv['messages'])
     
     # Add current message
     messages.append({'role': 'user', 'content': full_content})
     
+    # Decision cache key - follow-ups mean something different in each conversation
+    decision_cache.observe_jobs(active_jobs)
+    cache_key = None
+    if not follow_up:
+        cache_key = decision_cache.key(source, sender_email, decision_cache.text_for(subject, prompt_content, attachment_names), mentioned)
+    
+    context = {
+        'source': source,
+        'content': content,
+        'session_id': session_id,
+        'jobs': {job['jobNumber']: job for job in active_jobs or [] if job.get('jobNumber')},
+        'cache_key': cache_key,
+        'cached': False,
+        'subject': subject,
+        'job_numbers': mentioned,
+    }
+    return messages, context
+
+
+def claude_request(messages, tools=True):
+    """Keyword arguments for anthropic messages.create (tools=False forces a text answer)"""
+    params = {
+        'model': ANTHROPIC_MODEL,
+        'max_tokens': 1500,
+        'temperature': 0.1,
+        'system': TRAFFIC_PROMPT,
+        'messages': budget.fit_tool_rounds(messages, budget.PROMPT_TOKEN_BUDGET - SYSTEM_TOKENS),
+    }
+    if tools:
+        params['tools'] = CLAUDE_TOOLS
+    return params
+
+
+def call_claude(messages, call, tools=True):
+    """One Anthropic call - timed, with token usage counted (call: initial / tool_round / final)"""
+    with breaker.anthropic.guard(), metrics.timed_claude('traffic', call):
+        response = cassettes.claude(call, claude_request(messages, tools), anthropic_client.messages.create)
+    metrics.record_usage('traffic', getattr(response, 'usage', None))
+    return response
+
+
+def assistant_message(content_blocks):
+    """Echo Claude's tool_use/text blocks back as an assistant message"""
+    assistant_content = []
+    for b in content_blocks:
+        if b.type == 'tool_use':
+            assistant_content.append({
+                'type': 'tool_use',
+                'id': b.id,
+                'name': b.name,
+                'input': b.input
+            })
+        elif b.type == 'text':
+            assistant_content.append({
+                'type': 'text',
+                'text': b.text
+            })
+    return {'role': 'assistant', 'content': assistant_content}
+
+
+def tool_result_block(tool_use_id, tool_result, tool_name=None, tool_input=None):
+    """Wrap a tool result for the next Claude call (format_tool_result), counting tokens saved"""
+    content = format_tool_result(tool_name, tool_input, tool_result)
+    sent = budget.estimate_tokens(content)
+    verbatim = budget.estimate_tokens(tool_result)
+    metrics.record_tool_result(tool_name or 'unknown', verbatim, sent)
+    if verbatim > sent:
+        logger.info('Tool result compacted', tool=tool_name, tokens=sent, jsonTokens=verbatim,
+                    saved=f"{100 - sent * 100 // verbatim}%")
+    return {
+        'type': 'tool_result',
+        'tool_use_id': tool_use_id,
+        'content': content
+    }
+
+
+def remember_jobs(context, tool_result):
+    """Keep the full job records a tool returned, to fill in Claude's answer (fill_jobs)"""
+    if not isinstance(tool_result, dict):
+        return
+    jobs = tool_result.get('jobs') or ([tool_result['job']] if tool_result.get('job') else [])
+    for job in jobs:
+        if isinstance(job, dict) and job.get('jobNumber'):
+            context['jobs'][job['jobNumber']] = job
+    decision_cache.observe_jobs(jobs)
+
+
+def fill_jobs(routing, known_jobs):
+    """
+    Claude sees job lists as summary rows, so the jobs it hands back (confirm
+    options) can be partial - complete them from the records we fetched.
+    """
+    for key in ('jobs', 'possibleJobs'):
+        jobs = routing.get(key)
+        if not known_jobs or not isinstance(jobs, list):
+            continue
+        routing[key] = [
+            {**job, **known_jobs[job['jobNumber']]} if isinstance(job, dict) and job.get('jobNumber') in known_jobs else job
+            for job in jobs
+        ]
+    return routing
+
+
+def response_text(response):
+    """
+    Pull the JSON text out of Claude's final response.
+    Strips markdown fences and any preamble before the JSON object.
+    """
+    result_text = ''
+    for block in response.content:
+        if block.type == 'text':
+            result_text = block.text
+            break
+    
+    result_text = strip_markdown_json(result_text)
+    
+    # If Claude returned text + JSON, extract just the JSON
+    if result_text and not result_text.strip().startswith('{'):
+        json_match = re.search(r'\{[\s\S]*\}', result_text)
+        if json_match:
+            logger.info('Extracting JSON from mixed response')
+            result_text = json_match.group()
+    
+    return result_text
+
+
+def finish_routing(context, routing):
+    """Log Claude's decision and update conversation memory for hub sessions"""
+    logger.info('Claude decision', type=routing.get('type'), route=routing.get('route'),
+                confidence=routing.get('confidence'), clientCode=routing.get('clientCode'),
+                clientName=routing.get('clientName'), jobNumber=routing.get('jobNumber'),
+                message=(routing.get('message') or '')[:50], reason=routing.get('reason'))
+    
+    # Full job records behind any jobs Claude listed
+    fill_jobs(routing, context.get('jobs'))
+    
+    # An action that writes to Airtable makes cached answers stale; then keep
+    # this decision for the next near-identical request
+    if routing.get('type') == 'action' and routing.get('route') in decision_cache.JOB_CHANGING_ROUTES:
+        decision_cache.jobs_changed(f"{routing.get('route')} {routing.get('jobNumber') or routing.get('clientCode') or ''}")
+    if not context.get('cached'):
+        decision_cache.store(context.get('cache_key'), routing)
+    
+    # Update conversation memory for hub sessions
+    if context['source'] == 'hub' and context['session_id']:
+        add_to_conversation(context['session_id'], 'user', context['content'])
+        add_to_conversation(context['session_id'], 'assistant', routing.get('message', '')[:200])
+    
+    return routing
+
+
+def validate_cached_action(routing):
+    """A cached action still holds: its client code is valid and its job (if any) is still live"""
+    if routing.get('clientCode') and routing['clientCode'] not in CLIENT_CODES:
+        return False
+    job_number = routing.get('jobNumber')
+    if not job_number:
+        return True
+    job = airtable.get_job_by_number(job_number)
+    return bool(job) and job.get('status') not in ('Completed', 'Archived')
+
+
+def cached_routing(context):
+    """
+    An earlier decision for a near-identical request (decision_cache.py), or None.
+    Cached actions are only reused once validate_cached_action passes.
+    """
+    routing = decision_cache.lookup(context['cache_key'])
+    if routing and routing.get('type') == 'action' and not validate_cached_action(routing):
+        logger.info('Cached action no longer valid - asking Claude', route=routing.get('route'), jobNumber=routing.get('jobNumber'))
+        decision_cache.forget(context['cache_key'])
+        return None
+    if routing:
+        context['cached'] = True
+    return routing
+
+
+# Clear-cut triggers for the rule-based route (see TRAFFIC_PROMPT's ACTIONS).
+# Both routes write to the job, so a trigger only counts as an instruction at
+# the start of a fresh subject or the email's opening line - never a word in
+# quoted history, and never a question ("update yet?").
+FALLBACK_TRIGGERS = [
+    ('file', re.compile(r'(?:please\s+)?(?:file this|save this|job bag|archive)\b', re.IGNORECASE)),
+    ('update', re.compile(r'(?:please\s+)?update\b(?!\s+(?:on|yet|from|re)\b)', re.IGNORECASE)),
+]
+REPLY_SUBJECT = re.compile(r'\s*(?:re|fw|fwd)\s*:', re.IGNORECASE)
+GREETING_LINE = re.compile(r'\s*(?:hi|hey|hello|morning|afternoon|kia ora)\b[^.!?]{0,30}[,.!]?\s*$', re.IGNORECASE)
+
+
+def fallback_route(context):
+    """The worker route a rule sends this email to, or None (see FALLBACK_TRIGGERS)"""
+    subject = context.get('subject') or ''
+    lines = [line for line in context['content'].splitlines() if line.strip()]
+    if lines and GREETING_LINE.match(lines[0]):
+        lines = lines[1:]
+    
+    openings = [lines[0].strip()] if lines else []
+    if subject and not REPLY_SUBJECT.match(subject):
+        openings.insert(0, subject.strip())
+    
+    for opening in openings:
+        if opening.endswith('?'):
+            continue
+        for route, trigger in FALLBACK_TRIGGERS:
+            if trigger.match(opening):
+                return route
+    return None
+
+
+def fallback_routing(context, error):
+    """
+    Rule-based decision while Claude's breaker is open (breaker.py).
+    An email naming exactly one job that opens with a clear file/update
+    instruction goes to that worker; anything else gets an error at once
+    instead of a 60s wait.
+    """
+    logger.warning('Claude unavailable - rule-based routing', error=str(error))
+    job_numbers = context.get('job_numbers') or []
+    route = fallback_route(context) if context['source'] == 'email' and len(job_numbers) == 1 else None
+    if route:
+        routing = {
+            'type': 'action',
+            'route': route,
+            'message': 'On it.',
+            'confidence': 'low',
+            'clientCode': job_numbers[0].split()[0],
+            'jobNumber': job_numbers[0],
+            'reason': f"Rule-based fallback ({error})",
+            'fallback': True,
+        }
+        # Not Claude's decision - don't let the cache reuse it
+        context['cache_key'] = None
+        return finish_routing(context, routing)
+    return routing_error('Claude unavailable', error)
+
+
+def routing_error(reason, error):
+    """Standard error routing when Claude can't give us a decision"""
+    return {
+        'type': 'error',
+        'message': "Sorry, I got in a muddle over that one.",
+        'confidence': 'low',
+        'reason': reason,
+        'error': str(error)
+    }
+
+
+@cassettes.recorded
+def route_request(request_data, active_jobs=None):
+    """
+    Route a request through Claude - unified for email and hub.
+    
+    Args:
+        request_data: dict with request fields (content, source, sender, etc.)
+        active_jobs: optional list of active jobs
+    
+    Returns:
+        dict with routing decision from Claude (type, message, route, jobs, etc.)
+    """
+    messages, context = build_messages(request_data, active_jobs)
+    result_text = None
+    
+    # Same content seen recently - reuse the decision
+    cached = cached_routing(context)
+    if cached:
+        return finish_routing(context, cached)
+    
     # Call Claude
     try:
-        response = anthropic_client.messages.create(
-            model=ANTHROPIC_MODEL,
-            max_tokens=1500,
-            temperature=0.1,
-            system=TRAFFIC_PROMPT,
-            tools=CLAUDE_TOOLS,
-            messages=messages
-        )
+        response = call_claude(messages, 'initial')
         
         # Handle tool use - loop until Claude is done (max 5 rounds to prevent runaway)
         tool_rounds = 0
-        max_tool_rounds = 5
+        tool_calls = 0
         
-        while response.stop_reason == 'tool_use' and tool_rounds < max_tool_rounds:
+        while response.stop_reason == 'tool_use' and tool_rounds < MAX_TOOL_ROUNDS:
             tool_rounds += 1
-            print(f"[traffic] Tool round {tool_rounds}")
+            logger.info('Tool round', round=tool_rounds)
             
             tool_results = []
-            content_blocks = response.content
-            
-            for block in content_blocks:
-                if block.type == 'tool_use':
-                    print(f"[traffic] Executing tool: {block.name}")
-                    tool_result = execute_tool(block.name, block.input)
-                    tool_results.append({
-                        'type': 'tool_result',
-                        'tool_use_id': block.id,
-                        'content': json.dumps(tool_result)
-                    })
+            with metrics.timed('tool_round'):
+                for block in response.content:
+                    if block.type == 'tool_use':
+                        tool_calls += 1
+                        tool_result = execute_tool(block.name, block.input)
+                        remember_jobs(context, tool_result)
+                        tool_results.append(tool_result_block(block.id, tool_result, block.name, block.input))
             
             # Add assistant's tool use to messages
-            assistant_content = []
-            for b in content_blocks:
-                if b.type == 'tool_use':
-                    assistant_content.append({
-                        'type': 'tool_use',
-                        'id': b.id,
-                        'name': b.name,
-                        'input': b.input
-                    })
-                elif b.type == 'text':
-                    assistant_content.append({
-                        'type': 'text',
-                        'text': b.text
-                    })
-            messages.append({'role': 'assistant', 'content': assistant_content})
+            messages.append(assistant_message(response.content))
             messages.append({'role': 'user', 'content': tool_results})
             
             # Next Claude call with tool results
-            response = anthropic_client.messages.create(
-                model=ANTHROPIC_MODEL,
-                max_tokens=1500,
-                temperature=0.1,
-                system=TRAFFIC_PROMPT,
-                tools=CLAUDE_TOOLS,
-                messages=messages
-            )
+            response = call_claude(messages, 'tool_round')
         
         # If we hit max rounds and Claude still wants tools, force a final answer
-        if tool_rounds >= max_tool_rounds and response.stop_reason == 'tool_use':
-            print(f"[traffic] Hit max tool rounds ({max_tool_rounds}), forcing final answer")
-            
-            # Add Claude's last response to messages
-            assistant_content = []
-            for b in response.content:
-                if b.type == 'tool_use':
-                    assistant_content.append({
-                        'type': 'tool_use',
-                        'id': b.id,
-                        'name': b.name,
-                        'input': b.input
-                    })
-                elif b.type == 'text':
-                    assistant_content.append({
-                        'type': 'text',
-                        'text': b.text
-                    })
-            messages.append({'role': 'assistant', 'content': assistant_content})
+        if tool_rounds >= MAX_TOOL_ROUNDS and response.stop_reason == 'tool_use':
+            logger.warning('Hit max tool rounds, forcing final answer', rounds=MAX_TOOL_ROUNDS)
             
-            # Tell Claude to wrap up with what it has
-            messages.append({'role': 'user', 'content': "You've gathered enough information. Please provide your final JSON response now based on what you have."})
+            # Add Claude's last response, then tell Claude to wrap up with what it has
+            messages.append(assistant_message(response.content))
+            messages.append({'role': 'user', 'content': FORCE_FINAL_PROMPT})
             
             # Final call WITHOUT tools to force JSON response
-            response = anthropic_client.messages.create(
-                model=ANTHROPIC_MODEL,
-                max_tokens=1500,
-                temperature=0.1,
-                system=TRAFFIC_PROMPT,
-                messages=messages  # No tools parameter = must respond with text
-            )
-            print(f"[traffic] Forced final response, stop_reason: {response.stop_reason}")
-        
-        content_blocks = response.content
-        
-        # Extract text response
-        result_text = ''
-        for block in content_blocks:
-            if block.type == 'text':
-                result_text = block.text
-                break
-        
-        result_text = strip_markdown_json(result_text)
-        
-        # If Claude returned text + JSON, extract just the JSON
-        if result_text and not result_text.strip().startswith('{'):
-            json_match = re.search(r'\{[\s\S]*\}', result_text)
-            if json_match:
-                print(f"[traffic] Extracting JSON from mixed response")
-                result_text = json_match.group()
+            response = call_claude(messages, 'final', tools=False)
+            logger.info('Forced final response', stopReason=response.stop_reason)
         
+        metrics.record_tool_rounds('traffic', tool_rounds, tool_calls)
+        result_text = response_text(response)
         routing = json.loads(result_text)
         
-        # Debug logging - Claude's decision
-        print(f"[traffic] === CLAUDE DECISION ===")
-        print(f"[traffic] Type: {routing.get('type')}")
-        print(f"[traffic] Route: {routing.get('route')}")
-        print(f"[traffic] Confidence: {routing.get('confidence')}")
-        print(f"[traffic] Client: {routing.get('clientCode')} / {routing.get('clientName')}")
-        print(f"[traffic] Job: {routing.get('jobNumber')}")
-        print(f"[traffic] Message: {routing.get('message', '')[:50]}...")
-        print(f"[traffic] Reason: {routing.get('reason')}")
-        
-        # Update conversation memory for hub sessions
-        if source == 'hub' and session_id:
-            add_to_conversation(session_id, 'user', content)
-            add_to_conversation(session_id, 'assistant', routing.get('message', '')[:200])
-        
-        return routing
+        return finish_routing(context, routing)
         
     except json.JSONDecodeError as e:
-        print(f"[traffic] Claude returned invalid JSON: {e}")
-        print(f"[traffic] Raw response: {result_text if 'result_text' in dir() else 'No response'}")
-        return {
-            'type': 'error',
-            'message': "Sorry, I got in a muddle over that one.",
-            'confidence': 'low',
-            'reason': 'Claude returned invalid JSON',
-            'error': str(e)
-        }
+        logger.error('Claude returned invalid JSON', error=str(e), response=result_text)
+        return routing_error('Claude returned invalid JSON', e)
     
+    except breaker.BreakerOpen as e:
+        return fallback_routing(context, e)
+        
     except Exception as e:
-        print(f"[traffic] Error calling Claude: {e}")
-        import traceback
-        traceback.print_exc()
-        return {
-            'type': 'error',
-            'message': "Sorry, I got in a muddle over that one.",
-            'confidence': 'low',
-            'reason': 'Error calling Claude',
-            'error': str(e)
-        }
+        logger.error('Error calling Claude', exc_info=True, error=str(e))
+        return routing_error('Error calling Claude', e)
@@ -0,0 +1,133 @@
+"""
+Dot Traffic - Unified Brain (async)
+Async twin of traffic.route_request, for the ASGI app.
+
+Prompt building, tool definitions and decision parsing all come from
+traffic.py - only the Claude calls and tool execution are awaited here,
+so one event loop can hold hundreds of Claude conversations at once.
+"""
+
+import asyncio
+import json
+import httpx
+from anthropic import AsyncAnthropic
+
+import traffic
+import metrics
+import cassettes
+import breaker
+import logs
+from traffic import ANTHROPIC_API_KEY, MAX_TOOL_ROUNDS, FORCE_FINAL_PROMPT
+
+# ===================
+# CONFIG
+# ===================
+
+logger = logs.get('traffic')
+
+# Async Anthropic client - one per process, shared by every request on the loop
+anthropic_client = AsyncAnthropic(
+    api_key=ANTHROPIC_API_KEY,
+    http_client=httpx.AsyncClient(timeout=60.0, follow_redirects=True)
+)
+
+
+async def close():
+    """Close the Anthropic client (called when the ASGI app shuts down)"""
+    await anthropic_client.close()
+
+
+async def call_claude(messages, call, tools=True):
+    """One Anthropic call - timed, with token usage counted (see traffic.call_claude)"""
+    with breaker.anthropic.guard(), metrics.timed_claude('traffic', call):
+        response = await cassettes.claude_async(call, traffic.claude_request(messages, tools), anthropic_client.messages.create)
+    metrics.record_usage('traffic', getattr(response, 'usage', None))
+    return response
+
+
+# ===================
+# TOOLS
+# ===================
+
+async def execute_tool(tool_name, tool_input):
+    """
+    Execute a tool without blocking the loop.
+    The tools themselves are the sync ones in traffic.py, run on the default executor.
+    """
+    return await asyncio.to_thread(traffic.execute_tool, tool_name, tool_input)
+
+
+# ===================
+# MAIN ROUTING FUNCTION
+# ===================
+
+@cassettes.recorded
+async def route_request(request_data, active_jobs=None):
+    """
+    Route a request through Claude - unified for email and hub.
+    Same contract as traffic.route_request.
+    """
+    messages, context = traffic.build_messages(request_data, active_jobs)
+    result_text = None
+    
+    # Cached actions are validated against Airtable - off the event loop
+    cached = await asyncio.to_thread(traffic.cached_routing, context)
+    if cached:
+        return traffic.finish_routing(context, cached)
+    
+    try:
+        response = await call_claude(messages, 'initial')
+        
+        tool_rounds = 0
+        tool_calls = 0
+        
+        while response.stop_reason == 'tool_use' and tool_rounds < MAX_TOOL_ROUNDS:
+            tool_rounds += 1
+            logger.info('Tool round', round=tool_rounds)
+            
+            # Tools requested in the same round are independent - run them together
+            tool_blocks = [block for block in response.content if block.type == 'tool_use']
+            tool_calls += len(tool_blocks)
+            with metrics.timed('tool_round'):
+                results = await asyncio.gather(*[
+                    execute_tool(block.name, block.input) for block in tool_blocks
+                ])
+            for result in results:
+                traffic.remember_jobs(context, result)
+            tool_results = [
+                traffic.tool_result_block(block.id, result, block.name, block.input)
+                for block, result in zip(tool_blocks, results)
+            ]
+            
+            messages.append(traffic.assistant_message(response.content))
+            messages.append({'role': 'user', 'content': tool_results})
+            
+            response = await call_claude(messages, 'tool_round')
+        
+        # If we hit max rounds and Claude still wants tools, force a final answer
+        if tool_rounds >= MAX_TOOL_ROUNDS and response.stop_reason == 'tool_use':
+            logger.warning('Hit max tool rounds, forcing final answer', rounds=MAX_TOOL_ROUNDS)
+            
+            messages.append(traffic.assistant_message(response.content))
+            messages.append({'role': 'user', 'content': FORCE_FINAL_PROMPT})
+            
+            response = await call_claude(messages, 'final', tools=False)
+            logger.info('Forced final response', stopReason=response.stop_reason)
+        
+        metrics.record_tool_rounds('traffic', tool_rounds, tool_calls)
+        
+        result_text = traffic.response_text(response)
+        routing = json.loads(result_text)
+        
+        return traffic.finish_routing(context, routing)
+        
+    except json.JSONDecodeError as e:
+        logger.error('Claude returned invalid JSON', error=str(e), response=result_text)
+        return traffic.routing_error('Claude returned invalid JSON', e)
+        
+    except breaker.BreakerOpen as e:
+        return traffic.fallback_routing(context, e)
+        
+    except Exception as e:
+        logger.error('Error calling Claude', exc_info=True, error=str(e))
+        return traffic.routing_error('Error calling Claude', e)
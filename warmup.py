@@ -0,0 +1,147 @@
+"""
+Dot Traffic 2.0 - Warm-up
+Gets a worker ready before it takes traffic, so the first requests after a
+deploy don't pay for imports, connection setup and cold caches.
+
+STEPS (warm_up(), each timed; a failure is logged, recorded against the step
+in /ready and skipped - a worker that couldn't warm a cache still serves, its
+first call is just slower):
+- imports:  every module a request can touch (hub is otherwise imported on
+            the first /hub request) - prompt files read, API clients created
+- clients:  the Clients table into the spend view and the Team ID / client
+            name lookups - opens the pooled Airtable connection
+- people:   the People directory
+- jobs:     all active jobs - the list the job tools and get_project fall
+            back on if Airtable fails later
+- meetings: the Hub's meetings cache
+- outbox:   starts the email/Teams senders, which pick up anything a
+            previous process left queued
+- reservations: hands back job number blocks a crashed or killed server
+            run left behind (reservations.py)
+
+WHEN: gunicorn's post_worker_init hook (gunicorn.conf.py) runs it in each
+worker after the fork and before it accepts connections - pooled connections
+can't be shared across processes, so it can't run in the master. asgi.py
+runs it before serving. /ready answers 503 until it's done, while /health
+(liveness) answers throughout. WARMUP=off marks the worker ready at once.
+"""
+
+import os
+import time
+import threading
+import importlib
+
+import logs
+
+# ===================
+# CONFIG
+# ===================
+
+WARMUP = os.environ.get('WARMUP', 'on')  # 'off' skips the steps
+
+# Everything on a request path, so no request pays for an import
+MODULES = ('traffic', 'hub', 'airtable', 'connect', 'preprocess', 'budget', 'decision_cache',
+           'breaker', 'reservations', 'people', 'spend', 'metrics', 'tracing', 'logs', 'outbox')
+
+logger = logs.get('warmup')
+
+# ===================
+# STATE
+# ===================
+
+_ready = threading.Event()
+_steps = {}                 # step -> {'seconds', 'ok'[, 'error']}
+_finished_at = None
+
+
+# ===================
+# STEPS
+# ===================
+
+def _imports():
+    for name in MODULES:
+        importlib.import_module(name)
+
+
+def _clients():
+    import spend
+    spend.refresh()
+
+
+def _people():
+    import people
+    people.refresh()
+
+
+def _jobs():
+    import airtable
+    airtable.load_active_jobs()
+
+
+def _meetings():
+    import airtable
+    airtable.load_meetings()
+
+
+def _outbox():
+    import outbox
+    outbox.start()
+
+
+def _reservations():
+    import reservations
+    reservations.release_leftovers()
+
+
+STEPS = (
+    ('imports', _imports),
+    ('clients', _clients),
+    ('people', _people),
+    ('jobs', _jobs),
+    ('meetings', _meetings),
+    ('outbox', _outbox),
+    ('reservations', _reservations),
+)
+
+
+# ===================
+# WARM-UP
+# ===================
+
+def warm_up():
+    """Run every step, then mark this process ready. Returns the step timings."""
+    global _finished_at
+    if WARMUP == 'off':
+        _ready.set()
+        return {}
+    
+    start = time.perf_counter()
+    for name, step in STEPS:
+        step_start = time.perf_counter()
+        try:
+            step()
+            _steps[name] = {'seconds': round(time.perf_counter() - step_start, 3), 'ok': True}
+        except Exception as e:
+            error = str(e).splitlines()[0] if str(e) else type(e).__name__
+            _steps[name] = {'seconds': round(time.perf_counter() - step_start, 3), 'ok': False, 'error': error}
+            logger.warning('Step failed', step=name, error=error)
+    
+    _finished_at = time.time()
+    _ready.set()
+    logger.info('Ready', seconds=round(time.perf_counter() - start, 2),
+                steps={name: step['seconds'] for name, step in _steps.items()})
+    return dict(_steps)
+
+
+def ready():
+    """Whether this process has finished warming up"""
+    return _ready.is_set()
+
+
+def status():
+    """Readiness and step timings, for /ready"""
+    return {
+        'ready': _ready.is_set(),
+        'steps': dict(_steps),
+        'readyFor': round(time.time() - _finished_at) if _finished_at else None,
+    }